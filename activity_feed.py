@@ -0,0 +1,199 @@
+"""
+Bounded recent-activity feed fed by AppData change events from every engine
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from data_models import AppData
+from instrumentation import timed
+
+DEPARTMENT_CAPACITY = 500
+USER_CAPACITY = 100
+INBOX_DRAIN_AT = 1000       # writers drain opportunistically past this, if no reader holds the lock
+COALESCE_SECONDS = 15 * 60  # same-kind events closer than this merge into one entry
+ICONS = {"bid": "🔄", "assignment": "✅", "credential": "⚠️", "consultation": "💬", "message": "✉️", "swap": "🔁"}
+
+@dataclass
+class ActivityEvent:
+    seq: int
+    kind: str
+    department: str
+    text: str
+    users: Tuple[str, ...] = ()
+    timestamp: float = field(default_factory=time.time)
+    count: int = 1
+    group: Optional[str] = None  # events sharing a group within COALESCE_SECONDS are merged
+    summary: str = ""            # text once merged; "{n}" is the merged count
+    superseded: bool = False     # a later merged copy replaced this one; reads skip it
+
+    @property
+    def display(self) -> str:
+        text = self.summary.format(n=self.count) if self.count > 1 and self.summary else self.text
+        return f"{ICONS.get(self.kind, '•')} {text}"
+
+    @property
+    def time_label(self) -> str:
+        return datetime.fromtimestamp(self.timestamp).strftime("%b %d %I:%M %p")
+
+def _shift_label(shift) -> str:
+    return f"{shift.shift} shift ({shift.location}, {shift.date})"
+
+def describe_change(collection: str, before, after) -> List[Dict]:
+    """Feed entries for one record write; empty for writes nobody needs to see"""
+    if collection == "open_shifts":
+        events = []
+        new_bids = (after.bid_history or [])[len(before.bid_history or []) if before else 0:]
+        for bid in new_bids:
+            events.append(dict(kind="bid", users=(bid["radiologist"],), group=f"bid:{after.shift}",
+                               text=f"{bid['radiologist']} bid ${bid['amount']:,} on {_shift_label(after)}",
+                               summary=f"{{n}} new bids on {after.shift} shifts"))
+        if after.assigned_to and (before is None or before.assigned_to != after.assigned_to):
+            users = (after.assigned_to,) + ((before.assigned_to,) if before and before.assigned_to else ())
+            events.append(dict(kind="assignment", users=users, group=f"assignment:{after.assigned_to}",
+                               text=f"{_shift_label(after)} assigned to {after.assigned_to}",
+                               summary=f"{{n}} shifts assigned to {after.assigned_to}"))
+        return events
+    if collection == "consultations" and before is None:
+        return [dict(kind="consultation", users=(after.requesting_physician,), group="consultation",
+                     text=f"New consultation request ({after.urgency}): {after.description[:80]}",
+                     summary="{n} new consultation requests")]
+    if collection == "messages" and before is None:
+        return [dict(kind="message", users=(after.recipient,), group=f"message:{after.sender}->{after.recipient}",
+                     text=f"Message from {after.sender} to {after.recipient}",
+                     summary=f"{{n}} messages from {after.sender} to {after.recipient}")]
+    if collection == "swap_requests" and (before is None or before.status != after.status):
+        who = (after.requester,) + ((after.candidate,) if after.candidate else ())
+        return [dict(kind="swap", users=who,
+                     text=f"Swap request #{after.id} for shift {after.shift_id}: {after.status.lower()}")]
+    return []
+
+class ActivityFeed:
+    """Ring buffers of recent activity per department and per user.
+
+    publish() only appends to a lock-free deque, so the engine thread that wrote
+    the record never waits on the feed. Readers drain that inbox under the feed's
+    own lock, turning writes into entries and merging repeats ("5 new bids on
+    Weekend Night shifts"); the bounded deques then drop the oldest entries."""
+
+    def __init__(self, department_capacity: int = DEPARTMENT_CAPACITY, user_capacity: int = USER_CAPACITY,
+                 coalesce_seconds: float = COALESCE_SECONDS):
+        self.department_capacity = department_capacity
+        self.user_capacity = user_capacity
+        self.coalesce_seconds = coalesce_seconds
+        self._inbox: Deque[Tuple] = deque()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._departments: Dict[str, Deque[ActivityEvent]] = {}
+        self._users: Dict[str, Deque[ActivityEvent]] = {}
+        self._latest: Dict[Tuple[str, str], ActivityEvent] = {}  # (department, group) -> mergeable entry
+        self._listeners: Dict[str, Tuple[AppData, object]] = {}
+
+    # --- Sources -------------------------------------------------------------
+
+    def watch(self, department: str, app_data: AppData) -> None:
+        """Publish every record write in a shard"""
+        self.unwatch(department)
+        def listener(collection, old, new):
+            self._inbox.append((department, collection, old, new, time.time()))
+            self._maybe_drain()
+        self._listeners[department] = (app_data, app_data.subscribe(listener))
+
+    def unwatch(self, department: str) -> None:
+        watched = self._listeners.pop(department, None)
+        if watched is not None:
+            watched[0].unsubscribe(watched[1])
+
+    def publish(self, department: str, kind: str, text: str, users: Tuple[str, ...] = (),
+                group: Optional[str] = None, summary: str = "") -> None:
+        """Add one entry directly (e.g. credential alerts); never blocks"""
+        self._inbox.append((department, None, dict(kind=kind, text=text, users=tuple(users), group=group,
+                                                   summary=summary), None, time.time()))
+        self._maybe_drain()
+
+    def _maybe_drain(self) -> None:
+        """Keep the inbox bounded when nobody reads, without ever waiting for the lock"""
+        if len(self._inbox) > INBOX_DRAIN_AT and self._lock.acquire(blocking=False):
+            try:
+                self._drain()
+            finally:
+                self._lock.release()
+
+    # --- Draining ------------------------------------------------------------
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                department, collection, old, new, stamp = self._inbox.popleft()
+            except IndexError:
+                return
+            if collection is None:
+                self._add(department, old, stamp)
+                continue
+            for before, after in zip(old, new):
+                for entry in describe_change(collection, before, after):
+                    self._add(department, entry, stamp)
+
+    def _add(self, department: str, entry: Dict, stamp: float) -> None:
+        group = entry.get("group")
+        buffer = self._departments.get(department)
+        if buffer is None:
+            buffer = self._departments[department] = deque(maxlen=self.department_capacity)
+        latest = self._latest.get((department, group)) if group else None
+        if latest is not None and (stamp - latest.timestamp > self.coalesce_seconds
+                                   or not buffer or buffer[0].seq > latest.seq):
+            del self._latest[(department, group)]  # window closed, or evicted from the ring
+            latest = None
+        self._seq += 1
+        if latest is not None:
+            # append a merged copy under a new seq, so pages stay newest-first without
+            # searching the rings; the old entry stays behind, skipped on read
+            event = replace(latest, seq=self._seq, count=latest.count + 1, timestamp=stamp, text=entry["text"],
+                            users=latest.users + tuple(u for u in entry["users"] if u not in latest.users))
+            latest.superseded = True
+            self._latest[(department, group)] = event
+            buffer.append(event)
+            for user in event.users:
+                self._user_buffer(user).append(event)
+            return
+        event = ActivityEvent(self._seq, department=department, timestamp=stamp, **entry)
+        buffer.append(event)
+        for user in event.users:
+            self._user_buffer(user).append(event)
+        if group:
+            self._latest[(department, group)] = event
+            if len(self._latest) > 4 * self.department_capacity:
+                self._latest = {key: e for key, e in self._latest.items()
+                                if stamp - e.timestamp <= self.coalesce_seconds}
+
+    def _user_buffer(self, user: str) -> Deque[ActivityEvent]:
+        buffer = self._users.get(user)
+        if buffer is None:
+            buffer = self._users[user] = deque(maxlen=self.user_capacity)
+        return buffer
+
+    # --- Reads ---------------------------------------------------------------
+
+    @timed()
+    def page(self, department: Optional[str] = None, user: Optional[str] = None,
+             before: Optional[int] = None, limit: int = 20) -> List[ActivityEvent]:
+        """Newest first; pass the last entry's seq as `before` for the next page"""
+        with self._lock:
+            self._drain()
+            buffer = self._users.get(user, ()) if user is not None else self._departments.get(department, ())
+            entries = []
+            for event in reversed(buffer):
+                if event.superseded:
+                    continue
+                if before is not None and event.seq >= before:
+                    continue
+                if department is not None and event.department != department:
+                    continue
+                entries.append(event)
+                if len(entries) == limit:
+                    break
+            return entries
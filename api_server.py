@@ -0,0 +1,457 @@
+"""
+Headless JSON API over the shared department data and bidding engine
+
+Usage:
+    python api_server.py --port 8502
+    python api_server.py --port 8502 --scale medium
+    python api_server.py --port 8503 --shared-db radflow_shared.db   # one of several workers
+    python api_server.py --port 8502 --audit-dir radflow_audit
+    python api_server.py --port 8502 --scale large --snapshot large.rfsnap   # instant restarts
+    python api_server.py --host 0.0.0.0 --tokens api_tokens.json   # off localhost, bearer tokens required
+"""
+
+import argparse
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import traceback
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from attachments import Attachment
+from audit_log import acting_as
+from bidding import BidRejected
+from swaps import SwapRejected
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+from instrumentation import timed
+
+SORT_FIELDS = ("date", "shift", "location", "base_compensation", "status", "id")
+MAX_PAGE_SIZE = 500
+MAX_BODY_BYTES = 64 * 1024
+RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+UNSAFE_FILENAME = re.compile(r"[^\w .()-]")
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+CONSULT_FIELDS = ("case_id", "requesting_physician", "specialty_needed", "urgency", "description")
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _int_param(params: Dict[str, List[str]], name: str, default: int, low: int = 0,
+               high: Optional[int] = None) -> int:
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[-1])
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer") from None
+    if value < low or (high is not None and value > high):
+        raise ApiError(400, f"{name} must be between {low} and {high}" if high is not None else f"{name} must be >= {low}")
+    return value
+
+def load_tokens(path: str) -> Dict[str, str]:
+    """{user: token} JSON file -> {token: user}"""
+    with open(path, encoding="utf-8") as handle:
+        users = json.load(handle)
+    if not isinstance(users, dict) or not all(isinstance(t, str) and t for t in users.values()):
+        raise ValueError(f"{path} must map each user to a non-empty token string")
+    return {token: user for user, token in users.items()}
+
+def _flag(params: Dict[str, List[str]], name: str) -> bool:
+    return params.get(name, [""])[-1].lower() in ("1", "true", "yes")
+
+class RadFlowApi:
+    """Request routing and JSON shaping, independent of the HTTP transport"""
+
+    def __init__(self, store: DepartmentStore):
+        self.store = store
+        self.routes = [
+            ("GET", ("health",), self.health),
+            ("GET", ("departments",), self.list_departments),
+            ("GET", ("shifts",), self.list_shifts),
+            ("GET", ("shifts", None), self.get_shift),
+            ("POST", ("shifts", None, "bids"), self.place_bid),
+            ("POST", ("shifts", None, "award"), self.award_shift),
+            ("GET", ("shifts", None, "swap-candidates"), self.swap_candidates),
+            ("GET", ("auctions", "deltas"), self.auction_deltas),
+            ("GET", ("swaps",), self.list_swaps),
+            ("POST", ("swaps",), self.post_swap),
+            ("POST", ("swaps", None, "offer"), self.offer_swap),
+            ("POST", ("swaps", None, "approve"), self.approve_swap),
+            ("GET", ("consultations",), self.list_consultations),
+            ("POST", ("consultations",), self.submit_consultation),
+            ("GET", ("attachments", None), self.get_attachment)
+        ]
+
+    def dispatch(self, method: str, path: str, params: Dict[str, List[str]], body: Optional[Dict]) -> Tuple[int, Dict]:
+        if self.store.shared is not None:
+            self.store.shared.sync()
+        parts = tuple(part for part in path.split("/") if part)
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            if len(pattern) != len(parts) or any(p is not None and p != part for p, part in zip(pattern, parts)):
+                continue
+            path_matched = True
+            if route_method == method:
+                args = [part for p, part in zip(pattern, parts) if p is None]
+                return handler(params, body, *args)
+        raise ApiError(405 if path_matched else 404, "Method not allowed" if path_matched else "Not found")
+
+    def _department(self, params: Dict[str, List[str]], body: Optional[Dict] = None) -> str:
+        name = (body or {}).get("department") or params.get("department", [None])[-1]
+        if name is not None and not isinstance(name, str):
+            raise ApiError(422, "department must be a string")
+        if name is None:
+            departments = self.store.departments
+            if len(departments) == 1:
+                return departments[0]
+            if DEFAULT_DEPARTMENT in self.store.shards:
+                return DEFAULT_DEPARTMENT
+            raise ApiError(400, "department is required")
+        if name not in self.store.shards:
+            raise ApiError(404, f"Unknown department {name!r}")
+        return name
+
+    @staticmethod
+    def _shift_id(raw: str) -> int:
+        try:
+            return int(raw)
+        except ValueError:
+            raise ApiError(404, "Not found") from None
+
+    @staticmethod
+    def _request_id(raw: str) -> int:
+        try:
+            return int(raw)
+        except ValueError:
+            raise ApiError(404, f"Swap request {raw} not found") from None
+
+    # --- Handlers ------------------------------------------------------------
+
+    def health(self, params, body):
+        return 200, {"status": "ok", "departments": len(self.store.departments),
+                     "auction_seq": self.store.bidding.latest_seq}
+
+    def list_departments(self, params, body):
+        return 200, {"departments": [
+            {"name": name, "radiologists": len(self.store.shard(name).radiologists),
+             "open_shifts": len(self.store.shard(name).open_shifts)}
+            for name in self.store.departments
+        ]}
+
+    @timed()
+    def list_shifts(self, params, body):
+        sort_by = params.get("sort", ["date"])[-1]
+        if sort_by not in SORT_FIELDS:
+            raise ApiError(400, f"sort must be one of {', '.join(SORT_FIELDS)}")
+        offset = _int_param(params, "offset", 0)
+        limit = _int_param(params, "limit", 25, 1, MAX_PAGE_SIZE)
+        departments = params.get("department")
+        for name in departments or ():
+            if name not in self.store.shards:
+                raise ApiError(404, f"Unknown department {name!r}")
+        page, total = self.store.query_open_shifts(
+            departments=departments, sort_by=sort_by, descending=_flag(params, "desc"),
+            offset=offset, limit=limit,
+            date_from=params.get("date_from", [None])[-1], date_to=params.get("date_to", [None])[-1],
+            locations=params.get("location"), modes=params.get("mode"), statuses=params.get("status")
+        )
+        return 200, {"total": total, "offset": offset, "limit": limit,
+                     "shifts": [{"department": department, **asdict(shift)} for department, shift in page]}
+
+    def get_shift(self, params, body, raw_id):
+        department = self._department(params)
+        shift = self.store.shard(department).get_shift_by_id(self._shift_id(raw_id))
+        if shift is None:
+            raise ApiError(404, f"Shift {raw_id} not found")
+        return 200, {"department": department, **asdict(shift)}
+
+    @timed()
+    def place_bid(self, params, body, raw_id):
+        body = body or {}
+        department = self._department(params, body)
+        radiologist, amount = body.get("radiologist"), body.get("amount")
+        if not isinstance(radiologist, str) or not radiologist:
+            raise ApiError(422, "radiologist is required")
+        if isinstance(amount, bool) or not isinstance(amount, int):
+            raise ApiError(422, "amount must be a whole number of dollars")
+        shift_id = self._shift_id(raw_id)
+        if self.store.shard(department).get_shift_by_id(shift_id) is None:
+            raise ApiError(404, f"Shift {raw_id} not found")
+        try:
+            event = self.store.bidding.place_bid(department, shift_id, radiologist, amount)
+        except BidRejected as exc:
+            raise ApiError(409, str(exc)) from None
+        return 201, asdict(event)
+
+    def award_shift(self, params, body, raw_id):
+        department = self._department(params, body)
+        try:
+            shift = self.store.bidding.close_auction(department, self._shift_id(raw_id))
+        except BidRejected as exc:
+            raise ApiError(409, str(exc)) from None
+        return 200, {"department": department, **asdict(shift)}
+
+    @timed()
+    def swap_candidates(self, params, body, raw_id):
+        department = self._department(params)
+        limit = _int_param(params, "limit", 10, 1, 100)
+        try:
+            candidates = self.store.swaps.candidates(department, self._shift_id(raw_id),
+                                                     params.get("q", [""])[-1], limit)
+        except SwapRejected as exc:
+            raise ApiError(404, str(exc)) from None
+        return 200, {"department": department, "candidates": [asdict(c) for c in candidates]}
+
+    def list_swaps(self, params, body):
+        department = self._department(params)
+        return 200, {"department": department,
+                     "swaps": [asdict(r) for r in self.store.swaps.open_requests(department)]}
+
+    def post_swap(self, params, body):
+        body = body or {}
+        department = self._department(params, body)
+        if isinstance(body.get("shift_id"), bool) or not isinstance(body.get("shift_id"), int) \
+                or not isinstance(body.get("requester"), str):
+            raise ApiError(422, "shift_id and requester are required")
+        try:
+            request = self.store.swaps.post(department, body["shift_id"], body["requester"], str(body.get("note", "")))
+        except SwapRejected as exc:
+            raise ApiError(409, str(exc)) from None
+        return 201, asdict(request)
+
+    def offer_swap(self, params, body, raw_id):
+        body = body or {}
+        department = self._department(params, body)
+        if not isinstance(body.get("candidate"), str):
+            raise ApiError(422, "candidate is required")
+        try:
+            request = self.store.swaps.offer(department, self._request_id(raw_id), body["candidate"])
+        except SwapRejected as exc:
+            raise ApiError(409, str(exc)) from None
+        return 200, asdict(request)
+
+    def approve_swap(self, params, body, raw_id):
+        department = self._department(params, body)
+        try:
+            shift = self.store.swaps.approve(department, self._request_id(raw_id))
+        except SwapRejected as exc:
+            raise ApiError(409, str(exc)) from None
+        return 200, {"department": department, **asdict(shift)}
+
+    def auction_deltas(self, params, body):
+        department = params.get("department", [None])[-1]
+        deltas = self.store.bidding.deltas(_int_param(params, "since", 0), department)
+        return 200, {**deltas, "events": [asdict(event) for event in deltas["events"]]}
+
+    def get_attachment(self, params, body, digest):
+        """Metadata only; the transport streams the bytes (honouring Range)"""
+        try:
+            return 200, self.store.attachments.get(digest)
+        except KeyError:
+            raise ApiError(404, "Not found") from None
+
+    def list_consultations(self, params, body):
+        department = self._department(params)
+        statuses = {status.lower() for status in params.get("status", [])}
+        consultations = [asdict(c) for c in self.store.shard(department).consultations
+                         if not statuses or c.status.lower() in statuses]
+        return 200, {"department": department, "consultations": consultations}
+
+    def submit_consultation(self, params, body):
+        body = body or {}
+        department = self._department(params, body)
+        missing = [name for name in CONSULT_FIELDS if not isinstance(body.get(name), str) or not body[name].strip()]
+        if missing:
+            raise ApiError(422, f"missing fields: {', '.join(missing)}")
+        with self.store.transaction():
+            consultation = self.store.shard(department).add_consultation(
+                **{name: body[name].strip() for name in CONSULT_FIELDS})
+        return 201, {"department": department, **asdict(consultation)}
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection across requests
+    server_version = "RadFlowAPI/1.0"
+    disable_nagle_algorithm = True  # headers and body are separate writes; don't stall on delayed ACKs
+
+    def _handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        try:
+            user = self._authenticate()
+            body = self._read_body() if method == "POST" else None
+            with acting_as(user):
+                status, payload = self.server.api.dispatch(method, url.path, parse_qs(url.query), body)
+        except ApiError as exc:
+            status, payload = exc.status, {"error": str(exc)}
+            if exc.status == 401:
+                self.close_connection = True
+        except ValueError as exc:
+            status, payload = 422, {"error": str(exc)}
+        except Exception:  # a bug, not the client's fault: log it and still answer
+            traceback.print_exc(file=sys.stderr)
+            status, payload = 500, {"error": "Internal server error"}
+        if isinstance(payload, Attachment):
+            self._send_attachment(payload)
+        else:
+            self._send_json(status, payload)
+
+    def _authenticate(self) -> str:
+        """The user a bearer token belongs to; without a token file (localhost only)
+        callers name themselves in X-RadFlow-User"""
+        tokens = self.server.tokens
+        if tokens is None:
+            return self.headers.get("X-RadFlow-User") or "api"
+        scheme, _, presented = self.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            for token, user in tokens.items():
+                if hmac.compare_digest(token.encode(), presented.strip().encode()):
+                    return user
+        raise ApiError(401, "A valid bearer token is required")
+
+    def _read_body(self) -> Optional[Dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise ApiError(413, "Request body too large")
+        if not length:
+            return None
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            raise ApiError(400, "Body must be JSON") from None
+        if not isinstance(body, dict):
+            raise ApiError(400, "Body must be a JSON object")
+        return body
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        if status == 401:
+            self.send_header("WWW-Authenticate", 'Bearer realm="radflow"')
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_attachment(self, attachment: Attachment) -> None:
+        """The blob in chunks, or one `Range: bytes=a-b` slice of it (206)"""
+        start, end, status = 0, attachment.size, 200
+        requested = RANGE.fullmatch(self.headers.get("Range", "").strip())
+        if requested:
+            first, last = requested.groups()
+            if first:
+                start, end = int(first), min(int(last) + 1 if last else attachment.size, attachment.size)
+            elif last:
+                start = max(attachment.size - int(last), 0)
+            if not (first or last) or start >= end:  # "bytes=-" names no range at all
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{attachment.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        try:
+            chunks = self.server.api.store.attachments.read_range(attachment.digest, start, end)
+        except (KeyError, OSError):  # row without its blob (deleted under us)
+            self._send_json(404, {"error": "Not found"})
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", attachment.content_type)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Disposition", f'inline; filename="{UNSAFE_FILENAME.sub("_", attachment.name)}"')
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{attachment.size}")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(chunk)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class ApiServer(ThreadingHTTPServer):
+    """One thread per connection; connections stay open between requests"""
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, store: DepartmentStore, host: str = "127.0.0.1", port: int = 8502, verbose: bool = False,
+                 tokens: Optional[Dict[str, str]] = None):
+        self.api = RadFlowApi(store)
+        self.verbose = verbose
+        self.tokens = tokens  # {token: user}; None trusts X-RadFlow-User, so bind to localhost only
+        super().__init__((host, port), _ApiHandler)
+
+def serve_in_background(store: DepartmentStore, host: str = "127.0.0.1", port: int = 0,
+                        tokens: Optional[Dict[str, str]] = None) -> ApiServer:
+    """Start a server on a daemon thread; port 0 picks a free port (see server.server_address)"""
+    server = ApiServer(store, host, port, tokens=tokens)
+    threading.Thread(target=server.serve_forever, daemon=True, name="radflow-api").start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--scale", choices=["sample", "small", "medium", "large"], default="sample",
+                        help="serve the built-in sample data or a synthetic dataset")
+    parser.add_argument("--snapshot", help="load the department from this snapshot file, writing it on first run")
+    parser.add_argument("--shared-db", help="SQLite database shared with other worker processes")
+    parser.add_argument("--audit-dir", help="directory for the tamper-evident audit log (other processes "
+                        "sharing it write to worker-<pid> subdirectories)")
+    parser.add_argument("--tokens", default=os.environ.get("RADFLOW_API_TOKENS"),
+                        help="JSON file mapping each user to their bearer token; required off localhost")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if args.tokens is None and args.host not in LOOPBACK_HOSTS:
+        parser.error("--tokens is required when --host is not localhost")
+    tokens = load_tokens(args.tokens) if args.tokens else None
+
+    if args.snapshot and os.path.exists(args.snapshot):
+        from snapshot import load_snapshot
+        store = DepartmentStore()
+        store.add_department(DEFAULT_DEPARTMENT, load_snapshot(args.snapshot, DEFAULT_DEPARTMENT))
+    elif args.scale == "sample":
+        store = DepartmentStore.with_sample_data()
+    else:
+        from synthetic_data import SCALES, generate_app_data
+        store = DepartmentStore()
+        store.add_department(DEFAULT_DEPARTMENT, generate_app_data(**SCALES[args.scale]))
+    if args.snapshot and not os.path.exists(args.snapshot):
+        from snapshot import save_snapshot
+        save_snapshot(store.shard(DEFAULT_DEPARTMENT), args.snapshot)
+
+    if args.shared_db:
+        from shared_state import SharedState
+        SharedState(args.shared_db).attach(store)
+
+    if args.audit_dir:
+        from audit_log import AuditLog
+        AuditLog(args.audit_dir).watch_store(store)
+
+    server = ApiServer(store, args.host, args.port, verbose=args.verbose, tokens=tokens)
+    print(f"RadFlow API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
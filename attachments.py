@@ -0,0 +1,263 @@
+"""
+Content-addressed message attachments: chunked streaming writes, reference counts,
+ranged/memory-mapped reads and cached thumbnails from a worker pool
+"""
+
+import glob
+import hashlib
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterator, Optional, Set, Tuple
+
+from instrumentation import timed
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are skipped without Pillow; attachments still work
+    Image = None
+
+DEFAULT_DIRECTORY = os.environ.get("RADFLOW_ATTACHMENT_DIR", "radflow_attachments")
+CHUNK_SIZE = 256 * 1024
+MAX_BYTES = 50 * 1024 * 1024
+THUMBNAIL_SIZE = 256
+THUMBNAIL_WORKERS = 2
+SIGNATURES = ((b"%PDF-", "application/pdf"), (b"\x89PNG\r\n\x1a\n", "image/png"), (b"\xff\xd8\xff", "image/jpeg"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    refs INTEGER NOT NULL,
+    created TEXT NOT NULL
+);
+"""
+
+class AttachmentRejected(ValueError):
+    pass
+
+@dataclass(frozen=True)
+class Attachment:
+    digest: str
+    size: int
+    content_type: str
+    name: str
+    refs: int
+    created: str
+
+    @property
+    def is_image(self) -> bool:
+        return self.content_type.startswith("image/")
+
+def sniff(head: bytes) -> Optional[str]:
+    """Content type from the leading bytes; the uploader's extension is not trusted"""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+class AttachmentStore:
+    """Blobs stored once per SHA-256 under objects/ab/abcd..., with the reference
+    count, size and type in SQLite so several worker processes can share a directory.
+
+    put() hashes while copying the upload to a temp file chunk by chunk, so neither
+    the upload nor the stored blob is ever held in memory whole; a second upload of
+    the same bytes only bumps the count. Reads are ranged (pread) or memory-mapped."""
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, chunk_size: int = CHUNK_SIZE,
+                 max_bytes: int = MAX_BYTES, workers: int = THUMBNAIL_WORKERS):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.workers = workers
+        for sub in ("objects", "thumbnails", "tmp"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "attachments.db"), timeout=30.0,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[Tuple[str, int], Future] = {}
+        self._failed: Set[Tuple[str, int]] = set()  # unreadable images are not retried every rerun
+
+    # --- Paths ---------------------------------------------------------------
+
+    def path(self, digest: str) -> str:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise KeyError(digest)  # digests reach here from URLs; never build paths from anything else
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _thumbnail_path(self, digest: str, size: int) -> str:
+        return os.path.join(self.directory, "thumbnails", digest[:2], f"{digest}-{size}.png")
+
+    # --- Writes --------------------------------------------------------------
+
+    @timed()
+    def put(self, source: BinaryIO, name: str = "", content_type: Optional[str] = None) -> Attachment:
+        """Stream `source` to disk; returns the stored attachment with one more reference"""
+        hasher = hashlib.sha256()
+        size = 0
+        sniffed = None
+        handle = tempfile.NamedTemporaryFile(dir=os.path.join(self.directory, "tmp"), delete=False)
+        try:
+            with handle:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if sniffed is None:
+                        sniffed = sniff(chunk) or ""
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise AttachmentRejected(f"Attachment exceeds {self.max_bytes // (1024 * 1024)} MB")
+                    hasher.update(chunk)
+                    handle.write(chunk)
+                handle.flush()
+                os.fsync(handle.fileno())
+            if size == 0:
+                raise AttachmentRejected("Attachment is empty")
+            if not sniffed:
+                raise AttachmentRejected(f"Unsupported attachment type {content_type or name or 'unknown'}")
+            digest = hasher.hexdigest()
+            target = self.path(digest)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if os.path.exists(target):
+                        os.unlink(handle.name)
+                    else:
+                        os.replace(handle.name, target)
+                    self._conn.execute(
+                        "INSERT INTO objects (digest, size, content_type, name, refs, created) VALUES (?, ?, ?, ?, 1, ?) "
+                        "ON CONFLICT(digest) DO UPDATE SET refs = refs + 1",
+                        (digest, size, sniffed, os.path.basename(name) or digest[:12],
+                         datetime.now(timezone.utc).isoformat(timespec="seconds")))
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        finally:
+            if os.path.exists(handle.name):
+                os.unlink(handle.name)
+        return self.get(digest)
+
+    def retain(self, digest: str) -> Attachment:
+        """One more reference to a stored attachment (e.g. a forwarded message)"""
+        with self._lock:
+            updated = self._conn.execute("UPDATE objects SET refs = refs + 1 WHERE digest = ?", (digest,)).rowcount
+        if not updated:
+            raise KeyError(digest)
+        return self.get(digest)
+
+    def release(self, digest: str) -> int:
+        """Drop one reference; the blob and its thumbnails are deleted with the last one"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT refs FROM objects WHERE digest = ?", (digest,)).fetchone()
+                if row is None:
+                    raise KeyError(digest)
+                refs = row[0] - 1
+                if refs > 0:
+                    self._conn.execute("UPDATE objects SET refs = ? WHERE digest = ?", (refs, digest))
+                else:
+                    self._conn.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+                    thumbnails = glob.glob(self._thumbnail_path(digest, 0).replace("-0.png", "-*.png"))
+                    for path in [self.path(digest), *thumbnails]:
+                        if os.path.exists(path):
+                            os.unlink(path)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return max(refs, 0)
+
+    # --- Reads ---------------------------------------------------------------
+
+    def get(self, digest: str) -> Attachment:
+        with self._lock:
+            row = self._conn.execute("SELECT digest, size, content_type, name, refs, created FROM objects "
+                                     "WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return Attachment(*row)
+
+    def read_range(self, digest: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes [start, end) in chunks via pread; only one chunk is in memory at a time.
+        The blob is opened here, so a missing file raises before anything is sent."""
+        handle = open(self.path(digest), "rb", buffering=0)
+        end = os.fstat(handle.fileno()).st_size if end is None else end
+        return self._chunks(handle, start, end)
+
+    def _chunks(self, handle: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+        with handle:
+            offset = start
+            while offset < end:
+                chunk = os.pread(handle.fileno(), min(self.chunk_size, end - offset), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+
+    @contextmanager
+    def mapped(self, digest: str) -> Iterator[mmap.mmap]:
+        """The blob as a read-only memory map; pages load on access, not up front"""
+        with open(self.path(digest), "rb") as handle:
+            view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield view
+        finally:
+            view.close()
+
+    # --- Thumbnails ----------------------------------------------------------
+
+    def thumbnail(self, digest: str, size: int = THUMBNAIL_SIZE) -> Optional[str]:
+        """Path of a cached PNG preview, or None while it is being rendered (or can't be:
+        PDFs, or Pillow not installed). The first call queues the render on the pool."""
+        if Image is None:
+            return None
+        path = self._thumbnail_path(digest, size)
+        if os.path.exists(path):
+            return path
+        if not self.get(digest).is_image:
+            return None
+        key = (digest, size)
+        with self._lock:
+            if key in self._pending or key in self._failed:
+                return None
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="radflow-thumbs")
+            future = self._pending[key] = self._pool.submit(self._render, digest, size, path)
+        future.add_done_callback(lambda done: self._forget(key, done))  # may run at once, so outside the lock
+        return None
+
+    def _forget(self, key: Tuple[str, int], future: Future) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.exception() is not None:
+                self._failed.add(key)
+
+    def _render(self, digest: str, size: int, path: str) -> str:
+        with Image.open(self.path(digest)) as image:
+            image.draft("RGB", (size, size))  # JPEG decodes at reduced scale directly
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.{threading.get_ident()}.tmp"
+            image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB").save(temp, "PNG")
+        os.replace(temp, path)
+        return path
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        self._conn.close()
@@ -0,0 +1,396 @@
+"""
+Tamper-evident audit log: hash-chained records in rotated gzip segments, group-committed
+with one fsync per batch, and a sparse per-batch index for user and time-range queries
+"""
+
+import atexit
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from data_models import AppData
+from file_locks import lock_file
+from instrumentation import timed
+
+DEFAULT_DIRECTORY = os.environ.get("RADFLOW_AUDIT_DIR", "radflow_audit")
+SEGMENT_BYTES = 1 << 20    # compressed size before rotating to a new segment
+BATCH_SIZE = 512           # records per group commit before the writer wakes early
+MAX_BATCH = 4096           # cap per gzip member so the sparse index stays selective
+FLUSH_INTERVAL = 0.05      # seconds a record may wait for its batch's fsync
+LOCK_NAME = ".lock"
+GENESIS = "0" * 64
+SYSTEM_ACTOR = "system"
+
+_actor: contextvars.ContextVar = contextvars.ContextVar("audit_actor", default=SYSTEM_ACTOR)
+_replaying: contextvars.ContextVar = contextvars.ContextVar("audit_replaying", default=False)
+
+@contextmanager
+def acting_as(user: str):
+    """Attribute writes made in this context to `user`"""
+    token = _actor.set(user)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+@contextmanager
+def replaying():
+    """Writes replicated from another worker; that worker's own log already has them"""
+    token = _replaying.set(True)
+    try:
+        yield
+    finally:
+        _replaying.reset(token)
+
+def set_actor(user: str) -> None:
+    """Attribute writes on the current thread/context to `user` (e.g. once per Streamlit rerun)"""
+    _actor.set(user)
+
+def _canonical(record: Dict) -> str:
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+
+def _chain(prev: str, record: Dict) -> str:
+    return hashlib.sha256((prev + _canonical(record)).encode()).hexdigest()
+
+def _iso(when: Union[None, str, datetime]) -> Optional[str]:
+    if when is None or isinstance(when, str):
+        return when
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when.isoformat(timespec="microseconds") + "Z"
+
+@dataclass
+class _Batch:
+    """Sparse index entry: one gzip member per group commit"""
+    offset: int
+    length: int
+    first_seq: int
+    last_seq: int
+    first_ts: str
+    last_ts: str
+    users: List[str]
+
+@dataclass
+class _Segment:
+    path: str
+    batches: List[_Batch] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return self.batches[-1].offset + self.batches[-1].length if self.batches else 0
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-len(".log.gz")] + ".idx"
+
+def _members(data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    """(offset, length, payload) of each complete gzip member; stops at a torn tail"""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            payload = decompressor.decompress(view[offset:])
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            return
+        length = len(data) - offset - len(decompressor.unused_data)
+        yield offset, length, payload
+        offset += length
+
+def _lock_directory(directory: str):
+    """The directory's lock file held under an exclusive lock, or None if another process holds it"""
+    os.makedirs(directory, exist_ok=True)
+    handle = open(os.path.join(directory, LOCK_NAME), "a")
+    if not lock_file(handle, blocking=False):
+        handle.close()
+        return None
+    return handle
+
+class AuditLog:
+    """Append-only audit trail. append() only queues; a writer thread turns each
+    queue drain into one gzip member, fsyncs once and records the member's time
+    span and users in the segment's sidecar index. Every record carries the hash
+    of its predecessor, so editing or dropping a record breaks verify().
+
+    One chain has one writer: the directory is held under an exclusive lock, and
+    a second process pointed at it writes to its own `worker-<pid>` subdirectory."""
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, segment_bytes: int = SEGMENT_BYTES,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self._lock_file = _lock_directory(directory)
+        if self._lock_file is None:
+            directory = os.path.join(directory, f"worker-{os.getpid()}")
+            self._lock_file = _lock_directory(directory)
+            if self._lock_file is None:
+                raise RuntimeError(f"audit directory {directory} is locked by another process")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        self._queue: List[Tuple] = []
+        self._queued = 0
+        self._durable = 0
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._writer: Optional[threading.Thread] = None
+        self._listeners: Dict[str, Tuple[AppData, object]] = {}
+        self.stats = {"records": 0, "batches": 0, "fsyncs": 0}
+        self._segments: List[_Segment] = []
+        self._seq = 0
+        self._last_hash = GENESIS
+        self._load()
+        atexit.register(self.close)
+
+    # --- Startup -------------------------------------------------------------
+
+    def _load(self) -> None:
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".log.gz"))
+        for position, name in enumerate(names):
+            segment = _Segment(os.path.join(self.directory, name))
+            tail = position == len(names) - 1
+            if not tail and os.path.exists(segment.index_path):
+                with open(segment.index_path) as index:
+                    segment.batches = [_Batch(**json.loads(line)) for line in index if line.strip()]
+            else:
+                self._rescan(segment)  # the open segment's index may lag its data after a crash
+            self._segments.append(segment)
+        for segment in reversed(self._segments):
+            if segment.batches:
+                last = self._read_batch(segment, segment.batches[-1])[-1]
+                self._seq, self._last_hash = last["seq"], last["hash"]
+                break
+
+    def _rescan(self, segment: _Segment) -> None:
+        with open(segment.path, "rb") as handle:
+            data = handle.read()
+        segment.batches = []
+        for offset, length, payload in _members(data):
+            records = [json.loads(line) for line in payload.decode().splitlines()]
+            segment.batches.append(self._entry(offset, length, records))
+        if segment.size < len(data):
+            with open(segment.path, "r+b") as handle:  # drop a batch torn mid-write
+                handle.truncate(segment.size)
+        with open(segment.index_path, "w") as index:
+            index.writelines(json.dumps(batch.__dict__) + "\n" for batch in segment.batches)
+
+    @staticmethod
+    def _entry(offset: int, length: int, records: List[Dict]) -> _Batch:
+        return _Batch(offset, length, records[0]["seq"], records[-1]["seq"], records[0]["ts"], records[-1]["ts"],
+                      sorted({r["user"] for r in records}))
+
+    # --- Writing -------------------------------------------------------------
+
+    def append(self, action: str, user: Optional[str] = None, department: Optional[str] = None,
+               target: Optional[str] = None, **detail) -> None:
+        """Queue one record; returns at once, durability follows within flush_interval"""
+        ts = _iso(datetime.now(timezone.utc))
+        with self._cond:
+            if self._closed:
+                raise ValueError("audit log is closed")
+            if self._error is not None:
+                raise RuntimeError("audit log writer failed") from self._error
+            self._queue.append((ts, action, user or _actor.get(), department, target, detail))
+            self._queued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, daemon=True, name="radflow-audit")
+                self._writer.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything appended so far is fsynced"""
+        with self._cond:
+            target = self._queued
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._durable >= target or self._error is not None,
+                                       timeout) and self._error is None
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        for department in list(self._listeners):
+            self.unwatch(department)
+        self._lock_file.close()  # releases the directory lock
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._queue) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_interval)  # let a group of records gather
+                batch, self._queue = self._queue[:MAX_BATCH], self._queue[MAX_BATCH:]
+                if not batch and self._closed:
+                    return
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as exc:  # e.g. disk full: refuse further appends rather than drop silently
+                    with self._cond:
+                        self._error = exc
+                        self._cond.notify_all()
+                    return
+            with self._cond:
+                self._durable += len(batch)
+                self._cond.notify_all()
+
+    @timed()
+    def _commit(self, batch: List[Tuple]) -> None:
+        records = []
+        for ts, action, user, department, target, detail in batch:
+            self._seq += 1
+            record = {"seq": self._seq, "ts": ts, "user": user, "action": action, "department": department,
+                      "target": target, "detail": detail, "prev": self._last_hash}
+            record["hash"] = self._last_hash = _chain(self._last_hash, record)
+            records.append(record)
+        member = gzip.compress("".join(_canonical(r) + "\n" for r in records).encode(), compresslevel=6)
+
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or (segment.batches and segment.size + len(member) > self.segment_bytes):
+            segment = _Segment(os.path.join(self.directory, f"segment-{records[0]['seq']:012d}.log.gz"))
+            self._segments.append(segment)
+        offset = segment.size
+        with open(segment.path, "ab") as handle:
+            handle.write(member)
+            handle.flush()
+            os.fsync(handle.fileno())  # one fsync covers the whole batch
+        entry = self._entry(offset, len(member), records)
+        segment.batches.append(entry)
+        with open(segment.index_path, "a") as index:
+            index.write(json.dumps(entry.__dict__) + "\n")
+        self.stats["records"] += len(records)
+        self.stats["batches"] += 1
+        self.stats["fsyncs"] += 1
+
+    # --- Reading -------------------------------------------------------------
+
+    def _read_batch(self, segment: _Segment, batch: _Batch) -> List[Dict]:
+        with open(segment.path, "rb") as handle:
+            handle.seek(batch.offset)
+            payload = gzip.decompress(handle.read(batch.length))
+        return [json.loads(line) for line in payload.decode().splitlines()]
+
+    @timed()
+    def query(self, user: Optional[str] = None, start: Union[None, str, datetime] = None,
+              end: Union[None, str, datetime] = None, action: Optional[str] = None,
+              department: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Records matching every given filter, oldest first. Batches whose time span or
+        user list rules them out are never read or decompressed."""
+        self.flush()
+        start, end = _iso(start), _iso(end)
+        results = []
+        for segment in list(self._segments):
+            for batch in list(segment.batches):
+                if (start and batch.last_ts < start) or (end and batch.first_ts > end):
+                    continue
+                if user is not None and user not in batch.users:
+                    continue
+                for record in self._read_batch(segment, batch):
+                    if ((user is None or record["user"] == user) and (action is None or record["action"] == action)
+                            and (department is None or record["department"] == department)
+                            and (not start or record["ts"] >= start) and (not end or record["ts"] <= end)):
+                        results.append(record)
+                        if limit is not None and len(results) >= limit:
+                            return results
+        return results
+
+    @timed()
+    def verify(self) -> Tuple[bool, Optional[int]]:
+        """Walk the whole chain; returns (intact, first bad seq)"""
+        self.flush()
+        prev, expected_seq = GENESIS, 1
+        for segment in list(self._segments):
+            with open(segment.path, "rb") as handle:
+                data = handle.read()
+            for _, _, payload in _members(data):
+                for line in payload.decode().splitlines():
+                    record = json.loads(line)
+                    claimed = record.pop("hash")
+                    if record["seq"] != expected_seq or record["prev"] != prev or _chain(prev, record) != claimed:
+                        return False, expected_seq
+                    prev, expected_seq = claimed, expected_seq + 1
+        return expected_seq - 1 == self._seq, None if expected_seq - 1 == self._seq else expected_seq
+
+    # --- Sources -------------------------------------------------------------
+
+    def watch(self, department: str, app_data: AppData) -> None:
+        """Audit every message, bid, assignment, roster and settings write in a shard"""
+        self.unwatch(department)
+        def listener(collection, old, new):
+            if _replaying.get():
+                return
+            for before, after in zip(old, new):
+                for action, user, target, detail in audit_entries(collection, before, after):
+                    self.append(action, user, department, target, **detail)
+        self._listeners[department] = (app_data, app_data.subscribe(listener))
+
+    def unwatch(self, department: str) -> None:
+        watched = self._listeners.pop(department, None)
+        if watched is not None:
+            watched[0].unsubscribe(watched[1])
+
+    def watch_store(self, store) -> "AuditLog":
+        for name, shard in store.shards.items():
+            self.watch(name, shard)
+        store.audit = self
+        return self
+
+def _settings_diff(before: Dict, after: Dict, prefix: str = "") -> Dict:
+    changed = {}
+    for key in set(before) | set(after):
+        old, new = before.get(key), after.get(key)
+        if isinstance(old, dict) and isinstance(new, dict):
+            changed.update(_settings_diff(old, new, f"{prefix}{key}."))
+        elif old != new:
+            changed[f"{prefix}{key}"] = {"from": old, "to": new}
+    return changed
+
+def audit_entries(collection: str, before, after) -> List[Tuple[str, Optional[str], str, Dict]]:
+    """(action, user, target, detail) for one record write; user None means the current actor.
+    Message bodies and case descriptions are not copied into the log."""
+    entries = []
+    if collection == "open_shifts":
+        for bid in (after.bid_history or [])[len(before.bid_history or []) if before else 0:]:
+            entries.append(("bid", bid["radiologist"], f"shift:{after.id}", {"amount": bid["amount"]}))
+        if before is None or before.assigned_to != after.assigned_to or before.status != after.status:
+            entries.append(("assignment" if after.assigned_to else "shift_update", None, f"shift:{after.id}",
+                            {"assigned_to": after.assigned_to, "status": after.status,
+                             "previous": before.assigned_to if before else None}))
+    elif collection == "messages" and before is None:
+        entries.append(("message", after.sender, f"message:{after.id}",
+                        {"recipient": after.recipient, "priority": after.priority, "chars": len(after.body),
+                         "attachments": list(after.attachments or ())}))
+    elif collection == "consultations" and before is None:
+        entries.append(("consultation", after.requesting_physician, f"case:{after.case_id}",
+                        {"specialty": after.specialty_needed, "urgency": after.urgency}))
+    elif collection == "swap_requests" and (before is None or before.status != after.status):
+        entries.append(("swap", None, f"swap:{after.id}",
+                        {"shift_id": after.shift_id, "status": after.status, "candidate": after.candidate}))
+    elif collection == "radiologists":
+        changed = [name for name in ("credentials", "preferences", "locations", "subspecialty")
+                   if before is None or getattr(before, name) != getattr(after, name)]
+        if changed:
+            entries.append(("roster", None, f"radiologist:{after.id}", {"name": after.name, "fields": changed}))
+    elif collection == "department_settings":
+        before, after = dict(before or {}), dict(after or {})
+        rotation = after.pop("rotation", None)
+        if before.pop("rotation", None) != rotation:  # log the published slot count, not the whole state
+            entries.append(("rotation", None, "rotation", {"slots": len((rotation or {}).get("assigned", ()))}))
+        changed = _settings_diff(before, after)
+        if changed or not entries:
+            entries.append(("settings", None, "department_settings", changed))
+    return entries
@@ -0,0 +1,125 @@
+"""
+Throughput scaling of the shared SQLite state across worker processes.
+
+Each worker attaches to one WAL database and runs a read-heavy mix (sync, then a
+page of open shifts) with a share of bids placed through the cross-process lock.
+Reports operations per second per worker count and checks the auction stayed
+consistent (every high bid matches its history, no lost events).
+
+Usage:
+    python benchmarks/bench_multiprocess.py --scale small --workers 1 2 4 --duration 5
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bidding import BidRejected, bid_floor
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+from shared_state import SharedState
+from synthetic_data import SCALES, generate_app_data
+
+BID_SHARE = 0.1
+
+def _worker(path, seed, start_at, duration, results):
+    store = SharedState(path).attach(DepartmentStore())
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    rng = random.Random(seed)
+    bidding_ids = [shift.id for shift in shard.get_active_bidding_shifts()]
+    bidders = [rad.name for rad in shard.radiologists if rad.preferences.get("bidding_opt_in")]
+    counts = {"reads": 0, "bids": 0, "rejected": 0}
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + duration
+    while time.time() < deadline:
+        if bidding_ids and rng.random() < BID_SHARE:
+            shift_id = rng.choice(bidding_ids)
+            store.shared.sync()
+            amount = bid_floor(shard, shard.get_shift_by_id(shift_id))
+            try:
+                store.bidding.place_bid(DEFAULT_DEPARTMENT, shift_id, rng.choice(bidders), amount)
+                counts["bids"] += 1
+            except BidRejected:
+                counts["rejected"] += 1  # another worker got there first, or the bidder is ineligible
+        else:
+            store.shared.sync()
+            shard.query_open_shifts(offset=rng.randrange(0, 200, 25), limit=25)
+            counts["reads"] += 1
+    results.put(counts)
+
+def run(path, workers, duration):
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0  # give every worker time to attach before the clock starts
+    procs = [multiprocessing.Process(target=_worker, args=(path, seed, start_at, duration, results))
+             for seed in range(workers)]
+    for proc in procs:
+        proc.start()
+    totals = {"reads": 0, "bids": 0, "rejected": 0}
+    for _ in procs:
+        for key, value in results.get().items():
+            totals[key] += value
+    for proc in procs:
+        proc.join()
+    ops = sum(totals.values())
+    return {"workers": workers, **totals, "ops_per_s": ops / duration}
+
+def check_consistency(path):
+    """High bids must equal the best bid in each history and every accepted bid must be logged"""
+    store = SharedState(path).attach(DepartmentStore())
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    problems = []
+    history_bids = 0
+    for shift in shard.open_shifts:
+        history = shift.bid_history or []
+        history_bids += len(history)
+        if history and shift.current_high_bid != max(bid["amount"] for bid in history):
+            problems.append(f"shift {shift.id}: high bid {shift.current_high_bid} does not match its history")
+    logged = len(store.shared.events_since(0))
+    return problems, history_bids, logged
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per worker count")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(f"{os.cpu_count()} CPUs; scale={args.scale}, {BID_SHARE:.0%} bids")
+    print(f"{'workers':>8} {'ops/s':>10} {'speedup':>8} {'reads':>9} {'bids':>7} {'rejected':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            path = os.path.join(tmp, f"shared-{workers}.db")
+            store = DepartmentStore()
+            store.add_department(DEFAULT_DEPARTMENT, generate_app_data(**SCALES[args.scale]))
+            SharedState(path).attach(store)  # seed a fresh database per run
+
+            row = run(path, workers, args.duration)
+            baseline_rows = [r for r in rows if r["workers"] == 1]
+            baseline = baseline_rows[0]["ops_per_s"] if baseline_rows else row["ops_per_s"] / workers
+            row["speedup"] = row["ops_per_s"] / baseline
+            problems, history_bids, logged = check_consistency(path)
+            row["consistent"] = not problems and logged >= row["bids"]
+            rows.append(row)
+            print(f"{workers:>8} {row['ops_per_s']:>10,.0f} {row['speedup']:>7.2f}x {row['reads']:>9,} "
+                  f"{row['bids']:>7,} {row['rejected']:>9,}")
+            for problem in problems:
+                print(f"  inconsistent: {problem}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"scale": args.scale, "cpus": os.cpu_count(), "results": rows}, handle, indent=2)
+    return 0 if all(row["consistent"] for row in rows) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
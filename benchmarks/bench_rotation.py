@@ -0,0 +1,37 @@
+"""
+Fairness of a simulated year of routine call: rotation queue vs the old index round-robin,
+both spreading the calls the rotation could staff
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rotation import simulate_year
+from synthetic_data import SCALES, START_DATE, generate_app_data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", choices=sorted(SCALES), nargs="+", default=["small", "medium", "large"])
+    parser.add_argument("--weeks", type=int, default=52)
+    args = parser.parse_args()
+
+    start = START_DATE  # synthetic credentials are valid relative to this date
+    print(f"{'scale':<8} {'policy':<12} {'mean':>8} {'min':>8} {'max':>8} {'spread':>8} {'gini':>7} {'filled':>7} "
+          f"{'time':>8}")
+    for scale in args.scale:
+        app_data = generate_app_data(**SCALES[scale])
+        staffing = {location.name: location.staffing_requirements for location in app_data.locations}
+        started = time.perf_counter()
+        reports = simulate_year(app_data.radiologists, list(staffing), start,
+                                lambda location, day, shift_type: staffing[location].get(shift_type, 0), args.weeks)
+        elapsed = time.perf_counter() - started
+        for policy, report in reports.items():
+            print(f"{scale:<8} {policy:<12} {report.mean:>8.1f} {report.low:>8.1f} {report.high:>8.1f} "
+                  f"{report.spread:>8.1f} {report.gini:>7.3f} {report.fill_rate:>7.1%} {elapsed:>7.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Render-time benchmark for the paginated Open Shifts list
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData
+from synthetic_data import generate_open_shifts
+from utils import shift_display_row
+
+SIZES = [10, 1000, 10000]
+PAGE_SIZE = 25
+REPEATS = 20
+
+def time_page(app_data, **filters):
+    """Time one page query plus row preparation, in milliseconds"""
+    start = time.perf_counter()
+    page, _ = app_data.query_open_shifts(limit=PAGE_SIZE, **filters)
+    rows = [shift_display_row(shift) for shift in page]
+    assert len(rows) <= PAGE_SIZE
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    app_data = AppData()
+    print(f"{'shifts':>8} {'first page':>12} {'filtered':>12} {'last page':>12}")
+    for size in SIZES:
+        app_data.open_shifts = generate_open_shifts(size)
+        last_offset = max(0, size - PAGE_SIZE)
+        first = min(time_page(app_data) for _ in range(REPEATS))
+        filtered = min(time_page(app_data, locations=["Main Hospital"], sort_by="location") for _ in range(REPEATS))
+        last = min(time_page(app_data, offset=last_offset) for _ in range(REPEATS))
+        print(f"{size:>8} {first:>10.2f}ms {filtered:>10.2f}ms {last:>10.2f}ms")
+
+if __name__ == "__main__":
+    main()
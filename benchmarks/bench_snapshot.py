@@ -0,0 +1,76 @@
+"""
+Startup benchmark: binary snapshot vs JSON (to_dict/from_dict) save and load of one department
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData
+from snapshot import COLLECTIONS, Snapshot, save_snapshot
+from synthetic_data import SCALES, generate_app_data
+
+REPEATS = 5
+
+def save_json(app_data, path):
+    document = {"department": app_data.department, "settings": app_data.department_settings}
+    for collection in COLLECTIONS:
+        document[collection] = [record.to_dict() for record in getattr(app_data, collection)]
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(document, handle)
+
+def load_json(path):
+    with open(path, encoding="utf-8") as handle:
+        document = json.load(handle)
+    app_data = AppData.empty(document["department"])
+    app_data.department_settings = document["settings"]
+    for collection, record_type in COLLECTIONS.items():
+        setattr(app_data, collection, [record_type.from_dict(row) for row in document[collection]])
+    return app_data
+
+def best(func, *args):
+    """Fastest of REPEATS runs, in milliseconds"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", choices=sorted(SCALES), nargs="+", default=["small", "medium", "large"])
+    args = parser.parse_args()
+
+    print(f"{'scale':<8} {'records':>8} {'format':<9} {'size':>9} {'save':>10} {'load':>10} {'roster+shifts':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scale:
+            app_data = generate_app_data(**SCALES[scale])
+            records = sum(len(getattr(app_data, collection)) for collection in COLLECTIONS)
+            snapshot_path = os.path.join(directory, f"{scale}.rfsnap")
+            json_path = os.path.join(directory, f"{scale}.json")
+
+            def load_partial():
+                with Snapshot(snapshot_path) as snapshot:
+                    snapshot.load(collections=["radiologists", "locations", "open_shifts"])
+
+            def load_full():
+                with Snapshot(snapshot_path) as snapshot:
+                    snapshot.load()
+
+            rows = [
+                ("snapshot", snapshot_path, best(save_snapshot, app_data, snapshot_path), best(load_full),
+                 f"{best(load_partial):>12.1f}ms"),
+                ("json", json_path, best(save_json, app_data, json_path), best(load_json, json_path), f"{'-':>14}")
+            ]
+            for name, path, save_ms, load_ms, partial in rows:
+                size = os.path.getsize(path) / 1e6
+                print(f"{scale:<8} {records:>8} {name:<9} {size:>7.1f}MB {save_ms:>8.1f}ms {load_ms:>8.1f}ms {partial}")
+
+if __name__ == "__main__":
+    main()
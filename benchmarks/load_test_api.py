@@ -0,0 +1,176 @@
+"""
+Load test for the headless JSON API: keep-alive clients, throughput and latency percentiles.
+
+Starts the API in-process on a free localhost port (or targets --url) and runs a
+mix of shift listings, auction delta polls and bids for a fixed duration.
+
+Usage:
+    python benchmarks/load_test_api.py --scale medium --clients 16 --duration 10
+    python benchmarks/load_test_api.py --url http://127.0.0.1:8502 --clients 32
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import serve_in_background
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+from synthetic_data import SCALES, generate_app_data
+
+# operation -> share of requests
+MIX = {"list_shifts": 0.7, "auction_deltas": 0.2, "place_bid": 0.1}
+BID_INCREMENT = 50
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+class Client(threading.Thread):
+    """One keep-alive connection issuing requests until the deadline"""
+
+    def __init__(self, host, port, seed, deadline, bidding_ids, bidders, locations):
+        super().__init__(daemon=True)
+        self.conn = http.client.HTTPConnection(host, port, timeout=10)
+        self.rng = random.Random(seed)
+        self.deadline = deadline
+        self.bidding_ids = bidding_ids
+        self.bidders = bidders
+        self.locations = locations
+        self.latencies = {op: [] for op in MIX}
+        self.statuses = {}
+        self.errors = 0
+        self.since = 0
+
+    def _request(self, op, method, path, body=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            self.conn.close()  # reconnects on the next request
+            return None, None
+        self.latencies[op].append(time.perf_counter() - start)
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        return response.status, json.loads(data)
+
+    def run(self):
+        ops, weights = list(MIX), list(MIX.values())
+        while time.perf_counter() < self.deadline:
+            op = self.rng.choices(ops, weights)[0]
+            if op == "list_shifts":
+                query = f"/shifts?limit=25&offset={self.rng.randrange(0, 200, 25)}"
+                if self.locations and self.rng.random() < 0.5:
+                    query += f"&location={self.rng.choice(self.locations).replace(' ', '+')}"
+                self._request(op, "GET", query)
+            elif op == "auction_deltas":
+                status, body = self._request(op, "GET", f"/auctions/deltas?since={self.since}")
+                if status == 200:
+                    self.since = body["latest_seq"]
+            elif self.bidding_ids:
+                shift_id = self.rng.choice(self.bidding_ids)
+                status, shift = self._request("list_shifts", "GET", f"/shifts/{shift_id}")
+                if status == 200:
+                    amount = (shift["current_high_bid"] + BID_INCREMENT if shift["current_high_bid"]
+                              else shift["base_compensation"])
+                    self._request(op, "POST", f"/shifts/{shift_id}/bids",
+                                  {"radiologist": self.rng.choice(self.bidders), "amount": amount})
+        self.conn.close()
+
+def _discover(host, port):
+    """Bidding shift ids, opted-in bidders and sites, read through the API itself"""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    shifts, offset = [], 0
+    while True:
+        conn.request("GET", f"/shifts?status=Bidding&limit=500&offset={offset}")
+        page = json.loads(conn.getresponse().read())
+        shifts.extend(page["shifts"])
+        offset += 500
+        if offset >= page["total"]:
+            break
+    conn.close()
+    locations = sorted({shift["location"] for shift in shifts})
+    return [shift["id"] for shift in shifts], locations
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--url", help="target an already running server instead of an in-process one")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--bidder", action="append", help="radiologist name to bid as (repeatable)")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+        bidders = args.bidder or []
+    else:
+        app_data = generate_app_data(**SCALES[args.scale])
+        store = DepartmentStore()
+        store.add_department(DEFAULT_DEPARTMENT, app_data)
+        host, port = serve_in_background(store).server_address
+        bidders = args.bidder or [rad.name for rad in app_data.radiologists if rad.preferences.get("bidding_opt_in")]
+
+    bidding_ids, locations = _discover(host, port)
+    if not bidders:
+        bidding_ids = []  # nobody to bid as; run reads only
+
+    deadline = time.perf_counter() + args.duration
+    clients = [Client(host, port, seed, deadline, bidding_ids, bidders, locations) for seed in range(args.clients)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    report = {"clients": args.clients, "duration_s": elapsed, "scale": None if args.url else args.scale,
+              "operations": {}, "statuses": {}, "errors": sum(c.errors for c in clients)}
+    everything = []
+    for op in MIX:
+        ordered = sorted(latency for c in clients for latency in c.latencies[op])
+        everything.extend(ordered)
+        report["operations"][op] = {
+            "requests": len(ordered),
+            "p50_ms": _percentile(ordered, 0.5) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "p99_ms": _percentile(ordered, 0.99) * 1000
+        }
+    for client in clients:
+        for status, count in client.statuses.items():
+            report["statuses"][str(status)] = report["statuses"].get(str(status), 0) + count
+    everything.sort()
+    report["requests"] = len(everything)
+    report["requests_per_s"] = len(everything) / elapsed
+    report["p50_ms"] = _percentile(everything, 0.5) * 1000
+    report["p95_ms"] = _percentile(everything, 0.95) * 1000
+    report["p99_ms"] = _percentile(everything, 0.99) * 1000
+
+    print(f"{report['requests']:,} requests in {elapsed:.1f}s from {args.clients} keep-alive clients: "
+          f"{report['requests_per_s']:,.0f} req/s")
+    print(f"{'operation':<16} {'requests':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for op, row in [*report["operations"].items(), ("all", report)]:
+        print(f"{op:<16} {row['requests']:>9,} {row['p50_ms']:>7.2f}ms {row['p95_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms")
+    print("status codes: " + ", ".join(f"{status}={count:,}" for status, count in sorted(report["statuses"].items()))
+          + (f", connection errors={report['errors']:,}" if report["errors"] else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Repeatable benchmark suite over the hot paths in data_models, utils and page data prep.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale medium --output results.json
+    python benchmarks/run_benchmarks.py --scale medium --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_fragments
+import utils
+from schedule_export import iter_ics
+from synthetic_data import SCALES, generate_app_data
+
+REGRESSION_THRESHOLD = 1.25
+
+def measure(func, repeats=7, min_time=0.05):
+    """Time func, auto-scaling the loop count; returns per-call timings in ms"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10
+    timings = [elapsed / loops * 1000]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops * 1000)
+    return timings, loops
+
+def build_cases(app_data):
+    """Benchmark name -> zero-argument callable"""
+    radiologist_dicts = [asdict(rad) for rad in app_data.radiologists]
+    location_dicts = [asdict(loc) for loc in app_data.locations]
+    last_name = app_data.radiologists[-1].name
+    sample_shift = app_data.open_shifts[len(app_data.open_shifts) // 2]
+    sample_rad = app_data.radiologists[0]
+    assigned = [s for s in app_data.get_assigned_shifts() if s.assigned_to == sample_rad.name]
+
+    def call_schedule_page():
+        page, _ = app_data.query_open_shifts(statuses=["Open", "Bidding"], sort_by="date", limit=25)
+        rows = [utils.shift_display_row(shift) for shift in page]
+        return html_fragments.render_section(html_fragments.shift_row(row) for row in rows)
+
+    def messaging_page():
+        return html_fragments.render_section(html_fragments.message_bubble(msg) for msg in app_data.messages[-200:])
+
+    def credential_page():
+        return [utils.get_credential_status(rad.credentials["cert_expiry"], rad.credentials["cme_credits"],
+                                            rad.credentials["cme_required"]) for rad in app_data.radiologists]
+
+    return {
+        "data_models.query_open_shifts": lambda: app_data.query_open_shifts(limit=25),
+        "data_models.query_open_shifts.filtered": lambda: app_data.query_open_shifts(
+            locations=[app_data.locations[0].name], modes=["Bidding"], sort_by="location", limit=25),
+        "data_models.get_active_bidding_shifts": app_data.get_active_bidding_shifts,
+        "data_models.get_open_shifts_by_mode": lambda: app_data.get_open_shifts_by_mode("Smart"),
+        "data_models.get_radiologist_by_name": lambda: app_data.get_radiologist_by_name(last_name),
+        "data_models.get_assigned_shifts": app_data.get_assigned_shifts,
+        "utils.format_currency": lambda: utils.format_currency(2850),
+        "utils.format_date": lambda: utils.format_date("2025-09-14"),
+        "utils.create_status_badge": lambda: utils.create_status_badge("Open"),
+        "utils.shift_display_row": lambda: utils.shift_display_row(sample_shift),
+        "utils.calculate_workload_balance": lambda: utils.calculate_workload_balance(radiologist_dicts),
+        "utils.generate_schedule_grid": lambda: utils.generate_schedule_grid(radiologist_dicts, location_dicts),
+        "utils.format_subspecialty_coverage": lambda: utils.format_subspecialty_coverage(radiologist_dicts),
+        "page.call_schedule": call_schedule_page,
+        "page.secure_messaging": messaging_page,
+        "page.credential_tracking": credential_page,
+        "export.radiologist_ics": lambda: sum(1 for _ in iter_ics(assigned, sample_rad.name))
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(scale, only=None, repeats=7):
+    app_data = generate_app_data(**SCALES[scale])
+    results = []
+    for name, func in build_cases(app_data).items():
+        if only and only not in name:
+            continue
+        timings, loops = measure(func, repeats=repeats)
+        results.append({
+            "name": name,
+            "loops": loops,
+            "min_ms": min(timings),
+            "median_ms": statistics.median(timings),
+            "mean_ms": statistics.fmean(timings),
+            "stdev_ms": statistics.stdev(timings) if len(timings) > 1 else 0.0
+        })
+        print(f"{name:<45} {results[-1]['median_ms']:>12.4f} ms  (min {results[-1]['min_ms']:.4f})")
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "dataset": {
+            "radiologists": len(app_data.radiologists),
+            "locations": len(app_data.locations),
+            "shifts": len(app_data.open_shifts),
+            "consultations": len(app_data.consultations),
+            "messages": len(app_data.messages)
+        },
+        "results": results
+    }
+
+def compare(current, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print per-benchmark ratios against a baseline; returns the number of regressions"""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline_run = json.load(handle)
+    baseline = {r["name"]: r for r in baseline_run["results"]}
+    if baseline_run.get("scale") != current["scale"]:
+        print(f"\nWarning: baseline scale is {baseline_run.get('scale')}, current scale is {current['scale']}")
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression if median > {threshold:.2f}x):")
+    for result in current["results"]:
+        old = baseline.get(result["name"])
+        if old is None:
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        flag = "REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{result['name']:<45} {ratio:>7.2f}x {flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RadFlow Pro benchmark suite")
+    parser.add_argument("--scale", choices=SCALES, default="medium")
+    parser.add_argument("--only", help="run benchmarks whose name contains this text")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    current = run(args.scale, args.only, args.repeats)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+    if args.compare:
+        return 1 if compare(current, args.compare) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
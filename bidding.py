@@ -0,0 +1,179 @@
+"""
+Bid placement engine and auction change log for RadFlow Pro
+"""
+
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from data_models import AppData, OpenShift, Radiologist, ineligibility_reasons
+from eligibility import month_key
+from instrumentation import timed
+
+AUCTION_LOG_SIZE = 10000
+
+class BidRejected(ValueError):
+    """A bid that is well-formed but not acceptable right now (outbid, closed, over limit)"""
+
+@dataclass
+class AuctionEvent:
+    seq: int
+    type: str
+    department: str
+    shift_id: int
+    radiologist: Optional[str]
+    amount: Optional[int]
+    timestamp: str
+
+def bid_floor(app_data: AppData, shift: OpenShift) -> int:
+    """Lowest acceptable next bid for a shift"""
+    rules = app_data.department_settings.get("bidding_rules", {})
+    increment = rules.get("bid_increment", 50)
+    if shift.current_high_bid:
+        return shift.current_high_bid + increment
+    minimum = rules.get("min_bid_weekend_night" if "Night" in shift.shift else "min_bid_weekend_day", 0)
+    return max(minimum, shift.base_compensation)
+
+def bidding_window(app_data: AppData, shift: OpenShift) -> Optional[Tuple[datetime, datetime]]:
+    """(opened, closes) in local time: the first bid opens `default_bidding_time` hours of
+    bidding, closing early at the shift's start. None until someone bids."""
+    if not shift.bid_history:
+        return None
+    first = min(bid["timestamp"] for bid in shift.bid_history)
+    opened = datetime.fromisoformat(first.replace("Z", "+00:00")).astimezone().replace(tzinfo=None)
+    hours = app_data.department_settings.get("bidding_rules", {}).get("default_bidding_time", 24)
+    return opened, min(opened + timedelta(hours=hours), shift.window()[0])
+
+def bidder_ineligibility(app_data: AppData, radiologist: Radiologist, shift: OpenShift) -> List[str]:
+    """ineligibility_reasons() with the weekend calls already held that month, from the shard's index"""
+    index = app_data.eligibility()
+    pos = index.position(radiologist.name)
+    weekend_calls = int(index.weekend_calls(month_key(shift.date))[pos]) if pos is not None else 0
+    return ineligibility_reasons(radiologist, shift, weekend_calls)
+
+def validate_bid(app_data: AppData, shift: Optional[OpenShift], radiologist: str, amount: int) -> None:
+    """Raise BidRejected unless the bid can be placed on the shift as it stands"""
+    if shift is None:
+        raise BidRejected("Shift not found")
+    if "Bidding" not in shift.status:
+        raise BidRejected(f"Shift {shift.id} is not open for bidding")
+    rad = app_data.get_radiologist_by_name(radiologist)
+    if rad is None:
+        raise BidRejected(f"{radiologist} is not on the {app_data.department} roster")
+    if not rad.preferences.get("bidding_opt_in", False):
+        raise BidRejected(f"{radiologist} has not opted in to bidding")
+    reasons = bidder_ineligibility(app_data, rad, shift)
+    if reasons:
+        raise BidRejected(f"{radiologist} cannot take shift {shift.id}: {', '.join(reasons)}")
+    floor = bid_floor(app_data, shift)
+    if amount < floor:
+        raise BidRejected(f"Bid on shift {shift.id} must be at least ${floor:,}")
+    max_bid = app_data.department_settings.get("bidding_rules", {}).get("max_bid_limit")
+    if max_bid is not None and amount > max_bid:
+        raise BidRejected(f"Bid on shift {shift.id} cannot exceed ${max_bid:,}")
+
+class BiddingEngine:
+    """Serializes bid placement per store and keeps a bounded, sequenced log of
+    auction changes so clients can poll for deltas instead of full refreshes"""
+
+    def __init__(self, store):
+        self.store = store
+        self._seq = itertools.count(1)
+        self._latest = 0
+        self._log = deque(maxlen=AUCTION_LOG_SIZE)
+        self._log_lock = threading.Lock()
+
+    def _record(self, event_type: str, department: str, shift_id: int, radiologist: Optional[str] = None,
+                amount: Optional[int] = None) -> AuctionEvent:
+        with self._log_lock:
+            event = AuctionEvent(next(self._seq), event_type, department, shift_id, radiologist, amount,
+                                 datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+            self._log.append(event)
+            self._latest = event.seq
+        return event
+
+    def _check_conflicts(self, department: str, radiologist: str, shift: OpenShift) -> None:
+        """A winning bid must not double-book the radiologist or cut their rest short"""
+        conflicts = self.store.assignment_conflicts(department, radiologist, shift)
+        if conflicts:
+            raise BidRejected(f"Shift {shift.id} conflicts with {radiologist}'s schedule: "
+                              + "; ".join(c.describe() for c in conflicts))
+
+    @timed()
+    def place_bid(self, department: str, shift_id: int, radiologist: str, amount: int) -> AuctionEvent:
+        return self.place_bids(department, [(shift_id, amount)], radiologist)[0]
+
+    @timed()
+    def place_bids(self, department: str, bids: List[Tuple[int, int]], radiologist: str) -> List[AuctionEvent]:
+        """Validate every bid first, then apply them all; nothing is applied if any is rejected.
+        A second bid on the same shift must beat the first, and replaces it."""
+        with self.store.transaction():
+            shard = self.store.shard(department)
+            raised: Dict[int, OpenShift] = {}  # shift as the batch's earlier bids leave it
+            for shift_id, amount in bids:
+                shift = raised.get(shift_id) or shard.get_shift_by_id(shift_id)
+                validate_bid(shard, shift, radiologist, amount)
+                self._check_conflicts(department, radiologist, shift)
+                raised[shift_id] = replace(shift, current_high_bid=amount, current_high_bidder=radiologist)
+            accepted = {shift_id: shift.current_high_bid for shift_id, shift in raised.items()}
+            timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            shard.upsert_bids([(shift_id, {"radiologist": radiologist, "amount": amount, "timestamp": timestamp})
+                               for shift_id, amount in accepted.items()])
+            return [self._record("bid", department, shift_id, radiologist, amount)
+                    for shift_id, amount in accepted.items()]
+
+    def _can_award(self, department: str, shard: AppData, radiologist: str, shift: OpenShift) -> bool:
+        """Still on the roster, still eligible and free of conflicts as the schedule stands now"""
+        rad = shard.get_radiologist_by_name(radiologist)
+        if rad is None:
+            return False
+        return not bidder_ineligibility(shard, rad, shift) \
+            and not self.store.assignment_conflicts(department, radiologist, shift)
+
+    @timed()
+    def close_auction(self, department: str, shift_id: int) -> OpenShift:
+        """Award a bidding shift to the highest bidder who can still take it. Bidders who
+        have since been booked elsewhere or lost eligibility are passed over; if none is
+        left the shift reopens without a high bid."""
+        with self.store.transaction():
+            shard = self.store.shard(department)
+            shift = shard.get_shift_by_id(shift_id)
+            if shift is None or "Bidding" not in shift.status:
+                raise BidRejected(f"Shift {shift_id} is not open for bidding")
+            if not shift.current_high_bidder:
+                raise BidRejected(f"Shift {shift_id} has no bids to award")
+            considered = set()
+            for bid in sorted(shift.bid_history or (), key=lambda b: (-b["amount"], b["timestamp"])):
+                bidder = bid["radiologist"]
+                if bidder in considered:
+                    continue  # only a bidder's best bid counts
+                considered.add(bidder)
+                if self._can_award(department, shard, bidder, shift):
+                    awarded = replace(shift, status="Filled", assigned_to=bidder,
+                                      current_high_bid=bid["amount"], current_high_bidder=bidder)
+                    shard.upsert_open_shifts([awarded])
+                    self._record("awarded", department, shift_id, bidder, bid["amount"])
+                    return awarded
+            reopened = replace(shift, status="Open", assigned_to=None, current_high_bid=None, current_high_bidder=None)
+            shard.upsert_open_shifts([reopened])
+            self._record("reopened", department, shift_id)
+            return reopened
+
+    @property
+    def latest_seq(self) -> int:
+        return self._latest
+
+    def deltas(self, since: int, department: Optional[str] = None) -> Dict:
+        """Auction events after `since`; reset=True means the client fell off the log and must reload"""
+        with self._log_lock:
+            events = list(self._log)
+            latest = self._latest
+        reset = bool(events) and since < events[0].seq - 1
+        return {
+            "latest_seq": latest,
+            "reset": reset,
+            "events": [e for e in events if e.seq > since and (department is None or e.department == department)]
+        }
@@ -0,0 +1,181 @@
+"""
+Double-booking and rest-period checks over each radiologist's sorted assignment intervals
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data_models import AppData, OpenShift
+from instrumentation import timed
+
+MIN_REST_HOURS = 10  # between the end of one assignment and the start of the next
+MAX_SHIFT_HOURS = 24  # bounds how far back an earlier assignment can still reach
+EPOCH = datetime(2000, 1, 1)
+
+Interval = Tuple[int, int, object]  # (start minute, end minute, key)
+
+def minutes(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds()) // 60
+
+def shift_interval(shift: OpenShift) -> Tuple[int, int]:
+    start, end = shift.window()
+    return minutes(start), minutes(end)
+
+def min_rest_hours(app_data: AppData) -> float:
+    return app_data.department_settings.get("scheduling_rules", {}).get("min_rest_hours", MIN_REST_HOURS)
+
+@dataclass(frozen=True)
+class Conflict:
+    radiologist: str
+    key: object        # the proposed (or later) assignment
+    other: object      # the assignment it collides with: a shift id, or a rotation slot
+    kind: str          # "overlap" or "rest"
+    gap_hours: float   # negative for an overlap
+    department: Optional[str] = None  # where `other` is, when checked across departments
+
+    def describe(self) -> str:
+        if isinstance(self.other, int):
+            other = f"shift {self.other}"
+        elif isinstance(self.other, tuple):
+            other = "rotation " + " ".join(map(str, self.other))  # (date, shift, location)
+        else:
+            other = str(self.other)
+        if self.department:
+            other += f" ({self.department})"
+        if self.kind == "overlap":
+            return f"overlaps {other} by {-self.gap_hours:g}h"
+        return f"only {self.gap_hours:g}h rest next to {other}"
+
+def _classify(radiologist: str, key, other, gap: int, rest: int) -> Optional[Conflict]:
+    if gap < 0:
+        return Conflict(radiologist, key, other, "overlap", round(gap / 60, 2))
+    if gap < rest:
+        return Conflict(radiologist, key, other, "rest", round(gap / 60, 2))
+    return None
+
+class IntervalSchedule:
+    """Per-radiologist assignment intervals kept sorted by start (bisect). A check
+    only looks at intervals starting within MAX_SHIFT_HOURS + rest of the proposal,
+    so it is O(log n) plus the few neighbours in that window."""
+
+    def __init__(self, rest_hours: float = MIN_REST_HOURS):
+        self.rest = int(rest_hours * 60)
+        self._intervals: Dict[str, List[Interval]] = {}
+
+    def add(self, radiologist: str, start: int, end: int, key) -> None:
+        insort(self._intervals.setdefault(radiologist, []), (start, end, key), key=lambda i: i[:2])
+
+    def remove(self, radiologist: str, start: int, end: int, key) -> None:
+        intervals = self._intervals.get(radiologist, [])
+        pos = bisect_left(intervals, (start, end), key=lambda i: i[:2])
+        while pos < len(intervals) and intervals[pos][:2] == (start, end):
+            if intervals[pos][2] == key:
+                del intervals[pos]
+                return
+            pos += 1
+
+    def check(self, radiologist: str, start: int, end: int, key=None, exclude=None) -> List[Conflict]:
+        """Conflicts a proposed [start, end) would create; `exclude` is an assignment being replaced"""
+        intervals = self._intervals.get(radiologist)
+        if not intervals:
+            return []
+        low = bisect_left(intervals, start - (MAX_SHIFT_HOURS * 60 + self.rest), key=lambda i: i[0])
+        high = bisect_right(intervals, end + self.rest, key=lambda i: i[0])
+        conflicts = []
+        for other_start, other_end, other in intervals[low:high]:
+            if exclude is not None and other == exclude:
+                continue
+            if other_start < end and start < other_end:
+                gap = -(min(end, other_end) - max(start, other_start))
+            else:
+                gap = other_start - end if other_start >= end else start - other_end
+            conflict = _classify(radiologist, key, other, gap, self.rest)
+            if conflict is not None:
+                conflicts.append(conflict)
+        return conflicts
+
+    def held(self) -> List[Tuple[str, int, int, object]]:
+        """Every interval as (radiologist, start, end, key), e.g. to sweep against another schedule"""
+        return [(radiologist, start, end, key) for radiologist, intervals in self._intervals.items()
+                for start, end, key in intervals]
+
+    def sweep(self, proposed: Iterable[Tuple[str, int, int, object]] = (), replaces: Iterable = ()) -> List[Conflict]:
+        """Every conflict in the schedule plus `proposed` (radiologist, start, end, key)
+        assignments, minus `replaces` keys: one sorted pass per radiologist."""
+        replaced = set(replaces)
+        extra: Dict[str, List[Interval]] = {}
+        for radiologist, start, end, key in proposed:
+            extra.setdefault(radiologist, []).append((start, end, key))
+        conflicts = []
+        for radiologist in set(self._intervals) | set(extra):
+            merged = [i for i in self._intervals.get(radiologist, ()) if i[2] not in replaced]
+            if radiologist in extra:
+                merged = sorted(merged + extra[radiologist], key=lambda i: i[:2])
+            latest: Optional[Interval] = None  # the interval ending last so far
+            for interval in merged:
+                if latest is not None:
+                    gap = interval[0] - latest[1]
+                    if gap < 0:
+                        gap = -(min(interval[1], latest[1]) - interval[0])
+                    conflict = _classify(radiologist, interval[2], latest[2], gap, self.rest)
+                    if conflict is not None:
+                        conflicts.append(conflict)
+                if latest is None or interval[1] > latest[1]:
+                    latest = interval
+        return conflicts
+
+class ConflictIndex:
+    """A shard's assigned shifts as an IntervalSchedule, kept current from change
+    events (reassignments, swaps, awards) and rebuilt if open_shifts is replaced."""
+
+    def __init__(self, app_data: AppData):
+        self.app_data = app_data
+        self._lock = threading.Lock()
+        self._rebuild()
+        app_data.subscribe(self._on_change)
+
+    def _rebuild(self) -> None:
+        with self._lock:
+            self._shifts = self.app_data.open_shifts
+            self._rest_hours = min_rest_hours(self.app_data)
+            self.schedule = IntervalSchedule(self._rest_hours)
+            for shift in self._shifts:
+                if shift.assigned_to:
+                    self.schedule.add(shift.assigned_to, *shift_interval(shift), shift.id)
+
+    def _on_change(self, collection: str, old: List, new: List) -> None:
+        if collection != "open_shifts":
+            return
+        with self._lock:
+            for before, after in zip(old, new):
+                if before is not None and before.assigned_to:
+                    self.schedule.remove(before.assigned_to, *shift_interval(before), before.id)
+                if after.assigned_to:
+                    self.schedule.add(after.assigned_to, *shift_interval(after), after.id)
+
+    def _current(self) -> None:
+        if self.app_data.open_shifts is not self._shifts or min_rest_hours(self.app_data) != self._rest_hours:
+            self._rebuild()  # bulk load or a rest-rule change
+
+    @timed()
+    def check(self, radiologist: str, shift: OpenShift, replacing: bool = True) -> List[Conflict]:
+        """Conflicts from giving `shift` to `radiologist`. The shift's own current slot is
+        ignored (it is being reassigned); pass replacing=False for a shift from another shard."""
+        self._current()
+        with self._lock:
+            return self.schedule.check(radiologist, *shift_interval(shift), key=shift.id,
+                                       exclude=shift.id if replacing else None)
+
+    @timed()
+    def validate(self, assignments: Iterable[Tuple[str, OpenShift]] = (),
+                 held: Iterable[Tuple[str, int, int, object]] = ()) -> List[Conflict]:
+        """All conflicts once `assignments` (radiologist, shift) replace those shifts' current holders,
+        including against `held` (radiologist, start, end, key) intervals kept elsewhere, e.g. rotation slots"""
+        self._current()
+        assignments = list(assignments)
+        proposed = [(name, *shift_interval(shift), shift.id) for name, shift in assignments] + list(held)
+        with self._lock:
+            return self.schedule.sweep(proposed, replaces=[shift.id for _, shift in assignments])
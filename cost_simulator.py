@@ -0,0 +1,199 @@
+"""
+Monte Carlo cost and fill-time simulator for Smart Distribution vs Bidding policies
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from data_models import AppData, OpenShift
+from instrumentation import timed
+
+MODES = ("Smart Distribution", "Bidding Mode", "Hybrid")
+# policy name -> one mode for every shift, or {shift type: mode} with "*" as the fallback
+POLICIES: Dict[str, Union[str, Dict[str, str]]] = {
+    "Smart Distribution": "Smart Distribution",
+    "Bidding Mode": "Bidding Mode",
+    "Hybrid": "Hybrid",
+    "Weekend Nights to Bidding": {"Weekend Night": "Bidding Mode", "*": "Smart Distribution"}
+}
+
+FILL_TIME_SIGMA = 0.6      # log-normal spread of hours to fill around the historical mean
+PREMIUM_SIGMA = 0.08       # spread of the bid premium when there is too little bid history
+SMART_ESCALATION = 1.15    # incentive paid when nobody accepts and the shift is escalated
+MIN_BID_SAMPLES = 5
+CELLS_PER_CHUNK = 1_000_000  # scenarios x shifts simulated at once, bounds memory per worker
+
+@dataclass
+class SimulationInputs:
+    """Everything a worker needs, extracted from AppData so it pickles cheaply"""
+    base_pay: np.ndarray
+    shift_types: List[str]
+    premium_samples: np.ndarray
+    smart_acceptance: float
+    bid_participation: float
+    smart_fill_hours: float
+    bidding_fill_hours: float
+    cascade_timeout: float
+    bidding_window: float
+    max_bid: float
+
+@dataclass
+class PolicyEstimate:
+    policy: str
+    cost_mean: float
+    cost_low: float
+    cost_high: float
+    fill_hours_mean: float
+    fill_hours_low: float
+    fill_hours_high: float
+    escalation_rate: float
+
+@dataclass
+class SimulationResult:
+    scenarios: int
+    shifts: int
+    confidence: float
+    estimates: Dict[str, PolicyEstimate]
+    totals: Dict[str, np.ndarray]
+
+    def savings(self, baseline: str, alternative: str) -> Dict[str, float]:
+        """Paired saving of `alternative` over `baseline` (common random numbers, so the CI is tight)"""
+        diff = self.totals[baseline] - self.totals[alternative]
+        tail = (1 - self.confidence) / 2 * 100
+        low, high = np.percentile(diff, [tail, 100 - tail])
+        mean_base = float(self.totals[baseline].mean())
+        return {"mean": float(diff.mean()), "low": float(low), "high": float(high),
+                "percent": float(diff.mean() / mean_base * 100) if mean_base else 0.0}
+
+def _hours(text, default: float) -> float:
+    try:
+        return float(str(text).split()[0])
+    except (ValueError, IndexError):
+        return default
+
+@timed()
+def simulation_inputs(app_data: AppData, shifts: Optional[List[OpenShift]] = None) -> SimulationInputs:
+    """Historical distributions for one department: bid premiums from bid history,
+    acceptance and participation rates and mean fill times from analytics. The
+    simulated shifts default to those still unassigned; filled ones cost nothing more."""
+    if shifts is None:
+        shifts = [shift for shift in app_data.open_shifts if not shift.assigned_to and shift.status != "Filled"]
+    rules = app_data.department_settings.get("bidding_rules", {})
+    analytics = getattr(app_data, "analytics_data", {})
+    comparison = analytics.get("monthly_comparison", {})
+    rates = analytics.get("participation_rates", {})
+
+    premiums = np.array([shift.current_high_bid / shift.base_compensation for shift in app_data.open_shifts
+                         if shift.current_high_bid and shift.base_compensation], dtype=float)
+    if len(premiums) < MIN_BID_SAMPLES:
+        smart_avg = comparison.get("smart_distribution", {}).get("avg_cost", 0)
+        bidding_avg = comparison.get("bidding_mode", {}).get("avg_cost", 0)
+        ratio = bidding_avg / smart_avg if smart_avg and bidding_avg else 1.13
+        premiums = np.exp(np.random.default_rng(0).normal(np.log(ratio), PREMIUM_SIGMA, 256))
+
+    return SimulationInputs(
+        base_pay=np.array([shift.base_compensation for shift in shifts], dtype=float),
+        shift_types=[shift.shift for shift in shifts],
+        premium_samples=premiums,
+        smart_acceptance=rates.get("smart_distribution_acceptance", 92) / 100,
+        bid_participation=rates.get("bidding_participation", 78) / 100,
+        smart_fill_hours=_hours(comparison.get("smart_distribution", {}).get("avg_time_to_fill"), 2.3),
+        bidding_fill_hours=_hours(comparison.get("bidding_mode", {}).get("avg_time_to_fill"), 18.5),
+        cascade_timeout=float(rules.get("cascade_timeout_hours", 12)),
+        bidding_window=float(rules.get("default_bidding_time", 24)),
+        max_bid=float(rules.get("max_bid_limit") or np.inf)
+    )
+
+def _mode_codes(inputs: SimulationInputs, policy: Union[str, Dict[str, str]]) -> np.ndarray:
+    if isinstance(policy, str):
+        return np.full(len(inputs.shift_types), MODES.index(policy))
+    fallback = policy.get("*", "Smart Distribution")
+    return np.array([MODES.index(policy.get(shift_type, fallback)) for shift_type in inputs.shift_types])
+
+def _fill_times(rng, mean_hours: float, size) -> np.ndarray:
+    mu = np.log(mean_hours) - FILL_TIME_SIGMA ** 2 / 2  # keeps the sampled mean at mean_hours
+    return rng.lognormal(mu, FILL_TIME_SIGMA, size)
+
+def _simulate_chunk(inputs: SimulationInputs, mode_codes: Dict[str, np.ndarray], scenarios: int, seed):
+    """Per-scenario total cost, mean fill hours and escalation share for every policy, on shared draws"""
+    rng = np.random.default_rng(seed)
+    size = (scenarios, len(inputs.base_pay))
+    base = inputs.base_pay
+
+    accepted = rng.random(size) < inputs.smart_acceptance
+    smart_hours = _fill_times(rng, inputs.smart_fill_hours, size)
+    has_bids = rng.random(size) < inputs.bid_participation
+    premium = rng.choice(inputs.premium_samples, size)
+    bid_cost = np.minimum(base * premium, inputs.max_bid)
+    bid_hours = np.minimum(_fill_times(rng, inputs.bidding_fill_hours, size), inputs.bidding_window)
+    escalated_cost = base * SMART_ESCALATION
+
+    # Outcome of every shift under each mode; policies then pick a mode per shift
+    outcomes = {
+        0: (np.where(accepted, base, escalated_cost),
+            np.where(accepted, smart_hours, inputs.cascade_timeout + smart_hours),
+            ~accepted),
+        1: (np.where(has_bids, bid_cost, escalated_cost),
+            np.where(has_bids, bid_hours, inputs.bidding_window + smart_hours),
+            ~has_bids),
+        2: (np.where(accepted, base, np.where(has_bids, bid_cost, escalated_cost)),
+            np.where(accepted, np.minimum(smart_hours, inputs.cascade_timeout),
+                     inputs.cascade_timeout + np.where(has_bids, bid_hours, inputs.bidding_window + smart_hours)),
+            ~accepted & ~has_bids)
+    }
+
+    results = {}
+    for name, codes in mode_codes.items():
+        cost = np.zeros(size)
+        hours = np.zeros(size)
+        escalated = np.zeros(size, dtype=bool)
+        for code, (mode_cost, mode_hours, mode_escalated) in outcomes.items():
+            columns = codes == code
+            if columns.any():
+                cost[:, columns] = mode_cost[:, columns]
+                hours[:, columns] = mode_hours[:, columns]
+                escalated[:, columns] = mode_escalated[:, columns]
+        results[name] = (cost.sum(axis=1), hours.mean(axis=1), escalated.mean(axis=1))
+    return results
+
+@timed()
+def simulate(inputs: SimulationInputs, policies: Optional[Dict[str, Union[str, Dict[str, str]]]] = None,
+             scenarios: int = 5000, seed: int = 0, workers: Optional[int] = None,
+             confidence: float = 0.95) -> SimulationResult:
+    """Run every policy over the same sampled scenarios, in chunks across a process pool"""
+    policies = POLICIES if policies is None else policies
+    mode_codes = {name: _mode_codes(inputs, policy) for name, policy in policies.items()}
+    n_shifts = max(1, len(inputs.base_pay))
+    chunk = max(1, min(scenarios, CELLS_PER_CHUNK // n_shifts))
+    sizes = [min(chunk, scenarios - start) for start in range(0, scenarios, chunk)]
+    if workers is None:
+        workers = min(len(sizes), os.cpu_count() or 1)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers <= 1 or len(sizes) == 1:
+        parts = [_simulate_chunk(inputs, mode_codes, size, s) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, [inputs] * len(sizes), [mode_codes] * len(sizes), sizes, seeds))
+
+    tail = (1 - confidence) / 2 * 100
+    estimates, totals = {}, {}
+    for name in policies:
+        cost = np.concatenate([part[name][0] for part in parts])
+        hours = np.concatenate([part[name][1] for part in parts])
+        escalated = np.concatenate([part[name][2] for part in parts])
+        cost_low, cost_high = np.percentile(cost, [tail, 100 - tail])
+        hours_low, hours_high = np.percentile(hours, [tail, 100 - tail])
+        totals[name] = cost
+        estimates[name] = PolicyEstimate(name, float(cost.mean()), float(cost_low), float(cost_high),
+                                         float(hours.mean()), float(hours_low), float(hours_high),
+                                         float(escalated.mean()))
+    return SimulationResult(scenarios, len(inputs.base_pay), confidence, estimates, totals)
+
+def compare_policies(app_data: AppData, scenarios: int = 5000, seed: int = 0,
+                     workers: Optional[int] = None) -> SimulationResult:
+    return simulate(simulation_inputs(app_data), scenarios=scenarios, seed=seed, workers=workers)
@@ -0,0 +1,219 @@
+"""
+Expiry-ordered credential deadlines: due-soon queries, once-only alerts and renewal reminders
+"""
+
+import heapq
+import itertools
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from data_models import AppData, Message, Radiologist
+from instrumentation import timed
+
+ALERT_THRESHOLDS = (90, 30, 7, 0)  # days before a deadline; each fires once, 0 means expired
+CME_DEADLINE = "12-31"             # CME credits are due at year end unless credentials say otherwise
+DUE_SOON_DAYS = 90
+REMINDER_SENDER = "Credentialing Office"
+
+DeadlineKey = Tuple[str, str]  # (radiologist, kind)
+
+@dataclass(frozen=True)
+class Deadline:
+    radiologist: str
+    kind: str  # "board_cert" or "cme"
+    due: date
+    detail: str
+
+    @property
+    def key(self) -> DeadlineKey:
+        return self.radiologist, self.kind
+
+    def summary(self, today: date) -> str:
+        days = (self.due - today).days
+        if self.kind == "cme":
+            when = f"{-days} days overdue" if days < 0 else f"{days} days left"
+            return f"{self.detail} by {self.due:%b %d} ({when})"
+        when = f"expired {-days} days ago" if days < 0 else f"expires in {days} days"
+        return f"{self.detail} {when} ({self.due:%b %d, %Y})"
+
+    def describe(self, today: date) -> str:
+        return f"{self.radiologist}: {self.summary(today)}"
+
+@dataclass(frozen=True)
+class CredentialAlert:
+    deadline: Deadline
+    threshold: int
+    days_left: int
+
+    @property
+    def severity(self) -> str:
+        return "critical" if self.days_left <= 30 else "warning"
+
+def _date(text) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(text)[:10])
+    except ValueError:
+        return None
+
+def radiologist_deadlines(radiologist: Radiologist, today: date) -> List[Deadline]:
+    """Board certification expiry and, while credits are short, the CME deadline"""
+    credentials = radiologist.credentials
+    deadlines = []
+    expiry = _date(credentials.get("cert_expiry", ""))
+    if credentials.get("board_certified") and expiry is not None:
+        deadlines.append(Deadline(radiologist.name, "board_cert", expiry, "Board certification"))
+    short = credentials.get("cme_required", 0) - credentials.get("cme_credits", 0)
+    cme_due = _date(credentials.get("cme_deadline") or f"{today.year}-{CME_DEADLINE}")
+    if short > 0 and cme_due is not None:
+        deadlines.append(Deadline(radiologist.name, "cme", cme_due, f"Needs {short} more CME credits"))
+    return deadlines
+
+class CredentialIndex:
+    """Deadlines kept sorted by due date (bisect) for range queries, plus a heap
+    holding each deadline's next alert threshold so poll() only touches what fired.
+
+    Records are replaced copy-on-write, so refresh() re-derives deadlines only
+    for radiologists whose record object changed, and all of them when the year
+    rolls over (the default CME deadline moves). Crossed thresholds go to a log
+    that each poll() consumer (a user, or None for department-wide feeds) reads
+    with its own cursor, so every viewer gets every alert once."""
+
+    def __init__(self, app_data: AppData, today: Optional[date] = None,
+                 thresholds: Tuple[int, ...] = ALERT_THRESHOLDS):
+        self.app_data = app_data
+        self.thresholds = tuple(sorted(thresholds, reverse=True))
+        self._pinned = today  # fixed "today" for tests; otherwise the real date on each call
+        self._today = today or date.today()
+        self._by_due: List[Tuple[int, DeadlineKey]] = []
+        self._deadlines: Dict[DeadlineKey, Deadline] = {}
+        self._heap: List[Tuple[int, int, int, Deadline]] = []  # (fire date, tiebreak, threshold, deadline)
+        self._tiebreak = itertools.count()
+        self._fired: Dict[DeadlineKey, Tuple[Deadline, int]] = {}  # tightest threshold already alerted
+        self._log: List[CredentialAlert] = []                     # every crossing, in firing order
+        self._cursors: Dict[Optional[str], int] = {}              # consumer -> log entries already read
+        self._records: Dict[int, Radiologist] = {}
+        self._version = None
+        self.refresh()
+
+    # --- Maintenance ---------------------------------------------------------
+
+    def _remove(self, key: DeadlineKey) -> None:
+        deadline = self._deadlines.pop(key, None)
+        if deadline is not None:
+            entry = (deadline.due.toordinal(), key)
+            del self._by_due[bisect_left(self._by_due, entry)]
+            # its heap entry goes stale and is skipped when popped
+
+    def _add(self, deadline: Deadline) -> None:
+        key = deadline.key
+        self._deadlines[key] = deadline
+        insort(self._by_due, (deadline.due.toordinal(), key))
+        fired = self._fired.get(key)
+        after = fired[1] if fired and fired[0].due == deadline.due else None  # same deadline, reworded
+        self._schedule(deadline, after)
+
+    def _schedule(self, deadline: Deadline, after: Optional[int]) -> None:
+        """Queue the next threshold tighter than `after` (None: the loosest)"""
+        pending = [t for t in self.thresholds if after is None or t < after]
+        if pending:
+            threshold = pending[0]
+            heapq.heappush(self._heap, (deadline.due.toordinal() - threshold, next(self._tiebreak), threshold, deadline))
+
+    def _reindex(self, radiologist: Radiologist) -> None:
+        fresh = {d.key: d for d in radiologist_deadlines(radiologist, self._today)}
+        for kind in ("board_cert", "cme"):
+            key = (radiologist.name, kind)
+            if self._deadlines.get(key) != fresh.get(key):
+                self._remove(key)
+                if key in fresh:
+                    self._add(fresh[key])
+
+    @timed()
+    def refresh(self, today: Optional[date] = None) -> int:
+        """Pick up roster edits and the current date; returns radiologists re-indexed"""
+        today = today or self._pinned or date.today()
+        new_year = today.year != self._today.year
+        self._today = today
+        if self.app_data.version == self._version and not new_year:
+            return 0
+        current = {rad.id: rad for rad in self.app_data.radiologists}
+        changed = [rad for rad_id, rad in current.items() if new_year or self._records.get(rad_id) is not rad]
+        for rad_id, old in self._records.items():
+            if rad_id not in current or current[rad_id].name != old.name:
+                for kind in ("board_cert", "cme"):
+                    self._remove((old.name, kind))
+        for rad in changed:
+            self._reindex(rad)
+        self._records = current
+        self._version = self.app_data.version
+        return len(changed)
+
+    # --- Queries -------------------------------------------------------------
+
+    def due_within(self, days: int, today: Optional[date] = None, include_overdue: bool = True) -> List[Deadline]:
+        """Deadlines due in the next `days` days, earliest first; O(log n + k)"""
+        self.refresh(today)
+        today = self._today
+        low = 0 if include_overdue else bisect_left(self._by_due, (today.toordinal(),))
+        high = bisect_right(self._by_due, (today.toordinal() + days, (chr(0x10FFFF),)))
+        return [self._deadlines[key] for _, key in self._by_due[low:high]]
+
+    def count_due(self, days: int = DUE_SOON_DAYS, today: Optional[date] = None) -> int:
+        self.refresh(today)
+        today = self._today
+        return bisect_right(self._by_due, (today.toordinal() + days, (chr(0x10FFFF),)))
+
+    def due_for(self, radiologist: str, days: int = DUE_SOON_DAYS, today: Optional[date] = None) -> List[Deadline]:
+        """One radiologist's deadlines due in the next `days` days"""
+        self.refresh(today)
+        cutoff = self._today.toordinal() + days
+        deadlines = [self._deadlines.get((radiologist, kind)) for kind in ("board_cert", "cme")]
+        return sorted((d for d in deadlines if d is not None and d.due.toordinal() <= cutoff), key=lambda d: d.due)
+
+    def _fire(self, today: date) -> None:
+        """Move thresholds that have come due from the heap to the log"""
+        while self._heap and self._heap[0][0] <= today.toordinal():
+            _, _, threshold, deadline = heapq.heappop(self._heap)
+            key = deadline.key
+            if self._deadlines.get(key) is not deadline:
+                continue  # renewed or removed since this entry was queued
+            days_left = (deadline.due - today).days
+            crossed = min(t for t in self.thresholds if t <= threshold and days_left <= t)
+            self._fired[key] = (deadline, crossed)
+            self._log.append(CredentialAlert(deadline, crossed, days_left))
+            self._schedule(deadline, crossed)
+
+    @timed()
+    def poll(self, today: Optional[date] = None, user: Optional[str] = None) -> List[CredentialAlert]:
+        """Alerts for thresholds crossed since `user` last polled, each raised once per
+        user (None is one more consumer, e.g. the activity feed). A deadline that jumped
+        past several thresholds, or was renewed meanwhile, raises only its current one."""
+        self.refresh(today)
+        self._fire(self._today)
+        start = self._cursors.get(user, 0)
+        self._cursors[user] = len(self._log)
+        latest: Dict[DeadlineKey, CredentialAlert] = {}
+        for alert in self._log[start:]:
+            key = alert.deadline.key
+            if self._fired.get(key) == (alert.deadline, alert.threshold) and self._deadlines.get(key) is alert.deadline:
+                latest[key] = alert
+        return sorted(latest.values(), key=lambda alert: alert.deadline.due)
+
+    @timed()
+    def renewal_reminders(self, days: int = DUE_SOON_DAYS, today: Optional[date] = None) -> List[Message]:
+        """One message per radiologist listing every deadline due in `days` (not yet stored)"""
+        today = today or date.today()
+        by_radiologist: Dict[str, List[Deadline]] = {}
+        for deadline in self.due_within(days, today):
+            by_radiologist.setdefault(deadline.radiologist, []).append(deadline)
+        sent = datetime.now().strftime("%I:%M %p").lstrip("0")
+        next_id = max((m.id for m in self.app_data.messages), default=0) + 1
+        return [
+            Message(id=next_id + i, sender=REMINDER_SENDER, recipient=name, time=sent,
+                    body="Renewal reminder: " + "; ".join(d.summary(today) for d in deadlines),
+                    direction="received",
+                    priority="High" if any((d.due - today).days <= 30 for d in deadlines) else "Normal")
+            for i, (name, deadlines) in enumerate(by_radiologist.items())
+        ]
@@ -0,0 +1,112 @@
+"""
+Dashboard tile counters maintained incrementally from AppData change events
+"""
+
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+from credential_alerts import DUE_SOON_DAYS
+from data_models import AppData, OpenShift
+from instrumentation import timed
+
+@dataclass
+class DashboardCounts:
+    upcoming_calls: int
+    open_shifts: int
+    active_bidding: int
+    credentials_due: int
+    own_credentials_due: int
+
+class _DatedCount:
+    """Shift dates kept sorted so 'from today on' is a bisect, not a recount"""
+    __slots__ = ("days",)
+
+    def __init__(self):
+        self.days: List[int] = []
+
+    def add(self, day: int) -> None:
+        insort(self.days, day)
+
+    def remove(self, day: int) -> bool:
+        """False when the day was never counted, i.e. the counter is out of step"""
+        pos = bisect_left(self.days, day)
+        if pos == len(self.days) or self.days[pos] != day:
+            return False
+        del self.days[pos]
+        return True
+
+    def since(self, day: int) -> int:
+        return len(self.days) - bisect_left(self.days, day)
+
+def is_open(shift: OpenShift) -> bool:
+    return not shift.assigned_to and shift.status != "Filled"
+
+def is_bidding(shift: OpenShift) -> bool:
+    return "Bidding" in shift.status
+
+class DashboardCounters:
+    """Per-department open/bidding counts and per-radiologist upcoming calls, adjusted
+    by the old -> new delta of every shift write; a Dashboard load is a few bisects."""
+
+    def __init__(self, app_data: AppData):
+        self.app_data = app_data
+        self._lock = threading.Lock()
+        self._rebuild()
+        app_data.subscribe(self._on_change)
+
+    def _rebuild(self) -> None:
+        with self._lock:
+            self._shifts = self.app_data.open_shifts
+            self._open = _DatedCount()
+            self._bidding = _DatedCount()
+            self._calls: Dict[str, _DatedCount] = {}
+            self._stale = False
+            for shift in self._shifts:
+                self._apply(shift, +1)
+
+    def _apply(self, shift: OpenShift, sign: int) -> None:
+        day = date.fromisoformat(shift.date).toordinal()
+        targets = []
+        if is_open(shift):
+            targets.append(self._open)
+        if is_bidding(shift):
+            targets.append(self._bidding)
+        if shift.assigned_to:
+            targets.append(self._calls.setdefault(shift.assigned_to, _DatedCount()))
+        for target in targets:
+            if sign > 0:
+                target.add(day)
+            elif not target.remove(day):
+                self._stale = True  # an event was missed; recount on the next read
+
+    def _on_change(self, collection: str, old: List, new: List) -> None:
+        if collection != "open_shifts":
+            return
+        with self._lock:
+            for before, after in zip(old, new):
+                if before is not None:
+                    self._apply(before, -1)
+                self._apply(after, +1)
+
+    def _current(self) -> None:
+        if self.app_data.open_shifts is not self._shifts or self._stale:
+            self._rebuild()  # list replaced wholesale (bulk load) or a removal found nothing to remove
+
+    @timed()
+    def counts(self, user: Optional[str] = None, today: Optional[date] = None) -> DashboardCounts:
+        """Department tile values plus the user's own upcoming calls and credential deadlines"""
+        self._current()
+        today = today or date.today()
+        credentials = self.app_data.credential_index()
+        with self._lock:
+            calls = self._calls.get(user)
+            return DashboardCounts(
+                upcoming_calls=calls.since(today.toordinal()) if calls else 0,
+                open_shifts=self._open.since(today.toordinal()),
+                active_bidding=self._bidding.since(today.toordinal()),
+                credentials_due=credentials.count_due(DUE_SOON_DAYS, today),
+                own_credentials_due=len(credentials.due_for(user, DUE_SOON_DAYS, today)) if user else 0
+            )
@@ -0,0 +1,330 @@
+"""
+Streaming bulk import of rosters, locations, shifts and bids for RadFlow Pro
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from data_models import AppData, Location, OpenShift, Radiologist
+from instrumentation import timed
+
+REQUIRED = object()
+ASSIGNMENT_MODES = ["Smart Distribution", "Bidding Mode", "Hybrid"]
+LIST_SEPARATOR = ";"
+
+@dataclass
+class RowError:
+    row: int
+    message: str
+
+@dataclass
+class ImportReport:
+    entity: str
+    source: str
+    rows_read: int = 0
+    rows_imported: int = 0
+    error_count: int = 0
+    errors: List[RowError] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def add_error(self, row: int, exc: Exception, max_errors: int) -> None:
+        self.error_count += 1
+        if len(self.errors) < max_errors:
+            self.errors.append(RowError(row, str(exc)))
+
+    def summary(self) -> str:
+        return (f"{self.entity}: {self.rows_imported}/{self.rows_read} rows imported from {self.source} "
+                f"in {self.elapsed_seconds:.2f}s ({self.rows_per_second:,.0f} rows/s), "
+                f"{self.error_count} bad rows")
+
+# --- Value coercion -------------------------------------------------------
+
+def _missing(value):
+    return value is None or (isinstance(value, str) and value.strip() == "")
+
+def _str(value):
+    return str(value).strip()
+
+def _int(value):
+    if isinstance(value, bool):
+        raise ValueError(f"expected a number, got {value!r}")
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"expected a whole number, got {value!r}")
+    return int(number)
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "y", "1"):
+        return True
+    if text in ("false", "no", "n", "0"):
+        return False
+    raise ValueError(f"expected true/false, got {value!r}")
+
+def _date(value):
+    text = str(value).strip()[:10]
+    datetime.strptime(text, "%Y-%m-%d")
+    return text
+
+def _list(value):
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if not _missing(item)]
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+def _date_list(value):
+    return [_date(item) for item in _list(value)]
+
+def _field(record, name, coerce, default=REQUIRED, section=None):
+    """Read one field from a nested section, a dotted column or a flat column"""
+    value = None
+    if section is not None and isinstance(record.get(section), dict):
+        value = record[section].get(name)
+    if _missing(value) and section is not None:
+        value = record.get(f"{section}.{name}")
+    if _missing(value):
+        value = record.get(name)
+    if _missing(value):
+        if default is REQUIRED:
+            raise ValueError(f"missing required field '{name}'")
+        return default() if callable(default) else default
+    try:
+        return coerce(value)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"invalid {name}: {exc}") from None
+
+def _section(record, section, spec):
+    return {name: _field(record, name, coerce, default, section) for name, (coerce, default) in spec.items()}
+
+# --- Schema parsers -------------------------------------------------------
+
+RADIOLOGIST_SECTIONS = {
+    "credentials": {
+        "board_certified": (_bool, False),
+        "cert_expiry": (_date, REQUIRED),
+        "cme_credits": (_int, 0),
+        "cme_required": (_int, 50)
+    },
+    "preferences": {
+        "max_weekend_calls": (_int, 2),
+        "preferred_locations": (_list, list),
+        "blackout_dates": (_date_list, list),
+        "bidding_opt_in": (_bool, False),
+        "max_auto_bid": (_int, 0),
+        "preferred_assignment_mode": (_str, "Smart Distribution")
+    },
+    "call_history": {
+        "last_30_days": (_int, 0),
+        "year_total": (_int, 0)
+    },
+    "bidding_stats": {
+        "bids_placed": (_int, 0),
+        "bids_won": (_int, 0),
+        "avg_winning_bid": (_int, 0),
+        "total_bidding_earnings": (_int, 0)
+    }
+}
+
+STAFFING_SPEC = {
+    "weekday_day": (_int, 0),
+    "weekday_night": (_int, 0),
+    "weekend_day": (_int, 0),
+    "weekend_night": (_int, 0)
+}
+
+def parse_radiologist(record: Dict) -> Radiologist:
+    """Validate a record against the Radiologist schema"""
+    radiologist = Radiologist(
+        id=_field(record, "id", _int),
+        name=_field(record, "name", _str),
+        subspecialty=_field(record, "subspecialty", _str),
+        locations=_field(record, "locations", _list),
+        **{section: _section(record, section, spec) for section, spec in RADIOLOGIST_SECTIONS.items()}
+    )
+    if not radiologist.locations:
+        raise ValueError("radiologist must cover at least one location")
+    return radiologist
+
+def parse_location(record: Dict) -> Location:
+    """Validate a record against the Location schema"""
+    return Location(
+        name=_field(record, "name", _str),
+        address=_field(record, "address", _str, ""),
+        modalities=_field(record, "modalities", _list, list),
+        staffing_requirements=_section(record, "staffing_requirements", STAFFING_SPEC)
+    )
+
+def parse_open_shift(record: Dict) -> OpenShift:
+    """Validate a record against the OpenShift schema"""
+    shift = OpenShift(
+        id=_field(record, "id", _int),
+        date=_field(record, "date", _date),
+        shift=_field(record, "shift", _str),
+        location=_field(record, "location", _str),
+        subspecialty_required=_field(record, "subspecialty_required", _str, "Any"),
+        duration=_field(record, "duration", _str, "12 hours"),
+        base_compensation=_field(record, "base_compensation", _int),
+        assignment_mode=_field(record, "assignment_mode", _str, "Smart Distribution"),
+        status=_field(record, "status", _str, "Open"),
+        current_high_bid=_field(record, "current_high_bid", _int, None),
+        current_high_bidder=_field(record, "current_high_bidder", _str, None),
+        assigned_to=_field(record, "assigned_to", _str, None)
+    )
+    if not any(mode.lower() in shift.assignment_mode.lower() for mode in ASSIGNMENT_MODES):
+        raise ValueError(f"unknown assignment_mode '{shift.assignment_mode}'")
+    if shift.base_compensation < 0:
+        raise ValueError("base_compensation must not be negative")
+    return shift
+
+def parse_bid(record: Dict) -> Tuple[int, Dict]:
+    """Validate a historical bid record; returns (shift_id, bid)"""
+    timestamp = _field(record, "timestamp", _str)
+    try:
+        datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"invalid timestamp {timestamp!r}") from None
+    return _field(record, "shift_id", _int), {
+        "radiologist": _field(record, "radiologist", _str),
+        "amount": _field(record, "amount", _int),
+        "timestamp": timestamp
+    }
+
+def check_bid(app_data: AppData, parsed: Tuple[int, Dict]) -> None:
+    """Reject bids for shifts that are not loaded"""
+    if app_data.get_shift_by_id(parsed[0]) is None:
+        raise ValueError(f"unknown shift_id {parsed[0]}")
+
+# entity -> (parser, reference check against loaded data, batch upsert)
+ENTITIES: Dict[str, Tuple[Callable, Optional[Callable], Callable]] = {
+    "radiologists": (parse_radiologist, None, AppData.upsert_radiologists),
+    "locations": (parse_location, None, AppData.upsert_locations),
+    "shifts": (parse_open_shift, None, AppData.upsert_open_shifts),
+    "bids": (parse_bid, check_bid, AppData.upsert_bids)
+}
+
+# --- Streaming readers ----------------------------------------------------
+
+def detect_format(name: str) -> str:
+    """Infer the file format from its extension"""
+    extension = os.path.splitext(name.lower())[1]
+    formats = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet", ".pq": "parquet"}
+    if extension not in formats:
+        raise ValueError(f"Unsupported file type '{extension}' (expected CSV, JSONL or Parquet)")
+    return formats[extension]
+
+def _open_text(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, newline="", encoding="utf-8-sig")
+    return io.TextIOWrapper(source, newline="", encoding="utf-8-sig")
+
+def iter_records(source, fmt: str, batch_size: int = 1000) -> Iterator[Tuple[int, object]]:
+    """Yield (row_number, record) pairs without loading the whole file;
+    records that cannot be decoded are yielded as the exception"""
+    if fmt == "csv":
+        with _open_text(source) as handle:
+            for row_number, record in enumerate(csv.DictReader(handle), start=2):
+                yield row_number, record
+    elif fmt == "jsonl":
+        with _open_text(source) as handle:
+            for row_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield row_number, ValueError(f"invalid JSON: {exc.msg}")
+                    continue
+                yield row_number, record if isinstance(record, dict) else ValueError("expected a JSON object")
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet import requires pyarrow (pip install pyarrow)") from None
+        row_number = 0
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+            for record in batch.to_pylist():
+                row_number += 1
+                yield row_number, record
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'")
+
+# --- Import driver --------------------------------------------------------
+
+@timed()
+def import_file(app_data: AppData, source, entity: str, fmt: Optional[str] = None,
+                batch_size: int = 1000, max_errors: int = 100,
+                progress: Optional[Callable[[ImportReport], None]] = None,
+                transaction: Callable[[], ContextManager] = nullcontext) -> ImportReport:
+    """Stream a file into AppData in validated batches, collecting bad rows. Rows are
+    parsed outside `transaction` (e.g. DepartmentStore.transaction); each batch is
+    checked and written inside its own, so other writers wait at most one batch."""
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity '{entity}' (expected one of {', '.join(ENTITIES)})")
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "upload")
+    fmt = fmt or detect_format(str(name))
+    parse, check, upsert = ENTITIES[entity]
+    report = ImportReport(entity=entity, source=str(name))
+
+    started = time.perf_counter()
+    records = iter_records(source, fmt, batch_size)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        parsed_rows = []
+        for row_number, record in chunk:
+            report.rows_read += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                parsed_rows.append((row_number, parse(record)))
+            except ValueError as exc:
+                report.add_error(row_number, exc, max_errors)
+        with transaction():
+            batch = []
+            for row_number, parsed in parsed_rows:
+                try:
+                    if check is not None:
+                        check(app_data, parsed)
+                    batch.append(parsed)
+                except ValueError as exc:
+                    report.add_error(row_number, exc, max_errors)
+            upsert(app_data, batch)
+        report.rows_imported += len(batch)
+        report.elapsed_seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
+
+def main(argv=None):
+    """Validate (and time) an import from the command line"""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] not in ENTITIES:
+        print(f"Usage: python data_import.py {{{'|'.join(ENTITIES)}}} <file.csv|file.jsonl|file.parquet>")
+        return 2
+    report = import_file(AppData(), argv[1], argv[0])
+    print(report.summary())
+    for error in report.errors:
+        print(f"  row {error.row}: {error.message}")
+    if report.error_count > len(report.errors):
+        print(f"  ... and {report.error_count - len(report.errors)} more")
+    return 1 if report.error_count else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
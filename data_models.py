@@ -3,13 +3,54 @@
 Data models and sample data for RadFlow Pro Streamlit application
 """
 
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+import heapq
 import json
 
+from instrumentation import timed
+
+SCHEMA_VERSION = 1
+SCHEMA_KEY = "schema_version"
+# (record type, version) -> function upgrading that version's dict to the next one
+MIGRATIONS: Dict[Tuple[str, int], Callable[[Dict], Dict]] = {}
+
+class Record:
+    """Schema-versioned dict round-trip shared by the record dataclasses"""
+
+    def to_dict(self) -> Dict:
+        return {SCHEMA_KEY: SCHEMA_VERSION, **asdict(self)}
+
+    @classmethod
+    def field_names(cls) -> Tuple[str, ...]:
+        names = cls.__dict__.get("_field_names")
+        if names is None:
+            names = tuple(f.name for f in fields(cls))
+            setattr(cls, "_field_names", names)
+        return names
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        """Build a record from to_dict() output of this or an older schema. Dicts without a
+        version (imports, older shared databases) are read as current; unknown keys are dropped."""
+        data = dict(data)
+        version = data.pop(SCHEMA_KEY, SCHEMA_VERSION)
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{cls.__name__} schema v{version} is newer than this build (v{SCHEMA_VERSION})")
+        while version < SCHEMA_VERSION:
+            migrate = MIGRATIONS.get((cls.__name__, version))
+            if migrate is not None:
+                data = migrate(data)
+            version += 1
+        names = cls.field_names()
+        try:
+            return cls(**{name: value for name, value in data.items() if name in names})
+        except TypeError as exc:
+            raise ValueError(f"Invalid {cls.__name__}: {exc}") from None
+
 @dataclass
-class Radiologist:
+class Radiologist(Record):
     id: int
     name: str
     subspecialty: str
@@ -20,14 +61,14 @@ class Radiologist:
     bidding_stats: Dict
 
 @dataclass
-class Location:
+class Location(Record):
     name: str
     address: str
     modalities: List[str]
     staffing_requirements: Dict
 
 @dataclass
-class OpenShift:
+class OpenShift(Record):
     id: int
     date: str
     shift: str
@@ -40,9 +81,16 @@ class OpenShift:
     current_high_bid: Optional[int] = None
     current_high_bidder: Optional[str] = None
     bid_history: Optional[List[Dict]] = None
+    assigned_to: Optional[str] = None
+
+    def window(self) -> Tuple[datetime, datetime]:
+        """Start and end of the shift; night shifts start at 7 PM, day shifts at 7 AM"""
+        start = datetime.strptime(self.date, "%Y-%m-%d").replace(hour=19 if "Night" in self.shift else 7)
+        hours = int(self.duration.split()[0]) if self.duration[:1].isdigit() else 12
+        return start, start + timedelta(hours=hours)
 
 @dataclass
-class Consultation:
+class Consultation(Record):
     id: int
     case_id: str
     requesting_physician: str
@@ -52,8 +100,68 @@ class Consultation:
     status: str
     created: str
 
+@dataclass
+class Message(Record):
+    id: int
+    sender: str
+    recipient: str
+    time: str
+    body: str
+    direction: str
+    priority: str = "Normal"
+    attachments: Optional[List[str]] = None  # AttachmentStore digests
+
+@dataclass
+class SwapRequest(Record):
+    id: int
+    shift_id: int
+    requester: str
+    status: str
+    created: str
+    candidate: Optional[str] = None
+    note: str = ""
+
+DEFAULT_DEPARTMENT = "Diagnostic Radiology"
+GENERAL_SUBSPECIALTIES = ("Any", "General")
+
+def is_weekend_shift(shift: OpenShift) -> bool:
+    return "Weekend" in shift.shift or datetime.strptime(shift.date, "%Y-%m-%d").weekday() >= 5
+
+def ineligibility_reasons(radiologist: Radiologist, shift: OpenShift, weekend_calls: int = 0) -> List[str]:
+    """Why a radiologist cannot take a shift; empty when eligible. weekend_calls is the
+    number of weekend shifts they already hold in the shift's month."""
+    reasons = []
+    if shift.location not in radiologist.locations:
+        reasons.append(f"no privileges at {shift.location}")
+    if shift.subspecialty_required not in GENERAL_SUBSPECIALTIES and shift.subspecialty_required != radiologist.subspecialty:
+        reasons.append(f"requires {shift.subspecialty_required}")
+    if shift.date in radiologist.preferences.get("blackout_dates", ()):
+        reasons.append("blackout date")
+    credentials = radiologist.credentials
+    if not credentials.get("board_certified", False) or credentials.get("cert_expiry", "") < shift.date:
+        reasons.append("credentials not valid on shift date")
+    if is_weekend_shift(shift) and weekend_calls >= radiologist.preferences.get("max_weekend_calls", 0):
+        reasons.append("weekend call cap reached")
+    return reasons
+
+def is_eligible(radiologist: Radiologist, shift: OpenShift, weekend_calls: int = 0) -> bool:
+    return not ineligibility_reasons(radiologist, shift, weekend_calls)
+
 class AppData:
-    def __init__(self):
+    def __init__(self, department: str = DEFAULT_DEPARTMENT):
+        self.department = department
+        self._indexes = {}
+        self._dirty = None  # collection -> touched keys, while a shared-state transaction tracks writes
+        self._eligibility = None
+        self._credentials = None
+        self._counters = None
+        self._search = None
+        self._rotation = None
+        self._rotation_state = None  # the department_settings["rotation"] it was resumed from
+        self._conflicts = None
+        self._listeners: List[Callable[[str, List, List], None]] = []
+        self._version = 0
+
         self.radiologists = [
             Radiologist(
                 id=1,
@@ -252,9 +360,34 @@ class AppData:
                     {"radiologist": "Dr. James Park", "amount": 2700, "timestamp": "2025-08-31T14:30:00Z"},
                     {"radiologist": "Dr. Michael Rodriguez", "amount": 2850, "timestamp": "2025-08-31T16:15:00Z"}
                 ]
+            ),
+            OpenShift(
+                id=3,
+                date="2025-09-21",
+                shift="Weekend Day",
+                location="Sports Medicine Center",
+                subspecialty_required="Musculoskeletal",
+                duration="8 hours",
+                base_compensation=1800,
+                assignment_mode="Hybrid",
+                status="Smart Failed → Bidding"
+            ),
+            OpenShift(
+                id=4,
+                date="2025-08-30",
+                shift="Weekend Day",
+                location="Main Hospital",
+                subspecialty_required="Any",
+                duration="12 hours",
+                base_compensation=2400,
+                assignment_mode="Smart Distribution",
+                status="Filled",
+                assigned_to="Dr. Emily Johnson"
             )
         ]
 
+        self.swap_requests: List[SwapRequest] = []
+
         self.consultations = [
             Consultation(
                 id=1,
@@ -278,6 +411,33 @@ class AppData:
             )
         ]
 
+        self.messages = [
+            Message(
+                id=1,
+                sender="Dr. Michael Rodriguez",
+                recipient="Dr. Sarah Chen",
+                time="2:45 PM",
+                body="Can you cover my weekend shift? Family emergency.",
+                direction="received"
+            ),
+            Message(
+                id=2,
+                sender="Dr. Sarah Chen",
+                recipient="Dr. Michael Rodriguez",
+                time="2:50 PM",
+                body="Of course! I can take the Saturday shift. Hope everything is okay.",
+                direction="sent"
+            ),
+            Message(
+                id=3,
+                sender="Dr. Michael Rodriguez",
+                recipient="Dr. Sarah Chen",
+                time="2:52 PM",
+                body="Thank you so much! I'll make it up to you.",
+                direction="received"
+            )
+        ]
+
         self.department_settings = {
             "default_assignment_mode": "Smart Distribution",
             "allow_mode_override": True,
@@ -295,6 +455,16 @@ class AppData:
                 "monthly_bidding_budget": 50000,
                 "approval_required_over": 3500,
                 "cost_alert_threshold": 3000
+            },
+            "notifications": {
+                "email": True,
+                "sms": True,
+                "push": True
+            },
+            "integrations": {
+                "pacs": True,
+                "ris": True,
+                "emr": False
             }
         }
 
@@ -325,14 +495,277 @@ class AppData:
             }
         }
 
+    @classmethod
+    def empty(cls, department: str = DEFAULT_DEPARTMENT) -> "AppData":
+        """A department with default settings and no roster, sites or shifts"""
+        app_data = cls(department)
+        app_data.radiologists = []
+        app_data.locations = []
+        app_data.open_shifts = []
+        app_data.consultations = []
+        app_data.swap_requests = []
+        app_data.messages = []
+        return app_data
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def mark_changed(self) -> None:
+        """Invalidate derived indexes after an in-place mutation"""
+        self._version += 1
+
+    def _touch(self, collection: str, keys) -> None:
+        if self._dirty is not None:
+            self._dirty.setdefault(collection, set()).update(keys)
+
+    def subscribe(self, listener: Callable[[str, List, List], None]) -> Callable[[str, List, List], None]:
+        """Call listener(collection, old_records, new_records) after every record write;
+        old is None for inserts. Listeners run on the writer's thread, so keep them cheap."""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: Callable[[str, List, List], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _publish(self, collection: str, old: List, new: List) -> None:
+        for listener in list(self._listeners):
+            listener(collection, old, new)
+
+    def _stamp(self, collection: str):
+        items = getattr(self, collection)
+        return items, len(items), self._version
+
+    def _is_current(self, cached, stamp) -> bool:
+        return cached is not None and cached[0][0] is stamp[0] and cached[0][1:] == stamp[1:]
+
+    def _key_index(self, collection: str, key: str) -> Dict:
+        """Lazily built key -> position index, rebuilt after any change"""
+        stamp = self._stamp(collection)
+        cached = self._indexes.get((collection, key))
+        if not self._is_current(cached, stamp):
+            cached = (stamp, {getattr(item, key): pos for pos, item in enumerate(stamp[0])})
+            self._indexes[(collection, key)] = cached
+        return cached[1]
+
+    def _group_index(self, collection: str, key: str) -> Dict[str, List]:
+        """Lazily built key -> items buckets, rebuilt after any change"""
+        stamp = self._stamp(collection)
+        cached = self._indexes.get((collection, key, "group"))
+        if not self._is_current(cached, stamp):
+            groups = {}
+            for item in stamp[0]:
+                groups.setdefault(getattr(item, key), []).append(item)
+            cached = (stamp, groups)
+            self._indexes[(collection, key, "group")] = cached
+        return cached[1]
+
+    def _upsert(self, collection: str, key: str, records: List) -> None:
+        items = getattr(self, collection)
+        index = self._key_index(collection, key)
+        replaced = []
+        for record in records:
+            pos = index.get(getattr(record, key))
+            if pos is None:
+                index[getattr(record, key)] = len(items)
+                items.append(record)
+                replaced.append(None)
+            else:
+                replaced.append(items[pos])
+                items[pos] = record
+        self._touch(collection, [getattr(record, key) for record in records])
+        self.mark_changed()
+        # The index maintained above stays valid; every other index is rebuilt lazily
+        self._indexes[(collection, key)] = (self._stamp(collection), index)
+        if self._listeners:
+            self._publish(collection, replaced, list(records))
+
+    @timed()
+    def upsert_radiologists(self, radiologists: List[Radiologist]) -> None:
+        self._upsert("radiologists", "id", radiologists)
+
+    @timed()
+    def upsert_locations(self, locations: List[Location]) -> None:
+        self._upsert("locations", "name", locations)
+
+    @timed()
+    def upsert_open_shifts(self, shifts: List[OpenShift]) -> None:
+        self._upsert("open_shifts", "id", shifts)
+
+    @timed()
+    def add_consultation(self, case_id: str, requesting_physician: str, specialty_needed: str,
+                         urgency: str, description: str, status: str = "Pending",
+                         created: Optional[str] = None) -> Consultation:
+        consultation = Consultation(
+            id=max((c.id for c in self.consultations), default=0) + 1,
+            case_id=case_id,
+            requesting_physician=requesting_physician,
+            specialty_needed=specialty_needed,
+            urgency=urgency,
+            description=description,
+            status=status,
+            created=created or datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        )
+        self.consultations.append(consultation)
+        self._touch("consultations", [consultation.id])
+        self.mark_changed()
+        if self._listeners:
+            self._publish("consultations", [None], [consultation])
+        return consultation
+
+    @timed()
+    def upsert_swap_requests(self, requests: List[SwapRequest]) -> None:
+        self._upsert("swap_requests", "id", requests)
+
+    def replace_settings(self, settings: Dict) -> None:
+        """Swap in a new department settings dict (copy-on-write) and notify listeners"""
+        previous = self.department_settings
+        self.department_settings = settings
+        self.mark_changed()
+        if self._listeners:
+            self._publish("department_settings", [previous], [settings])
+
+    @timed()
+    def upsert_messages(self, messages: List[Message]) -> None:
+        self._upsert("messages", "id", messages)
+
+    def credential_index(self):
+        """CredentialIndex of upcoming expiries and CME deadlines, refreshed incrementally"""
+        if self._credentials is None:
+            from credential_alerts import CredentialIndex
+            self._credentials = CredentialIndex(self)
+        self._credentials.refresh()
+        return self._credentials
+
+    def dashboard_counters(self):
+        """DashboardCounters kept current by this shard's change events"""
+        if self._counters is None:
+            from dashboard_counters import DashboardCounters
+            self._counters = DashboardCounters(self)
+        return self._counters
+
+    def search_index(self):
+        """SearchIndex over consultations, messages and shifts, kept current by change events"""
+        if self._search is None:
+            from search_index import SearchIndex
+            self._search = SearchIndex(self)
+        return self._search
+
+    def eligibility(self):
+        """Radiologist x shift EligibilityIndex, built once and refreshed incrementally"""
+        if self._eligibility is None:
+            from eligibility import EligibilityIndex
+            self._eligibility = EligibilityIndex(self)
+        self._eligibility.refresh()
+        return self._eligibility
+
+    def conflicts(self):
+        """ConflictIndex of assigned shifts per radiologist, kept current by change events"""
+        if self._conflicts is None:
+            from conflicts import ConflictIndex
+            self._conflicts = ConflictIndex(self)
+        return self._conflicts
+
+    def rotation(self, conflicts=None):
+        """Fairness RotationQueue for routine call coverage, resumed from the weeks published
+        in department_settings["rotation"] (so every worker sees the same) and carried on.
+        Picks skip anyone `conflicts(name, shift)` reports, by default this shard's assigned shifts;
+        pass DepartmentStore.assignment_conflicts to include the radiologist's other departments."""
+        state = self.department_settings.get("rotation")
+        if self._rotation is None or state is not self._rotation_state:
+            from rotation import RotationQueue
+            self._rotation = RotationQueue.from_dict(state or {}, self.radiologists)
+            self._rotation_state = state
+        self._rotation.conflicts = conflicts or (lambda name, shift: self.conflicts().check(name, shift, replacing=False))
+        self._rotation.sync(self.radiologists, self._version)
+        return self._rotation
+
+    @timed()
+    def get_shift_by_id(self, shift_id: int) -> Optional[OpenShift]:
+        pos = self._key_index("open_shifts", "id").get(shift_id)
+        return self.open_shifts[pos] if pos is not None else None
+
+    @timed()
+    def upsert_bids(self, bids: List[Tuple[int, Dict]]) -> None:
+        """Merge historical bids into their shifts' bid history (copy-on-write per shift)"""
+        index = self._key_index("open_shifts", "id")
+        old, new = [], []
+        for shift_id, bid in bids:
+            pos = index.get(shift_id)
+            if pos is None:
+                continue
+            shift = self.open_shifts[pos]
+            history = shift.bid_history or []
+            if any(b["radiologist"] == bid["radiologist"] and b["timestamp"] == bid["timestamp"] for b in history):
+                continue
+            updated = replace(shift, bid_history=history + [bid])
+            if shift.current_high_bid is None or bid["amount"] > shift.current_high_bid:
+                updated.current_high_bid = bid["amount"]
+                updated.current_high_bidder = bid["radiologist"]
+            old.append(self.open_shifts[pos])
+            new.append(updated)
+            self.open_shifts[pos] = updated
+            self._touch("open_shifts", [shift_id])
+        self.mark_changed()
+        if self._listeners and new:
+            self._publish("open_shifts", old, new)
+
+    @timed()
     def get_radiologist_by_name(self, name: str) -> Optional[Radiologist]:
-        for rad in self.radiologists:
-            if rad.name == name:
-                return rad
-        return None
+        pos = self._key_index("radiologists", "name").get(name)
+        return self.radiologists[pos] if pos is not None else None
+
+    @timed()
+    def get_location(self, name: str) -> Optional[Location]:
+        pos = self._key_index("locations", "name").get(name)
+        return self.locations[pos] if pos is not None else None
+
+    @timed()
+    def get_shifts_at_location(self, location: str) -> List[OpenShift]:
+        return self._group_index("open_shifts", "location").get(location, [])
 
+    @timed()
     def get_active_bidding_shifts(self) -> List[OpenShift]:
         return [shift for shift in self.open_shifts if "Bidding" in shift.status]
 
+    @timed()
+    def get_assigned_shifts(self) -> List[OpenShift]:
+        return [shift for shift in self.open_shifts if shift.assigned_to]
+
+    @timed()
     def get_open_shifts_by_mode(self, mode: str) -> List[OpenShift]:
         return [shift for shift in self.open_shifts if mode.lower() in shift.assignment_mode.lower()]
+
+    @timed()
+    def query_open_shifts(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                          locations: Optional[List[str]] = None, modes: Optional[List[str]] = None,
+                          statuses: Optional[List[str]] = None, sort_by: str = "date",
+                          descending: bool = False, offset: int = 0,
+                          limit: int = 25) -> Tuple[List[OpenShift], int]:
+        """Filter, sort and window open shifts; returns (page, total_matches)"""
+        if locations:
+            by_location = self._group_index("open_shifts", "location")
+            candidates = [shift for location in set(locations) for shift in by_location.get(location, [])]
+        else:
+            candidates = self.open_shifts
+        matches = [
+            shift for shift in candidates
+            if (date_from is None or shift.date >= date_from)
+            and (date_to is None or shift.date <= date_to)
+            and (not modes or any(mode.lower() in shift.assignment_mode.lower() for mode in modes))
+            and (not statuses or any(status.lower() in shift.status.lower() for status in statuses))
+        ]
+
+        def sort_key(shift):
+            return (getattr(shift, sort_by), shift.id)
+
+        # Only the rows up to the end of the requested window need ordering
+        window_end = offset + limit
+        if window_end < len(matches) // 4:
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            ordered = pick(window_end, matches, key=sort_key)
+        else:
+            ordered = sorted(matches, key=sort_key, reverse=descending)
+
+        return ordered[offset:window_end], len(matches)
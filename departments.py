@@ -0,0 +1,211 @@
+"""
+Per-department sharding of RadFlow Pro data with cross-shard lookups
+"""
+
+import copy
+import heapq
+import threading
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from data_models import DEFAULT_DEPARTMENT, AppData, OpenShift, Radiologist
+from instrumentation import timed
+
+class DepartmentStore:
+    """AppData shards keyed by department, plus a small directory of which
+    shards touch each location and radiologist for cross-shard reads"""
+
+    def __init__(self):
+        self.shards: Dict[str, AppData] = {}
+        self._location_departments: Dict[str, Set[str]] = {}
+        self._radiologist_departments: Dict[str, Set[str]] = {}
+        self._indexed_keys: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self._indexed_versions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._bidding = None
+        self._swaps = None
+        self._activity = None
+        self._attachments = None
+        self.audit = None  # AuditLog when writes are audited, see AuditLog.watch_store
+        self.shared = None  # SharedState when several processes serve this data
+
+    @classmethod
+    def with_sample_data(cls) -> "DepartmentStore":
+        store = cls()
+        store.add_department(DEFAULT_DEPARTMENT, AppData())
+        return store
+
+    @property
+    def departments(self) -> List[str]:
+        return sorted(self.shards)
+
+    def add_department(self, name: str, app_data: Optional[AppData] = None,
+                       settings: Optional[Dict] = None) -> AppData:
+        """Register a shard; only the new shard's keys are added to the directory"""
+        with self._lock:
+            if name in self.shards:
+                raise ValueError(f"Department '{name}' already exists")
+            shard = app_data if app_data is not None else AppData.empty(name)
+            shard.department = name
+            if settings is not None:  # another department's published rotation does not carry over
+                shard.department_settings = copy.deepcopy({key: value for key, value in settings.items()
+                                                           if key != "rotation"})
+            self.shards[name] = shard
+            self.reindex(name)
+            for watcher in (self._activity, self.audit):
+                if watcher is not None:
+                    watcher.watch(name, shard)
+            return shard
+
+    def remove_department(self, name: str) -> None:
+        with self._lock:
+            self._unindex(name)
+            del self.shards[name]
+            for watcher in (self._activity, self.audit):
+                if watcher is not None:
+                    watcher.unwatch(name)
+
+    @property
+    def bidding(self):
+        """The store's bidding engine, created on first use"""
+        if self._bidding is None:
+            from bidding import BiddingEngine
+            self._bidding = BiddingEngine(self)
+        return self._bidding
+
+    @property
+    def swaps(self):
+        """The store's shift-swap marketplace, created on first use"""
+        if self._swaps is None:
+            from swaps import SwapMarket
+            self._swaps = SwapMarket(self)
+        return self._swaps
+
+    @property
+    def attachments(self):
+        """Message attachment blobs (RADFLOW_ATTACHMENT_DIR), opened on first use"""
+        if self._attachments is None:
+            from attachments import AttachmentStore
+            self._attachments = AttachmentStore()
+        return self._attachments
+
+    @property
+    def activity(self):
+        """Recent-activity feed watching every shard, created on first use"""
+        if self._activity is None:
+            from activity_feed import ActivityFeed
+            feed = ActivityFeed()
+            for name, shard in self.shards.items():
+                feed.watch(name, shard)
+            self._activity = feed
+        return self._activity
+
+    def transaction(self):
+        """Lock held while a commit swaps records into a shard; when shared, also the
+        cross-process write lock, and touched records are written through on exit"""
+        return self.shared.transaction() if self.shared is not None else self._lock
+
+    def shard(self, name: str) -> AppData:
+        return self.shards[name]
+
+    def settings(self, name: str) -> Dict:
+        return self.shards[name].department_settings
+
+    def reindex(self, name: str) -> None:
+        """Refresh one shard's directory entries, e.g. after an import into it"""
+        with self._lock:
+            shard = self.shards[name]
+            if self._indexed_versions.get(name) == shard.version and name in self._indexed_keys:
+                return
+            self._unindex(name)
+            locations = {loc.name for loc in shard.locations} | {rad_loc for rad in shard.radiologists
+                                                                 for rad_loc in rad.locations}
+            radiologists = {rad.name for rad in shard.radiologists}
+            for location in locations:
+                self._location_departments.setdefault(location, set()).add(name)
+            for radiologist in radiologists:
+                self._radiologist_departments.setdefault(radiologist, set()).add(name)
+            self._indexed_keys[name] = (locations, radiologists)
+            self._indexed_versions[name] = shard.version
+
+    def _refresh(self) -> None:
+        """Reindex shards that changed since their directory entries were built"""
+        for name, shard in list(self.shards.items()):
+            if self._indexed_versions.get(name) != shard.version:
+                self.reindex(name)
+
+    def _unindex(self, name: str) -> None:
+        locations, radiologists = self._indexed_keys.pop(name, (set(), set()))
+        for location in locations:
+            self._location_departments[location].discard(name)
+        for radiologist in radiologists:
+            self._radiologist_departments[radiologist].discard(name)
+
+    def departments_for_location(self, location: str) -> List[str]:
+        self._refresh()
+        return sorted(self._location_departments.get(location, ()))
+
+    def departments_for_radiologist(self, name: str) -> List[str]:
+        self._refresh()
+        return sorted(self._radiologist_departments.get(name, ()))
+
+    @timed()
+    def assignment_conflicts(self, department: str, radiologist: str, shift: OpenShift) -> List:
+        """Double bookings and short rests that giving `shift` (in `department`) to `radiologist`
+        would cause, across every department the radiologist works in"""
+        return self.conflict_checker(department, shift)(radiologist)
+
+    def conflict_checker(self, department: str, shift: OpenShift) -> Callable[[str], List]:
+        """assignment_conflicts for one shift and many radiologists: the directory is
+        refreshed once here rather than once per radiologist checked"""
+        self._refresh()
+        directory = self._radiologist_departments
+
+        def check(radiologist: str) -> List:
+            conflicts = []
+            for name in directory.get(radiologist, set()) | {department}:
+                found = self.shards[name].conflicts().check(radiologist, shift, replacing=name == department)
+                conflicts += [replace(c, department=name) for c in found] if name != department else found
+            return conflicts
+        return check
+
+    def shared_locations(self) -> Dict[str, List[str]]:
+        """Locations staffed by more than one department"""
+        self._refresh()
+        return {location: sorted(departments) for location, departments in self._location_departments.items()
+                if len(departments) > 1}
+
+    # --- Cross-shard reads ---------------------------------------------------
+
+    @timed()
+    def find_radiologist(self, name: str) -> List[Tuple[str, Radiologist]]:
+        """Every department record for a radiologist who may work in several groups"""
+        return [(department, self.shards[department].get_radiologist_by_name(name))
+                for department in self.departments_for_radiologist(name)]
+
+    @timed()
+    def shifts_at_location(self, location: str) -> List[Tuple[str, OpenShift]]:
+        """Shifts at a (possibly shared) site across only the shards that staff it"""
+        return [(department, shift) for department in self.departments_for_location(location)
+                for shift in self.shards[department].get_shifts_at_location(location)]
+
+    @timed()
+    def query_open_shifts(self, departments: Optional[Iterable[str]] = None, sort_by: str = "date",
+                          descending: bool = False, offset: int = 0, limit: int = 25,
+                          **filters) -> Tuple[List[Tuple[str, OpenShift]], int]:
+        """Merge each shard's top window into one page; untouched shards cost nothing"""
+        names = list(departments) if departments is not None else self.departments
+        if filters.get("locations"):
+            touching = {d for location in filters["locations"] for d in self.departments_for_location(location)}
+            names = [name for name in names if name in touching]
+
+        window_end = offset + limit
+        pages, total = [], 0
+        for name in names:
+            page, count = self.shards[name].query_open_shifts(sort_by=sort_by, descending=descending,
+                                                              offset=0, limit=window_end, **filters)
+            pages.append([(getattr(shift, sort_by), shift.id, name, shift) for shift in page])
+            total += count
+        merged = heapq.merge(*pages, key=lambda row: row[:2], reverse=descending)
+        window = [(name, shift) for _, _, name, shift in merged][offset:window_end]
+        return window, total
@@ -0,0 +1,271 @@
+"""
+Precomputed radiologist x shift eligibility matrix with incremental updates
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from data_models import GENERAL_SUBSPECIALTIES, AppData, OpenShift, Radiologist, is_weekend_shift
+from instrumentation import timed
+
+def _ordinal(iso: str) -> int:
+    try:
+        return date.fromisoformat(iso[:10]).toordinal()
+    except (TypeError, ValueError):
+        return 0  # missing or malformed expiry counts as expired
+
+def month_key(iso: str) -> int:
+    """'2024-07-13' -> 2024 * 12 + 7, the bucket weekend caps are counted in"""
+    return int(iso[:4]) * 12 + int(iso[5:7])
+
+# shift column array -> (dtype, value for unused capacity)
+SHIFT_COLUMNS = {
+    "shift_location": (np.int32, 0),
+    "shift_subspecialty": (np.int32, 0),
+    "shift_date": (np.int64, 0),
+    "shift_weekend": (bool, False),
+    "shift_month": (np.int32, 0),
+    "shift_assignee": (np.int32, -1)
+}
+
+def _grown(array: np.ndarray, capacity: int, fill) -> np.ndarray:
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class EligibilityIndex:
+    """Boolean matrix [radiologist, shift] of the static checks (location privileges,
+    subspecialty, blackout dates, credentials valid on the shift date). Schedule-
+    dependent checks (weekend cap, already working that day) are applied per query
+    from the shift columns, so assignments never invalidate the matrix.
+
+    Records are replaced copy-on-write, so refresh() finds edits by identity and
+    recomputes only the affected rows and columns. Appended radiologists and shifts
+    fill spare capacity in the arrays, which double when full."""
+
+    def __init__(self, app_data: AppData):
+        self.app_data = app_data
+        self._rebuild()
+
+    # --- Build and incremental maintenance -----------------------------------
+
+    def _vocab(self, mapping: Dict[str, int], name: str) -> int:
+        if name not in mapping:
+            mapping[name] = len(mapping)
+        return mapping[name]
+
+    def _rebuild(self) -> None:
+        app_data = self.app_data
+        self._rad_list = app_data.radiologists
+        self._shift_list = app_data.open_shifts
+        self._rads: List[Radiologist] = list(app_data.radiologists)
+        self._shifts: List[OpenShift] = list(app_data.open_shifts)
+        self._rad_pos = {rad.name: i for i, rad in enumerate(self._rads)}
+        self._unrostered: Dict[str, Set[int]] = {}  # assignee not on the roster -> shift positions
+        self._locations: Dict[str, int] = {}
+        self._subspecialties: Dict[str, int] = {}
+
+        self._shift_buffers = {name: np.full(len(self._shifts), fill, dtype=dtype)
+                               for name, (dtype, fill) in SHIFT_COLUMNS.items()}
+        self._cap_buffer = np.zeros(len(self._rads), dtype=np.int32)
+        self._matrix_buffer = np.zeros((len(self._rads), len(self._shifts)), dtype=bool)
+        self._resize()
+        for pos, shift in enumerate(self._shifts):
+            self._set_shift_columns(pos, shift)
+        for pos in range(len(self._rads)):
+            self._compute_row(pos)
+        self._version = app_data.version
+
+    def _resize(self) -> None:
+        """Point the public arrays at the first len(rads) x len(shifts) of the buffers,
+        doubling a buffer that is full so appends cost amortized O(1) copies"""
+        rads, shifts = len(self._rads), len(self._shifts)
+        rad_cap, shift_cap = self._matrix_buffer.shape
+        if shifts > shift_cap:
+            shift_cap = max(shifts, 2 * shift_cap)
+            for name, (dtype, fill) in SHIFT_COLUMNS.items():
+                self._shift_buffers[name] = _grown(self._shift_buffers[name], shift_cap, fill)
+        if rads > rad_cap:
+            rad_cap = max(rads, 2 * rad_cap)
+            self._cap_buffer = _grown(self._cap_buffer, rad_cap, 0)
+        if (rad_cap, shift_cap) != self._matrix_buffer.shape:
+            matrix = np.zeros((rad_cap, shift_cap), dtype=bool)
+            matrix[:self._matrix_buffer.shape[0], :self._matrix_buffer.shape[1]] = self._matrix_buffer
+            self._matrix_buffer = matrix
+        for name in SHIFT_COLUMNS:
+            setattr(self, name, self._shift_buffers[name][:shifts])
+        self.weekend_cap = self._cap_buffer[:rads]
+        self.matrix = self._matrix_buffer[:rads, :shifts]
+
+    def _set_shift_columns(self, pos: int, shift: OpenShift) -> None:
+        self.shift_location[pos] = self._vocab(self._locations, shift.location)
+        self.shift_subspecialty[pos] = (-1 if shift.subspecialty_required in GENERAL_SUBSPECIALTIES
+                                        else self._vocab(self._subspecialties, shift.subspecialty_required))
+        self.shift_date[pos] = _ordinal(shift.date)
+        self.shift_weekend[pos] = is_weekend_shift(shift)
+        self.shift_month[pos] = month_key(shift.date)
+        self.shift_assignee[pos] = self._rad_pos.get(shift.assigned_to, -1) if shift.assigned_to else -1
+        if shift.assigned_to and self.shift_assignee[pos] < 0:
+            self._unrostered.setdefault(shift.assigned_to, set()).add(pos)
+
+    def _compute_row(self, pos: int) -> None:
+        """One radiologist against every shift, vectorized"""
+        rad = self._rads[pos]
+        locations = [self._locations[name] for name in rad.locations if name in self._locations]
+        blackouts = [_ordinal(day) for day in rad.preferences.get("blackout_dates", ())]
+        credentials = rad.credentials
+        cert_valid_until = _ordinal(credentials.get("cert_expiry", "")) if credentials.get("board_certified") else 0
+        subspecialty = self._subspecialties.get(rad.subspecialty, -2)
+        self.matrix[pos] = (np.isin(self.shift_location, locations)
+                            & ((self.shift_subspecialty == -1) | (self.shift_subspecialty == subspecialty))
+                            & ~np.isin(self.shift_date, blackouts)
+                            & (self.shift_date <= cert_valid_until))
+        self.weekend_cap[pos] = rad.preferences.get("max_weekend_calls", 0)
+
+    def _compute_column(self, pos: int) -> None:
+        """Every radiologist against one shift"""
+        shift = self._shifts[pos]
+        day = self.shift_date[pos]
+        general = shift.subspecialty_required in GENERAL_SUBSPECIALTIES
+        self.matrix[:, pos] = [
+            shift.location in rad.locations
+            and (general or rad.subspecialty == shift.subspecialty_required)
+            and shift.date not in rad.preferences.get("blackout_dates", ())
+            and bool(rad.credentials.get("board_certified"))
+            and day <= _ordinal(rad.credentials.get("cert_expiry", ""))
+            for rad in self._rads
+        ]
+
+    def update_radiologist(self, pos: int) -> None:
+        """Re-derive one row after that radiologist's preferences or credentials changed"""
+        old, rad = self._rads[pos], self.app_data.radiologists[pos]
+        self._rads[pos] = rad
+        if rad.name != old.name:
+            self._rad_pos.pop(old.name, None)
+            self._rad_pos[rad.name] = pos
+        self._compute_row(pos)
+
+    def update_shift(self, pos: int) -> None:
+        self._shifts[pos] = self.app_data.open_shifts[pos]
+        self._set_shift_columns(pos, self._shifts[pos])
+        self._compute_column(pos)
+
+    def _append_shifts(self, start: int) -> None:
+        self._shifts.extend(self.app_data.open_shifts[start:])
+        self._resize()
+        for pos in range(start, len(self._shifts)):
+            self._set_shift_columns(pos, self._shifts[pos])
+            self._compute_column(pos)
+
+    def _append_radiologists(self, start: int) -> None:
+        self._rads.extend(self.app_data.radiologists[start:])
+        self._resize()
+        for pos in range(start, len(self._rads)):
+            name = self._rads[pos].name
+            self._rad_pos[name] = pos
+            for shift_pos in self._unrostered.pop(name, ()):  # shifts already assigned to the newcomer
+                if self._shifts[shift_pos].assigned_to == name:
+                    self.shift_assignee[shift_pos] = pos
+            self._compute_row(pos)
+
+    @timed()
+    def refresh(self) -> int:
+        """Bring the matrix up to date with AppData; returns rows + columns recomputed"""
+        app_data = self.app_data
+        if app_data.version == self._version:
+            return 0
+        if (app_data.radiologists is not self._rad_list or app_data.open_shifts is not self._shift_list
+                or len(app_data.radiologists) < len(self._rads) or len(app_data.open_shifts) < len(self._shifts)):
+            self._rebuild()  # lists replaced or shrunk: positions no longer line up
+            return len(self._rads) + len(self._shifts)
+
+        updated = 0
+        known_locations, known_subspecialties = len(self._locations), len(self._subspecialties)
+        if len(app_data.radiologists) > len(self._rads):
+            start = len(self._rads)
+            self._append_radiologists(start)
+            updated += len(self._rads) - start
+        if len(app_data.open_shifts) > len(self._shifts):
+            start = len(self._shifts)
+            self._append_shifts(start)
+            updated += len(self._shifts) - start
+        current = app_data.open_shifts
+        for pos in [i for i, (old, new) in enumerate(zip(self._shifts, current)) if old is not new]:
+            self.update_shift(pos)
+            updated += 1
+        if len(self._locations) != known_locations or len(self._subspecialties) != known_subspecialties:
+            for pos in range(len(self._rads)):  # new site or subspecialty names: rows must see them
+                self._compute_row(pos)
+        for pos in [i for i, (old, new) in enumerate(zip(self._rads, app_data.radiologists)) if old is not new]:
+            self.update_radiologist(pos)
+            updated += 1
+        self._version = app_data.version
+        return updated
+
+    # --- Queries -------------------------------------------------------------
+
+    def _shift_positions(self, shift_ids: Iterable[int]) -> np.ndarray:
+        index = self.app_data._key_index("open_shifts", "id")
+        positions = [index[shift_id] for shift_id in shift_ids if shift_id in index]
+        return np.array(positions, dtype=np.int64)
+
+    def weekend_calls(self, month: int) -> np.ndarray:
+        """Weekend shifts each radiologist holds in a month (year * 12 + month)"""
+        held = self.shift_assignee[(self.shift_month == month) & self.shift_weekend & (self.shift_assignee >= 0)]
+        return np.bincount(held, minlength=len(self._rads))
+
+    def _working_on(self, days: np.ndarray) -> np.ndarray:
+        held = self.shift_assignee[np.isin(self.shift_date, days) & (self.shift_assignee >= 0)]
+        working = np.zeros(len(self._rads), dtype=bool)
+        working[held] = True
+        return working
+
+    @timed()
+    def eligible_mask(self, shift_id: int, respect_schedule: bool = True) -> np.ndarray:
+        """Radiologists (roster order) who can take one shift"""
+        return self.can_cover_all_mask([shift_id], respect_schedule)
+
+    @timed()
+    def can_cover_all_mask(self, shift_ids: Iterable[int], respect_schedule: bool = True) -> np.ndarray:
+        """Radiologists who could take every one of the shifts together"""
+        self.refresh()
+        positions = self._shift_positions(shift_ids)
+        if not len(positions):
+            return np.zeros(len(self._rads), dtype=bool)
+        mask = self.matrix[:, positions].all(axis=1)
+        if not respect_schedule:
+            return mask
+        days = self.shift_date[positions]
+        if len(np.unique(days)) < len(days):
+            return np.zeros(len(self._rads), dtype=bool)  # two shifts on one day
+        mask &= ~self._working_on(days)
+        weekend = positions[self.shift_weekend[positions]]
+        for month, needed in zip(*np.unique(self.shift_month[weekend], return_counts=True)):
+            mask &= self.weekend_calls(month) + needed <= self.weekend_cap
+        return mask
+
+    def eligible_radiologists(self, shift_id: int) -> List[Radiologist]:
+        return [self._rads[i] for i in np.flatnonzero(self.eligible_mask(shift_id))]
+
+    def can_cover_all(self, shift_ids: Iterable[int]) -> List[Radiologist]:
+        return [self._rads[i] for i in np.flatnonzero(self.can_cover_all_mask(shift_ids))]
+
+    def eligible_shifts(self, radiologist: str) -> List[OpenShift]:
+        """Shifts a radiologist passes the static checks for"""
+        self.refresh()
+        pos = self._rad_pos.get(radiologist)
+        return [] if pos is None else [self._shifts[i] for i in np.flatnonzero(self.matrix[pos])]
+
+    def position(self, radiologist: str) -> Optional[int]:
+        return self._rad_pos.get(radiologist)
+
+    def is_working(self, radiologist: str, day: str) -> bool:
+        pos = self._rad_pos.get(radiologist)
+        return pos is not None and bool(self._working_on(np.array([_ordinal(day)]))[pos])
+
+    def packed(self) -> np.ndarray:
+        """Rows as packed bitsets (8 shifts per byte), e.g. for snapshots"""
+        self.refresh()
+        return np.packbits(self.matrix, axis=1)
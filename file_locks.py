@@ -0,0 +1,32 @@
+"""
+Portable exclusive file locks: fcntl.flock on POSIX, msvcrt.locking on Windows
+"""
+
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+RETRY_INTERVAL = 0.05  # seconds between attempts where the platform cannot block
+
+def lock_file(handle, blocking: bool = True) -> bool:
+    """Take an exclusive lock on an open file, held until the handle is closed.
+    Returns False when `blocking` is off and another process holds it."""
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    handle.seek(0)
+    while True:
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)  # the first byte stands for the file
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(RETRY_INTERVAL)
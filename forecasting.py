@@ -0,0 +1,235 @@
+"""
+Staffing demand forecasting per location, shift type and modality, and coverage-gap detection
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from data_models import AppData, Location, OpenShift
+from instrumentation import timed
+
+SHIFT_KEYS = ("weekday_day", "weekday_night", "weekend_day", "weekend_night")
+ALL_MODALITIES = "All"
+MIN_HISTORY_DAYS = 56       # below this the static staffing_requirements are used
+TREND_MIN_DAYS = 120        # shorter histories fit level + weekday pattern only
+SEASONAL_MIN_DAYS = 365     # annual seasonality needs a full year to be identifiable
+HEADCOUNT_TOLERANCE = 0.15  # 2.1 forecast slots round to 2, 2.2 round up to 3
+RIDGE = 1e-3
+
+SeriesKey = Tuple[str, str, str]  # (location, shift type, modality)
+
+def shift_type_key(label: str, day: Optional[date] = None) -> str:
+    """A Location.staffing_requirements key for a shift label, read the way
+    OpenShift.window() and the bid floors read it: "Night" anywhere makes a night
+    shift, and a "Weekend" label or a Saturday/Sunday date a weekend one.
+    'Weekend Night' -> 'weekend_night'; 'Night' on a Tuesday -> 'weekday_night'."""
+    label = label.lower()
+    weekend = "weekend" in label or (day is not None and day.weekday() >= 5)
+    return f"{'weekend' if weekend else 'weekday'}_{'night' if 'night' in label else 'day'}"
+
+def shift_keys_for(day: date) -> Tuple[str, str]:
+    prefix = "weekend" if day.weekday() >= 5 else "weekday"
+    return f"{prefix}_day", f"{prefix}_night"
+
+@dataclass
+class DemandHistory:
+    """Daily demand in radiologist shifts; one row per series, one column per day"""
+    start: date
+    keys: List[SeriesKey]
+    values: np.ndarray
+
+    @property
+    def days(self) -> int:
+        return self.values.shape[1]
+
+def _history(rows: Iterable[Tuple[SeriesKey, date, float]]) -> Optional[DemandHistory]:
+    rows = list(rows)
+    if not rows:
+        return None
+    start = min(day for _, day, _ in rows)
+    end = max(day for _, day, _ in rows)
+    keys = sorted({key for key, _, _ in rows})
+    row_of = {key: i for i, key in enumerate(keys)}
+    series = np.fromiter((row_of[key] for key, _, _ in rows), dtype=np.int64, count=len(rows))
+    offsets = np.fromiter(((day - start).days for _, day, _ in rows), dtype=np.int64, count=len(rows))
+    amounts = np.fromiter((amount for _, _, amount in rows), dtype=float, count=len(rows))
+    values = np.zeros((len(keys), (end - start).days + 1))
+    np.add.at(values, (series, offsets), amounts)
+    return DemandHistory(start, keys, values)
+
+@timed()
+def history_from_shifts(shifts: Iterable[OpenShift], until: Optional[date] = None) -> Optional[DemandHistory]:
+    """Each posted shift, filled or still open, stands in for one slot of demand at its
+    location and shift type; the schedule holds no record of demand nobody posted"""
+    return _history(
+        ((shift.location, shift_type_key(shift.shift, day), ALL_MODALITIES), day, 1.0)
+        for shift in shifts
+        for day in [datetime.strptime(shift.date, "%Y-%m-%d").date()]
+        if until is None or day < until
+    )
+
+@timed()
+def history_from_volumes(records: Iterable[Dict], studies_per_shift: Union[int, Dict[str, int]] = 60
+                         ) -> Optional[DemandHistory]:
+    """Study volumes (date, location, shift_type, modality, studies) converted to fractional
+    radiologist shifts, so modality series add up to a location's headcount"""
+    def capacity(modality):
+        return studies_per_shift.get(modality, 60) if isinstance(studies_per_shift, dict) else studies_per_shift
+    return _history(
+        ((record["location"], shift_type_key(record["shift_type"], day), record["modality"]),
+         day, float(record["studies"]) / capacity(record["modality"]))
+        for record in records
+        for day in [date.fromisoformat(str(record["date"])[:10])]
+    )
+
+def _design(start: date, offsets: np.ndarray, trend: bool, seasonal: bool) -> np.ndarray:
+    """Intercept, weekday dummies, optional linear trend and annual Fourier terms"""
+    weekday = (start.weekday() + offsets) % 7
+    columns = [np.ones(len(offsets))]
+    columns += [(weekday == d).astype(float) for d in range(1, 7)]
+    if trend:
+        columns.append(offsets / 365.0)
+    if seasonal:
+        day_of_year = np.array([(start + timedelta(days=int(o))).timetuple().tm_yday for o in offsets])
+        for harmonic in (1, 2):
+            angle = 2 * np.pi * harmonic * day_of_year / 365.25
+            columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+@dataclass
+class DemandModel:
+    start: date
+    keys: List[SeriesKey]
+    coefficients: np.ndarray  # features x series
+    trend: bool
+    seasonal: bool
+    history_days: int
+
+    @timed()
+    def predict(self, start: date, days: int) -> "DemandForecast":
+        offsets = np.arange((start - self.start).days, (start - self.start).days + days)
+        values = np.maximum(_design(self.start, offsets, self.trend, self.seasonal) @ self.coefficients, 0.0)
+        return DemandForecast(start, self.keys, values.T)
+
+@timed()
+def fit_demand(history: DemandHistory) -> DemandModel:
+    """One ridge least-squares solve fits every series at once"""
+    trend = history.days >= TREND_MIN_DAYS
+    seasonal = history.days >= SEASONAL_MIN_DAYS
+    X = _design(history.start, np.arange(history.days), trend, seasonal)
+    gram = X.T @ X + RIDGE * np.eye(X.shape[1])
+    coefficients = np.linalg.solve(gram, X.T @ history.values.T)
+    return DemandModel(history.start, history.keys, coefficients, trend, seasonal, history.days)
+
+@dataclass
+class DemandForecast:
+    start: date
+    keys: List[SeriesKey]
+    values: np.ndarray  # series x days, fractional radiologist shifts
+
+    def __post_init__(self):
+        slots: Dict[Tuple[str, str], List[int]] = {}
+        for row, (location, shift_type, _) in enumerate(self.keys):
+            slots.setdefault((location, shift_type), []).append(row)
+        self._rows = slots
+        self._headcount: Dict[Tuple[str, str], np.ndarray] = {}
+
+    @property
+    def days(self) -> int:
+        return self.values.shape[1]
+
+    def headcount(self, location: str, shift_type: str) -> Optional[np.ndarray]:
+        """Required radiologists per day, summed over modalities"""
+        key = (location, shift_type)
+        if key not in self._rows:
+            return None
+        if key not in self._headcount:
+            total = self.values[self._rows[key]].sum(axis=0)
+            self._headcount[key] = np.ceil(np.maximum(total - HEADCOUNT_TOLERANCE, 0)).astype(int)
+        return self._headcount[key]
+
+    def required(self, location: str, shift_type: str, day: date) -> Optional[int]:
+        offset = (day - self.start).days
+        counts = self.headcount(location, shift_type)
+        if counts is None or not 0 <= offset < self.days:
+            return None
+        return int(counts[offset])
+
+    def monthly_slots(self) -> List[Dict]:
+        """Projected shift slots per location and month"""
+        totals = Counter()
+        months = [(self.start + timedelta(days=i)).strftime("%Y-%m") for i in range(self.days)]
+        for location, shift_type in self._rows:
+            for month, count in zip(months, self.headcount(location, shift_type)):
+                totals[(location, month)] += int(count)
+        return [{"location": location, "month": month, "slots": slots}
+                for (location, month), slots in sorted(totals.items())]
+
+@timed()
+def forecast_demand(app_data: AppData, start: Optional[date] = None, days: int = 90,
+                    history: Optional[DemandHistory] = None) -> Optional[DemandForecast]:
+    """Fit on history before `start` and project `days` ahead; None if history is too short"""
+    if history is None:
+        history = history_from_shifts(app_data.open_shifts, until=start)
+    if history is None or history.days < MIN_HISTORY_DAYS:
+        return None
+    if start is None:
+        start = history.start + timedelta(days=history.days)
+    return fit_demand(history).predict(start, days)
+
+def staffing_requirement(location: Location, shift_type: str, day: date,
+                         forecast: Optional[DemandForecast] = None) -> int:
+    """Forecast headcount when available, otherwise the location's fixed requirement"""
+    if forecast is not None:
+        required = forecast.required(location.name, shift_type, day)
+        if required is not None:
+            return required
+    return location.staffing_requirements.get(shift_type, 0)
+
+@dataclass
+class CoverageGap:
+    date: str
+    location: str
+    shift_type: str
+    required: int
+    scheduled: int
+    open_shifts: int
+
+    @property
+    def shortfall(self) -> int:
+        return self.required - self.scheduled
+
+@timed()
+def detect_coverage_gaps(app_data: AppData, start: date, days: int = 7,
+                         forecast: Optional[DemandForecast] = None,
+                         locations: Optional[List[str]] = None) -> List[CoverageGap]:
+    """Slots where assigned radiologists fall short of the (forecast) requirement"""
+    end = start + timedelta(days=days)
+    scheduled, posted = Counter(), Counter()
+    for shift in app_data.open_shifts:
+        if not start.isoformat() <= shift.date < end.isoformat():
+            continue
+        key = (shift.date, shift.location, shift_type_key(shift.shift, date.fromisoformat(shift.date)))
+        if shift.assigned_to:
+            scheduled[key] += 1
+        else:
+            posted[key] += 1
+
+    gaps = []
+    wanted = set(locations) if locations else None
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for location in app_data.locations:
+            if wanted is not None and location.name not in wanted:
+                continue
+            for shift_type in shift_keys_for(day):
+                required = staffing_requirement(location, shift_type, day, forecast)
+                key = (day.isoformat(), location.name, shift_type)
+                if scheduled[key] < required:
+                    gaps.append(CoverageGap(day.isoformat(), location.name, shift_type, required,
+                                            scheduled[key], posted[key]))
+    return gaps
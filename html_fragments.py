@@ -0,0 +1,93 @@
+"""
+Memoized HTML fragment rendering for RadFlow Pro Streamlit application
+"""
+
+from functools import lru_cache
+from html import escape
+from typing import Iterable
+
+# Templates are compiled once at import; only escaped values are interpolated
+STATUS_BADGE = '<span class="status-badge {css_class}">{label}</span>'
+MODE_CARD = '<div class="{css_class}">{icon} {mode}<br>💰 {base_pay}</div>'
+SHIFT_ROW = (
+    '<div class="shift-row">'
+    '<div><strong>{date} - {shift}</strong><br>📍 {location} ({duration})</div>'
+    '<div>{mode_card}</div>'
+    '<div>{status_badge}</div>'
+    '</div>'
+)
+MESSAGE_BUBBLE = (
+    '<div class="bubble-wrap bubble-{direction}">'
+    '<div class="bubble">{sender}{body}</div>'
+    '<div class="bubble-time">{time}</div>'
+    '</div>'
+)
+
+CACHE_SIZE = 4096
+
+def text(value):
+    """Escape a value for HTML; "$" is escaped too so st.markdown never reads it as LaTeX"""
+    return escape(str(value)).replace("$", "&#36;")
+
+def status_css_class(status):
+    """Map a shift status to its badge CSS class"""
+    if "Open" in status:
+        return "status-open"
+    if "Bidding" in status:
+        return "status-active"
+    return "status-filled"
+
+@lru_cache(maxsize=CACHE_SIZE)
+def status_badge(status):
+    """Render a status badge, memoized on status"""
+    return STATUS_BADGE.format(css_class=status_css_class(status), label=text(status))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def mode_card(mode, base_pay):
+    """Render the assignment mode card, memoized on mode and pay"""
+    is_smart = "Smart" in mode
+    return MODE_CARD.format(
+        css_class="smart-card" if is_smart else "bidding-card",
+        icon="🤖" if is_smart else "🏷️",
+        mode=text(mode),
+        base_pay=text(base_pay)
+    )
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _shift_row(date, shift, location, duration, mode, base_pay, status):
+    return SHIFT_ROW.format(
+        date=text(date),
+        shift=text(shift),
+        location=text(location),
+        duration=text(duration),
+        mode_card=mode_card(mode, base_pay),
+        status_badge=status_badge(status)
+    )
+
+def shift_row(row):
+    """Render one open shift display row (see utils.shift_display_row)"""
+    return _shift_row(row["Date"], row["Shift"], row["Location"], row["Duration"],
+                      row["Mode"], row["Base Pay"], row["Status"])
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _message_bubble(message_id, sender, sent_at, body, outgoing):
+    return MESSAGE_BUBBLE.format(
+        direction="sent" if outgoing else "received",
+        sender="" if outgoing else f"<strong>{text(sender)}</strong><br>",
+        body=text(body).replace("\n", "<br>"),
+        time=text(sent_at)
+    )
+
+def message_bubble(message):
+    """Render a message bubble, memoized on message id"""
+    return _message_bubble(message.id, message.sender, message.time, message.body,
+                           message.direction == "sent")
+
+def render_section(fragments: Iterable[str]):
+    """Join fragments into a single HTML payload for one st.markdown call"""
+    return "".join(fragments)
+
+def clear_caches():
+    """Drop all memoized fragments"""
+    for cached in (status_badge, mode_card, _shift_row, _message_bubble):
+        cached.cache_clear()
@@ -0,0 +1,180 @@
+"""
+Hot-path timing hooks, percentile metrics and Prometheus export for RadFlow Pro
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+SAMPLE_WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+class _Metric:
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+class _Registry:
+    def __init__(self):
+        self.enabled = os.environ.get("RADFLOW_METRICS", "").lower() in ("1", "true", "yes")
+        self.metrics: Dict[str, _Metric] = {}
+        self.lock = threading.Lock()
+
+_registry = _Registry()
+
+def enable():
+    _registry.enabled = True
+
+def disable():
+    _registry.enabled = False
+
+def is_enabled() -> bool:
+    return _registry.enabled
+
+def reset():
+    with _registry.lock:
+        _registry.metrics.clear()
+
+def record(name: str, seconds: float) -> None:
+    """Add one duration sample for an operation"""
+    with _registry.lock:
+        metric = _registry.metrics.get(name)
+        if metric is None:
+            metric = _registry.metrics[name] = _Metric()
+        metric.samples.append(seconds)
+        metric.count += 1
+        metric.total += seconds
+
+def timed(name: Optional[str] = None):
+    """Decorator timing every call while metrics are enabled; a single flag check otherwise"""
+    def decorator(func):
+        metric_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(metric_name, time.perf_counter() - start)
+        for attr in ("cache_info", "cache_clear", "cache_parameters"):  # keep lru_cache controls reachable
+            if hasattr(func, attr):
+                setattr(wrapper, attr, getattr(func, attr))
+        return wrapper
+    return decorator
+
+@contextmanager
+def span(name: str):
+    """Time a block of code"""
+    if not _registry.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def start(name: str):
+    """Begin timing a region that cannot be wrapped in a with-block; pass the token to stop()"""
+    return (name, time.perf_counter()) if _registry.enabled else None
+
+def stop(token) -> None:
+    if token is not None:
+        record(token[0], time.perf_counter() - token[1])
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def snapshot() -> List[Dict]:
+    """Per-operation call counts and p50/p95/p99 (over the recent sample window), in ms"""
+    with _registry.lock:
+        items = [(name, sorted(m.samples), m.count, m.total) for name, m in _registry.metrics.items()]
+    rows = []
+    for name, ordered, count, total in sorted(items):
+        if not ordered:
+            continue
+        rows.append({
+            "operation": name,
+            "calls": count,
+            "total_ms": total * 1000,
+            "p50_ms": _quantile(ordered, 0.5) * 1000,
+            "p95_ms": _quantile(ordered, 0.95) * 1000,
+            "p99_ms": _quantile(ordered, 0.99) * 1000,
+            "max_ms": ordered[-1] * 1000
+        })
+    return rows
+
+def prometheus_text() -> str:
+    """Metrics in the Prometheus text exposition format"""
+    lines = [
+        "# HELP radflow_operation_duration_seconds Duration of instrumented RadFlow operations.",
+        "# TYPE radflow_operation_duration_seconds summary"
+    ]
+    with _registry.lock:
+        items = [(name, sorted(m.samples), m.count, m.total) for name, m in _registry.metrics.items()]
+    for name, ordered, count, total in sorted(items):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for q in QUANTILES:
+            value = _quantile(ordered, q) if ordered else float("nan")
+            lines.append(f'radflow_operation_duration_seconds{{operation="{label}",quantile="{q}"}} {value:.9f}')
+        lines.append(f'radflow_operation_duration_seconds_sum{{operation="{label}"}} {total:.9f}')
+        lines.append(f'radflow_operation_duration_seconds_count{{operation="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_metrics_server = None
+_metrics_lock = threading.Lock()  # concurrent sessions run the script on separate threads
+
+def serve_metrics(port: int, host: str = "127.0.0.1"):
+    """Expose /metrics for scraping from a daemon thread (idempotent per process)"""
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True, name="radflow-metrics").start()
+        return _metrics_server
+
+class RerunProfiler:
+    """Opt-in cProfile capture of a single script run"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def report(self, limit: int = 40, sort: str = "cumulative") -> str:
+        buffer = io.StringIO()
+        pstats.Stats(self.profile, stream=buffer).strip_dirs().sort_stats(sort).print_stats(limit)
+        return buffer.getvalue()
@@ -5,8 +5,25 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
-from data_models import AppData
-from utils import format_currency, calculate_time_remaining, get_status_color
+import os
+import time
+import instrumentation
+import cost_simulator
+import audit_log
+from attachments import AttachmentRejected
+from bidding import bidding_window
+from credential_alerts import DUE_SOON_DAYS
+from forecasting import detect_coverage_gaps, forecast_demand, shift_keys_for, staffing_requirement
+from data_models import AppData, Message
+from departments import DepartmentStore
+from session_overlay import CommitConflict, SessionOverlay
+from settings_store import SettingsStore, SettingsValidationError, commit_and_persist
+from shared_state import SharedState
+from data_import import ENTITIES, import_file
+from schedule_export import calendar_timezone, iter_csv, iter_ics, slugify
+from utils import (format_currency, format_date, calculate_time_remaining, get_status_color, shift_display_row,
+                   generate_schedule_grid)
+import html_fragments
 
 # Set page config
 st.set_page_config(
@@ -65,594 +82,1085 @@ st.markdown("""
         border-radius: 0.75rem;
         border: 2px solid #0ea5e9;
     }
+    .shift-row {
+        display: grid;
+        grid-template-columns: 2fr 2fr 1fr;
+        gap: 1rem;
+        align-items: center;
+        padding: 0.75rem 0;
+        border-bottom: 1px solid #e5e7eb;
+    }
+    .bubble-wrap { margin: 10px 0; }
+    .bubble-sent { text-align: right; }
+    .bubble-received { text-align: left; }
+    .bubble {
+        padding: 10px;
+        border-radius: 10px;
+        display: inline-block;
+        max-width: 70%;
+        text-align: left;
+    }
+    .bubble-sent .bubble { background-color: #0ea5e9; color: white; }
+    .bubble-received .bubble { background-color: #f3f4f6; }
+    .bubble-time { font-size: 0.8em; color: #666; margin-top: 5px; }
 </style>
 """, unsafe_allow_html=True)
 
+CURRENT_USER = "Dr. Sarah Chen"
+audit_log.set_actor(CURRENT_USER)  # writes made during this rerun are attributed to the signed-in user
+
 # Initialize session state
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'Dashboard'
 
-# Initialize data
-app_data = AppData()
-
-# Sidebar Navigation
-with st.sidebar:
-    st.markdown("# 🏥 RadFlow Pro")
-    st.markdown("### Radiology Workflow Management")
-
-    # User profile
-    st.markdown("---")
-    col1, col2 = st.columns([1, 2])
-    with col1:
-        st.markdown("👨‍⚕️")
-    with col2:
-        st.markdown("**Dr. Sarah Chen**")
-        st.markdown("*Neuroradiology*")
-        st.markdown("🟢 Online")
-    st.markdown("---")
+# Opt-in diagnostics: Prometheus scrape endpoint and single-rerun cProfile capture
+if os.environ.get("RADFLOW_METRICS_PORT"):
+    instrumentation.serve_metrics(int(os.environ["RADFLOW_METRICS_PORT"]))
+
+rerun_profiler = None
+if st.session_state.pop("profile_next_rerun", False):
+    rerun_profiler = instrumentation.RerunProfiler()
+    rerun_profiler.start()
+page_run = {"timer": None, "profile_slot": None}  # filled in by render_page() for the finally below
+
+def render_page():
+    # Initialize data once per server process so imported data survives reruns
+    @st.cache_resource
+    def load_settings_store():
+        return SettingsStore()
+
+    @st.cache_resource
+    def load_department_store():
+        store = DepartmentStore.with_sample_data()
+        if os.environ.get("RADFLOW_SHARED_DB"):
+            # Several worker processes: the SQLite copy is authoritative once seeded
+            SharedState(os.environ["RADFLOW_SHARED_DB"]).attach(store)
+        load_settings_store().apply_to(store)
+        audit_log.AuditLog(os.environ.get("RADFLOW_AUDIT_DIR", audit_log.DEFAULT_DIRECTORY)).watch_store(store)
+        return store
+
+    @st.cache_data(show_spinner="Simulating assignment policies...", max_entries=16)
+    def simulate_policy_costs(department, version, scenarios):
+        """Cached per department data version; the simulator fans out over a process pool"""
+        return cost_simulator.compare_policies(department_store.shard(department), scenarios=scenarios)
+
+    @st.cache_data(show_spinner=False, max_entries=16)
+    def forecast_staffing_demand(department, version, start):
+        """Demand model refit per department data version, projecting 90 days from `start`"""
+        return forecast_demand(department_store.shard(department), start=datetime.strptime(start, "%Y-%m-%d").date())
+
+    def publish_credential_alerts(department, shard):
+        """Credential thresholds crossed since this user last looked get a toast; the
+        department feed gets each one once, whichever session polls first"""
+        today = datetime.now().date()
+        index = shard.credential_index()
+        for alert in index.poll(today):
+            department_store.activity.publish(department, "credential", alert.deadline.describe(today),
+                                              users=(alert.deadline.radiologist,))
+        for alert in index.poll(today, user=CURRENT_USER):
+            st.toast(f"⚠️ {alert.deadline.describe(today)}")
+
+    settings_store = load_settings_store()
+    department_store = load_department_store()
+    if department_store.shared is not None:
+        department_store.shared.sync()  # pick up bids and edits committed by other workers
+
+    # Sidebar Navigation
+    with st.sidebar:
+        st.markdown("# 🏥 RadFlow Pro")
+        st.markdown("### Radiology Workflow Management")
+
+        # User profile
+        st.markdown("---")
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.markdown("👨‍⚕️")
+        with col2:
+            st.markdown(f"**{CURRENT_USER}**")
+            st.markdown("*Neuroradiology*")
+            st.markdown("🟢 Online")
+        st.markdown("---")
 
-    # Navigation menu
-    pages = [
-        "📊 Dashboard",
-        "📅 Call Schedule",
-        "🏷️ Bidding Dashboard", 
-        "🏥 Multi-Location Tracker",
-        "💬 Case Consultation",
-        "✉️ Secure Messaging",
-        "🎓 Credential Tracking",
-        "📈 Analytics & Reports",
-        "⚙️ Settings"
-    ]
-
-    for page in pages:
-        if st.button(page, key=page, use_container_width=True):
-            st.session_state.current_page = page.split(" ", 1)[1]
-
-# Main content area
-current_page = st.session_state.current_page
-
-if current_page == "Dashboard":
-    st.markdown('<h1 class="main-header">📊 Dashboard Overview</h1>', unsafe_allow_html=True)
-
-    # Key metrics
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">3</div>
-            <div class="metric-label">Upcoming Calls</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col2:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">2</div>
-            <div class="metric-label">Open Shifts</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col3:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">1</div>
-            <div class="metric-label">Active Bidding</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col4:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">1</div>
-            <div class="metric-label">Credentials Due</div>
-        </div>
-        """, unsafe_allow_html=True)
+        # Department shard
+        current_department = st.selectbox("🏢 Department", department_store.departments, key="department")
+        app_data = department_store.shard(current_department)
+
+        # This session's copy-on-write overlay for the selected department
+        session_overlays = st.session_state.setdefault("overlays", {})
+        if current_department not in session_overlays:
+            session_overlays[current_department] = SessionOverlay(department_store, current_department)
+        overlay = session_overlays[current_department]
+
+        # Navigation menu
+        pages = [
+            "📊 Dashboard",
+            "📅 Call Schedule",
+            "🏷️ Bidding Dashboard", 
+            "🏥 Multi-Location Tracker",
+            "💬 Case Consultation",
+            "✉️ Secure Messaging",
+            "🎓 Credential Tracking",
+            "📈 Analytics & Reports",
+            "⚙️ Settings"
+        ]
 
-    st.markdown("---")
+        # Hidden diagnostics page, reachable with ?diagnostics=1
+        if st.query_params.get("diagnostics") == "1":
+            pages.append("🩺 Diagnostics")
 
-    # Recent activity and quick actions
-    col1, col2 = st.columns([2, 1])
+        for page in pages:
+            if st.button(page, key=page, use_container_width=True):
+                st.session_state.current_page = page.split(" ", 1)[1]
 
-    with col1:
-        st.subheader("📋 Recent Activity")
-        activities = [
-            "🔄 Dr. Rodriguez bid $2850 on Weekend Night shift",
-            "✅ Weekend Day shift auto-assigned to Dr. Johnson",
-            "⚠️ Dr. Rodriguez credential expires in 90 days",
-            "💬 New consultation request: Vascular malformation case"
+        st.markdown("---")
+        search_query = st.text_input("🔎 Search", key="search_query",
+                                     placeholder='consults, messages, shifts — "exact phrase", pref*')
+
+    # Main content area
+    current_page = st.session_state.current_page
+    page_run["timer"] = instrumentation.start(f"page.{current_page}")
+
+    if search_query.strip():
+        with st.expander(f"🔎 Results for {search_query}", expanded=True):
+            col_kind, col_spec, col_urg, col_dates = st.columns(4)
+            kind_labels = {"Consultations": "consultations", "Messages": "messages", "Shifts": "open_shifts"}
+            kinds = col_kind.multiselect("In", list(kind_labels), key="search_kinds")
+            specialties = sorted({rad.subspecialty for rad in app_data.radiologists} | {"General"})
+            specialty = col_spec.selectbox("Specialty", ["Any"] + specialties, key="search_specialty")
+            urgency = col_urg.selectbox("Urgency / priority", ["Any", "Urgent", "High", "Medium", "Normal", "Low"],
+                                        key="search_urgency")
+            dates = col_dates.date_input("Date range", value=(), key="search_dates")
+            date_from, date_to = (dates[0], dates[-1]) if len(dates) else (None, None)
+            hits = app_data.search_index().search(
+                search_query, kinds=[kind_labels[k] for k in kinds] or None,
+                specialty=None if specialty == "Any" else specialty, urgency=None if urgency == "Any" else urgency,
+                date_from=date_from, date_to=date_to, limit=25)
+            for hit in hits:
+                record = hit.record
+                if hit.kind == "consultations":
+                    st.markdown(f"💬 **{record.case_id}** · {record.specialty_needed} · {record.urgency} · "
+                                f"{record.created[:10]} — {record.description}")
+                elif hit.kind == "messages":
+                    st.markdown(f"✉️ **{record.sender} → {record.recipient}** · {record.time} — {record.body}")
+                elif record is not None:
+                    st.markdown(f"📅 **{record.shift}** · {record.location} · {record.date} · {record.status}"
+                                f"{' · ' + record.assigned_to if record.assigned_to else ''}")
+            if not hits:
+                st.caption("No matches")
+
+    if current_page == "Dashboard":
+        st.markdown('<h1 class="main-header">📊 Dashboard Overview</h1>', unsafe_allow_html=True)
+
+        # Key metrics
+        col1, col2, col3, col4 = st.columns(4)
+
+        counts = app_data.dashboard_counters().counts(CURRENT_USER)
+        tiles = [
+            (col1, counts.upcoming_calls, "Upcoming Calls"),
+            (col2, counts.open_shifts, "Open Shifts"),
+            (col3, counts.active_bidding, "Active Bidding"),
+            (col4, counts.credentials_due, f"Credentials Due ({counts.own_credentials_due} yours)")
         ]
-        for activity in activities:
-            st.markdown(f"• {activity}")
-
-    with col2:
-        st.subheader("⚡ Quick Actions")
-        if st.button("🎯 Auto-Fill Open Shifts", use_container_width=True):
-            st.success("Smart distribution algorithm activated!")
-        if st.button("📨 Send Shift Reminders", use_container_width=True):
-            st.info("Reminder notifications sent to all radiologists")
-        if st.button("📊 Generate Weekly Report", use_container_width=True):
-            st.info("Weekly analytics report generated")
-
-elif current_page == "Call Schedule":
-    st.markdown('<h1 class="main-header">📅 Call Schedule Management</h1>', unsafe_allow_html=True)
-
-    # Mode selector
-    col1, col2, col3 = st.columns([1, 1, 1])
-    with col1:
-        assignment_mode = st.selectbox(
-            "🎯 Assignment Mode",
-            ["Smart Distribution (Recommended)", "Bidding Mode", "Hybrid (Smart First)"],
-            help="Choose how open shifts are filled"
-        )
-
-    with col2:
-        if st.button("🔄 Auto-Fill All Open Shifts"):
-            st.success("Smart distribution algorithm processing all open shifts...")
-
-    with col3:
-        if st.button("📊 View Assignment Analytics"):
-            st.session_state.current_page = "Analytics & Reports"
-            st.rerun()
-
-    st.markdown("---")
+        for col, value, label in tiles:
+            with col:
+                st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{value}</div>
+                <div class="metric-label">{label}</div>
+            </div>
+            """, unsafe_allow_html=True)
+        publish_credential_alerts(current_department, app_data)
 
-    # Open shifts
-    st.subheader("🎯 Open Shifts Management")
-
-    # Create sample shift data
-    shifts_data = [
-        {
-            "Date": "Sep 7, 2025",
-            "Shift": "Weekend Day",
-            "Location": "Main Hospital", 
-            "Duration": "12 hours",
-            "Base Pay": "$2,400",
-            "Mode": "Smart Distribution",
-            "Status": "Open",
-            "Action": "Auto-Assign"
-        },
-        {
-            "Date": "Sep 14, 2025", 
-            "Shift": "Weekend Night",
-            "Location": "Outpatient Center",
-            "Duration": "12 hours", 
-            "Base Pay": "$2,600",
-            "Mode": "Bidding Mode",
-            "Status": "Active Bidding - $2,850",
-            "Action": "View Bids"
-        },
-        {
-            "Date": "Sep 21, 2025",
-            "Shift": "Weekend Day", 
-            "Location": "Sports Medicine",
-            "Duration": "8 hours",
-            "Base Pay": "$1,800", 
-            "Mode": "Hybrid",
-            "Status": "Smart Failed → Bidding",
-            "Action": "Monitor"
-        }
-    ]
-
-    df_shifts = pd.DataFrame(shifts_data)
-
-    # Display with custom styling
-    for idx, shift in df_shifts.iterrows():
-        with st.container():
-            col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+        st.markdown("---")
 
-            with col1:
-                st.markdown(f"**{shift['Date']} - {shift['Shift']}**")
-                st.markdown(f"📍 {shift['Location']} ({shift['Duration']})")
+        # Recent activity and quick actions
+        col1, col2 = st.columns([2, 1])
+
+        with col1:
+            st.subheader("📋 Recent Activity")
+            only_mine = st.toggle("Only activity involving me", key="activity_mine")
+            cursor_key = f"activity_before_{current_department}_{only_mine}"
+            before = st.session_state.get(cursor_key)
+            activities = department_store.activity.page(current_department, user=CURRENT_USER if only_mine else None,
+                                                        before=before, limit=10)
+            for activity in activities:
+                st.markdown(f"• {activity.display} <span style='color:#9ca3af'>· {activity.time_label}</span>",
+                            unsafe_allow_html=True)
+            if not activities:
+                st.caption("No activity yet. Bids, assignments, consults and messages appear here as they happen.")
+            col_newer, col_older = st.columns(2)
+            if before is not None and col_newer.button("⬆️ Newest", key="activity_newest"):
+                st.session_state.pop(cursor_key)
+                st.rerun()
+            if len(activities) == 10 and col_older.button("⬇️ Older", key="activity_older"):
+                st.session_state[cursor_key] = activities[-1].seq
+                st.rerun()
+
+        with col2:
+            st.subheader("⚡ Quick Actions")
+            if st.button("🎯 Auto-Fill Open Shifts", use_container_width=True):
+                st.success("Smart distribution algorithm activated!")
+            if st.button("📨 Send Shift Reminders", use_container_width=True):
+                st.info("Reminder notifications sent to all radiologists")
+            if st.button("📊 Generate Weekly Report", use_container_width=True):
+                st.info("Weekly analytics report generated")
+
+    elif current_page == "Call Schedule":
+        st.markdown('<h1 class="main-header">📅 Call Schedule Management</h1>', unsafe_allow_html=True)
+
+        # Mode selector
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            assignment_mode = st.selectbox(
+                "🎯 Assignment Mode",
+                ["Smart Distribution (Recommended)", "Bidding Mode", "Hybrid (Smart First)"],
+                help="Choose how open shifts are filled"
+            )
+
+        with col2:
+            if st.button("🔄 Auto-Fill All Open Shifts"):
+                st.success("Smart distribution algorithm processing all open shifts...")
+
+        with col3:
+            if st.button("📊 View Assignment Analytics"):
+                st.session_state.current_page = "Analytics & Reports"
+                st.rerun()
 
-            with col2:
-                if "Smart" in shift['Mode']:
-                    st.markdown(f'<div class="smart-card">🤖 {shift["Mode"]}<br>💰 {shift["Base Pay"]}</div>', unsafe_allow_html=True)
-                else:
-                    st.markdown(f'<div class="bidding-card">🏷️ {shift["Mode"]}<br>💰 {shift["Base Pay"]}</div>', unsafe_allow_html=True)
-
-            with col3:
-                status_color = "status-open" if "Open" in shift['Status'] else "status-active" if "Bidding" in shift['Status'] else "status-filled"
-                st.markdown(f'<span class="status-badge {status_color}">{shift["Status"]}</span>', unsafe_allow_html=True)
+        st.markdown("---")
 
-            with col4:
-                if shift['Action'] == "Auto-Assign":
-                    if st.button("🎯 Assign", key=f"assign_{idx}"):
+        # Open shifts
+        st.subheader("🎯 Open Shifts Management")
+
+        # Server-side filters and sorting; only the visible window is rendered
+        render_start = time.perf_counter()
+        filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+        with filter_col1:
+            location_filter = st.multiselect("📍 Location", [loc.name for loc in app_data.locations])
+        with filter_col2:
+            mode_filter = st.multiselect("🎯 Mode", ["Smart Distribution", "Bidding Mode", "Hybrid"])
+        with filter_col3:
+            status_filter = st.multiselect("📌 Status", ["Open", "Bidding", "Filled"])
+        with filter_col4:
+            date_range = st.date_input("📅 Date Range", value=(), help="Leave empty to show all dates")
+
+        sort_options = {"Date": "date", "Location": "location", "Mode": "assignment_mode", "Status": "status"}
+        sort_col1, sort_col2, sort_col3 = st.columns([2, 1, 1])
+        with sort_col1:
+            sort_label = st.selectbox("↕️ Sort By", list(sort_options))
+        with sort_col2:
+            sort_descending = st.checkbox("Descending")
+        with sort_col3:
+            page_size = st.selectbox("Rows per Page", [10, 25, 50, 100], index=1)
+
+        date_from = date_range[0].isoformat() if len(date_range) > 0 else None
+        date_to = date_range[1].isoformat() if len(date_range) > 1 else date_from
+
+        def shift_page(number: int):
+            return app_data.query_open_shifts(
+                date_from=date_from, date_to=date_to, locations=location_filter,
+                modes=mode_filter, statuses=status_filter, sort_by=sort_options[sort_label],
+                descending=sort_descending, offset=(number - 1) * page_size, limit=page_size
+            )
+
+        # One query gives both the window and the total; the page widget is drawn after it
+        page_number = st.session_state.get("open_shifts_page", 1)
+        page_shifts, total_shifts = shift_page(page_number)
+        page_count = max(1, -(-total_shifts // page_size))
+        if page_number > page_count:  # filters shrank the result past the current page
+            page_number = st.session_state["open_shifts_page"] = page_count
+            page_shifts, total_shifts = shift_page(page_number)
+        st.number_input("Page", min_value=1, max_value=page_count, step=1, key="open_shifts_page")
+
+        # One HTML payload for the whole visible window
+        shift_rows = [shift_display_row(shift) for shift in page_shifts]
+        st.markdown(html_fragments.render_section(html_fragments.shift_row(row) for row in shift_rows),
+                    unsafe_allow_html=True)
+
+        # Single action bar for the window instead of one button per row
+        if page_shifts:
+            action_col1, action_col2 = st.columns([3, 1])
+            with action_col1:
+                selected_index = st.selectbox(
+                    "Selected Shift", range(len(page_shifts)),
+                    format_func=lambda i: f"{shift_rows[i]['Date']} - {shift_rows[i]['Shift']} @ {shift_rows[i]['Location']}"
+                )
+            selected_row = shift_rows[selected_index]
+            with action_col2:
+                if selected_row['Action'] == "Auto-Assign":
+                    if st.button("🎯 Assign", use_container_width=True):
                         st.success("Shift auto-assigned using smart distribution!")
-                elif shift['Action'] == "View Bids":
-                    if st.button("👀 View", key=f"view_{idx}"):
+                elif selected_row['Action'] == "View Bids":
+                    if st.button("👀 View", use_container_width=True):
                         st.session_state.current_page = "Bidding Dashboard"
                         st.rerun()
                 else:
-                    st.button("📊 Monitor", key=f"monitor_{idx}")
-
-            st.markdown("---")
-
-elif current_page == "Bidding Dashboard":
-    st.markdown('<h1 class="main-header">🏷️ Active Bidding Dashboard</h1>', unsafe_allow_html=True)
-
-    # Active bidding shift
-    st.subheader("🔥 Currently Active Bidding")
-
-    with st.container():
-        st.markdown("""
-        <div class="bidding-card">
-            <h3>🌙 Weekend Night Shift - September 14, 2025</h3>
-            <p><strong>📍 Location:</strong> Outpatient Center</p>
-            <p><strong>⏰ Duration:</strong> 12 hours (7 PM - 7 AM)</p>
-            <p><strong>🩺 Specialty:</strong> General Radiology</p>
-            <p><strong>💰 Base Rate:</strong> $2,600</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    # Bidding interface
-    col1, col2 = st.columns([1, 1])
-
-    with col1:
-        st.markdown("### 🏆 Current High Bid")
-        st.markdown("**$2,850** by Dr. Michael Rodriguez")
-        st.progress(0.7)
-        st.markdown("⏰ **18 hours remaining**")
-
-        # Bid history
-        st.markdown("### 📜 Bid History")
-        bid_history = [
-            {"Time": "4:30 PM", "Radiologist": "Dr. James Park", "Amount": "$2,700"},
-            {"Time": "4:15 PM", "Radiologist": "Dr. Michael Rodriguez", "Amount": "$2,850"},
-        ]
-
-        for bid in bid_history:
-            st.markdown(f"• **{bid['Time']}** - {bid['Radiologist']}: **{bid['Amount']}**")
-
-    with col2:
-        st.markdown("### 🎯 Place Your Bid")
-
-        current_bid = 2850
-        min_bid = current_bid + 50
+                    st.button("📊 Monitor", use_container_width=True)
 
-        # Quick bid buttons
-        st.markdown("**Quick Bid Options:**")
-        col_a, col_b, col_c = st.columns(3)
-        with col_a:
-            if st.button(f"${min_bid}", use_container_width=True):
-                st.success(f"Bid placed: ${min_bid}")
-        with col_b:
-            if st.button(f"${min_bid + 100}", use_container_width=True):
-                st.success(f"Bid placed: ${min_bid + 100}")
-        with col_c:
-            if st.button(f"${min_bid + 200}", use_container_width=True):
-                st.success(f"Bid placed: ${min_bid + 200}")
+        render_ms = (time.perf_counter() - render_start) * 1000
+        st.caption(f"Showing {len(page_shifts)} of {total_shifts} shifts · page {page_number}/{page_count} · rendered in {render_ms:.1f} ms")
 
-        # Custom bid amount
-        st.markdown("**Custom Bid Amount:**")
-        custom_bid = st.number_input("Enter bid amount", min_value=min_bid, max_value=4000, step=50, value=min_bid)
-
-        if st.button("🚀 Place Custom Bid", use_container_width=True):
-            st.success(f"Bid placed: ${custom_bid}")
-
-        # Auto-bid settings
-        st.markdown("---")
-        st.markdown("**🤖 Auto-Bid Settings:**")
-        auto_bid_max = st.number_input("Maximum auto-bid amount", min_value=min_bid, max_value=4000, step=50, value=3000)
-        auto_bid_enabled = st.checkbox("Enable auto-bidding for this shift")
-
-        if auto_bid_enabled:
-            st.info(f"Auto-bid active up to ${auto_bid_max}")
-
-elif current_page == "Multi-Location Tracker":
-    st.markdown('<h1 class="main-header">🏥 Multi-Location Schedule Tracker</h1>', unsafe_allow_html=True)
-
-    # Location selector
-    locations = ["All Locations", "Main Hospital", "Outpatient Center", "Sports Medicine Center", "Pulmonary Center"]
-    selected_location = st.selectbox("📍 Select Location", locations)
-
-    # Coverage overview
-    st.subheader("📊 Coverage Overview")
-
-    coverage_data = [
-        {"Location": "Main Hospital", "Day_Coverage": "✅ Full", "Night_Coverage": "✅ Full", "Weekend": "⚠️ 1 Gap", "Staff_Count": 4},
-        {"Location": "Outpatient Center", "Day_Coverage": "✅ Full", "Night_Coverage": "➖ N/A", "Weekend": "🔴 Open", "Staff_Count": 2},
-        {"Location": "Sports Medicine", "Day_Coverage": "✅ Full", "Night_Coverage": "➖ N/A", "Weekend": "🔴 Open", "Staff_Count": 1},
-        {"Location": "Pulmonary Center", "Day_Coverage": "✅ Full", "Night_Coverage": "➖ N/A", "Weekend": "✅ Full", "Staff_Count": 1}
-    ]
-
-    df_coverage = pd.DataFrame(coverage_data)
-    st.dataframe(df_coverage, use_container_width=True)
-
-    # Schedule grid
-    st.subheader("📅 Weekly Schedule Grid")
-
-    # Sample schedule data
-    schedule_data = {
-        "Shift": ["Monday Day", "Monday Night", "Tuesday Day", "Tuesday Night", "Wednesday Day", "Wednesday Night"],
-        "Main Hospital": ["Dr. Chen", "Dr. Park", "Dr. Rodriguez", "Dr. Johnson", "Dr. Chen", "Dr. Park"],
-        "Outpatient Center": ["Dr. Johnson", "—", "Dr. Chen", "—", "Dr. Rodriguez", "—"],
-        "Sports Medicine": ["Dr. Rodriguez", "—", "Dr. Park", "—", "Dr. Rodriguez", "—"],
-        "Pulmonary Center": ["Dr. Johnson", "—", "Dr. Johnson", "—", "Dr. Johnson", "—"]
-    }
-
-    df_schedule = pd.DataFrame(schedule_data)
-    st.dataframe(df_schedule, use_container_width=True)
-
-    # Quick actions
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        if st.button("🔄 Sync All Locations"):
-            st.success("All location schedules synchronized!")
-    with col2:
-        if st.button("⚠️ Identify Coverage Gaps"):
-            st.warning("2 coverage gaps identified across locations")
-    with col3:
-        if st.button("📱 Send Mobile Updates"):
-            st.info("Mobile notifications sent to all radiologists")
-
-elif current_page == "Analytics & Reports":
-    st.markdown('<h1 class="main-header">📈 Analytics & Performance Reports</h1>', unsafe_allow_html=True)
-
-    # Mode comparison
-    st.subheader("🔄 Assignment Mode Comparison")
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        # Cost comparison chart
-        modes = ['Smart Distribution', 'Bidding Mode']
-        costs = [2450, 2780]
-        fig_cost = px.bar(x=modes, y=costs, title="Average Cost per Shift", 
-                         color=modes, color_discrete_map={'Smart Distribution': '#0ea5e9', 'Bidding Mode': '#fb923c'})
-        fig_cost.update_layout(showlegend=False)
-        st.plotly_chart(fig_cost, use_container_width=True)
-
-    with col2:
-        # Time to fill comparison
-        times = [2.3, 18.5]
-        fig_time = px.bar(x=modes, y=times, title="Average Time to Fill (Hours)",
-                         color=modes, color_discrete_map={'Smart Distribution': '#0ea5e9', 'Bidding Mode': '#fb923c'})
-        fig_time.update_layout(showlegend=False)
-        st.plotly_chart(fig_time, use_container_width=True)
-
-    # Workload distribution
-    st.subheader("⚖️ Workload Distribution")
-
-    radiologists = ['Dr. Chen', 'Dr. Rodriguez', 'Dr. Johnson', 'Dr. Park']
-    calls_current = [4, 6, 3, 5]
-    calls_target = [6, 6, 6, 6]
-
-    fig_workload = go.Figure()
-    fig_workload.add_trace(go.Bar(name='Current Month', x=radiologists, y=calls_current, marker_color='#0ea5e9'))
-    fig_workload.add_trace(go.Bar(name='Target', x=radiologists, y=calls_target, marker_color='#fb923c'))
-    fig_workload.update_layout(title='Calls This Month vs Target', barmode='group')
-    st.plotly_chart(fig_workload, use_container_width=True)
-
-    # Financial impact
-    st.subheader("💰 Monthly Financial Impact")
-
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Smart Distribution", "$58,800", "↓ $8,640")
-    with col2:
-        st.metric("Bidding Mode", "$22,240", "↑ $2,240") 
-    with col3:
-        st.metric("Total Savings", "$8,640", "14.2%")
-
-elif current_page == "Case Consultation":
-    st.markdown('<h1 class="main-header">💬 Case Consultation Hub</h1>', unsafe_allow_html=True)
-
-    # Active consultations
-    st.subheader("🔥 Active Consultation Requests")
-
-    consultations = [
-        {
-            "Case ID": "RAD-2025-001",
-            "Requesting": "Dr. Sarah Chen",
-            "Specialty": "Interventional",
-            "Urgency": "🔴 High",
-            "Description": "Complex vascular malformation requiring intervention planning",
-            "Status": "Awaiting Response"
-        },
-        {
-            "Case ID": "RAD-2025-002", 
-            "Requesting": "Dr. Emily Johnson",
-            "Specialty": "Neuroradiology",
-            "Urgency": "🟡 Medium",
-            "Description": "Unusual white matter lesion pattern in young patient",
-            "Status": "Under Review"
-        }
-    ]
-
-    for consultation in consultations:
-        with st.expander(f"{consultation['Case ID']} - {consultation['Specialty']} ({consultation['Urgency']})"):
-            col1, col2 = st.columns([2, 1])
+        # Coverage requests and swaps
+        with st.expander("🔁 Coverage & Swap Requests"):
+            swap_market = department_store.swaps
+            assigned_shifts = app_data.get_assigned_shifts()
+            if not assigned_shifts:
+                st.info("No assigned shifts to swap.")
+            else:
+                swap_col1, swap_col2 = st.columns([2, 1])
+                with swap_col1:
+                    swap_shift = st.selectbox(
+                        "Shift needing cover", assigned_shifts,
+                        format_func=lambda s: f"{format_date(s.date)} - {s.shift} @ {s.location} ({s.assigned_to})"
+                    )
+                with swap_col2:
+                    candidate_filter = st.text_input("Find colleague", placeholder="Type a name...")
+                swap_candidates = swap_market.candidates(current_department, swap_shift.id, candidate_filter)
+                if swap_candidates:
+                    st.dataframe(pd.DataFrame([{
+                        "Colleague": c.name, "Score": c.score, "Calls (30d)": c.calls_last_30_days,
+                        "Weekend Calls": f"{c.weekend_calls}/{c.weekend_cap}",
+                        "Preferred Site": "⭐" if c.preferred_location else ""
+                    } for c in swap_candidates]), use_container_width=True, hide_index=True)
+                else:
+                    st.warning("No eligible colleagues for this shift.")
+                swap_note = st.text_input("Note", placeholder="Can you cover my weekend shift?")
+                pick_col1, pick_col2 = st.columns(2)
+                with pick_col1:
+                    if st.button("📣 Post Coverage Request", use_container_width=True):
+                        try:
+                            swap_market.post(current_department, swap_shift.id, swap_shift.assigned_to, swap_note)
+                            st.success("Coverage request posted")
+                        except ValueError as exc:
+                            st.error(str(exc))
+                with pick_col2:
+                    if swap_candidates and st.button(f"🤝 Ask {swap_candidates[0].name}", use_container_width=True):
+                        try:
+                            open_request = next((r for r in swap_market.open_requests(current_department)
+                                                 if r.shift_id == swap_shift.id), None)
+                            if open_request is None:
+                                open_request = swap_market.post(current_department, swap_shift.id,
+                                                                swap_shift.assigned_to, swap_note)
+                            swap_market.offer(current_department, open_request.id, swap_candidates[0].name)
+                            st.success(f"Waiting for approval: {swap_candidates[0].name}")
+                        except ValueError as exc:
+                            st.error(str(exc))
+
+            open_swaps = swap_market.open_requests(current_department)
+            if open_swaps:
+                st.markdown("**Open requests**")
+            for swap_request in open_swaps:
+                swap_target = app_data.get_shift_by_id(swap_request.shift_id)
+                req_col1, req_col2, req_col3 = st.columns([3, 1, 1])
+                with req_col1:
+                    st.markdown(f"#{swap_request.id} {swap_request.requester}: {swap_target.shift} {format_date(swap_target.date)} "
+                                f"@ {swap_target.location} · {swap_request.status}"
+                                + (f" → {swap_request.candidate}" if swap_request.candidate else ""))
+                with req_col2:
+                    if swap_request.candidate and st.button("✅ Approve", key=f"approve_swap_{swap_request.id}"):
+                        try:
+                            swap_market.approve(current_department, swap_request.id)
+                            st.success(f"Shift reassigned to {swap_request.candidate}")
+                        except ValueError as exc:
+                            st.error(str(exc))
+                with req_col3:
+                    if st.button("✖️ Cancel", key=f"cancel_swap_{swap_request.id}"):
+                        swap_market.cancel(current_department, swap_request.id)
+
+        # Calendar export
+        with st.expander("📆 Export Calendar"):
+            assigned_shifts = app_data.get_assigned_shifts()
+            calendar_tz = calendar_timezone(app_data)
+            export_col1, export_col2 = st.columns(2)
+            with export_col1:
+                export_radiologist = st.selectbox("Radiologist", [rad.name for rad in app_data.radiologists])
+                radiologist_shifts = [s for s in assigned_shifts if s.assigned_to == export_radiologist]
+                st.download_button("📥 Download .ics",
+                                   "".join(iter_ics(radiologist_shifts, export_radiologist, tz_name=calendar_tz)),
+                                   file_name=f"{slugify(export_radiologist)}.ics", mime="text/calendar",
+                                   use_container_width=True)
+            with export_col2:
+                export_location = st.selectbox("Location", [loc.name for loc in app_data.locations])
+                location_shifts = [s for s in assigned_shifts if s.location == export_location]
+                st.download_button("📥 Download .ics",
+                                   "".join(iter_ics(location_shifts, export_location, tz_name=calendar_tz)),
+                                   file_name=f"{slugify(export_location)}.ics", mime="text/calendar",
+                                   use_container_width=True, key="location_ics")
+            st.download_button("📥 Download CSV Snapshot", "".join(iter_csv(assigned_shifts, calendar_tz)),
+                               file_name="schedule.csv", mime="text/csv", use_container_width=True)
+
+    elif current_page == "Bidding Dashboard":
+        st.markdown('<h1 class="main-header">🏷️ Active Bidding Dashboard</h1>', unsafe_allow_html=True)
+
+        # Active bidding shift
+        st.subheader("🔥 Currently Active Bidding")
+
+        bidding_shifts = app_data.get_active_bidding_shifts()
+        if not bidding_shifts:
+            st.info("No shifts are open for bidding right now.")
+        else:
+            bid_shift = st.selectbox(
+                "Shift", bidding_shifts,
+                format_func=lambda s: f"{s.shift} - {format_date(s.date)} @ {s.location}"
+            ) if len(bidding_shifts) > 1 else bidding_shifts[0]
+            bid_start, bid_end = bid_shift.window()
+            bid_text = html_fragments.text
+
+            with st.container():
+                st.markdown(f"""
+            <div class="bidding-card">
+                <h3>{'🌙' if 'Night' in bid_shift.shift else '☀️'} {bid_text(bid_shift.shift)} Shift - {bid_text(format_date(bid_shift.date))}</h3>
+                <p><strong>📍 Location:</strong> {bid_text(bid_shift.location)}</p>
+                <p><strong>⏰ Duration:</strong> {bid_text(bid_shift.duration)} ({bid_start.strftime('%I %p').lstrip('0')} - {bid_end.strftime('%I %p').lstrip('0')})</p>
+                <p><strong>🩺 Specialty:</strong> {bid_text(bid_shift.subspecialty_required)}</p>
+                <p><strong>💰 Base Rate:</strong> {bid_text(format_currency(bid_shift.base_compensation))}</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+            bidding_rules = app_data.department_settings["bidding_rules"]
+            bid_increment = bidding_rules["bid_increment"]
+            max_bid = bidding_rules["max_bid_limit"]
+
+            # Bidding interface
+            col1, col2 = st.columns([1, 1])
 
             with col1:
-                st.markdown(f"**Requesting Physician:** {consultation['Requesting']}")
-                st.markdown(f"**Description:** {consultation['Description']}")
-                st.markdown(f"**Status:** {consultation['Status']}")
+                st.markdown("### 🏆 Current High Bid")
+                if bid_shift.current_high_bid:
+                    st.markdown(f"**{format_currency(bid_shift.current_high_bid)}** by {bid_shift.current_high_bidder}")
+                else:
+                    st.markdown("No bids yet")
+                window = bidding_window(app_data, bid_shift)
+                if window is None:
+                    st.progress(0.0)
+                    st.markdown(f"⏰ **{bidding_rules.get('default_bidding_time', 24)}h window** opens with the first bid")
+                else:
+                    opened, closes = window
+                    elapsed = (datetime.now() - opened) / (closes - opened) if closes > opened else 1.0
+                    st.progress(min(max(elapsed, 0.0), 1.0))
+                    remaining = calculate_time_remaining(closes.isoformat())
+                    st.markdown(f"⏰ **{remaining if remaining == 'Expired' else remaining + ' remaining'}** "
+                                f"(closes {closes.strftime('%b %d %I:%M %p')})")
+
+                # Bid history
+                st.markdown("### 📜 Bid History")
+                for bid in sorted(bid_shift.bid_history or [], key=lambda b: b["timestamp"], reverse=True):
+                    bid_time = datetime.fromisoformat(bid["timestamp"].replace('Z', '+00:00')).strftime("%I:%M %p").lstrip("0")
+                    st.markdown(f"• **{bid_time}** - {bid['radiologist']}: **{format_currency(bid['amount'])}**")
 
             with col2:
-                if st.button("🩺 Provide Consultation", key=f"consult_{consultation['Case ID']}"):
-                    st.success("Consultation response submitted!")
-                if st.button("📤 Forward to Expert", key=f"forward_{consultation['Case ID']}"):
-                    st.info("Case forwarded to subspecialty expert")
+                st.markdown("### 🎯 Place Your Bid")
+
+                current_bid = bid_shift.current_high_bid or bid_shift.base_compensation
+                min_bid = current_bid + bid_increment
+
+                # Bids are drafted in this session's overlay and only reach the shared board on submit
+                st.markdown("**Quick Bid Options:**")
+                col_a, col_b, col_c = st.columns(3)
+                for quick_col, quick_amount in zip((col_a, col_b, col_c), (min_bid, min_bid + 100, min_bid + 200)):
+                    with quick_col:
+                        if st.button(f"${quick_amount}", use_container_width=True, disabled=quick_amount > max_bid):
+                            overlay.draft_bid(bid_shift.id, quick_amount)
+
+                # Custom bid amount
+                st.markdown("**Custom Bid Amount:**")
+                custom_bid = st.number_input("Enter bid amount", min_value=min_bid, max_value=max(max_bid, min_bid),
+                                             step=bid_increment, value=min_bid)
+
+                if st.button("📝 Draft Custom Bid", use_container_width=True):
+                    overlay.draft_bid(bid_shift.id, custom_bid)
+
+                draft_amount = overlay.get_draft_bid(bid_shift.id)
+                if draft_amount is not None:
+                    st.info(f"Draft bid: {format_currency(draft_amount)} (not yet submitted)")
+                    if st.button("🚀 Submit Bid", use_container_width=True):
+                        try:
+                            overlay.commit(bidder=CURRENT_USER, edits=False)
+                            st.success(f"Bid placed: {format_currency(draft_amount)}")
+                        except (CommitConflict, ValueError) as exc:
+                            st.error(f"Bid not placed: {exc}")
+
+                # Auto-bid settings
+                st.markdown("---")
+                st.markdown("**🤖 Auto-Bid Settings:**")
+                auto_bid_max = st.number_input("Maximum auto-bid amount", min_value=min_bid, max_value=max(max_bid, min_bid),
+                                               step=bid_increment, value=max(min_bid, min(3000, max_bid)))
+                auto_bid_enabled = st.checkbox("Enable auto-bidding for this shift")
+
+                if auto_bid_enabled:
+                    st.info(f"Auto-bid active up to ${auto_bid_max}")
+
+    elif current_page == "Multi-Location Tracker":
+        st.markdown('<h1 class="main-header">🏥 Multi-Location Schedule Tracker</h1>', unsafe_allow_html=True)
+
+        # Location selector
+        locations = ["All Locations"] + [loc.name for loc in app_data.locations]
+        selected_location = st.selectbox("📍 Select Location", locations)
+
+        # Sites shared with other departments
+        if selected_location != "All Locations":
+            sharing = [d for d in department_store.departments_for_location(selected_location) if d != current_department]
+            if sharing:
+                shared_shifts = department_store.shifts_at_location(selected_location)
+                st.info(f"🤝 Shared site: also staffed by {', '.join(sharing)} "
+                        f"({len(shared_shifts)} shifts across all departments)")
+
+        # Week to review: the first scheduled week from today, else the start of the data
+        shift_dates = sorted(shift.date for shift in app_data.open_shifts)
+        today = datetime.now().date().isoformat()
+        default_week = next((d for d in shift_dates if d >= today), shift_dates[0] if shift_dates else today)
+        week_start = st.date_input("📅 Week Starting", value=datetime.strptime(default_week, "%Y-%m-%d").date())
+        demand_forecast = forecast_staffing_demand(current_department, app_data.version, week_start.isoformat())
+        location_scope = None if selected_location == "All Locations" else [selected_location]
+        coverage_gaps = detect_coverage_gaps(app_data, week_start, 7, forecast=demand_forecast, locations=location_scope)
+
+        # Coverage overview
+        st.subheader("📊 Coverage Overview")
+        if demand_forecast is None:
+            st.caption("Not enough shift history to forecast demand; using each location's fixed staffing requirements.")
+        else:
+            st.caption("Requirements are forecast from shift history by weekday, trend and season.")
+
+        def coverage_status(location, shift_types):
+            required = sum(staffing_requirement(location, shift_type, week_start + timedelta(days=offset), demand_forecast)
+                           for offset in range(7) for shift_type in shift_types
+                           if shift_type in shift_keys_for(week_start + timedelta(days=offset)))
+            shortfall = sum(gap.shortfall for gap in coverage_gaps
+                            if gap.location == location.name and gap.shift_type in shift_types)
+            if not required:
+                return "➖ N/A"
+            if not shortfall:
+                return "✅ Full"
+            if shortfall >= required:
+                return "🔴 Open"
+            return f"⚠️ {shortfall} Gap{'s' if shortfall > 1 else ''}"
+
+        coverage_data = [
+            {"Location": location.name,
+             "Day_Coverage": coverage_status(location, ["weekday_day"]),
+             "Night_Coverage": coverage_status(location, ["weekday_night"]),
+             "Weekend": coverage_status(location, ["weekend_day", "weekend_night"]),
+             "Staff_Count": sum(location.name in rad.locations for rad in app_data.radiologists)}
+            for location in app_data.locations if location_scope is None or location.name in location_scope
+        ]
 
-    # New consultation request
-    st.subheader("➕ Request New Consultation")
+        df_coverage = pd.DataFrame(coverage_data)
+        st.dataframe(df_coverage, use_container_width=True)
+
+        # Schedule grid
+        st.subheader("📅 Weekly Schedule Grid")
+
+        locations_by_name = {location.name: location for location in app_data.locations}
+        grid_locations = [{"name": loc.name, "staffing_requirements": loc.staffing_requirements}
+                          for loc in app_data.locations if location_scope is None or loc.name in location_scope]
+
+        def rotation_conflicts(name, shift):
+            return department_store.assignment_conflicts(current_department, name, shift)
+
+        def week_grid(shard, publish=False):
+            return generate_schedule_grid(
+                [{"name": rad.name} for rad in shard.radiologists], grid_locations,
+                datetime.combine(week_start, datetime.min.time()),
+                requirements=lambda name, day, shift_type: staffing_requirement(
+                    locations_by_name[name], shift_type, day.date(), demand_forecast),
+                rotation=shard.rotation(rotation_conflicts), publish=publish
+            ) if shard.radiologists else ({}, 1.0)
+
+        rotation = app_data.rotation(rotation_conflicts)
+        published = rotation.published([loc["name"] for loc in grid_locations], week_start)
+        schedule, fill_rate = week_grid(app_data)
+        df_schedule = pd.DataFrame([{"Shift": shift_name, **slots} for shift_name, slots in schedule.items()])
+        st.dataframe(df_schedule, use_container_width=True)
+        fairness = rotation.report()
+        st.caption(f"Rotation by accumulated call load (nights ×1.5, weekends ×2): spread {fairness.spread:g} "
+                   f"calls between most and least loaded, Gini {fairness.gini:.3f}; "
+                   f"{fill_rate:.0%} of this week's required calls filled")
+        if schedule and not published:
+            st.info("Draft: call load is only charged once the week is published.")
+            if st.button("📌 Publish Week"):
+                with department_store.transaction():
+                    shard = department_store.shard(current_department)
+                    week_grid(shard, publish=True)
+                    saved = shard.rotation().to_dict()
+                    shard.replace_settings({**shard.department_settings, "rotation": saved})
+                settings_store.put_settings(current_department, {("rotation",): saved})
+                st.rerun()
+
+        schedule_conflicts = app_data.conflicts().validate(held=rotation.held())
+        if schedule_conflicts:
+            with st.expander(f"⚠️ {len(schedule_conflicts)} double bookings or short rest periods in assigned shifts "
+                             "and published call"):
+                st.dataframe(pd.DataFrame([{"Radiologist": c.radiologist, "Shift": str(c.key), "Conflict": c.describe()}
+                                           for c in schedule_conflicts]), use_container_width=True, hide_index=True)
+
+        if demand_forecast is not None:
+            st.subheader("📈 Projected Demand")
+            projected = pd.DataFrame(demand_forecast.monthly_slots())
+            if location_scope is not None:
+                projected = projected[projected["location"].isin(location_scope)]
+            fig_demand = px.bar(projected, x="month", y="slots", color="location",
+                                title="Projected Shift Slots per Month")
+            st.plotly_chart(fig_demand, use_container_width=True)
+
+        # Quick actions
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("🔄 Sync All Locations"):
+                st.success("All location schedules synchronized!")
+        with col2:
+            show_gaps = st.button("⚠️ Identify Coverage Gaps")
+        with col3:
+            if st.button("📱 Send Mobile Updates"):
+                st.info("Mobile notifications sent to all radiologists")
+
+        if show_gaps:
+            if coverage_gaps:
+                st.warning(f"{len(coverage_gaps)} coverage gaps identified across locations "
+                           f"({sum(gap.shortfall for gap in coverage_gaps)} radiologist shifts short)")
+                st.dataframe(pd.DataFrame([{
+                    "Date": format_date(gap.date), "Location": gap.location,
+                    "Shift": gap.shift_type.replace("_", " ").title(), "Required": gap.required,
+                    "Scheduled": gap.scheduled, "Open Posts": gap.open_shifts
+                } for gap in coverage_gaps]), use_container_width=True, hide_index=True)
+            else:
+                st.success("No coverage gaps this week")
+
+    elif current_page == "Analytics & Reports":
+        st.markdown('<h1 class="main-header">📈 Analytics & Performance Reports</h1>', unsafe_allow_html=True)
+
+        # Mode comparison, simulated from this department's shifts and bid history
+        st.subheader("🔄 Assignment Mode Comparison")
+
+        scenario_count = st.select_slider("Simulated scenarios", options=[1000, 2500, 5000, 10000], value=5000)
+        simulation = simulate_policy_costs(current_department, app_data.version, scenario_count)
+        policy_names = list(simulation.estimates)
+        policy_colors = {'Smart Distribution': '#0ea5e9', 'Bidding Mode': '#fb923c', 'Hybrid': '#10b981',
+                         'Weekend Nights to Bidding': '#a855f7'}
+        estimates = [simulation.estimates[name] for name in policy_names]
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # Cost comparison chart
+            fig_cost = px.bar(x=policy_names, y=[e.cost_mean for e in estimates], title="Expected Cost of Open Shifts",
+                              error_y=[e.cost_high - e.cost_mean for e in estimates],
+                              error_y_minus=[e.cost_mean - e.cost_low for e in estimates],
+                              color=policy_names, color_discrete_map=policy_colors)
+            fig_cost.update_layout(showlegend=False)
+            st.plotly_chart(fig_cost, use_container_width=True)
+
+        with col2:
+            # Time to fill comparison
+            fig_time = px.bar(x=policy_names, y=[e.fill_hours_mean for e in estimates], title="Average Time to Fill (Hours)",
+                              error_y=[e.fill_hours_high - e.fill_hours_mean for e in estimates],
+                              error_y_minus=[e.fill_hours_mean - e.fill_hours_low for e in estimates],
+                              color=policy_names, color_discrete_map=policy_colors)
+            fig_time.update_layout(showlegend=False)
+            st.plotly_chart(fig_time, use_container_width=True)
+
+        confidence_label = f"{simulation.confidence:.0%} CI"
+        st.dataframe(pd.DataFrame([{
+            "Policy": e.policy,
+            "Expected Cost": format_currency(e.cost_mean),
+            confidence_label: f"{format_currency(e.cost_low)} – {format_currency(e.cost_high)}",
+            "Avg Fill (h)": round(e.fill_hours_mean, 1),
+            f"Fill {confidence_label} (h)": f"{e.fill_hours_low:.1f} – {e.fill_hours_high:.1f}",
+            "Escalated": f"{e.escalation_rate:.1%}"
+        } for e in estimates]), use_container_width=True, hide_index=True)
+        st.caption(f"{simulation.scenarios:,} scenarios over {simulation.shifts:,} unassigned shifts, sampling acceptance, "
+                   f"participation, bid premiums and fill times from department history.")
+
+        # Workload distribution
+        st.subheader("⚖️ Workload Distribution")
+
+        radiologists = ['Dr. Chen', 'Dr. Rodriguez', 'Dr. Johnson', 'Dr. Park']
+        calls_current = [4, 6, 3, 5]
+        calls_target = [6, 6, 6, 6]
+
+        fig_workload = go.Figure()
+        fig_workload.add_trace(go.Bar(name='Current Month', x=radiologists, y=calls_current, marker_color='#0ea5e9'))
+        fig_workload.add_trace(go.Bar(name='Target', x=radiologists, y=calls_target, marker_color='#fb923c'))
+        fig_workload.update_layout(title='Calls This Month vs Target', barmode='group')
+        st.plotly_chart(fig_workload, use_container_width=True)
+
+        # Financial impact
+        st.subheader("💰 Financial Impact")
+
+        smart_estimate = simulation.estimates["Smart Distribution"]
+        bidding_estimate = simulation.estimates["Bidding Mode"]
+        savings = simulation.savings("Bidding Mode", "Smart Distribution")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Smart Distribution", format_currency(smart_estimate.cost_mean),
+                      round(smart_estimate.cost_mean - bidding_estimate.cost_mean), delta_color="inverse",
+                      help="Difference from Bidding Mode; lower cost shows green")
+        with col2:
+            st.metric("Bidding Mode", format_currency(bidding_estimate.cost_mean),
+                      round(bidding_estimate.cost_mean - smart_estimate.cost_mean), delta_color="inverse",
+                      help="Difference from Smart Distribution; lower cost shows green")
+        with col3:
+            st.metric("Total Savings", format_currency(savings["mean"]), f"{savings['percent']:.1f}%",
+                      help=f"{confidence_label}: {format_currency(savings['low'])} – {format_currency(savings['high'])}")
+
+    elif current_page == "Case Consultation":
+        st.markdown('<h1 class="main-header">💬 Case Consultation Hub</h1>', unsafe_allow_html=True)
+
+        # Active consultations
+        st.subheader("🔥 Active Consultation Requests")
+
+        urgency_icons = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}
+        for consultation in reversed(app_data.consultations):
+            urgency_label = f"{urgency_icons.get(consultation.urgency, '⚪')} {consultation.urgency}"
+            with st.expander(f"{consultation.case_id} - {consultation.specialty_needed} ({urgency_label})"):
+                col1, col2 = st.columns([2, 1])
+
+                with col1:
+                    st.markdown(f"**Requesting Physician:** {consultation.requesting_physician}")
+                    st.markdown(f"**Description:** {consultation.description}")
+                    st.markdown(f"**Status:** {consultation.status}")
+
+                with col2:
+                    if st.button("🩺 Provide Consultation", key=f"consult_{consultation.id}"):
+                        st.success("Consultation response submitted!")
+                    if st.button("📤 Forward to Expert", key=f"forward_{consultation.id}"):
+                        st.info("Case forwarded to subspecialty expert")
+
+        # New consultation request
+        st.subheader("➕ Request New Consultation")
+
+        with st.form("new_consultation"):
+            case_id = st.text_input("Case ID", value=f"RAD-2025-{len(app_data.consultations) + 1:03d}")
+            specialty_needed = st.selectbox("Specialty Needed", 
+                                           ["Neuroradiology", "Musculoskeletal", "Chest Imaging", "Interventional", "General"])
+            urgency = st.selectbox("Urgency Level", ["🔴 High", "🟡 Medium", "🟢 Low"])
+            description = st.text_area("Case Description")
+
+            if st.form_submit_button("📤 Submit Consultation Request"):
+                if not case_id.strip() or not description.strip():
+                    st.error("Case ID and description are required")
+                else:
+                    with department_store.transaction():
+                        app_data.add_consultation(case_id.strip(), CURRENT_USER, specialty_needed,
+                                                  urgency.split(" ", 1)[1], description.strip())
+                    st.success("Consultation request submitted successfully!")
 
-    with st.form("new_consultation"):
-        case_id = st.text_input("Case ID", value="RAD-2025-003")
-        specialty_needed = st.selectbox("Specialty Needed", 
-                                       ["Neuroradiology", "Musculoskeletal", "Chest Imaging", "Interventional", "General"])
-        urgency = st.selectbox("Urgency Level", ["🔴 High", "🟡 Medium", "🟢 Low"])
-        description = st.text_area("Case Description")
+    elif current_page == "Secure Messaging":
+        st.markdown('<h1 class="main-header">✉️ HIPAA-Compliant Secure Messaging</h1>', unsafe_allow_html=True)
 
-        if st.form_submit_button("📤 Submit Consultation Request"):
-            st.success("Consultation request submitted successfully!")
+        col1, col2 = st.columns([1, 2])
 
-elif current_page == "Secure Messaging":
-    st.markdown('<h1 class="main-header">✉️ HIPAA-Compliant Secure Messaging</h1>', unsafe_allow_html=True)
+        with col1:
+            st.subheader("👥 Contacts")
 
-    col1, col2 = st.columns([1, 2])
+            contacts = [
+                {"name": "Dr. Michael Rodriguez", "status": "🟢 Online", "unread": 1},
+                {"name": "Dr. Emily Johnson", "status": "🟡 Away", "unread": 0},
+                {"name": "Dr. James Park", "status": "🟢 Online", "unread": 2},
+                {"name": "All Radiologists", "status": "📢 Group", "unread": 0}
+            ]
 
-    with col1:
-        st.subheader("👥 Contacts")
+            for contact in contacts:
+                unread_badge = f" ({contact['unread']})" if contact['unread'] > 0 else ""
+                if st.button(f"{contact['name']}{unread_badge}", key=contact['name'], use_container_width=True):
+                    st.session_state.message_contact = contact['name']
+            selected_contact = st.session_state.get("message_contact", contacts[0]["name"])
 
-        contacts = [
-            {"name": "Dr. Michael Rodriguez", "status": "🟢 Online", "unread": 1},
-            {"name": "Dr. Emily Johnson", "status": "🟡 Away", "unread": 0},
-            {"name": "Dr. James Park", "status": "🟢 Online", "unread": 2},
-            {"name": "All Radiologists", "status": "📢 Group", "unread": 0}
-        ]
-
-        selected_contact = None
-        for contact in contacts:
-            unread_badge = f" ({contact['unread']})" if contact['unread'] > 0 else ""
-            if st.button(f"{contact['name']}{unread_badge}", key=contact['name'], use_container_width=True):
-                selected_contact = contact['name']
+            st.markdown("---")
+            st.subheader("🔒 Security Status")
+            st.success("🔐 End-to-end encryption active")
+            if department_store.audit is not None:
+                st.info(f"📋 Audit logging enabled ({department_store.audit.stats['records']:,} records this session)")
+            else:
+                st.warning("📋 Audit logging disabled")
+
+        with col2:
+            st.subheader("💬 Messages")
+
+            # Message display, batched into one payload
+            st.markdown(html_fragments.render_section(html_fragments.message_bubble(msg) for msg in app_data.messages),
+                        unsafe_allow_html=True)
+
+            # Attachments: only the one asked for is read (memory-mapped) for download
+            attached = [(msg, digest) for msg in app_data.messages for digest in (msg.attachments or ())][-50:]
+            if attached:
+                with st.expander(f"📎 Attachments ({len(attached)})"):
+                    labels = {f"{department_store.attachments.get(digest).name} · {msg.sender}, {msg.time}": digest
+                              for msg, digest in reversed(attached)}
+                    digest = labels[st.selectbox("Attachment", list(labels), key="msg_attachment")]
+                    attachment = department_store.attachments.get(digest)
+                    thumbnail = department_store.attachments.thumbnail(digest)
+                    if thumbnail:
+                        st.image(thumbnail)
+                    elif attachment.is_image:
+                        st.caption("Preview is being generated...")
+                    # The blob is only read on the rerun after this click, never on ordinary page loads
+                    if st.button(f"📥 Prepare {attachment.name} ({attachment.size / 1024:,.0f} KB)",
+                                 key="prepare_attachment"):
+                        with department_store.attachments.mapped(digest) as blob:
+                            st.download_button(f"⬇️ Download {attachment.name}", blob[:],
+                                               file_name=attachment.name, mime=attachment.content_type)
+
+            # Message input
+            with st.form("send_message", clear_on_submit=True):
+                new_message = st.text_area(f"Message to {selected_contact}...")
+                col_a, col_b, col_c = st.columns([2, 1, 1])
+                with col_b:
+                    priority = st.selectbox("Priority", ["Normal", "High", "Urgent"], key="msg_priority")
+                with col_c:
+                    attach_file = st.file_uploader("📎", type=['pdf', 'jpg', 'jpeg', 'png'], key="msg_file")
+                with col_a:
+                    if st.form_submit_button("📤 Send Message") and (new_message.strip() or attach_file):
+                        try:
+                            digests = [department_store.attachments.put(attach_file, attach_file.name).digest] \
+                                if attach_file else None
+                        except AttachmentRejected as exc:
+                            st.error(str(exc))
+                        else:
+                            with department_store.transaction():
+                                app_data.upsert_messages([Message(
+                                    id=max((m.id for m in app_data.messages), default=0) + 1, sender=CURRENT_USER,
+                                    recipient=selected_contact, time=datetime.now().strftime("%I:%M %p").lstrip("0"),
+                                    body=new_message.strip() or f"📎 {attach_file.name}", direction="sent",
+                                    priority=priority, attachments=digests)])
+                            if digests:
+                                department_store.attachments.thumbnail(digests[0])  # render while the page reloads
+                            st.success("Message sent securely!")
+
+    elif current_page == "Credential Tracking":
+        st.markdown('<h1 class="main-header">🎓 Credential & Certification Tracking</h1>', unsafe_allow_html=True)
+
+        # Credential overview
+        st.subheader("📋 Certification Status Overview")
+
+        today = datetime.now().date()
+        credentials = app_data.credential_index()
+        credential_data = []
+        for rad in app_data.radiologists:
+            creds = rad.credentials
+            expiry = creds.get("cert_expiry", "")
+            days_left = (datetime.strptime(expiry, "%Y-%m-%d").date() - today).days if expiry else -1
+            cme = f"{creds.get('cme_credits', 0)}/{creds.get('cme_required', 0)}"
+            if not creds.get("board_certified") or days_left < 0:
+                board, status = "❌ Expired", "🔴 Action Required"
+            elif days_left <= DUE_SOON_DAYS:
+                board, status = "⚠️ Expires Soon", "🔴 Action Required"
+            else:
+                board = "✅ Valid"
+                status = "🟡 CME Needed" if creds.get("cme_credits", 0) < creds.get("cme_required", 0) else "✅ Compliant"
+            credential_data.append({"Radiologist": rad.name, "Board_Cert": board, "Expiry": format_date(expiry) if expiry else "—",
+                                    "CME": cme, "Status": status})
+
+        df_credentials = pd.DataFrame(credential_data)
+        st.dataframe(df_credentials, use_container_width=True)
+
+        # Renewal alerts, earliest deadline first, straight from the deadline index
+        st.subheader("⚠️ Upcoming Renewals & Actions Required")
+
+        publish_credential_alerts(current_department, app_data)
+        due = credentials.due_within(DUE_SOON_DAYS, today)
+        for deadline in due:
+            icon = "🔴" if (deadline.due - today).days <= 30 else "🟡"
+            st.warning(f"{icon} {deadline.describe(today)}")
+        if not due:
+            st.success(f"No credential deadlines in the next {DUE_SOON_DAYS} days")
+
+        # Quick actions
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            if st.button("📧 Send Renewal Reminders"):
+                with department_store.transaction():
+                    reminders = app_data.credential_index().renewal_reminders(DUE_SOON_DAYS, today)
+                    app_data.upsert_messages(reminders)
+                st.success(f"Renewal reminders sent to {len(reminders)} radiologists")
+
+        with col2:
+            if st.button("📊 Generate Compliance Report"):
+                st.info("Compliance report generated and ready for download")
+
+        with col3:
+            if st.button("🔄 Update CME Credits"):
+                st.info("CME credit update form opened")
+
+    elif current_page == "Settings":
+        st.markdown('<h1 class="main-header">⚙️ System Settings & Configuration</h1>', unsafe_allow_html=True)
+
+        # Department settings (edits stay in this session's overlay until saved)
+        st.subheader("🏥 Department Settings")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("**Default Assignment Mode**")
+            mode_options = ["Smart Distribution", "Bidding Mode", "Hybrid"]
+            current_mode = overlay.get_setting(("default_assignment_mode",), "Smart Distribution")
+            default_mode = st.radio("", mode_options, key="default_mode",
+                                    index=mode_options.index(current_mode) if current_mode in mode_options else 0)
+            overlay.set_setting(("default_assignment_mode",), default_mode)
+
+            st.markdown("**Bidding Rules**")
+            min_weekend_bid = st.number_input("Minimum Weekend Day Bid", step=50,
+                                              value=overlay.get_setting(("bidding_rules", "min_bid_weekend_day"), 2200))
+            max_bid_limit = st.number_input("Maximum Bid Limit", step=100,
+                                            value=overlay.get_setting(("bidding_rules", "max_bid_limit"), 4000))
+            bidding_time_limit = st.number_input("Bidding Time Limit (hours)", step=1,
+                                                 value=overlay.get_setting(("bidding_rules", "default_bidding_time"), 24))
+            overlay.set_setting(("bidding_rules", "min_bid_weekend_day"), min_weekend_bid)
+            overlay.set_setting(("bidding_rules", "max_bid_limit"), max_bid_limit)
+            overlay.set_setting(("bidding_rules", "default_bidding_time"), bidding_time_limit)
+
+        with col2:
+            st.markdown("**Notification Settings**")
+            for setting_key, label in [("email", "Email Notifications"), ("sms", "SMS Notifications"),
+                                       ("push", "Push Notifications")]:
+                enabled = st.checkbox(label, value=overlay.get_setting(("notifications", setting_key), True))
+                overlay.set_setting(("notifications", setting_key), enabled)
+
+            st.markdown("**Integration Settings**")
+            for setting_key, label in [("pacs", "PACS Integration"), ("ris", "RIS Integration"),
+                                       ("emr", "EMR Integration")]:
+                enabled = st.checkbox(label, value=overlay.get_setting(("integrations", setting_key), False))
+                overlay.set_setting(("integrations", setting_key), enabled)
+
+        # Personal preferences
+        st.subheader("👤 Personal Preferences")
+
+        current_user_record = app_data.get_radiologist_by_name(CURRENT_USER)
+        if current_user_record is None:
+            st.info(f"{CURRENT_USER} is not on the {current_department} roster.")
+        else:
+            my_preferences = overlay.get("radiologists", current_user_record.id).preferences
+            location_names = [loc.name for loc in app_data.locations]
+
+            max_weekend_calls = st.slider("Maximum Weekend Calls per Month", 1, 6, my_preferences["max_weekend_calls"])
+            preferred_locations = st.multiselect("Preferred Locations", location_names,
+                                                default=[l for l in my_preferences["preferred_locations"] if l in location_names])
+            bidding_opt_in = st.checkbox("Participate in Bidding", value=my_preferences["bidding_opt_in"])
+            max_auto_bid = st.number_input("Maximum Auto-bid Amount", value=my_preferences["max_auto_bid"], step=50)
+
+            preference_edits = {
+                "max_weekend_calls": max_weekend_calls,
+                "preferred_locations": preferred_locations,
+                "bidding_opt_in": bidding_opt_in,
+                "max_auto_bid": max_auto_bid
+            }
+            preference_edits = {k: v for k, v in preference_edits.items() if my_preferences[k] != v}
+            if preference_edits:
+                overlay.update("radiologists", current_user_record.id, preferences=preference_edits)
+
+        # Save settings
+        save_col1, save_col2 = st.columns([3, 1])
+        with save_col1:
+            if st.button("💾 Save All Settings", use_container_width=True):
+                try:
+                    saved = commit_and_persist(overlay, settings_store)
+                    st.success(f"All settings saved successfully! ({saved} changes)")
+                except SettingsValidationError as exc:
+                    st.error("Settings not saved:\n" + "\n".join(f"- {error}" for error in exc.errors))
+                except (CommitConflict, ValueError) as exc:
+                    st.error(f"Settings not saved: {exc}")
+        with save_col2:
+            if st.button("↩️ Discard Changes", use_container_width=True):
+                overlay.discard()
+                st.rerun()
+        st.caption(f"{overlay.pending_count} unsaved changes in this session · "
+                   f"{settings_store.pending_count} saved changes waiting to be written to disk")
+
+        # Departments
+        st.subheader("🏢 Departments")
+
+        dept_col1, dept_col2 = st.columns([2, 1])
+        with dept_col1:
+            new_department = st.text_input("New Department Name")
+            st.caption(f"Each department has its own roster, sites, settings and budget. Imports go into {current_department}.")
+        with dept_col2:
+            copy_settings = st.checkbox(f"Copy settings from {current_department}", value=True)
+            if st.button("➕ Add Department", use_container_width=True) and new_department.strip():
+                try:
+                    with department_store.transaction():
+                        department_store.add_department(new_department.strip(),
+                                                        settings=app_data.department_settings if copy_settings else None)
+                    st.success(f"Department {new_department.strip()} created")
+                except ValueError as exc:
+                    st.error(str(exc))
+
+        # Bulk data import
+        st.subheader("📥 Data Import")
+
+        import_col1, import_col2 = st.columns([1, 2])
+        with import_col1:
+            import_entity = st.selectbox("Import Type", list(ENTITIES), format_func=str.title)
+        with import_col2:
+            import_upload = st.file_uploader("CSV, JSONL or Parquet export", type=['csv', 'jsonl', 'ndjson', 'parquet'],
+                                             key="import_file")
+
+        if import_upload is not None and st.button("📥 Import Records", use_container_width=True):
+            import_progress = st.empty()
+            report = import_file(
+                app_data, import_upload, import_entity, transaction=department_store.transaction,
+                progress=lambda r: import_progress.caption(f"{r.rows_read:,} rows read · {r.rows_per_second:,.0f} rows/s")
+            )
+            department_store.reindex(current_department)
+            if report.error_count:
+                st.warning(report.summary())
+                st.dataframe(pd.DataFrame([{"Row": e.row, "Error": e.message} for e in report.errors]),
+                             use_container_width=True)
+            else:
+                st.success(report.summary())
 
-        st.markdown("---")
-        st.subheader("🔒 Security Status")
-        st.success("🔐 End-to-end encryption active")
-        st.info("📋 Audit logging enabled")
-
-    with col2:
-        st.subheader("💬 Messages")
-
-        # Sample conversation
-        messages = [
-            {"sender": "Dr. Michael Rodriguez", "time": "2:45 PM", "message": "Can you cover my weekend shift? Family emergency.", "type": "received"},
-            {"sender": "You", "time": "2:50 PM", "message": "Of course! I can take the Saturday shift. Hope everything is okay.", "type": "sent"},
-            {"sender": "Dr. Michael Rodriguez", "time": "2:52 PM", "message": "Thank you so much! I'll make it up to you.", "type": "received"}
-        ]
+    elif current_page == "Diagnostics":
+        st.markdown('<h1 class="main-header">🩺 Performance Diagnostics</h1>', unsafe_allow_html=True)
 
-        # Message display
-        for msg in messages:
-            if msg['type'] == 'sent':
-                st.markdown(f"""
-                <div style="text-align: right; margin: 10px 0;">
-                    <div style="background-color: #0ea5e9; color: white; padding: 10px; border-radius: 10px; display: inline-block; max-width: 70%;">
-                        {msg['message']}
-                    </div>
-                    <div style="font-size: 0.8em; color: #666; margin-top: 5px;">
-                        {msg['time']}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            metrics_enabled = st.toggle("Collect timings", value=instrumentation.is_enabled())
+            if metrics_enabled:
+                instrumentation.enable()
             else:
-                st.markdown(f"""
-                <div style="text-align: left; margin: 10px 0;">
-                    <div style="background-color: #f3f4f6; padding: 10px; border-radius: 10px; display: inline-block; max-width: 70%;">
-                        <strong>{msg['sender']}</strong><br>
-                        {msg['message']}
-                    </div>
-                    <div style="font-size: 0.8em; color: #666; margin-top: 5px;">
-                        {msg['time']}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-
-        # Message input
-        with st.form("send_message"):
-            new_message = st.text_area("Type your message...")
-            col_a, col_b, col_c = st.columns([2, 1, 1])
-            with col_a:
-                if st.form_submit_button("📤 Send Message"):
-                    st.success("Message sent securely!")
-            with col_b:
-                priority = st.selectbox("Priority", ["Normal", "High", "Urgent"], key="msg_priority")
-            with col_c:
-                attach_file = st.file_uploader("📎", type=['pdf', 'jpg', 'png'], key="msg_file")
-
-elif current_page == "Credential Tracking":
-    st.markdown('<h1 class="main-header">🎓 Credential & Certification Tracking</h1>', unsafe_allow_html=True)
-
-    # Credential overview
-    st.subheader("📋 Certification Status Overview")
-
-    credential_data = [
-        {"Radiologist": "Dr. Sarah Chen", "Board_Cert": "✅ Valid", "Expiry": "Mar 15, 2026", "CME": "45/50", "Status": "🟡 CME Needed"},
-        {"Radiologist": "Dr. Michael Rodriguez", "Board_Cert": "⚠️ Expires Soon", "Expiry": "Nov 30, 2025", "CME": "38/50", "Status": "🔴 Action Required"},
-        {"Radiologist": "Dr. Emily Johnson", "Board_Cert": "✅ Valid", "Expiry": "Jan 20, 2027", "CME": "52/50", "Status": "✅ Compliant"},
-        {"Radiologist": "Dr. James Park", "Board_Cert": "✅ Valid", "Expiry": "Aug 10, 2026", "CME": "41/50", "Status": "🟡 CME Needed"}
-    ]
-
-    df_credentials = pd.DataFrame(credential_data)
-    st.dataframe(df_credentials, use_container_width=True)
-
-    # Renewal alerts
-    st.subheader("⚠️ Upcoming Renewals & Actions Required")
-
-    alerts = [
-        "🔴 Dr. Rodriguez: Board certification expires in 90 days",
-        "🟡 Dr. Chen: Needs 5 more CME credits by Dec 31",
-        "🟡 Dr. Park: Needs 9 more CME credits by Dec 31",
-        "📅 Annual compliance report due in 30 days"
-    ]
-
-    for alert in alerts:
-        st.warning(alert)
-
-    # Quick actions
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        if st.button("📧 Send Renewal Reminders"):
-            st.success("Renewal reminders sent to affected radiologists")
-
-    with col2:
-        if st.button("📊 Generate Compliance Report"):
-            st.info("Compliance report generated and ready for download")
-
-    with col3:
-        if st.button("🔄 Update CME Credits"):
-            st.info("CME credit update form opened")
-
-elif current_page == "Settings":
-    st.markdown('<h1 class="main-header">⚙️ System Settings & Configuration</h1>', unsafe_allow_html=True)
-
-    # Department settings
-    st.subheader("🏥 Department Settings")
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown("**Default Assignment Mode**")
-        default_mode = st.radio("", ["Smart Distribution", "Bidding Mode", "Hybrid"], key="default_mode")
-
-        st.markdown("**Bidding Rules**")
-        min_weekend_bid = st.number_input("Minimum Weekend Day Bid", value=2200, step=50)
-        max_bid_limit = st.number_input("Maximum Bid Limit", value=4000, step=100)
-        bidding_time_limit = st.number_input("Bidding Time Limit (hours)", value=24, step=1)
-
-    with col2:
-        st.markdown("**Notification Settings**")
-        email_notifications = st.checkbox("Email Notifications", value=True)
-        sms_notifications = st.checkbox("SMS Notifications", value=True)
-        push_notifications = st.checkbox("Push Notifications", value=True)
-
-        st.markdown("**Integration Settings**")
-        pacs_integration = st.checkbox("PACS Integration", value=True)
-        ris_integration = st.checkbox("RIS Integration", value=True)
-        emr_integration = st.checkbox("EMR Integration", value=False)
-
-    # Personal preferences
-    st.subheader("👤 Personal Preferences")
-
-    max_weekend_calls = st.slider("Maximum Weekend Calls per Month", 1, 6, 2)
-    preferred_locations = st.multiselect("Preferred Locations", 
-                                        ["Main Hospital", "Outpatient Center", "Sports Medicine Center", "Pulmonary Center"],
-                                        default=["Main Hospital"])
-    bidding_opt_in = st.checkbox("Participate in Bidding", value=True)
-    max_auto_bid = st.number_input("Maximum Auto-bid Amount", value=2800, step=50)
-
-    # Save settings
-    if st.button("💾 Save All Settings", use_container_width=True):
-        st.success("All settings saved successfully!")
-
-# Footer
-st.markdown("---")
-st.markdown("""
+                instrumentation.disable()
+        with col2:
+            if st.button("🧹 Reset Metrics", use_container_width=True):
+                instrumentation.reset()
+        with col3:
+            if st.button("🔬 Profile Next Rerun", use_container_width=True):
+                st.session_state.profile_next_rerun = True
+                st.rerun()
+
+        st.subheader("⏱️ Operation Latency")
+        metrics_rows = instrumentation.snapshot()
+        if metrics_rows:
+            st.dataframe(pd.DataFrame(metrics_rows).round(3), use_container_width=True)
+        else:
+            st.info("No timings recorded yet. Enable collection and use the app, or set RADFLOW_METRICS=1.")
+
+        st.subheader("📤 Prometheus Export")
+        prometheus_body = instrumentation.prometheus_text()
+        st.download_button("📥 Download metrics.txt", prometheus_body, file_name="metrics.txt", mime="text/plain")
+        if os.environ.get("RADFLOW_METRICS_PORT"):
+            st.caption(f"Scrape endpoint: http://127.0.0.1:{os.environ['RADFLOW_METRICS_PORT']}/metrics")
+        with st.expander("Exposition text"):
+            st.code(prometheus_body, language="text")
+
+        st.subheader("🔬 Rerun Profile")
+        page_run["profile_slot"] = st.empty()
+        if st.session_state.get("last_profile"):
+            page_run["profile_slot"].code(st.session_state.last_profile, language="text")
+
+    # Footer
+    st.markdown("---")
+    st.markdown("""
 <div style='text-align: center; color: #6b7280; font-size: 0.8em;'>
     RadFlow Pro - Advanced Radiology Workflow Management System<br>
     🔒 HIPAA Compliant | 🌐 Multi-Location Support | 🤖 AI-Powered Scheduling
 </div>
 """, unsafe_allow_html=True)
+
+try:
+    render_page()
+finally:  # also when st.rerun() or st.stop() ends the page early, or it raises
+    instrumentation.stop(page_run["timer"])
+    if rerun_profiler is not None:
+        rerun_profiler.stop()
+        st.session_state.last_profile = rerun_profiler.report()
+
+if rerun_profiler is not None and page_run["profile_slot"] is not None:
+    page_run["profile_slot"].code(st.session_state.last_profile, language="text")
@@ -0,0 +1,290 @@
+"""
+Fairness-aware rotation for routine call coverage: a heap keyed by accumulated call load
+"""
+
+import heapq
+import itertools
+import threading
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from conflicts import IntervalSchedule, shift_interval
+from data_models import OpenShift, Radiologist, ineligibility_reasons
+from instrumentation import timed
+
+NIGHT_WEIGHT = 0.5    # a night call counts 1.5 calls of load
+WEEKEND_WEIGHT = 1.0  # a weekend call counts 2, a weekend night 2.5
+SHIFT_KINDS = ("Day", "Night")
+
+Requirements = Callable[[str, date, str], int]  # (location, day, "weekday_night") -> headcount
+Conflicts = Callable[[str, OpenShift], List]     # (radiologist, shift) -> clashes with assigned shifts
+
+def slot_weight(day: date, kind: str) -> float:
+    return 1.0 + (NIGHT_WEIGHT if kind == "Night" else 0.0) + (WEEKEND_WEIGHT if day.weekday() >= 5 else 0.0)
+
+def _probe(day: date, kind: str, location: str) -> OpenShift:
+    """The slot as an unassigned shift, for the shared eligibility and interval rules"""
+    return OpenShift(id=0, date=day.isoformat(), shift=kind, location=location, subspecialty_required="Any",
+                     duration="12 hours", base_compensation=0, assignment_mode="Smart", status="Open")
+
+def shift_type(day: date, kind: str) -> str:
+    return f"{'weekend' if day.weekday() >= 5 else 'weekday'}_{kind.lower()}"
+
+@dataclass
+class FairnessReport:
+    members: int
+    mean: float
+    low: float
+    high: float
+    spread: float  # max - min
+    gini: float    # 0 is perfectly even
+    fill_rate: float = 1.0  # share of required calls that were staffed
+
+def fairness_report(loads: Iterable[float]) -> FairnessReport:
+    values = sorted(loads)
+    n = len(values)
+    total = sum(values)
+    if not n or not total:
+        return FairnessReport(n, 0.0, 0.0, 0.0, 0.0, 0.0)
+    # Gini from the sorted values: sum((2i - n - 1) * x_i) / (n * sum(x))
+    gini = sum((2 * i - n + 1) * value for i, value in enumerate(values)) / (n * total)
+    return FairnessReport(n, round(total / n, 3), values[0], values[-1], round(values[-1] - values[0], 3),
+                          round(gini, 4))
+
+class RotationQueue:
+    """Routine call rotation. Each location has a min-heap of the radiologists
+    privileged there, keyed by (weighted call load, last pick order), so the next
+    pick pops the least-loaded eligible member in O(log n). Members popped on the
+    way (busy that day, weekend cap, lapsed credentials) are pushed back unchanged
+    and keep their place. A pick re-pushes the member into each of their locations'
+    heaps; the entries it supersedes are dropped when they surface.
+
+    Weeks are drafted until published: a draft picks against the current loads and
+    then undoes its picks, so rendering a week charges nobody. A published week is
+    remembered per (day, shift, location), so asking for it again returns the same
+    names, and each new week continues from the accumulated load instead of
+    restarting the pattern. Loads start at call_history["year_total"].
+
+    `conflicts` checks a slot against the assigned shifts (e.g. the store's
+    assignment_conflicts), so a pick never double-books someone already on a shift."""
+
+    def __init__(self, radiologists: Iterable[Radiologist] = (), conflicts: Optional[Conflicts] = None):
+        self.conflicts = conflicts
+        self._lock = threading.Lock()
+        self._members: Dict[str, Radiologist] = {}
+        self._load: Dict[str, float] = {}
+        self._heaps: Dict[str, List[Tuple[float, int, str]]] = {}  # location -> (load, stamp, name)
+        self._stamp: Dict[str, int] = {}  # name -> stamp of the member's live heap entries
+        self._order = itertools.count()
+        self._weekend_calls: Dict[Tuple[str, int], int] = {}  # (name, year * 12 + month) -> weekend calls
+        self._busy: Dict[int, Set[str]] = {}                   # day ordinal -> names already on call
+        self._intervals = IntervalSchedule()                   # rest gaps, e.g. no day call after a night
+        self._assigned: Dict[Tuple[int, str, str], Tuple[str, ...]] = {}
+        self._synced: Optional[int] = None  # AppData.version the roster was last read at
+        self._undo: Optional[List[Tuple]] = None  # picks to take back when a draft ends
+        self.sync(list(radiologists))
+
+    # --- Roster --------------------------------------------------------------
+
+    def sync(self, radiologists: List[Radiologist], version: Optional[int] = None) -> None:
+        """Follow roster edits; newcomers join at the current minimum load, not zero.
+        Pass the shard's data version to skip the re-read while nothing has changed."""
+        with self._lock:
+            if version is not None and version == self._synced:
+                return
+            self._synced = version
+            current = {rad.name: rad for rad in radiologists}
+            floor = min(self._load.values(), default=0.0)
+            for name, rad in current.items():
+                if name not in self._load:
+                    history = float(rad.call_history.get("year_total", 0))
+                    self._load[name] = max(history, floor) if self._members else history
+            for name in set(self._load) - set(current):
+                del self._load[name]
+            self._members = current
+            self._stamp = {name: self._stamp[name] if name in self._stamp else next(self._order) for name in current}
+            self._heaps = {}  # rebuilt per location on next use
+
+    def _heap(self, location: str) -> List[Tuple[float, int, str]]:
+        heap = self._heaps.get(location)
+        if heap is None or len(heap) > 4 * len(self._members) + 64:  # first use, or mostly stale entries
+            heap = self._heaps[location] = [(self._load[name], self._stamp[name], name)
+                                            for name, rad in self._members.items() if location in rad.locations]
+            heapq.heapify(heap)
+        return heap
+
+    # --- Picking -------------------------------------------------------------
+
+    def _can_take(self, rad: Radiologist, day: date, kind: str, location: str) -> bool:
+        if rad.name in self._busy.get(day.toordinal(), ()):
+            return False
+        probe = _probe(day, kind, location)
+        if self._intervals.check(rad.name, *shift_interval(probe)):
+            return False
+        month = day.year * 12 + day.month
+        if ineligibility_reasons(rad, probe, self._weekend_calls.get((rad.name, month), 0)):
+            return False
+        return not (self.conflicts and self.conflicts(rad.name, probe))
+
+    def _pick(self, day: date, kind: str, location: str) -> Optional[str]:
+        heap = self._heap(location)
+        skipped = []
+        chosen = None
+        while heap:
+            entry = heapq.heappop(heap)
+            if self._stamp.get(entry[2]) != entry[1]:
+                continue  # superseded by a later pick
+            if self._can_take(self._members[entry[2]], day, kind, location):
+                chosen = entry[2]
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        if chosen is None:
+            return None
+        if self._undo is not None:
+            self._undo.append((chosen, self._load[chosen], self._stamp[chosen], day, kind, location))
+        self._load[chosen] += slot_weight(day, kind)
+        stamp = self._stamp[chosen] = next(self._order)
+        for privileged in self._members[chosen].locations:
+            if privileged in self._heaps:
+                heapq.heappush(self._heaps[privileged], (self._load[chosen], stamp, chosen))
+        self._busy.setdefault(day.toordinal(), set()).add(chosen)
+        self._intervals.add(chosen, *shift_interval(_probe(day, kind, location)), (day.isoformat(), kind, location))
+        if day.weekday() >= 5:
+            key = (chosen, day.year * 12 + day.month)
+            self._weekend_calls[key] = self._weekend_calls.get(key, 0) + 1
+        return chosen
+
+    def _assign(self, day: date, kind: str, location: str, headcount: int) -> Tuple[str, ...]:
+        slot = (day.toordinal(), kind, location)
+        names = self._assigned.get(slot)
+        if names is None:
+            picks = (self._pick(day, kind, location) for _ in range(headcount))
+            names = tuple(name for name in picks if name is not None)
+            if self._undo is None:
+                self._assigned[slot] = names
+        return names
+
+    def _rollback(self) -> None:
+        """Take back a draft's picks, newest first"""
+        for name, load, stamp, day, kind, location in reversed(self._undo):
+            self._load[name] = load
+            self._stamp[name] = stamp
+            self._busy[day.toordinal()].discard(name)
+            self._intervals.remove(name, *shift_interval(_probe(day, kind, location)),
+                                   (day.isoformat(), kind, location))
+            if day.weekday() >= 5:
+                self._weekend_calls[(name, day.year * 12 + day.month)] -= 1
+        self._heaps = {}  # the picks popped live entries; rebuilt per location on next use
+
+    def assign(self, day: date, kind: str, location: str, headcount: int = 1) -> Tuple[str, ...]:
+        """Names on call for one slot; the first request fixes them, later ones repeat them.
+        Fewer than `headcount` names means nobody eligible was left."""
+        with self._lock:
+            return self._assign(day, kind, location, headcount)
+
+    @timed()
+    def schedule_week(self, locations: Iterable[str], start: date, requirements: Requirements,
+                      publish: bool = False) -> Dict:
+        """{"Monday Day": {location: names}} for the seven days from `start`. Published
+        slots repeat their names; the rest are a draft unless `publish` fixes them."""
+        schedule = {}
+        locations = list(locations)
+        with self._lock:
+            self._undo = None if publish else []
+            try:
+                for offset in range(7):
+                    day = start + timedelta(days=offset)
+                    for kind in SHIFT_KINDS:
+                        row = schedule[f"{day:%A} {kind}"] = {}
+                        for location in locations:
+                            headcount = max(0, requirements(location, day, shift_type(day, kind)))
+                            row[location] = self._assign(day, kind, location, headcount)
+            finally:
+                if self._undo is not None:
+                    self._rollback()
+                self._undo = None
+        return schedule
+
+    def published(self, locations: Iterable[str], start: date) -> bool:
+        """Whether every slot of the week from `start` has been published"""
+        with self._lock:
+            return all((start.toordinal() + offset, kind, location) in self._assigned
+                       for offset in range(7) for kind in SHIFT_KINDS for location in locations)
+
+    def validate(self) -> List:
+        """Every overlap or short rest among the slots assigned so far, in one sweep"""
+        with self._lock:
+            return self._intervals.sweep()
+
+    def held(self) -> List[Tuple[str, int, int, Tuple[str, str, str]]]:
+        """Published slots as (radiologist, start, end, (date, shift, location)), for
+        ConflictIndex.validate(held=...) to sweep them against the assigned shifts"""
+        with self._lock:
+            return self._intervals.held()
+
+    # --- Reporting -----------------------------------------------------------
+
+    @property
+    def loads(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._load)
+
+    def report(self, since: Optional[Dict[str, float]] = None) -> FairnessReport:
+        """Fairness of accumulated load, or of the load added since an earlier `loads` snapshot"""
+        loads = self.loads
+        return fairness_report(load - (since or {}).get(name, 0.0) for name, load in loads.items())
+
+    # --- Persistence ---------------------------------------------------------
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "loads": dict(self._load),
+                "weekend_calls": [[name, month, count] for (name, month), count in self._weekend_calls.items()],
+                "assigned": [[day, kind, location, list(names)]
+                             for (day, kind, location), names in self._assigned.items()]
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict, radiologists: List[Radiologist],
+                  conflicts: Optional[Conflicts] = None) -> "RotationQueue":
+        """Resume a saved rotation for the current roster"""
+        queue = cls(conflicts=conflicts)
+        queue._load = {name: float(load) for name, load in data.get("loads", {}).items()}
+        queue._weekend_calls = {(name, month): count for name, month, count in data.get("weekend_calls", ())}
+        for day, kind, location, names in data.get("assigned", ()):
+            queue._assigned[(day, kind, location)] = tuple(names)
+            queue._busy.setdefault(day, set()).update(names)
+            start, end = shift_interval(_probe(date.fromordinal(day), kind, location))
+            for name in names:
+                queue._intervals.add(name, start, end, (date.fromordinal(day).isoformat(), kind, location))
+        queue._members = {}
+        queue.sync(radiologists)
+        return queue
+
+def simulate_year(radiologists: List[Radiologist], locations: List[str], start: date, requirements: Requirements,
+                  weeks: int = 52) -> Dict[str, FairnessReport]:
+    """Total call load (history plus `weeks` of scheduling) under the rotation queue
+    and under the old index round-robin. The round-robin, which ignores eligibility,
+    is only given the calls the rotation could staff, so both spread the same load."""
+    queue = RotationQueue(radiologists)
+    round_robin = {rad.name: float(rad.call_history.get("year_total", 0)) for rad in radiologists}
+    required = filled = 0
+    for week in range(weeks):
+        monday = start + timedelta(weeks=week)
+        schedule = queue.schedule_week(locations, monday, requirements, publish=True)
+        for offset in range(7):
+            day = monday + timedelta(days=offset)
+            for kind in SHIFT_KINDS:
+                rad = radiologists[(offset + (1 if kind == "Night" else 0)) % len(radiologists)]
+                for location in locations:
+                    staffed = len(schedule[f"{day:%A} {kind}"][location])
+                    required += max(0, requirements(location, day, shift_type(day, kind)))
+                    filled += staffed
+                    round_robin[rad.name] += slot_weight(day, kind) * staffed
+    fill_rate = round(filled / required, 4) if required else 1.0
+    return {"round_robin": replace(fairness_report(round_robin.values()), fill_rate=fill_rate),
+            "rotation": replace(queue.report(), fill_rate=fill_rate)}
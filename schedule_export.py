@@ -0,0 +1,279 @@
+"""
+Streaming iCalendar and CSV schedule export for RadFlow Pro
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from data_models import AppData, OpenShift
+from instrumentation import timed
+
+PRODID = "-//RadFlow Pro//Call Schedule//EN"
+DEFAULT_TIMEZONE = os.environ.get("RADFLOW_TIMEZONE", "America/New_York")  # shift times are local to the sites
+MANIFEST_NAME = "manifest.json"
+CSV_COLUMNS = ["shift_id", "date", "start", "end", "shift", "location", "radiologist",
+               "subspecialty_required", "assignment_mode", "base_compensation"]
+
+@dataclass
+class ExportResult:
+    written: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+def slugify(text: str) -> str:
+    """Make a file-name safe slug"""
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+def unique_slugs(names: Iterable[str]) -> Dict[str, str]:
+    """Slug per name; names that would share a slug ("St. Mary's" and "St Marys") each
+    get a short hash of the full name appended, so no feed overwrites another"""
+    by_slug = defaultdict(set)
+    for name in names:
+        by_slug[slugify(name)].add(name)
+    slugs = {}
+    for slug, group in by_slug.items():
+        for name in group:
+            if len(group) == 1 and slug:
+                slugs[name] = slug
+            else:
+                suffix = hashlib.sha1(name.encode("utf-8")).hexdigest()[:6]
+                slugs[name] = f"{slug}-{suffix}" if slug else suffix
+    return slugs
+
+def calendar_timezone(app_data: AppData) -> str:
+    """IANA zone the department's shift times are in"""
+    return app_data.department_settings.get("timezone", DEFAULT_TIMEZONE)
+
+def shift_fingerprint(shift: OpenShift) -> str:
+    """Hash of every field that appears in an exported event"""
+    parts = (shift.id, shift.date, shift.shift, shift.duration, shift.location, shift.assigned_to,
+             shift.subspecialty_required, shift.assignment_mode, shift.base_compensation, shift.status)
+    return hashlib.sha1("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+def feed_etag(shifts: Iterable[OpenShift], tz_name: str = DEFAULT_TIMEZONE) -> str:
+    """Strong ETag for a feed, computed without rendering it"""
+    digest = hashlib.sha256(tz_name.encode("utf-8"))
+    for shift in sorted(shifts, key=lambda s: s.id):
+        digest.update(shift_fingerprint(shift).encode("ascii"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+def group_feeds(app_data: AppData) -> Dict[str, List[OpenShift]]:
+    """Assigned shifts keyed by feed name, one feed per radiologist and per location"""
+    assigned = app_data.get_assigned_shifts()
+    radiologists = unique_slugs({shift.assigned_to for shift in assigned})
+    locations = unique_slugs({shift.location for shift in assigned})
+    feeds = defaultdict(list)
+    for shift in assigned:
+        feeds[f"radiologist-{radiologists[shift.assigned_to]}"].append(shift)
+        feeds[f"location-{locations[shift.location]}"].append(shift)
+    return feeds
+
+# --- iCalendar ------------------------------------------------------------
+
+def _ics_text(value) -> str:
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets (RFC 5545 section 3.1)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1  # never split a multi-byte character
+        parts.append(encoded[start:end].decode("utf-8"))
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+def _utc_offset(delta: timedelta) -> str:
+    seconds = int(delta.total_seconds())
+    sign = "-" if seconds < 0 else "+"
+    hours, rest = divmod(abs(seconds), 3600)
+    return f"{sign}{hours:02d}{rest // 60:02d}"
+
+def _transitions(tz: ZoneInfo, first_year: int, last_year: int) -> List[Tuple[datetime, timedelta, timedelta]]:
+    """UTC offset changes in [first_year, last_year], found day by day and then
+    bisected to the second: (instant in UTC, offset before, offset after)"""
+    moment = datetime(first_year, 1, 1, tzinfo=timezone.utc)
+    end = datetime(last_year + 1, 1, 1, tzinfo=timezone.utc)
+    offset = moment.astimezone(tz).utcoffset()
+    transitions = []
+    while moment < end:
+        following = moment + timedelta(days=1)
+        next_offset = following.astimezone(tz).utcoffset()
+        if next_offset != offset:
+            low, high = moment, following
+            while high - low > timedelta(seconds=1):
+                middle = low + (high - low) / 2
+                if middle.astimezone(tz).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            transitions.append((high, offset, next_offset))
+            offset = next_offset
+        moment = following
+    return transitions
+
+def iter_vtimezone(tz_name: str, first_year: int, last_year: int) -> Iterator[str]:
+    """VTIMEZONE for `tz_name` with one observance per transition in the years
+    covered, so clients without the IANA database still place events correctly"""
+    tz = ZoneInfo(tz_name)
+    opening = datetime(first_year, 1, 1, tzinfo=tz)
+    observances = [(opening.replace(tzinfo=None), opening.utcoffset(), opening.utcoffset(), opening)]
+    for instant, before, after in _transitions(tz, first_year, last_year):
+        observances.append(((instant + before).replace(tzinfo=None), before, after, instant.astimezone(tz)))
+    yield _fold("BEGIN:VTIMEZONE")
+    yield _fold(f"TZID:{tz_name}")
+    for local_start, before, after, aware in observances:
+        kind = "DAYLIGHT" if aware.dst() else "STANDARD"
+        yield _fold(f"BEGIN:{kind}")
+        yield _fold(f"DTSTART:{local_start.strftime('%Y%m%dT%H%M%S')}")
+        yield _fold(f"TZOFFSETFROM:{_utc_offset(before)}")
+        yield _fold(f"TZOFFSETTO:{_utc_offset(after)}")
+        if aware.tzname():
+            yield _fold(f"TZNAME:{_ics_text(aware.tzname())}")
+        yield _fold(f"END:{kind}")
+    yield _fold("END:VTIMEZONE")
+
+def iter_ics(shifts: Iterable[OpenShift], calendar_name: str,
+             sequences: Optional[Dict[str, int]] = None, tz_name: str = DEFAULT_TIMEZONE) -> Iterator[str]:
+    """Yield an iCalendar document one folded line at a time; event times carry
+    TZID=`tz_name` rather than floating, so clients elsewhere don't shift them"""
+    shifts = list(shifts)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield _fold("BEGIN:VCALENDAR")
+    yield _fold("VERSION:2.0")
+    yield _fold(f"PRODID:{PRODID}")
+    yield _fold("CALSCALE:GREGORIAN")
+    yield _fold(f"X-WR-CALNAME:{_ics_text(calendar_name)}")
+    yield _fold(f"X-WR-TIMEZONE:{tz_name}")
+    if shifts:
+        years = [int(shift.date[:4]) for shift in shifts]
+        yield from iter_vtimezone(tz_name, min(years), max(years) + 1)  # night shifts can end next year
+    for shift in shifts:
+        start, end = shift.window()
+        yield _fold("BEGIN:VEVENT")
+        yield _fold(f"UID:shift-{shift.id}@radflow")
+        yield _fold(f"SEQUENCE:{(sequences or {}).get(str(shift.id), 0)}")
+        yield _fold(f"DTSTAMP:{stamp}")
+        yield _fold(f"DTSTART;TZID={tz_name}:{start.strftime('%Y%m%dT%H%M%S')}")
+        yield _fold(f"DTEND;TZID={tz_name}:{end.strftime('%Y%m%dT%H%M%S')}")
+        yield _fold(f"SUMMARY:{_ics_text(f'{shift.shift} - {shift.location}')}")
+        yield _fold(f"LOCATION:{_ics_text(shift.location)}")
+        yield _fold(f"DESCRIPTION:{_ics_text(f'Radiologist: {shift.assigned_to}; Mode: {shift.assignment_mode}')}")
+        yield _fold("END:VEVENT")
+    yield _fold("END:VCALENDAR")
+
+# --- CSV ------------------------------------------------------------------
+
+def iter_csv(shifts: Iterable[OpenShift], tz_name: str = DEFAULT_TIMEZONE) -> Iterator[str]:
+    """Yield a CSV snapshot one row at a time; start and end include the UTC offset"""
+    tz = ZoneInfo(tz_name)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        row = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return row
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for shift in shifts:
+        start, end = shift.window()
+        writer.writerow([shift.id, shift.date, start.replace(tzinfo=tz).isoformat(),
+                         end.replace(tzinfo=tz).isoformat(), shift.shift,
+                         shift.location, shift.assigned_to, shift.subspecialty_required,
+                         shift.assignment_mode, shift.base_compensation])
+        yield flush()
+
+# --- Incremental export ---------------------------------------------------
+
+def load_manifest(out_dir: str) -> Dict:
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+def _write_stream(path: str, chunks: Iterable[str]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+    os.replace(tmp_path, path)
+
+def _bump_sequences(previous: Dict, shifts: List[OpenShift]) -> Dict[str, Tuple[str, int]]:
+    """Carry per-event sequence numbers forward, bumping only changed events"""
+    sequences = {}
+    for shift in shifts:
+        fingerprint = shift_fingerprint(shift)
+        old_fingerprint, old_sequence = previous.get(str(shift.id), (fingerprint, 0))
+        sequences[str(shift.id)] = (fingerprint, old_sequence + (old_fingerprint != fingerprint))
+    return sequences
+
+@timed()
+def export_schedule(app_data: AppData, out_dir: str, force: bool = False) -> ExportResult:
+    """Write per-radiologist and per-location .ics feeds plus a CSV snapshot,
+    skipping any file whose ETag matches the previous export"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    result = ExportResult()
+    tz_name = calendar_timezone(app_data)
+
+    targets = [(f"{name}.ics", name, shifts) for name, shifts in sorted(group_feeds(app_data).items())]
+    targets.append(("schedule.csv", "schedule", app_data.get_assigned_shifts()))
+
+    for file_name, feed_name, shifts in targets:
+        shifts = sorted(shifts, key=lambda s: (s.date, s.id))
+        etag = feed_etag(shifts, tz_name)
+        previous = manifest.get(file_name, {})
+        path = os.path.join(out_dir, file_name)
+        if not force and previous.get("etag") == etag and os.path.exists(path):
+            result.unchanged.append(file_name)
+            continue
+
+        sequences = _bump_sequences(previous.get("sequences", {}), shifts)
+        if file_name.endswith(".ics"):
+            chunks = iter_ics(shifts, feed_name, {key: seq for key, (_, seq) in sequences.items()}, tz_name)
+        else:
+            chunks = iter_csv(shifts, tz_name)
+        _write_stream(path, chunks)
+        manifest[file_name] = {"etag": etag, "sequences": sequences}
+        result.written.append(file_name)
+
+    # Feeds that no longer have any assignments are removed
+    current = {file_name for file_name, _, _ in targets}
+    for file_name in [name for name in manifest if name not in current]:
+        stale_path = os.path.join(out_dir, file_name)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+        del manifest[file_name]
+
+    _write_stream(os.path.join(out_dir, MANIFEST_NAME), [json.dumps(manifest, indent=1, sort_keys=True)])
+    return result
+
+def main(argv=None):
+    """Export the sample schedule from the command line"""
+    argv = sys.argv[1:] if argv is None else argv
+    paths = [arg for arg in argv if not arg.startswith("--")]
+    out_dir = paths[0] if paths else "schedule_export"
+    result = export_schedule(AppData(), out_dir, force="--force" in argv)
+    print(f"Exported to {out_dir}: {len(result.written)} written, {len(result.unchanged)} unchanged")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+In-process inverted index over consultations, messages and shifts with prefix, phrase and filtered queries
+"""
+
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from data_models import AppData
+from instrumentation import timed
+
+TOKEN = re.compile(r"[a-z0-9]+")
+QUERY_CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+MAX_PREFIX_TERMS = 256  # a one-letter prefix stops expanding after this many vocabulary terms
+RESULT_CACHE_SIZE = 64  # reruns repeat the same query; cleared whenever the index changes
+KINDS = ("consultations", "messages", "open_shifts")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+@dataclass
+class _Doc:
+    kind: str
+    key: int
+    text: Tuple[str, ...]
+    day: Optional[int]  # date ordinal, None when the record has no date
+    specialty: Optional[str]
+    urgency: Optional[str]
+
+@dataclass
+class SearchHit:
+    kind: str
+    key: int
+    score: float
+    record: object
+
+def _day(text: str) -> Optional[int]:
+    try:
+        return date.fromisoformat(text[:10]).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+def _document(kind: str, record) -> _Doc:
+    """Searchable text and filter attributes of one record"""
+    if kind == "consultations":
+        fields = (record.case_id, record.description, record.specialty_needed, record.urgency,
+                  record.requesting_physician, record.status)
+        return _Doc(kind, record.id, fields, _day(record.created), record.specialty_needed, record.urgency)
+    if kind == "messages":
+        return _Doc(kind, record.id, (record.sender, record.recipient, record.body, record.priority),
+                    None, None, record.priority)
+    fields = (record.shift, record.location, record.subspecialty_required, record.assignment_mode,
+              record.status, record.assigned_to or "", record.date)
+    return _Doc(kind, record.id, fields, _day(record.date), record.subspecialty_required, None)
+
+class SearchIndex:
+    """term -> {doc: positions} postings with a sorted vocabulary for prefix
+    expansion and attribute sets for filters. Kept current from the shard's change
+    events, so a new message is searchable as soon as it is stored."""
+
+    def __init__(self, app_data: AppData):
+        self.app_data = app_data
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+        self._vocabulary: List[str] = []
+        self._docs: Dict[int, _Doc] = {}
+        self._doc_ids: Dict[Tuple[str, int], int] = {}
+        self._by_attribute: Dict[Tuple[str, str], Set[int]] = {}
+        self._lists: Dict[str, list] = {}
+        self._next_id = 0
+        self._results: Dict[Tuple, List[Tuple[str, int, float]]] = {}
+        app_data.subscribe(self._on_change)
+        for kind in KINDS:
+            self._reload(kind)
+
+    # --- Maintenance ---------------------------------------------------------
+
+    def _reload(self, kind: str) -> None:
+        with self._lock:
+            for doc_id in [doc_id for (k, _), doc_id in self._doc_ids.items() if k == kind]:
+                self._remove(doc_id)
+            items = getattr(self.app_data, kind)
+            for record in items:
+                self._index(kind, record)
+            self._lists[kind] = items
+
+    def _current(self) -> None:
+        for kind in KINDS:
+            if getattr(self.app_data, kind) is not self._lists.get(kind):
+                self._reload(kind)  # list replaced wholesale, no events were seen
+
+    def _attributes(self, doc: _Doc):
+        return [(name, value.lower()) for name, value in (("specialty", doc.specialty), ("urgency", doc.urgency))
+                if value]
+
+    def _index(self, kind: str, record) -> None:
+        doc = _document(kind, record)
+        doc_id = self._doc_ids.get((kind, doc.key))
+        if doc_id is not None:
+            old = self._docs[doc_id]
+            if (old.text, old.day, old.specialty, old.urgency) == (doc.text, doc.day, doc.specialty, doc.urgency):
+                return  # e.g. a new bid: nothing searchable changed
+            self._remove(doc_id)
+        doc_id = self._next_id
+        self._next_id += 1
+        self._results.clear()
+        self._docs[doc_id] = doc
+        self._doc_ids[(kind, doc.key)] = doc_id
+        positions: Dict[str, List[int]] = {}
+        for position, term in enumerate(tokenize(" ".join(doc.text))):
+            positions.setdefault(term, []).append(position)
+        for term, where in positions.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            postings[doc_id] = tuple(where)
+        for attribute in self._attributes(doc):
+            self._by_attribute.setdefault(attribute, set()).add(doc_id)
+
+    def _remove(self, doc_id: int) -> None:
+        self._results.clear()
+        doc = self._docs.pop(doc_id)
+        del self._doc_ids[(doc.kind, doc.key)]
+        for term in set(tokenize(" ".join(doc.text))):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        for attribute in self._attributes(doc):
+            self._by_attribute[attribute].discard(doc_id)
+
+    def _on_change(self, collection: str, old: List, new: List) -> None:
+        if collection not in KINDS:
+            return
+        with self._lock:
+            for record in new:
+                self._index(collection, record)
+
+    # --- Queries -------------------------------------------------------------
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + len(self._docs) / (1 + df))
+
+    def _term(self, term: str) -> Dict[int, float]:
+        postings = self._postings.get(term, {})
+        idf = self._idf(len(postings))
+        return {doc_id: len(where) * idf for doc_id, where in postings.items()}
+
+    def _prefix(self, prefix: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for term in self._expand(prefix):
+            for doc_id, score in self._term(term).items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return scores
+
+    def _phrase(self, terms: List[str]) -> Dict[int, float]:
+        if len(terms) == 1:
+            return self._term(terms[0])
+        lists = [self._postings.get(term) for term in terms]
+        if not all(lists):
+            return {}
+        candidates = set(min(lists, key=len))
+        for postings in lists:
+            candidates.intersection_update(postings)
+        idf = sum(self._idf(len(postings)) for postings in lists)
+        first, rest = lists[0], list(enumerate(lists[1:], 1))
+        scores = {}
+        for doc_id in candidates:
+            matches = 0
+            for start in first[doc_id]:
+                for offset, postings in rest:
+                    if start + offset not in postings[doc_id]:
+                        break
+                else:
+                    matches += 1
+            if matches:
+                scores[doc_id] = matches * idf
+        return scores
+
+    def _clauses(self, query: str) -> Iterable[Dict[int, float]]:
+        for phrase, word in QUERY_CLAUSE.findall(query.lower()):
+            if phrase:
+                terms = tokenize(phrase)
+                if terms:
+                    yield self._phrase(terms)
+            elif word.endswith("*"):
+                terms = tokenize(word[:-1])
+                if len(terms) > 1:
+                    yield self._phrase(terms[:-1])
+                if terms:
+                    yield self._prefix(terms[-1])
+            else:
+                terms = tokenize(word)  # "RAD-2025-001" is a phrase of its tokens
+                if terms:
+                    yield self._phrase(terms)
+
+    @timed()
+    def search(self, query: str = "", kinds: Optional[Iterable[str]] = None, specialty: Optional[str] = None,
+               urgency: Optional[str] = None, date_from: Optional[date] = None, date_to: Optional[date] = None,
+               limit: int = 20) -> List[SearchHit]:
+        """All clauses must match: plain terms, "quoted phrases" and prefix* terms.
+        Filters narrow by kind, specialty, urgency/priority and date range."""
+        self._current()
+        cache_key = (query, tuple(sorted(kinds)) if kinds else None, specialty, urgency, date_from, date_to, limit)
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is None:
+                cached = self._search(query, kinds, specialty, urgency, date_from, date_to, limit)
+                if len(self._results) >= RESULT_CACHE_SIZE:
+                    self._results.pop(next(iter(self._results)))
+                self._results[cache_key] = cached
+        # resolve records at read time: a cached hit may since have been replaced (e.g. a new bid)
+        hits = []
+        for kind, key, score in cached:
+            pos = self.app_data._key_index(kind, "id").get(key)
+            hits.append(SearchHit(kind, key, score, getattr(self.app_data, kind)[pos] if pos is not None else None))
+        return hits
+
+    def _search(self, query, kinds, specialty, urgency, date_from, date_to, limit) -> List[Tuple[str, int, float]]:
+        scores: Optional[Dict[int, float]] = None
+        for clause in sorted(self._clauses(query), key=len):
+            if scores is None:
+                scores = clause
+            else:
+                scores = {doc_id: score + clause[doc_id] for doc_id, score in scores.items() if doc_id in clause}
+            if not scores:
+                return []
+
+        filters = [self._by_attribute.get((name, value.lower()), set())
+                   for name, value in (("specialty", specialty), ("urgency", urgency)) if value]
+        if scores is None:
+            if not filters:
+                return []
+            scores = {doc_id: 0.0 for doc_id in min(filters, key=len)}
+        wanted_kinds = set(kinds) if kinds else None
+        low = date_from.toordinal() if date_from else None
+        high = date_to.toordinal() if date_to else None
+        docs = self._docs
+
+        def keep(doc_id: int) -> bool:
+            doc = docs[doc_id]
+            if wanted_kinds is not None and doc.kind not in wanted_kinds:
+                return False
+            if any(doc_id not in allowed for allowed in filters):
+                return False
+            if low is None and high is None:
+                return True
+            return doc.day is not None and (low is None or doc.day >= low) and (high is None or doc.day <= high)
+
+        candidates = scores if not (wanted_kinds or filters or low or high) else \
+            {doc_id: score for doc_id, score in scores.items() if keep(doc_id)}
+        # best score first, newest (latest indexed) among equals; walking newest-first means
+        # ties never displace heap entries, so this stays O(n) with no sort of every match
+        top = heapq.nlargest(limit, zip(reversed(candidates.values()), reversed(candidates.keys())))
+        return [(docs[doc_id].kind, docs[doc_id].key, round(score, 3)) for score, doc_id in top]
+
+    @property
+    def token_count(self) -> int:
+        return sum(len(where) for postings in self._postings.values() for where in postings.values())
@@ -0,0 +1,181 @@
+"""
+Copy-on-write per-session overlays over the shared department data
+"""
+
+import copy
+from dataclasses import replace
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from bidding import BidRejected, validate_bid
+from departments import DepartmentStore
+from instrumentation import timed
+
+# collection -> attribute used as the record key
+COLLECTION_KEYS = {
+    "radiologists": "id",
+    "locations": "name",
+    "open_shifts": "id",
+    "consultations": "id"
+}
+
+class CommitConflict(Exception):
+    """Another session committed a change to a record this overlay also edited"""
+
+class SessionOverlay:
+    """Pending edits of one browser session. The shared records are never
+    mutated; reads see base + overlay, and commit swaps in new record copies."""
+
+    def __init__(self, store: DepartmentStore, department: str):
+        self.store = store
+        self.department = department
+        self._record_changes: Dict[Tuple[str, Hashable], Dict[str, Any]] = {}
+        self._record_bases: Dict[Tuple[str, Hashable], Any] = {}
+        self._setting_changes: Dict[Tuple[str, ...], Any] = {}
+        self._draft_bids: Dict[int, int] = {}
+        self._views: Dict[Tuple[str, Hashable], Any] = {}
+
+    @property
+    def base(self):
+        return self.store.shard(self.department)
+
+    @property
+    def pending_count(self) -> int:
+        return (sum(len(fields) for fields in self._record_changes.values())
+                + len(self._setting_changes) + len(self._draft_bids))
+
+    def _base_record(self, collection: str, key: Hashable):
+        index = self.base._key_index(collection, COLLECTION_KEYS[collection])
+        pos = index.get(key)
+        if pos is None:
+            raise KeyError(f"No {collection} record with key {key!r}")
+        return getattr(self.base, collection)[pos]
+
+    # --- Records -------------------------------------------------------------
+
+    def get(self, collection: str, key: Hashable):
+        """The record as this session sees it"""
+        record_key = (collection, key)
+        changes = self._record_changes.get(record_key)
+        if not changes:
+            return self._base_record(collection, key)
+        view = self._views.get(record_key)
+        if view is None:
+            view = self._views[record_key] = self._apply(self._record_bases[record_key], changes)
+        return view
+
+    def update(self, collection: str, key: Hashable, **fields) -> None:
+        """Stage field changes; dict-valued fields are merged key by key"""
+        record_key = (collection, key)
+        if record_key not in self._record_bases:
+            self._record_bases[record_key] = self._base_record(collection, key)
+        changes = self._record_changes.setdefault(record_key, {})
+        for name, value in fields.items():
+            if isinstance(value, dict) and isinstance(getattr(self._record_bases[record_key], name), dict):
+                changes.setdefault(name, {}).update(value)
+            else:
+                changes[name] = value
+        self._views.pop(record_key, None)
+
+    def record_changes(self) -> Dict[Tuple[str, Hashable], Dict[str, Any]]:
+        return {key: dict(changes) for key, changes in self._record_changes.items()}
+
+    @staticmethod
+    def _apply(base, changes: Dict[str, Any]):
+        merged = {}
+        for name, value in changes.items():
+            current = getattr(base, name)
+            merged[name] = {**current, **value} if isinstance(current, dict) and isinstance(value, dict) else value
+        return replace(base, **merged)
+
+    # --- Department settings -------------------------------------------------
+
+    def get_setting(self, path: Tuple[str, ...], default: Any = None) -> Any:
+        path = tuple(path)
+        if path in self._setting_changes:
+            return self._setting_changes[path]
+        node = self.base.department_settings
+        for part in path:
+            if not isinstance(node, dict) or part not in node:
+                return default
+            node = node[part]
+        return node
+
+    def set_setting(self, path: Tuple[str, ...], value: Any) -> None:
+        path = tuple(path)
+        if path in self._setting_changes or self.get_setting(path) != value:
+            self._setting_changes[path] = value
+
+    def setting_changes(self) -> Dict[Tuple[str, ...], Any]:
+        return dict(self._setting_changes)
+
+    # --- Draft bids ----------------------------------------------------------
+
+    def draft_bid(self, shift_id: int, amount: int) -> None:
+        self._draft_bids[shift_id] = amount
+
+    def get_draft_bid(self, shift_id: int) -> Optional[int]:
+        return self._draft_bids.get(shift_id)
+
+    def draft_bids(self) -> Dict[int, int]:
+        return dict(self._draft_bids)
+
+    # --- Commit --------------------------------------------------------------
+
+    def discard(self) -> None:
+        self._discard(edits=True, bids=True)
+
+    def _discard(self, edits: bool, bids: bool) -> None:
+        if edits:
+            self._record_changes.clear()
+            self._record_bases.clear()
+            self._setting_changes.clear()
+            self._views.clear()
+        if bids:
+            self._draft_bids.clear()
+
+    @timed()
+    def commit(self, bidder: Optional[str] = None, edits: bool = True, bids: bool = True) -> int:
+        """Merge pending edits and/or draft bids into the shared shard atomically; returns
+        edits applied. Whatever is left out stays pending. Raises CommitConflict (and
+        applies nothing) if an edited record changed underneath or a bid is rejected."""
+        edit_count = sum(len(fields) for fields in self._record_changes.values()) + len(self._setting_changes)
+        draft_bids = list(self._draft_bids.items()) if bids else []
+        applied = (edit_count if edits else 0) + len(draft_bids)
+        if not applied:
+            return 0
+        with self.store.transaction():
+            base = self.base
+            if edits:
+                for (collection, key), original in self._record_bases.items():
+                    if self._base_record(collection, key) is not original:
+                        raise CommitConflict(f"{collection} {key!r} was changed by another session")
+            if draft_bids:
+                if bidder is None:
+                    raise ValueError("A bidder is required to submit draft bids")
+                for shift_id, amount in draft_bids:
+                    try:
+                        validate_bid(base, base.get_shift_by_id(shift_id), bidder, amount)
+                    except BidRejected as exc:
+                        raise CommitConflict(str(exc)) from None
+
+            if edits:
+                by_collection: Dict[str, List] = {}
+                for (collection, key), changes in self._record_changes.items():
+                    by_collection.setdefault(collection, []).append(
+                        self._apply(self._record_bases[(collection, key)], changes))
+                for collection, records in by_collection.items():
+                    base._upsert(collection, COLLECTION_KEYS[collection], records)
+
+            if edits and self._setting_changes:
+                settings = copy.deepcopy(base.department_settings)
+                for path, value in self._setting_changes.items():
+                    node = settings
+                    for part in path[:-1]:
+                        node = node.setdefault(part, {})
+                    node[path[-1]] = value
+                base.replace_settings(settings)
+
+            if draft_bids:
+                self.store.bidding.place_bids(self.department, draft_bids, bidder)
+        self._discard(edits=edits, bids=bids)
+        return applied
@@ -0,0 +1,363 @@
+"""
+Validated, write-behind persistence for department settings and personal preferences
+"""
+
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from departments import DepartmentStore
+from file_locks import lock_file
+from instrumentation import timed
+
+DEFAULT_PATH = os.environ.get("RADFLOW_SETTINGS_PATH", "radflow_settings.json")
+
+class SettingsValidationError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+# --- Validators -----------------------------------------------------------
+
+def _bool(value):
+    if not isinstance(value, bool):
+        raise ValueError("must be true or false")
+    return value
+
+def _int_range(low, high):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or int(value) != value:
+            raise ValueError("must be a whole number")
+        if not low <= value <= high:
+            raise ValueError(f"must be between {low:,} and {high:,}")
+        return int(value)
+    return check
+
+def _choice(options):
+    def check(value):
+        if value not in options:
+            raise ValueError(f"must be one of {', '.join(options)}")
+        return value
+    return check
+
+def _str_list(value):
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+        raise ValueError("must be a list of names")
+    return list(value)
+
+def _date_list(value):
+    for item in _str_list(value):
+        datetime.strptime(item, "%Y-%m-%d")
+    return list(value)
+
+def _text(value):
+    if not isinstance(value, str):
+        raise ValueError("must be text")
+    return value
+
+def _timezone(value):
+    try:
+        ZoneInfo(_text(value))
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError("must be an IANA time zone such as America/New_York") from None
+    return value
+
+def _rotation_state(value):
+    """RotationQueue.to_dict() of the published weeks"""
+    if not isinstance(value, dict) or not isinstance(value.get("loads", {}), dict) \
+            or not all(isinstance(value.get(key, []), list) for key in ("weekend_calls", "assigned")):
+        raise ValueError("must be a saved rotation")
+    return value
+
+DEPARTMENT_SETTING_RULES: Dict[Tuple[str, ...], Callable] = {
+    ("default_assignment_mode",): _choice(["Smart Distribution", "Bidding Mode", "Hybrid"]),
+    ("allow_mode_override",): _bool,
+    ("timezone",): _timezone,
+    ("bidding_rules", "min_bid_weekend_day"): _int_range(0, 20000),
+    ("bidding_rules", "min_bid_weekend_night"): _int_range(0, 20000),
+    ("bidding_rules", "max_bid_limit"): _int_range(0, 20000),
+    ("bidding_rules", "bid_increment"): _int_range(1, 1000),
+    ("bidding_rules", "default_bidding_time"): _int_range(1, 168),
+    ("bidding_rules", "auto_close_if_no_bids"): _bool,
+    ("bidding_rules", "cascade_to_bidding"): _bool,
+    ("bidding_rules", "cascade_timeout_hours"): _int_range(1, 168),
+    ("cost_control", "monthly_bidding_budget"): _int_range(0, 10_000_000),
+    ("cost_control", "approval_required_over"): _int_range(0, 20000),
+    ("cost_control", "cost_alert_threshold"): _int_range(0, 20000),
+    **{("notifications", key): _bool for key in ("email", "sms", "push")},
+    **{("integrations", key): _bool for key in ("pacs", "ris", "emr")},
+    ("rotation",): _rotation_state
+}
+
+PREFERENCE_RULES: Dict[str, Callable] = {
+    "max_weekend_calls": _int_range(1, 6),
+    "preferred_locations": _str_list,
+    "blackout_dates": _date_list,
+    "bidding_opt_in": _bool,
+    "max_auto_bid": _int_range(0, 20000),
+    "preferred_assignment_mode": _text
+}
+
+def validate_setting(path: Tuple[str, ...], value: Any) -> Any:
+    rule = DEPARTMENT_SETTING_RULES.get(tuple(path))
+    if rule is None:
+        raise ValueError(f"unknown setting {'.'.join(path)}")
+    try:
+        return rule(value)
+    except ValueError as exc:
+        raise ValueError(f"{'.'.join(path)} {exc}") from None
+
+def validate_preference(name: str, value: Any) -> Any:
+    rule = PREFERENCE_RULES.get(name)
+    if rule is None:
+        raise ValueError(f"unknown preference {name}")
+    try:
+        return rule(value)
+    except ValueError as exc:
+        raise ValueError(f"{name.replace('_', ' ')} {exc}") from None
+
+def _set_path(tree: Dict, path: Tuple[str, ...], value: Any) -> None:
+    for part in path[:-1]:
+        tree = tree.setdefault(part, {})
+    tree[path[-1]] = value
+
+def _get_path(tree: Dict, path: Tuple[str, ...], default=None):
+    for part in path:
+        if not isinstance(tree, dict) or part not in tree:
+            return default
+        tree = tree[part]
+    return tree
+
+# --- Store ----------------------------------------------------------------
+
+class SettingsStore:
+    """In-memory settings cache with a write-behind queue. put() updates the
+    cache immediately and coalesces into a pending batch; a background writer
+    flushes batches to one JSON file at most once per flush interval.
+
+    A flush re-reads the file under an exclusive lock and applies only this
+    process's pending edits to it, so workers sharing the file merge their
+    changes rather than the last writer replacing everyone else's."""
+
+    def __init__(self, path: str = DEFAULT_PATH, flush_interval: float = 0.5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time: the writer thread or close()
+        self._wakeup = threading.Event()
+        self._pending: Dict[Tuple, Any] = {}
+        self._views: Dict[Tuple, Any] = {}
+        self.stats = {"puts": 0, "coalesced": 0, "disk_writes": 0, "write_errors": 0}
+        self.last_error: Optional[Exception] = None
+        self._data = self._load()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, daemon=True, name="radflow-settings-writer")
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {"departments": {}, "preferences": {}}
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                data = json.load(handle)
+            if not isinstance(data, dict):
+                raise ValueError(f"{self.path} does not hold a JSON object")
+        except ValueError as exc:  # malformed or truncated: keep it for inspection, start from defaults
+            os.replace(self.path, f"{self.path}.corrupt-{datetime.now():%Y%m%d%H%M%S%f}")
+            self.last_error = exc
+            return {"departments": {}, "preferences": {}}
+        data.setdefault("departments", {})
+        data.setdefault("preferences", {})
+        return data
+
+    # Reads are served from memory; cached views are dropped on write and callers get copies
+    def department_settings(self, department: str) -> Dict:
+        key = ("departments", department)
+        with self._lock:
+            if key not in self._views:
+                self._views[key] = copy.deepcopy(self._data["departments"].get(department, {}))
+            return copy.deepcopy(self._views[key])
+
+    def preferences(self, department: str, radiologist_id: int) -> Dict:
+        key = ("preferences", department, str(radiologist_id))
+        with self._lock:
+            if key not in self._views:
+                self._views[key] = copy.deepcopy(
+                    self._data["preferences"].get(department, {}).get(str(radiologist_id), {}))
+            return copy.deepcopy(self._views[key])
+
+    @timed()
+    def put_settings(self, department: str, changes: Dict[Tuple[str, ...], Any]) -> None:
+        errors, clean = [], {}
+        for path, value in changes.items():
+            try:
+                clean[tuple(path)] = validate_setting(path, value)
+            except ValueError as exc:
+                errors.append(str(exc))
+        if errors:
+            raise SettingsValidationError(errors)
+        with self._lock:
+            for path, value in clean.items():
+                _set_path(self._data["departments"].setdefault(department, {}), path, value)
+                self._enqueue(("departments", department) + path, value)
+            self._views.pop(("departments", department), None)
+        self._wakeup.set()
+
+    @timed()
+    def put_preferences(self, department: str, radiologist_id: int, changes: Dict[str, Any]) -> None:
+        errors, clean = [], {}
+        for name, value in changes.items():
+            try:
+                clean[name] = validate_preference(name, value)
+            except ValueError as exc:
+                errors.append(str(exc))
+        if errors:
+            raise SettingsValidationError(errors)
+        with self._lock:
+            stored = self._data["preferences"].setdefault(department, {}).setdefault(str(radiologist_id), {})
+            for name, value in clean.items():
+                stored[name] = value
+                self._enqueue(("preferences", department, str(radiologist_id), name), value)
+            self._views.pop(("preferences", department, str(radiologist_id)), None)
+        self._wakeup.set()
+
+    def _enqueue(self, key: Tuple, value: Any) -> None:
+        self.stats["puts"] += 1
+        if key in self._pending:
+            self.stats["coalesced"] += 1
+        self._pending[key] = value
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    # --- Write-behind -----------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            if self._closed:
+                break
+            time.sleep(self.flush_interval)  # let rapid edits coalesce into one batch
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as exc:  # edits stay pending; keep the writer alive and retry next interval
+                self.last_error = exc
+                self._wakeup.set()
+
+    @timed()
+    def flush(self) -> int:
+        """Write pending edits into the file if there are any; returns edits flushed.
+        Edits are only dropped from the queue once the file has been replaced."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                edits = dict(self._pending)
+            try:
+                with open(f"{self.path}.lock", "a") as lock_handle:
+                    lock_file(lock_handle)  # other workers flushing the same file
+                    merged = self._load()
+                    for key, value in edits.items():
+                        _set_path(merged, key, value)
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as handle:
+                        handle.write(json.dumps(merged, indent=1, sort_keys=True))
+                        handle.flush()
+                        os.fsync(handle.fileno())
+                    os.replace(tmp_path, self.path)
+            except Exception:
+                with self._lock:
+                    self.stats["write_errors"] += 1
+                raise
+            with self._lock:
+                for key, value in edits.items():
+                    if key in self._pending and self._pending[key] == value:
+                        del self._pending[key]
+                for key, value in self._pending.items():  # queued during the write; still ours
+                    _set_path(merged, key, value)
+                self._data = merged  # now includes other workers' saved edits
+                self._views.clear()
+                self.stats["disk_writes"] += 1
+            self.last_error = None
+            return len(edits)
+
+    def close(self) -> None:
+        """Stop the writer, then write whatever is still pending"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._writer is not threading.current_thread():
+            self._writer.join(timeout=max(5.0, 2 * self.flush_interval))
+        self.flush()
+
+    # --- Integration with the shared data ---------------------------------
+
+    def apply_to(self, store: DepartmentStore) -> None:
+        """Overlay persisted settings and preferences onto freshly loaded shards. A
+        store attached to an existing shared database is left alone: SQLite already
+        holds every worker's committed settings, and this file may lag behind it."""
+        if store.shared is not None and not store.shared.seeded:
+            return
+        with store.transaction():
+            for department in store.departments:
+                shard = store.shard(department)
+                saved = self.department_settings(department)
+                if saved:
+                    settings = copy.deepcopy(shard.department_settings)
+                    for path in DEPARTMENT_SETTING_RULES:
+                        value = _get_path(saved, path)
+                        if value is not None:
+                            _set_path(settings, path, value)
+                    shard.department_settings = settings
+                updated = []
+                for rad in shard.radiologists:
+                    saved_prefs = self.preferences(department, rad.id)
+                    if saved_prefs:
+                        updated.append(replace(rad, preferences={**rad.preferences, **saved_prefs}))
+                if updated:
+                    shard.upsert_radiologists(updated)
+                shard.mark_changed()
+
+def commit_and_persist(overlay, settings_store: SettingsStore) -> int:
+    """Validate an overlay's settings and preference edits, commit them, then queue the writes.
+    Draft bids stay pending; they are only placed by overlay.commit(bidder=...)."""
+    setting_changes = overlay.setting_changes()
+    preference_changes = {key: changes["preferences"] for (collection, key), changes in overlay.record_changes().items()
+                          if collection == "radiologists" and "preferences" in changes}
+
+    errors = []
+    for path, value in setting_changes.items():
+        try:
+            validate_setting(path, value)
+        except ValueError as exc:
+            errors.append(str(exc))
+    for prefs in preference_changes.values():
+        for name, value in prefs.items():
+            try:
+                validate_preference(name, value)
+            except ValueError as exc:
+                errors.append(str(exc))
+    min_bid = overlay.get_setting(("bidding_rules", "min_bid_weekend_day"))
+    max_bid = overlay.get_setting(("bidding_rules", "max_bid_limit"))
+    if min_bid is not None and max_bid is not None and min_bid > max_bid:
+        errors.append("minimum weekend day bid cannot exceed the maximum bid limit")
+    if errors:
+        raise SettingsValidationError(errors)
+
+    applied = overlay.commit(bids=False)
+    if setting_changes:
+        settings_store.put_settings(overlay.department, setting_changes)
+    for radiologist_id, prefs in preference_changes.items():
+        settings_store.put_preferences(overlay.department, radiologist_id, prefs)
+    return applied
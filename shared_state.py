@@ -0,0 +1,375 @@
+"""
+SQLite (WAL) shared state so several Streamlit or API worker processes serve one dataset
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from audit_log import replaying
+from bidding import AUCTION_LOG_SIZE, AuctionEvent, BiddingEngine
+from data_models import AppData, Consultation, Location, Message, OpenShift, Radiologist, SwapRequest
+from departments import DepartmentStore
+from instrumentation import timed
+
+DEFAULT_PATH = os.environ.get("RADFLOW_SHARED_DB", "radflow_shared.db")
+
+# collection -> (record type, key attribute)
+RECORD_TYPES = {
+    "radiologists": (Radiologist, "id"),
+    "locations": (Location, "name"),
+    "open_shifts": (OpenShift, "id"),
+    "consultations": (Consultation, "id"),
+    "messages": (Message, "id"),
+    "swap_requests": (SwapRequest, "id")
+}
+SETTINGS = "department_settings"
+CHANGE_LOG_SIZE = 10000  # change-log rows kept; a worker further behind reloads every shard
+PRUNE_EVERY = 1000       # committed changes between prunes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    department TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (department, collection, key)
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    department TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS auction_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    department TEXT NOT NULL,
+    shift_id INTEGER NOT NULL,
+    radiologist TEXT,
+    amount INTEGER,
+    timestamp TEXT NOT NULL
+);
+"""
+
+class SharedState:
+    """Write-through copy of a DepartmentStore in one SQLite database.
+
+    Every write runs inside store.transaction(), which here also holds SQLite's
+    write lock (BEGIN IMMEDIATE), so bid placement is serialized across
+    processes. Each commit appends to a change log; other processes notice via
+    PRAGMA data_version (a cheap, lock-free check) and reload only the
+    records named in the log since their last sync. The log keeps its last
+    CHANGE_LOG_SIZE rows; a worker whose cursor was pruned reloads everything.
+    A transaction that fails reloads the records it touched, so memory never
+    keeps uncommitted writes."""
+
+    def __init__(self, path: str = DEFAULT_PATH, timeout: float = 30.0):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL stays consistent; fsync at checkpoints
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._seen_seq = 0
+        self._data_version = None
+        self.store: Optional[DepartmentStore] = None
+        self.seeded = False  # whether attach() created the database from the store
+        self.stats = {"syncs": 0, "records_reloaded": 0, "records_written": 0}
+
+    # --- Setup ---------------------------------------------------------------
+
+    def attach(self, store: DepartmentStore) -> DepartmentStore:
+        """Share a store: seeds an empty database from it, otherwise replaces its shards
+        with the database contents. Installs a bidding engine whose log lives in SQLite."""
+        self.store = store
+        store.shared = self
+        store._bidding = SharedBiddingEngine(store, self)
+        with store._lock, self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                departments = [row[0] for row in self._conn.execute(
+                    "SELECT DISTINCT department FROM records WHERE collection = ?", (SETTINGS,))]
+                if departments:
+                    for name in list(store.shards):
+                        store.remove_department(name)
+                    for name in departments:
+                        store.add_department(name, self._load_shard(name))
+                else:
+                    for name, shard in store.shards.items():
+                        self._write_shard(name, shard)
+                    self.seeded = True
+                self._seen_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._data_version = self._read_data_version()
+        return store
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # --- Serialization -------------------------------------------------------
+
+    @staticmethod
+    def _encode_key(key) -> str:
+        return json.dumps(key)
+
+    def _write_record(self, department: str, collection: str, key, position: int, data: Dict) -> None:
+        encoded = self._encode_key(key)
+        self._conn.execute(
+            "INSERT INTO records (department, collection, key, position, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (department, collection, key) DO UPDATE SET position = excluded.position, data = excluded.data",
+            (department, collection, encoded, position, json.dumps(data)))
+        self._conn.execute("INSERT INTO changes (department, collection, key) VALUES (?, ?, ?)",
+                           (department, collection, encoded))
+        self.stats["records_written"] += 1
+
+    def _write_shard(self, name: str, shard: AppData) -> None:
+        self._write_record(name, SETTINGS, "", 0, shard.department_settings)
+        for collection, (_, key) in RECORD_TYPES.items():
+            for position, record in enumerate(getattr(shard, collection)):
+                self._write_record(name, collection, getattr(record, key), position, record.to_dict())
+
+    def _has_department(self, name: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM records WHERE department = ? AND collection = ?",
+                                  (name, SETTINGS)).fetchone() is not None
+
+    def _delete_department(self, name: str) -> None:
+        self._conn.execute("DELETE FROM records WHERE department = ?", (name,))
+        self._conn.execute("INSERT INTO changes (department, collection, key) VALUES (?, ?, ?)",
+                           (name, SETTINGS, self._encode_key("")))
+
+    def _reload_department(self, name: str) -> None:
+        """Replace (or drop) a shard with the database's copy"""
+        if name in self.store.shards:
+            self.store.remove_department(name)
+        if self._has_department(name):
+            self.store.add_department(name, self._load_shard(name))
+
+    def _load_shard(self, name: str) -> AppData:
+        shard = AppData.empty(name)
+        rows = self._conn.execute("SELECT collection, data FROM records WHERE department = ? "
+                                  "ORDER BY collection, position", (name,))
+        for collection, data in rows:
+            if collection == SETTINGS:
+                shard.department_settings = json.loads(data)
+            elif collection in RECORD_TYPES:
+                getattr(shard, collection).append(RECORD_TYPES[collection][0].from_dict(json.loads(data)))
+        return shard
+
+    # --- Change notification -------------------------------------------------
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @timed()
+    def sync(self) -> int:
+        """Reload records other processes changed since the last sync; returns records reloaded"""
+        store = self.store
+        with store._lock, self._lock:
+            if self._depth == 0:
+                version = self._read_data_version()
+                if version == self._data_version:
+                    return 0
+                self._data_version = version
+            return self._apply_changes()
+
+    def _apply_changes(self) -> int:
+        with replaying():
+            return self._replay()
+
+    def _replay(self) -> int:
+        first, last = self._conn.execute("SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM changes").fetchone()
+        if last <= self._seen_seq:
+            return 0
+        if first > self._seen_seq + 1:
+            return self._reload_all(last)  # the log was pruned past our cursor
+        rows = self._conn.execute("SELECT seq, department, collection, key FROM changes WHERE seq > ? ORDER BY seq",
+                                  (self._seen_seq,)).fetchall()
+        self._seen_seq = rows[-1][0]
+        touched: Dict[str, Dict[str, set]] = {}
+        for _, department, collection, key in rows:
+            touched.setdefault(department, {}).setdefault(collection, set()).add(key)
+
+        reloaded = 0
+        for department, collections in touched.items():
+            if department not in self.store.shards or not self._has_department(department):
+                self._reload_department(department)  # added or removed by another worker
+                continue
+            shard = self.store.shard(department)
+            for collection, keys in collections.items():
+                placeholders = ",".join("?" * len(keys))
+                data = self._conn.execute(
+                    f"SELECT key, data FROM records WHERE department = ? AND collection = ? AND key IN ({placeholders}) "
+                    "ORDER BY position", (department, collection, *keys)).fetchall()
+                if collection == SETTINGS:
+                    shard.department_settings = json.loads(data[0][1])
+                    shard.mark_changed()
+                elif collection in RECORD_TYPES:
+                    record_type, key_attr = RECORD_TYPES[collection]
+                    shard._upsert(collection, key_attr, [record_type.from_dict(json.loads(row[1])) for row in data])
+                reloaded += len(data)
+        self.stats["syncs"] += 1
+        self.stats["records_reloaded"] += reloaded
+        return reloaded
+
+    def _reload_all(self, last_seq: int) -> int:
+        departments = {row[0] for row in self._conn.execute(
+            "SELECT DISTINCT department FROM records WHERE collection = ?", (SETTINGS,))}
+        for name in departments | set(self.store.shards):
+            self._reload_department(name)
+        self._seen_seq = last_seq
+        reloaded = sum(len(getattr(shard, collection)) for shard in self.store.shards.values()
+                       for collection in RECORD_TYPES)
+        self.stats["syncs"] += 1
+        self.stats["records_reloaded"] += reloaded
+        return reloaded
+
+    def _prune_changes(self, last_seq: int) -> None:
+        """Drop change-log rows older than CHANGE_LOG_SIZE, then checkpoint the WAL
+        so the freed pages are reused instead of growing the file"""
+        self._conn.execute("DELETE FROM changes WHERE seq <= ?", (last_seq - CHANGE_LOG_SIZE,))
+        self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    # --- Writes --------------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        """Cross-process write lock; records touched inside are written through on exit"""
+        store = self.store
+        with store._lock, self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+
+            self._conn.execute("BEGIN IMMEDIATE")  # blocks until no other process is writing
+            self._depth = 1
+            try:
+                self._apply_changes()  # see every write that committed before we took the lock
+                shards = dict(store.shards)
+                settings = {name: shard.department_settings for name, shard in shards.items()}
+                for shard in shards.values():
+                    shard._dirty = {}
+                yield
+                self._write_through(shards, settings)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._restore(shards, settings)
+                raise
+            finally:
+                self._depth = 0
+                for shard in store.shards.values():
+                    shard._dirty = None
+            # Our own commit bumps the change log; skip reloading what we just wrote
+            last_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            if last_seq // PRUNE_EVERY > self._seen_seq // PRUNE_EVERY:
+                self._prune_changes(last_seq)
+            self._seen_seq = last_seq
+            self._data_version = self._read_data_version()
+
+    def _restore(self, shards_before: Dict[str, AppData], settings_before: Dict[str, Dict]) -> None:
+        """Undo a failed transaction's in-memory writes: touched records are read back
+        from the database; a shard added, dropped or replaced (or with records that
+        only existed inside the transaction) is reloaded whole. Untouched shards,
+        e.g. after a rejected bid, cost nothing."""
+        for name in set(shards_before) | set(self.store.shards):
+            shard = self.store.shards.get(name)
+            if shards_before.get(name) is not shard:
+                self._reload_department(name)
+                continue
+            if shard.department_settings is not settings_before[name]:
+                shard.department_settings = settings_before[name]
+                shard.mark_changed()
+            for collection, keys in list((shard._dirty or {}).items()):
+                record_type, _ = RECORD_TYPES[collection]
+                encoded = [self._encode_key(key) for key in keys]
+                rows = self._conn.execute(
+                    f"SELECT data FROM records WHERE department = ? AND collection = ? "
+                    f"AND key IN ({','.join('?' * len(encoded))})", (name, collection, *encoded)).fetchall()
+                if len(rows) < len(encoded):  # inserted inside the transaction
+                    self._reload_department(name)
+                    break
+                shard._upsert(collection, RECORD_TYPES[collection][1],
+                              [record_type.from_dict(json.loads(row[0])) for row in rows])
+
+    def _write_through(self, shards_before: Dict[str, AppData], settings_before: Dict[str, Dict]) -> None:
+        for name in set(shards_before) - set(self.store.shards):
+            self._delete_department(name)
+        for name, shard in self.store.shards.items():
+            if shards_before.get(name) is not shard:
+                if name in shards_before:
+                    self._delete_department(name)  # replaced: drop records the new shard lacks
+                self._write_shard(name, shard)
+                continue
+            if shard.department_settings is not settings_before[name]:
+                self._write_record(name, SETTINGS, "", 0, shard.department_settings)
+            for collection, keys in (shard._dirty or {}).items():
+                key_attr = RECORD_TYPES[collection][1]
+                index = shard._key_index(collection, key_attr)
+                items = getattr(shard, collection)
+                for key in keys:
+                    self._write_record(name, collection, key, index[key], items[index[key]].to_dict())
+
+    # --- Auction log ---------------------------------------------------------
+
+    def append_event(self, event_type: str, department: str, shift_id: int, radiologist: Optional[str],
+                     amount: Optional[int]) -> AuctionEvent:
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self._lock:
+            seq = self._conn.execute(
+                "INSERT INTO auction_events (type, department, shift_id, radiologist, amount, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (event_type, department, shift_id, radiologist, amount, timestamp)).lastrowid
+            if seq % 1000 == 0:
+                self._conn.execute("DELETE FROM auction_events WHERE seq <= ?", (seq - AUCTION_LOG_SIZE,))
+        return AuctionEvent(seq, event_type, department, shift_id, radiologist, amount, timestamp)
+
+    def events_since(self, since: int, department: Optional[str] = None) -> List[AuctionEvent]:
+        query = "SELECT * FROM auction_events WHERE seq > ?"
+        params = [since]
+        if department is not None:
+            query += " AND department = ?"
+            params.append(department)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY seq", params).fetchall()
+        return [AuctionEvent(*row) for row in rows]
+
+    def event_bounds(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM auction_events").fetchone()
+
+class SharedBiddingEngine(BiddingEngine):
+    """BiddingEngine whose event log is the shared SQLite table, so deltas
+    are consistent whichever worker process a client polls"""
+
+    def __init__(self, store: DepartmentStore, shared: SharedState):
+        super().__init__(store)
+        self.shared = shared
+
+    def _record(self, event_type: str, department: str, shift_id: int, radiologist: Optional[str] = None,
+                amount: Optional[int] = None) -> AuctionEvent:
+        return self.shared.append_event(event_type, department, shift_id, radiologist, amount)
+
+    @property
+    def latest_seq(self) -> int:
+        return self.shared.event_bounds()[1]
+
+    def deltas(self, since: int, department: Optional[str] = None) -> Dict:
+        first, latest = self.shared.event_bounds()
+        return {
+            "latest_seq": latest,
+            "reset": bool(first) and since < first - 1,
+            "events": self.shared.events_since(since, department)
+        }
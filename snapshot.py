@@ -0,0 +1,168 @@
+"""
+Binary AppData snapshots: a section table over pickled columns, memory-mapped on load
+
+Layout (little-endian):
+    header   magic "RFSNAP", format version u16, schema version u16, section count u32
+    table    per section: name (16 bytes), offset u64, length u64, record count u32, crc32 u32
+    sections "meta" (JSON), "settings" and one per collection, each a pickle of
+             (field names, [row tuple, ...])
+"""
+
+import gc
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data_models import SCHEMA_KEY, SCHEMA_VERSION, AppData, Consultation, Location, Message, OpenShift, \
+    Radiologist, SwapRequest
+from instrumentation import timed
+
+MAGIC = b"RFSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<6sHHI")
+SECTION = struct.Struct("<16sQQII")
+COLLECTIONS = {
+    "radiologists": Radiologist,
+    "locations": Location,
+    "open_shifts": OpenShift,
+    "consultations": Consultation,
+    "messages": Message,
+    "swap_requests": SwapRequest
+}
+
+class SnapshotError(ValueError):
+    pass
+
+class _RowUnpickler(pickle.Unpickler):
+    """Sections hold only builtin containers and scalars; refuse anything that imports code"""
+
+    def find_class(self, module, name):
+        raise SnapshotError(f"snapshot section references {module}.{name}")
+
+def _section(fields: Tuple[str, ...], rows: List[Tuple]) -> bytes:
+    return pickle.dumps((fields, rows), protocol=pickle.HIGHEST_PROTOCOL)
+
+@timed()
+def save_snapshot(app_data: AppData, path: str) -> Dict[str, int]:
+    """Write `app_data` atomically to `path`; returns records written per collection"""
+    sections: List[Tuple[str, bytes, int]] = []
+    counts = {}
+    for collection, record_type in COLLECTIONS.items():
+        names = record_type.field_names()
+        rows = [tuple(record.__dict__[name] for name in names) for record in getattr(app_data, collection)]
+        sections.append((collection, _section(names, rows), len(rows)))
+        counts[collection] = len(rows)
+    sections.append(("settings", pickle.dumps(app_data.department_settings, protocol=pickle.HIGHEST_PROTOCOL), 1))
+    meta = {"department": app_data.department, SCHEMA_KEY: SCHEMA_VERSION, "counts": counts,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    sections.insert(0, ("meta", json.dumps(meta).encode(), 1))
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for name, payload, count in sections:
+        table.append(SECTION.pack(name.encode(), offset, len(payload), count, zlib.crc32(payload)))
+        offset += len(payload)
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, SCHEMA_VERSION, len(sections)))
+        handle.writelines(table)
+        handle.writelines(payload for _, payload, _ in sections)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, path)
+    return counts
+
+class Snapshot:
+    """A snapshot file mapped into memory. Only the header and section table are read
+    up front; each collection is checksummed and decoded only when asked for."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as handle:
+            try:
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise SnapshotError(f"{path} is not a RadFlow snapshot") from None
+        try:
+            self._read_table()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _read_table(self) -> None:
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"{self.path} is not a RadFlow snapshot")
+        magic, fmt, schema, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a RadFlow snapshot")
+        if fmt != FORMAT_VERSION:
+            raise SnapshotError(f"{self.path} uses snapshot format v{fmt}, expected v{FORMAT_VERSION}")
+        self.schema_version = schema
+        self.sections: Dict[str, Tuple[int, int, int, int]] = {}
+        for i in range(count):
+            name, offset, length, records, crc = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            if offset + length > len(self._map):
+                raise SnapshotError(f"{self.path} is truncated")
+            self.sections[name.rstrip(b"\0").decode()] = (offset, length, records, crc)
+        self.meta = json.loads(self._payload("meta"))
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _payload(self, name: str) -> bytes:
+        if name not in self.sections:
+            raise SnapshotError(f"{self.path} has no '{name}' section")
+        offset, length, _, crc = self.sections[name]
+        payload = self._map[offset:offset + length]
+        if zlib.crc32(payload) != crc:
+            raise SnapshotError(f"{self.path}: section '{name}' is corrupt")
+        return payload
+
+    def _unpickle(self, name: str):
+        return _RowUnpickler(io.BytesIO(self._payload(name))).load()
+
+    def count(self, collection: str) -> int:
+        return self.sections[collection][2]
+
+    def records(self, collection: str) -> List:
+        """Decode one collection; rows from an older schema go through from_dict migrations"""
+        record_type = COLLECTIONS[collection]
+        names, rows = self._unpickle(collection)
+        names = tuple(names)
+        if self.schema_version == SCHEMA_VERSION and names == record_type.field_names():
+            return [record_type(*row) for row in rows]
+        return [record_type.from_dict({SCHEMA_KEY: self.schema_version, **dict(zip(names, row))}) for row in rows]
+
+    def settings(self) -> Dict:
+        return self._unpickle("settings")
+
+    @timed()
+    def load(self, department: Optional[str] = None, collections: Optional[Iterable[str]] = None) -> AppData:
+        """An AppData with every collection (or just `collections`; the rest stay empty)"""
+        app_data = AppData.empty(department or self.meta["department"])
+        app_data.department_settings = self.settings()
+        collecting = gc.isenabled()
+        gc.disable()  # collector passes over 100k+ fresh, acyclic records cost more than decoding them
+        try:
+            for collection in collections or COLLECTIONS:
+                setattr(app_data, collection, self.records(collection))
+        finally:
+            if collecting:
+                gc.enable()
+        return app_data
+
+def load_snapshot(path: str, department: Optional[str] = None) -> AppData:
+    with Snapshot(path) as snapshot:
+        return snapshot.load(department)
@@ -0,0 +1,179 @@
+"""
+Shift-swap and coverage marketplace with ranked eligible-colleague lookup
+"""
+
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import List
+
+import numpy as np
+
+from data_models import AppData, OpenShift, Radiologist, SwapRequest, ineligibility_reasons, is_weekend_shift
+from eligibility import month_key
+from instrumentation import timed
+
+OPEN_STATUSES = ("Open", "Pending Approval")
+
+class SwapRejected(ValueError):
+    """A swap request or approval that is not valid against the current schedule"""
+
+@dataclass
+class SwapCandidate:
+    name: str
+    score: float
+    calls_last_30_days: int
+    weekend_calls: int
+    weekend_cap: int
+    preferred_location: bool
+
+class SwapMarket:
+    """Posts coverage requests, ranks colleagues who can take them and applies
+    approved swaps to the schedule in one transaction"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _reasons(self, department: str, radiologist: Radiologist, shift: OpenShift) -> List[str]:
+        index = self.store.shard(department).eligibility()
+        pos = index.position(radiologist.name)
+        weekend_calls = int(index.weekend_calls(month_key(shift.date))[pos]) if pos is not None else 0
+        reasons = ineligibility_reasons(radiologist, shift, weekend_calls)
+        if index.is_working(radiologist.name, shift.date):
+            reasons.append("already working that day")
+        reasons += [c.describe() for c in self.store.assignment_conflicts(department, radiologist.name, shift)]
+        return reasons
+
+    @staticmethod
+    def _request(shard: AppData, request_id: int) -> SwapRequest:
+        pos = shard._key_index("swap_requests", "id").get(request_id)
+        if pos is None:
+            raise SwapRejected(f"Swap request {request_id} not found")
+        return shard.swap_requests[pos]
+
+    # --- Lookup --------------------------------------------------------------
+
+    @timed()
+    def candidates(self, department: str, shift_id: int, query: str = "", limit: int = 10) -> List[SwapCandidate]:
+        """Eligible colleagues for a shift, fairest and most willing first; `query` filters by name.
+        Conflicts are checked after ranking, only until `limit` candidates are found."""
+        shard = self.store.shard(department)
+        shift = shard.get_shift_by_id(shift_id)
+        if shift is None:
+            raise SwapRejected(f"Shift {shift_id} not found")
+        index = shard.eligibility()
+        eligible = index.eligible_mask(shift_id)
+        weekend_calls = index.weekend_calls(month_key(shift.date))
+        weekend = is_weekend_shift(shift)
+        needle = query.strip().lower()
+        calls_by_rad = [rad.call_history.get("last_30_days", 0) for rad in shard.radiologists]
+        mean_calls = sum(calls_by_rad) / len(calls_by_rad) if calls_by_rad else 0.0
+
+        ranked = []
+        for pos in np.flatnonzero(eligible):
+            rad = shard.radiologists[pos]
+            if rad.name == shift.assigned_to or (needle and needle not in rad.name.lower()):
+                continue
+            calls = calls_by_rad[pos]
+            cap = int(index.weekend_cap[pos])
+            held = int(weekend_calls[pos])
+            preferred = shift.location in rad.preferences.get("preferred_locations", ())
+            score = (mean_calls - calls) + (2.0 if preferred else 0.0) + (0.5 * (cap - held) if weekend else 0.0)
+            ranked.append(SwapCandidate(rad.name, round(score, 2), calls, held, cap, preferred))
+        ranked.sort(key=lambda c: (-c.score, c.calls_last_30_days, c.name))
+        conflicts = self.store.conflict_checker(department, shift)
+        chosen = []
+        for candidate in ranked:
+            if len(chosen) == limit:
+                break
+            if not conflicts(candidate.name):  # no night the evening before, nothing elsewhere that overlaps
+                chosen.append(candidate)
+        return chosen
+
+    def open_requests(self, department: str) -> List[SwapRequest]:
+        return [request for request in self.store.shard(department).swap_requests if request.status in OPEN_STATUSES]
+
+    # --- Workflow ------------------------------------------------------------
+
+    @timed()
+    def post(self, department: str, shift_id: int, requester: str, note: str = "") -> SwapRequest:
+        """Ask colleagues to cover a shift the requester is assigned to"""
+        with self.store.transaction():
+            shard = self.store.shard(department)
+            shift = shard.get_shift_by_id(shift_id)
+            if shift is None or shift.assigned_to != requester:
+                raise SwapRejected(f"{requester} is not assigned to shift {shift_id}")
+            if any(r.shift_id == shift_id for r in self.open_requests(department)):
+                raise SwapRejected(f"Shift {shift_id} already has an open swap request")
+            request = SwapRequest(
+                id=max((r.id for r in shard.swap_requests), default=0) + 1,
+                shift_id=shift_id,
+                requester=requester,
+                status="Open",
+                created=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                note=note
+            )
+            shard.upsert_swap_requests([request])
+            return request
+
+    @timed()
+    def offer(self, department: str, request_id: int, candidate: str) -> SwapRequest:
+        """A colleague volunteers (or is picked); the swap then waits for approval"""
+        with self.store.transaction():
+            shard = self.store.shard(department)
+            request = self._request(shard, request_id)
+            if request.status not in OPEN_STATUSES:
+                raise SwapRejected(f"Swap request {request_id} is {request.status.lower()}")
+            rad = shard.get_radiologist_by_name(candidate)
+            if rad is None:
+                raise SwapRejected(f"{candidate} is not on the {department} roster")
+            reasons = self._reasons(department, rad, shard.get_shift_by_id(request.shift_id))
+            if reasons:
+                raise SwapRejected(f"{candidate} cannot cover this shift: {', '.join(reasons)}")
+            updated = replace(request, candidate=candidate, status="Pending Approval")
+            shard.upsert_swap_requests([updated])
+            return updated
+
+    @timed()
+    def approve(self, department: str, request_id: int) -> OpenShift:
+        """Reassign the shift to the candidate, re-checking everything against the current schedule"""
+        with self.store.transaction():
+            shard = self.store.shard(department)
+            request = self._request(shard, request_id)
+            if request.status != "Pending Approval" or not request.candidate:
+                raise SwapRejected(f"Swap request {request_id} has no candidate awaiting approval")
+            shift = shard.get_shift_by_id(request.shift_id)
+            if shift is None or shift.assigned_to != request.requester:
+                raise SwapRejected(f"Shift {request.shift_id} is no longer assigned to {request.requester}")
+            taker = shard.get_radiologist_by_name(request.candidate)
+            reasons = self._reasons(department, taker, shift) if taker else ["not on the roster"]
+            if reasons:
+                raise SwapRejected(f"{request.candidate} can no longer cover this shift: {', '.join(reasons)}")
+
+            giver = shard.get_radiologist_by_name(request.requester)
+            swapped = replace(shift, assigned_to=taker.name)
+            roster = [replace(taker, call_history={**taker.call_history,
+                                                   "last_30_days": taker.call_history.get("last_30_days", 0) + 1})]
+            if giver is not None:
+                roster.append(replace(giver, call_history={
+                    **giver.call_history, "last_30_days": max(0, giver.call_history.get("last_30_days", 0) - 1)}))
+            shard.upsert_open_shifts([swapped])
+            shard.upsert_radiologists(roster)
+            shard.upsert_swap_requests([replace(request, status="Approved")])
+            return swapped
+
+    def decline(self, department: str, request_id: int) -> SwapRequest:
+        """Reject the current candidate; the request reopens for other colleagues"""
+        return self._set_status(department, request_id, "Open", candidate=None)
+
+    def cancel(self, department: str, request_id: int) -> SwapRequest:
+        return self._set_status(department, request_id, "Cancelled")
+
+    def _set_status(self, department: str, request_id: int, status: str, **fields) -> SwapRequest:
+        with self.store.transaction():
+            shard = self.store.shard(department)
+            request = self._request(shard, request_id)
+            if request.status not in OPEN_STATUSES:
+                raise SwapRejected(f"Swap request {request_id} is {request.status.lower()}")
+            updated = replace(request, status=status, **fields)
+            shard.upsert_swap_requests([updated])
+            return updated
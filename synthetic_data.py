@@ -0,0 +1,216 @@
+"""
+Scalable synthetic data generator for RadFlow Pro benchmarks and demos
+"""
+
+import random
+from datetime import date, timedelta
+from typing import List
+
+from data_models import AppData, Consultation, Location, Message, OpenShift, Radiologist
+
+SUBSPECIALTIES = ["Neuroradiology", "Musculoskeletal", "Chest Imaging", "Interventional",
+                  "Body Imaging", "Pediatric", "Breast Imaging", "Nuclear Medicine"]
+MODALITIES = ["CT", "MRI", "X-Ray", "Ultrasound", "Nuclear Medicine", "Mammography", "PET"]
+BASE_SITES = ["Main Hospital", "Outpatient Center", "Sports Medicine Center", "Pulmonary Center"]
+FIRST_NAMES = ["Sarah", "Michael", "Emily", "James", "Priya", "David", "Aisha", "Robert",
+               "Mei", "Carlos", "Hannah", "Omar", "Grace", "Luis", "Nina", "Samuel"]
+LAST_NAMES = ["Chen", "Rodriguez", "Johnson", "Park", "Patel", "Kim", "Okafor", "Miller",
+              "Nguyen", "Garcia", "Schmidt", "Haddad", "Lee", "Rossi", "Novak", "Cohen"]
+CASE_PHRASES = ["Complex vascular malformation requiring intervention planning",
+                "Unusual white matter lesion pattern in young patient",
+                "Indeterminate pulmonary nodule with interval growth",
+                "Suspected occult scaphoid fracture",
+                "Incidental adrenal mass on staging CT",
+                "Atypical enhancement in post-operative spine"]
+MESSAGE_PHRASES = ["Can you cover my weekend shift?", "Thanks, I'll take Saturday.",
+                   "Please review the CT from this morning.", "Running late, 15 minutes.",
+                   "Bid window closes at 6 PM.", "Credential paperwork submitted."]
+SHIFT_TYPES = {
+    "weekday_day": "Weekday Day",
+    "weekday_night": "Weekday Night",
+    "weekend_day": "Weekend Day",
+    "weekend_night": "Weekend Night"
+}
+START_DATE = date(2025, 9, 1)
+# Named dataset sizes shared by the benchmarks and the API server
+SCALES = {
+    "small": dict(radiologists=10, sites=4, months=1, consultations=50, messages=200),
+    "medium": dict(radiologists=60, sites=8, months=6, consultations=1000, messages=10000),
+    "large": dict(radiologists=250, sites=25, months=12, consultations=10000, messages=100000)
+}
+
+def _site_names(count: int) -> List[str]:
+    return BASE_SITES[:count] + [f"Satellite Clinic {i}" for i in range(1, count - len(BASE_SITES) + 1)]
+
+def generate_locations(count: int, rng: random.Random) -> List[Location]:
+    """Sites with random modalities and staffing requirements"""
+    locations = []
+    for i, name in enumerate(_site_names(count)):
+        hospital = i == 0 or rng.random() < 0.2
+        locations.append(Location(
+            name=name,
+            address=f"{100 + i * 7} {rng.choice(LAST_NAMES)} Ave",
+            modalities=sorted(rng.sample(MODALITIES, rng.randint(2, len(MODALITIES)))),
+            staffing_requirements={
+                "weekday_day": rng.randint(2, 4) if hospital else rng.randint(1, 2),
+                "weekday_night": 1 if hospital else 0,
+                "weekend_day": rng.randint(1, 2),
+                "weekend_night": 1 if hospital else 0
+            }
+        ))
+    return locations
+
+def generate_radiologists(count: int, site_names: List[str], rng: random.Random,
+                          start: date = START_DATE) -> List[Radiologist]:
+    """Roster with credentials, preferences and history drawn from plausible ranges"""
+    radiologists = []
+    for i in range(count):
+        sites = rng.sample(site_names, rng.randint(1, min(3, len(site_names))))
+        if site_names[0] not in sites and rng.random() < 0.7:
+            sites.insert(0, site_names[0])
+        opt_in = rng.random() < 0.75
+        bids_placed = rng.randint(0, 20) if opt_in else 0
+        bids_won = rng.randint(0, bids_placed)
+        avg_win = rng.randrange(2400, 3400, 50) if bids_won else 0
+        radiologists.append(Radiologist(
+            id=i + 1,
+            name=f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i + 1}",
+            subspecialty=rng.choice(SUBSPECIALTIES),
+            locations=sites,
+            credentials={
+                "board_certified": rng.random() < 0.97,
+                "cert_expiry": (start + timedelta(days=rng.randint(-30, 900))).isoformat(),
+                "cme_credits": rng.randint(20, 60),
+                "cme_required": 50
+            },
+            preferences={
+                "max_weekend_calls": rng.randint(1, 4),
+                "preferred_locations": sites[:1],
+                "blackout_dates": sorted((start + timedelta(days=rng.randint(0, 365))).isoformat()
+                                         for _ in range(rng.randint(0, 4))),
+                "bidding_opt_in": opt_in,
+                "max_auto_bid": rng.randrange(2600, 3600, 100) if opt_in else 0,
+                "preferred_assignment_mode": rng.choice(["Smart Distribution", "Either", "Bidding Preferred",
+                                                         "Smart Distribution Only"])
+            },
+            call_history={
+                "last_30_days": rng.randint(0, 8),
+                "year_total": rng.randint(10, 45)
+            },
+            bidding_stats={
+                "bids_placed": bids_placed,
+                "bids_won": bids_won,
+                "avg_winning_bid": avg_win,
+                "total_bidding_earnings": avg_win * bids_won
+            }
+        ))
+    return radiologists
+
+def generate_shifts(locations: List[Location], radiologists: List[Radiologist], months: int,
+                    rng: random.Random, bids_per_shift: int = 3, start: date = START_DATE) -> List[OpenShift]:
+    """Shifts for every staffed slot over N months; most filled, the rest open or in bidding"""
+    by_site = {loc.name: [rad for rad in radiologists if loc.name in rad.locations] for loc in locations}
+    bidders = [rad.name for rad in radiologists if rad.preferences["bidding_opt_in"]]
+    shifts = []
+    for offset in range(months * 30):
+        day = start + timedelta(days=offset)
+        weekend = day.weekday() >= 5
+        for loc in locations:
+            for key, label in SHIFT_TYPES.items():
+                if key.startswith("weekend") != weekend:
+                    continue
+                for _ in range(loc.staffing_requirements.get(key, 0)):
+                    shifts.append(_make_shift(len(shifts) + 1, day, label, loc.name, by_site[loc.name],
+                                              bidders, bids_per_shift, rng))
+    return shifts
+
+def _make_shift(shift_id, day, label, site, site_staff, bidders, bids_per_shift, rng):
+    roll = rng.random()
+    base = rng.randrange(2200, 2800, 50) if "Weekend" in label else rng.randrange(1800, 2400, 50)
+    shift = OpenShift(
+        id=shift_id,
+        date=day.isoformat(),
+        shift=label,
+        location=site,
+        subspecialty_required=rng.choice(["Any", "General", "Any", rng.choice(SUBSPECIALTIES)]),
+        duration="12 hours" if "Night" in label or "Weekend" in label else "8 hours",
+        base_compensation=base,
+        assignment_mode="Smart Distribution",
+        status="Filled"
+    )
+    if roll < 0.80 and site_staff:
+        shift.assigned_to = rng.choice(site_staff).name
+    elif roll < 0.90 or not bidders:
+        shift.status = "Open"
+        shift.assignment_mode = rng.choice(["Smart Distribution", "Hybrid"])
+    else:
+        shift.assignment_mode = "Bidding Mode"
+        shift.status = "Active Bidding"
+        amount = base
+        shift.bid_history = []
+        for n in range(rng.randint(1, bids_per_shift)):
+            amount += rng.randrange(50, 300, 50)
+            shift.bid_history.append({
+                "radiologist": rng.choice(bidders),
+                "amount": amount,
+                "timestamp": f"{(day - timedelta(days=2)).isoformat()}T{8 + n:02d}:{rng.randint(0, 59):02d}:00Z"
+            })
+        shift.current_high_bid = amount
+        shift.current_high_bidder = shift.bid_history[-1]["radiologist"]
+    return shift
+
+def generate_consultations(count: int, radiologists: List[Radiologist], rng: random.Random,
+                           start: date = START_DATE) -> List[Consultation]:
+    return [
+        Consultation(
+            id=i + 1,
+            case_id=f"RAD-{start.year}-{i + 1:05d}",
+            requesting_physician=rng.choice(radiologists).name,
+            specialty_needed=rng.choice(SUBSPECIALTIES + ["General"]),
+            urgency=rng.choice(["High", "Medium", "Medium", "Low"]),
+            description=rng.choice(CASE_PHRASES),
+            status=rng.choice(["Active", "Pending", "Closed"]),
+            created=f"{(start - timedelta(days=rng.randint(0, 90))).isoformat()}T{rng.randint(7, 19):02d}:{rng.randint(0, 59):02d}:00Z"
+        )
+        for i in range(count)
+    ]
+
+def generate_messages(count: int, radiologists: List[Radiologist], rng: random.Random) -> List[Message]:
+    messages = []
+    for i in range(count):
+        sender, recipient = rng.sample(radiologists, 2) if len(radiologists) > 1 else (radiologists[0],) * 2
+        hour = rng.randint(1, 12)
+        messages.append(Message(
+            id=i + 1,
+            sender=sender.name,
+            recipient=recipient.name,
+            time=f"{hour}:{rng.randint(0, 59):02d} {'AM' if rng.random() < 0.5 else 'PM'}",
+            body=rng.choice(MESSAGE_PHRASES),
+            direction="sent" if sender is radiologists[0] else "received",
+            priority=rng.choice(["Normal", "Normal", "Normal", "High", "Urgent"])
+        ))
+    return messages
+
+def generate_app_data(radiologists: int = 40, sites: int = 4, months: int = 3, bids_per_shift: int = 3,
+                      consultations: int = 200, messages: int = 2000, seed: int = 0) -> AppData:
+    """AppData filled with reproducible synthetic data at the requested scale"""
+    rng = random.Random(seed)
+    app_data = AppData()
+    app_data.locations = generate_locations(sites, rng)
+    app_data.radiologists = generate_radiologists(radiologists, [loc.name for loc in app_data.locations], rng)
+    app_data.open_shifts = generate_shifts(app_data.locations, app_data.radiologists, months, rng, bids_per_shift)
+    app_data.consultations = generate_consultations(consultations, app_data.radiologists, rng)
+    app_data.messages = generate_messages(messages, app_data.radiologists, rng)
+    return app_data
+
+def generate_open_shifts(count: int, seed: int = 42) -> List[OpenShift]:
+    """Exactly `count` shifts over the base sites, for list and pagination benchmarks"""
+    rng = random.Random(seed)
+    locations = generate_locations(len(BASE_SITES), rng)
+    radiologists = generate_radiologists(20, BASE_SITES, rng)
+    shifts = []
+    months = 1
+    while len(shifts) < count:
+        shifts = generate_shifts(locations, radiologists, months, rng)
+        months *= 2
+    return shifts[:count]
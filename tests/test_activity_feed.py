@@ -0,0 +1,61 @@
+import os
+import sys
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity_feed import ActivityFeed
+from data_models import AppData
+
+def _bid(feed, text, user="Dr. A"):
+    feed.publish("Radiology", "bid", text, users=(user,), group="bid:Weekend Night", summary="{n} new bids")
+
+def test_repeats_coalesce_into_one_entry_and_old_copies_are_skipped():
+    feed = ActivityFeed()
+    _bid(feed, "first bid")
+    feed.publish("Radiology", "message", "hello", users=("Dr. B",))
+    _bid(feed, "second bid", user="Dr. C")
+    entries = feed.page("Radiology")
+    assert [e.display for e in entries] == ["🔄 2 new bids", "✉️ hello"]
+    assert entries[0].users == ("Dr. A", "Dr. C")
+    assert [e.count for e in feed.page(user="Dr. A")] == [2]
+
+def test_closed_window_starts_a_new_entry():
+    feed = ActivityFeed(coalesce_seconds=0)
+    _bid(feed, "first bid")
+    feed.page("Radiology")
+    _bid(feed, "second bid")
+    assert [e.count for e in feed.page("Radiology")] == [1, 1]
+
+def test_ring_buffers_evict_the_oldest_and_stop_merging_into_it():
+    feed = ActivityFeed(department_capacity=3, user_capacity=2)
+    _bid(feed, "first bid")
+    for i in range(3):
+        feed.publish("Radiology", "message", f"note {i}", users=("Dr. A",))
+    _bid(feed, "second bid")  # the first bid left the ring, so this one stands alone
+    entries = feed.page("Radiology")
+    assert [e.display for e in entries] == ["🔄 second bid", "✉️ note 2", "✉️ note 1"]
+    assert len(feed.page(user="Dr. A")) == 2
+
+def test_paging_with_before_continues_newest_first():
+    feed = ActivityFeed()
+    for i in range(5):
+        feed.publish("Radiology", "message", f"note {i}")
+    feed.publish("Cardiology", "message", "elsewhere")
+    first = feed.page("Radiology", limit=2)
+    second = feed.page("Radiology", before=first[-1].seq, limit=2)
+    assert [e.text for e in first + second] == ["note 4", "note 3", "note 2", "note 1"]
+    assert feed.page("Radiology", before=second[-1].seq)[-1].text == "note 0"
+
+def test_watched_shard_publishes_bids_and_assignments():
+    app_data = AppData()
+    feed = ActivityFeed()
+    feed.watch("Radiology", app_data)
+    shift = app_data.open_shifts[0]
+    bid = {"radiologist": "Dr. James Park", "amount": 4200, "timestamp": "2025-09-01T10:00:00"}
+    app_data.upsert_open_shifts([replace(shift, bid_history=(shift.bid_history or []) + [bid])])
+    app_data.upsert_open_shifts([replace(app_data.open_shifts[0], assigned_to="Dr. James Park", status="Filled")])
+    assert [e.kind for e in feed.page(user="Dr. James Park")] == ["assignment", "bid"]
+    feed.unwatch("Radiology")
+    app_data.upsert_open_shifts([replace(app_data.open_shifts[0], assigned_to="Dr. Sarah Chen")])
+    assert len(feed.page("Radiology")) == 2
@@ -0,0 +1,85 @@
+import http.client
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import main, serve_in_background
+from attachments import AttachmentStore
+from departments import DepartmentStore
+
+TOKENS = {"secret-park": "Dr. James Park"}
+BLOB = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+@pytest.fixture
+def api(tmp_path):
+    store = DepartmentStore.with_sample_data()
+    store._attachments = AttachmentStore(str(tmp_path / "attachments"))
+    digest = store.attachments.put(io.BytesIO(BLOB), "scan.pdf").digest
+    servers = []
+
+    def request(method, path, body=None, headers=None, tokens=None):
+        if not servers or servers[0].tokens != tokens:
+            servers.insert(0, serve_in_background(store, tokens=tokens))
+        connection = http.client.HTTPConnection("127.0.0.1", servers[0].server_address[1], timeout=5)
+        payload = json.dumps(body).encode() if body is not None else None
+        connection.request(method, path, payload, {"Content-Type": "application/json", **(headers or {})})
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+        is_json = response.getheader("Content-Type") == "application/json"
+        return response.status, json.loads(data) if is_json else data, response
+
+    request.store, request.digest = store, digest
+    yield request
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    store.attachments.close()
+
+def test_shift_listing_pages_and_validates(api):
+    status, page, _ = api("GET", "/shifts?limit=2&offset=1&sort=id")
+    assert status == 200 and page["limit"] == 2 and [s["id"] for s in page["shifts"]] == [2, 3]
+    assert api("GET", "/shifts?limit=0")[0] == 400
+    assert api("GET", "/shifts?sort=secret")[0] == 400
+    assert api("GET", "/shifts/abc")[0] == 404
+    assert api("DELETE", "/shifts")[0] in (404, 405, 501)
+    assert api("POST", "/shifts")[0] == 405
+
+def test_rejected_bid_is_a_conflict(api):
+    status, error, _ = api("POST", "/shifts/2/bids", {"radiologist": "Dr. James Park", "amount": 1})
+    assert status == 409 and "error" in error
+    assert api("POST", "/shifts/2/bids", {"radiologist": "Dr. James Park", "amount": "lots"})[0] == 422
+
+def test_swap_routes_parse_the_request_id(api):
+    status, error, _ = api("POST", "/swaps/abc/approve", {})
+    assert status == 404 and "Swap request abc" in error["error"]
+    assert api("POST", "/swaps/12345/approve", {})[0] == 409
+
+def test_attachment_ranges(api):
+    path = f"/attachments/{api.digest}"
+    status, data, response = api("GET", path)
+    assert status == 200 and data == BLOB and response.getheader("Accept-Ranges") == "bytes"
+    status, data, response = api("GET", path, headers={"Range": "bytes=10-19"})
+    assert status == 206 and data == BLOB[10:20]
+    assert response.getheader("Content-Range") == f"bytes 10-19/{len(BLOB)}"
+    assert api("GET", path, headers={"Range": "bytes=-16"})[1] == BLOB[-16:]
+    for unsatisfiable in ("bytes=-", f"bytes={len(BLOB)}-"):
+        status, _, response = api("GET", path, headers={"Range": unsatisfiable})
+        assert status == 416 and response.getheader("Content-Range") == f"bytes */{len(BLOB)}"
+    assert api("GET", "/attachments/../../etc/passwd")[0] == 404
+
+def test_tokens_decide_who_is_calling(api):
+    status, _, response = api("GET", "/health", tokens=TOKENS)
+    assert status == 401 and response.getheader("WWW-Authenticate").startswith("Bearer")
+    assert api("GET", "/health", headers={"Authorization": "Bearer wrong"}, tokens=TOKENS)[0] == 401
+    assert api("GET", "/health", headers={"X-RadFlow-User": "Dr. James Park"}, tokens=TOKENS)[0] == 401
+    assert api("GET", "/health", headers={"Authorization": "Bearer secret-park"}, tokens=TOKENS)[0] == 200
+
+def test_non_local_host_requires_a_token_file():
+    with pytest.raises(SystemExit):
+        main(["--host", "0.0.0.0"])
@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attachments import AttachmentRejected, AttachmentStore, Image
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+def _store(tmp_path, **kwargs):
+    return AttachmentStore(str(tmp_path / "attachments"), **kwargs)
+
+def test_same_bytes_are_stored_once_and_counted(tmp_path):
+    store = _store(tmp_path, chunk_size=1000)
+    first = store.put(io.BytesIO(PDF), name="../../report.pdf")
+    second = store.put(io.BytesIO(PDF), name="copy.pdf")
+    assert first.digest == second.digest
+    assert (second.refs, second.size, second.content_type, first.name) == (2, len(PDF), "application/pdf", "report.pdf")
+    assert store.retain(first.digest).refs == 3
+    assert store.release(first.digest) == 2
+    assert store.release(first.digest) == 1
+    assert os.path.exists(store.path(first.digest))
+    assert store.release(first.digest) == 0
+    assert not os.path.exists(store.path(first.digest))
+    with pytest.raises(KeyError):
+        store.get(first.digest)
+    store.close()
+
+def test_ranged_and_mapped_reads(tmp_path):
+    store = _store(tmp_path, chunk_size=100)
+    digest = store.put(io.BytesIO(PDF)).digest
+    chunks = list(store.read_range(digest, 50, 1050))
+    assert max(len(chunk) for chunk in chunks) == 100
+    assert b"".join(chunks) == PDF[50:1050]
+    assert b"".join(store.read_range(digest)) == PDF
+    with store.mapped(digest) as view:
+        assert view[:5] == b"%PDF-" and len(view) == len(PDF)
+    store.close()
+
+def test_rejects_unknown_types_empty_and_oversized_uploads(tmp_path):
+    store = _store(tmp_path, max_bytes=1024)
+    with pytest.raises(AttachmentRejected, match="Unsupported"):
+        store.put(io.BytesIO(b"MZ\x90\x00 pretending to be a pdf"), name="invoice.pdf")
+    with pytest.raises(AttachmentRejected, match="empty"):
+        store.put(io.BytesIO(b""))
+    with pytest.raises(AttachmentRejected, match="exceeds"):
+        store.put(io.BytesIO(PDF))
+    assert os.listdir(os.path.join(store.directory, "tmp")) == []
+    store.close()
+
+def test_paths_only_come_from_digests(tmp_path):
+    store = _store(tmp_path)
+    with pytest.raises(KeyError):
+        store.path("../attachments.db")
+    store.close()
+
+@pytest.mark.skipif(Image is None, reason="Pillow not installed")
+def test_thumbnails_render_in_the_background_and_are_cached(tmp_path):
+    store = _store(tmp_path)
+    png = io.BytesIO()
+    Image.new("RGB", (640, 480), "red").save(png, "PNG")
+    png.seek(0)
+    attachment = store.put(png, name="scan.png")
+    assert attachment.is_image
+    assert store.thumbnail(store.put(io.BytesIO(PDF)).digest) is None  # PDFs have no preview
+    path = store.thumbnail(attachment.digest, size=64)
+    deadline = time.time() + 5
+    while path is None and time.time() < deadline:
+        time.sleep(0.01)
+        path = store.thumbnail(attachment.digest, size=64)
+    with Image.open(path) as thumbnail:
+        assert max(thumbnail.size) == 64
+    store.release(attachment.digest)
+    assert not os.path.exists(path)
+    store.close()
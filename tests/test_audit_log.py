@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+import sys
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit_log import AuditLog, acting_as, replaying
+from data_models import AppData
+
+def _log(directory, **kwargs):
+    return AuditLog(str(directory), flush_interval=0.01, **kwargs)
+
+def _segments(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log.gz"))
+
+def test_hash_chain_verifies_across_segments_and_reopen(tmp_path):
+    log = _log(tmp_path, segment_bytes=200, batch_size=1)
+    for i in range(20):
+        log.append("settings", user="admin", target=f"key:{i}")
+        log.flush()
+    assert len(_segments(tmp_path)) > 1
+    assert log.verify() == (True, None)
+    log.close()
+
+    reopened = _log(tmp_path)
+    reopened.append("settings", user="admin")
+    assert reopened.verify() == (True, None)
+    assert reopened.query()[-1]["seq"] == 21
+    reopened.close()
+
+def test_edited_record_breaks_the_chain(tmp_path):
+    log = _log(tmp_path)
+    for amount in (100, 200, 300):
+        log.append("bid", user="Dr. A", amount=amount)
+    log.close()
+    path = _segments(tmp_path)[0]
+    with open(path, "rb") as handle:
+        records = [json.loads(line) for line in gzip.decompress(handle.read()).decode().splitlines()]
+    records[1]["detail"]["amount"] = 20
+    with open(path, "wb") as handle:
+        handle.write(gzip.compress("".join(json.dumps(r) + "\n" for r in records).encode()))
+
+    tampered = _log(tmp_path)
+    assert tampered.verify() == (False, 2)
+    tampered.close()
+
+def test_torn_tail_is_dropped_on_open(tmp_path):
+    log = _log(tmp_path)
+    log.append("message", user="Dr. A")
+    log.close()
+    with open(_segments(tmp_path)[0], "ab") as handle:
+        handle.write(gzip.compress(b'{"seq": 2}\n')[:-6])  # crash mid-write
+    reopened = _log(tmp_path)
+    assert reopened.verify() == (True, None)
+    assert [r["seq"] for r in reopened.query()] == [1]
+    reopened.close()
+
+def test_query_filters_by_user_action_and_time(tmp_path):
+    log = _log(tmp_path)
+    log.append("bid", user="Dr. A", department="Radiology")
+    log.append("message", user="Dr. B", department="Radiology")
+    log.append("bid", user="Dr. B", department="Cardiology")
+    assert [r["user"] for r in log.query(action="bid")] == ["Dr. A", "Dr. B"]
+    assert [r["action"] for r in log.query(user="Dr. B", department="Radiology")] == ["message"]
+    assert log.query(start="2999-01-01") == []
+    assert len(log.query(limit=2)) == 2
+    log.close()
+
+def test_watched_writes_are_attributed_to_the_actor(tmp_path):
+    log = _log(tmp_path)
+    app_data = AppData()
+    log.watch("Radiology", app_data)
+    shift = app_data.open_shifts[0]
+    with acting_as("scheduler"):
+        app_data.upsert_open_shifts([replace(shift, assigned_to="Dr. Sarah Chen", status="Filled")])
+    with replaying():
+        app_data.upsert_open_shifts([replace(app_data.open_shifts[0], assigned_to="Dr. James Park")])
+    records = log.query(department="Radiology")
+    assert [(r["action"], r["user"], r["detail"]["assigned_to"]) for r in records] == \
+        [("assignment", "scheduler", "Dr. Sarah Chen")]
+    log.close()
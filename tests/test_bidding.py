@@ -0,0 +1,85 @@
+import os
+import sys
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bidding import BidRejected, bidding_window
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+
+AUCTION = 2  # Weekend Night at Outpatient Center: Rodriguez bid 2850, Park 2700
+
+def _store():
+    """Sample data where both bidders on the auction are eligible for it"""
+    store = DepartmentStore.with_sample_data()
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    shard.upsert_open_shifts([replace(shard.get_shift_by_id(AUCTION), subspecialty_required="Any")])
+    shard.upsert_radiologists([
+        replace(rad, locations=rad.locations + ["Outpatient Center"],
+                credentials={**rad.credentials, "cert_expiry": "2030-01-01"})
+        for rad in shard.radiologists if rad.name in ("Dr. Michael Rodriguez", "Dr. James Park")])
+    return store
+
+def _book(store, radiologist, shift_id):
+    """Give the bidder an overlapping night at another site"""
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    auction = shard.get_shift_by_id(AUCTION)
+    shard.upsert_open_shifts([replace(auction, id=shift_id, location="Main Hospital", status="Filled",
+                                      assigned_to=radiologist, current_high_bid=None, current_high_bidder=None,
+                                      bid_history=None)])
+
+def test_close_auction_awards_high_bidder():
+    store = _store()
+    awarded = store.bidding.close_auction(DEFAULT_DEPARTMENT, AUCTION)
+    assert (awarded.assigned_to, awarded.current_high_bid) == ("Dr. Michael Rodriguez", 2850)
+
+def test_close_auction_passes_over_conflicting_high_bidder():
+    store = _store()
+    _book(store, "Dr. Michael Rodriguez", 100)
+    awarded = store.bidding.close_auction(DEFAULT_DEPARTMENT, AUCTION)
+    assert awarded.status == "Filled"
+    assert (awarded.assigned_to, awarded.current_high_bid) == ("Dr. James Park", 2700)
+    assert store.bidding.deltas(0)["events"][-1].type == "awarded"
+
+def test_close_auction_passes_over_ineligible_high_bidder():
+    store = _store()
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    rodriguez = shard.get_radiologist_by_name("Dr. Michael Rodriguez")
+    shard.upsert_radiologists([replace(rodriguez, credentials={**rodriguez.credentials, "cert_expiry": "2025-01-01"})])
+    assert store.bidding.close_auction(DEFAULT_DEPARTMENT, AUCTION).assigned_to == "Dr. James Park"
+
+def test_close_auction_reopens_when_no_bidder_can_take_it():
+    store = _store()
+    _book(store, "Dr. Michael Rodriguez", 100)
+    _book(store, "Dr. James Park", 101)
+    reopened = store.bidding.close_auction(DEFAULT_DEPARTMENT, AUCTION)
+    assert (reopened.status, reopened.assigned_to, reopened.current_high_bid) == ("Open", None, None)
+    assert len(reopened.bid_history) == 2
+    assert store.bidding.deltas(0)["events"][-1].type == "reopened"
+
+def test_place_bid_rejects_ineligible_bidder():
+    store = DepartmentStore.with_sample_data()  # nobody holds Outpatient Center privileges here
+    with pytest.raises(BidRejected, match="no privileges at Outpatient Center"):
+        store.bidding.place_bid(DEFAULT_DEPARTMENT, AUCTION, "Dr. Michael Rodriguez", 5000)
+
+def test_place_bids_raises_floor_within_batch():
+    store = _store()
+    with pytest.raises(BidRejected, match="at least"):
+        store.bidding.place_bids(DEFAULT_DEPARTMENT, [(AUCTION, 3000), (AUCTION, 3000)], "Dr. James Park")
+    assert store.shard(DEFAULT_DEPARTMENT).get_shift_by_id(AUCTION).current_high_bid == 2850
+    events = store.bidding.place_bids(DEFAULT_DEPARTMENT, [(AUCTION, 3000), (AUCTION, 3100)], "Dr. James Park")
+    assert [(e.shift_id, e.amount) for e in events] == [(AUCTION, 3100)]
+    assert store.shard(DEFAULT_DEPARTMENT).get_shift_by_id(AUCTION).current_high_bid == 3100
+
+def test_bidding_window_runs_from_first_bid_until_shift_start():
+    store = _store()
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    auction = shard.get_shift_by_id(AUCTION)
+    opened, closes = bidding_window(shard, auction)
+    assert opened == datetime(2025, 8, 31, 14, 30, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert closes == min(opened + timedelta(hours=24), auction.window()[0])
+    assert bidding_window(shard, replace(auction, bid_history=None)) is None
@@ -0,0 +1,70 @@
+import os
+import sys
+from dataclasses import replace
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conflicts import ConflictIndex, IntervalSchedule, minutes
+from data_models import AppData, OpenShift
+
+def _shift(shift_id, day, label="Weekday Day", assigned_to=None, duration="12 hours"):
+    return OpenShift(shift_id, day, label, "Main Hospital", "Any", duration, 2000, "Auto",
+                     "Filled" if assigned_to else "Open", assigned_to=assigned_to)
+
+def _app_data(*shifts):
+    app_data = AppData.empty()
+    app_data.upsert_open_shifts(list(shifts))
+    return app_data
+
+def _at(text):
+    return minutes(datetime.fromisoformat(text))
+
+def test_overlap_and_short_rest_are_classified():
+    schedule = IntervalSchedule(rest_hours=10)
+    schedule.add("Dr. A", _at("2025-09-01T07:00"), _at("2025-09-01T19:00"), 1)
+    overlap, = schedule.check("Dr. A", _at("2025-09-01T15:00"), _at("2025-09-02T03:00"), key=2)
+    assert (overlap.kind, overlap.gap_hours, overlap.other) == ("overlap", -4.0, 1)
+    assert overlap.describe() == "overlaps shift 1 by 4h"
+    rest, = schedule.check("Dr. A", _at("2025-09-02T03:00"), _at("2025-09-02T15:00"), key=2)
+    assert (rest.kind, rest.gap_hours) == ("rest", 8.0)
+    assert schedule.check("Dr. A", _at("2025-09-02T05:00"), _at("2025-09-02T17:00")) == []
+    assert schedule.check("Dr. B", _at("2025-09-01T07:00"), _at("2025-09-01T19:00")) == []
+
+def test_remove_only_drops_the_matching_key():
+    schedule = IntervalSchedule()
+    start, end = _at("2025-09-01T07:00"), _at("2025-09-01T19:00")
+    schedule.add("Dr. A", start, end, 1)
+    schedule.add("Dr. A", start, end, ("2025-09-01", "Day", "Main Hospital"))
+    schedule.remove("Dr. A", start, end, 1)
+    assert [key for _, _, _, key in schedule.held()] == [("2025-09-01", "Day", "Main Hospital")]
+
+def test_index_follows_reassignments():
+    app_data = _app_data(_shift(1, "2025-09-01", "Weekday Night", assigned_to="Dr. A"),
+                         _shift(2, "2025-09-02"))
+    index = app_data.conflicts()
+    assert [c.kind for c in index.check("Dr. A", app_data.get_shift_by_id(2))] == ["rest"]  # 7 AM after the night
+    app_data.upsert_open_shifts([replace(app_data.get_shift_by_id(1), assigned_to="Dr. B")])
+    assert index.check("Dr. A", app_data.get_shift_by_id(2)) == []
+    assert index.check("Dr. B", app_data.get_shift_by_id(1)) == []  # its own slot is being replaced
+
+def test_rest_rule_and_bulk_loads_rebuild_the_index():
+    app_data = _app_data(_shift(1, "2025-09-01", "Weekday Night", assigned_to="Dr. A"), _shift(2, "2025-09-02"))
+    index = ConflictIndex(app_data)
+    app_data.department_settings = {**app_data.department_settings, "scheduling_rules": {"min_rest_hours": 0}}
+    assert index.check("Dr. A", app_data.get_shift_by_id(2)) == []
+    app_data.open_shifts = [_shift(3, "2025-09-02", assigned_to="Dr. A")]
+    assert [c.kind for c in index.check("Dr. A", _shift(4, "2025-09-02"))] == ["overlap"]
+
+def test_validate_sweeps_the_whole_schedule_with_proposals():
+    app_data = _app_data(_shift(1, "2025-09-01", assigned_to="Dr. A"), _shift(2, "2025-09-03", assigned_to="Dr. B"),
+                         _shift(3, "2025-09-01"))
+    index = app_data.conflicts()
+    assert index.validate() == []
+    clash, = index.validate([("Dr. A", app_data.get_shift_by_id(3))])
+    assert (clash.radiologist, clash.kind, {clash.key, clash.other}) == ("Dr. A", "overlap", {1, 3})
+    assert index.validate([("Dr. C", app_data.get_shift_by_id(1))]) == []  # Dr. A gives shift 1 away
+    slot = ("2025-09-03", "Day", "Main Hospital")
+    held = [("Dr. B", _at("2025-09-03T07:00"), _at("2025-09-03T19:00"), slot)]
+    conflict, = index.validate(held=held)
+    assert (conflict.key, conflict.describe()) == (slot, "overlaps shift 2 by 12h")
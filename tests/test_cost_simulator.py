@@ -0,0 +1,56 @@
+import os
+import sys
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cost_simulator
+from cost_simulator import SMART_ESCALATION, simulate, simulation_inputs
+from data_models import AppData
+
+def _inputs(**overrides):
+    inputs = simulation_inputs(AppData())
+    return replace(inputs, **overrides)
+
+def test_only_unassigned_shifts_are_simulated():
+    app_data = AppData()
+    unassigned = [shift for shift in app_data.open_shifts if not shift.assigned_to and shift.status != "Filled"]
+    inputs = simulation_inputs(app_data)
+    assert len(inputs.base_pay) == len(unassigned) == len(inputs.shift_types)
+    assert len(inputs.premium_samples) >= cost_simulator.MIN_BID_SAMPLES
+
+def test_same_seed_reproduces_and_chunking_does_not_change_totals(monkeypatch):
+    inputs = _inputs()
+    whole = simulate(inputs, scenarios=200, seed=3, workers=1)
+    assert np.array_equal(whole.totals["Hybrid"], simulate(inputs, scenarios=200, seed=3, workers=1).totals["Hybrid"])
+    monkeypatch.setattr(cost_simulator, "CELLS_PER_CHUNK", len(inputs.base_pay) * 50)
+    chunked = simulate(inputs, scenarios=200, seed=3, workers=1)
+    assert len(chunked.totals["Hybrid"]) == 200
+    assert chunked.estimates["Hybrid"].cost_low <= chunked.estimates["Hybrid"].cost_mean <= chunked.estimates["Hybrid"].cost_high
+
+def test_certain_acceptance_costs_exactly_base_pay():
+    inputs = _inputs(smart_acceptance=1.0, bid_participation=0.0)
+    result = simulate(inputs, scenarios=50, workers=1)
+    smart, bidding = result.estimates["Smart Distribution"], result.estimates["Bidding Mode"]
+    assert smart.cost_mean == pytest.approx(inputs.base_pay.sum())
+    assert smart.escalation_rate == 0.0
+    assert bidding.escalation_rate == 1.0
+    assert bidding.cost_mean == pytest.approx(inputs.base_pay.sum() * SMART_ESCALATION)
+    assert result.savings("Bidding Mode", "Smart Distribution")["mean"] > 0
+
+def test_bids_are_capped_at_the_max_bid():
+    inputs = _inputs(bid_participation=1.0, premium_samples=np.array([5.0]), max_bid=100.0)
+    result = simulate(inputs, {"bid": "Bidding Mode"}, scenarios=20, workers=1)
+    assert result.estimates["bid"].cost_mean == pytest.approx(100.0 * len(inputs.base_pay))
+
+def test_per_shift_type_policy_mixes_modes():
+    inputs = _inputs(smart_acceptance=1.0, bid_participation=1.0, premium_samples=np.array([2.0]), max_bid=np.inf)
+    weekend_nights = np.array([label == "Weekend Night" for label in inputs.shift_types])
+    assert weekend_nights.any() and not weekend_nights.all()
+    result = simulate(inputs, {"mixed": {"Weekend Night": "Bidding Mode", "*": "Smart Distribution"}},
+                      scenarios=10, workers=1)
+    expected = inputs.base_pay[~weekend_nights].sum() + 2 * inputs.base_pay[weekend_nights].sum()
+    assert result.estimates["mixed"].cost_mean == pytest.approx(expected)
@@ -0,0 +1,62 @@
+import os
+import sys
+from dataclasses import replace
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from credential_alerts import CredentialIndex
+from data_models import AppData, Radiologist
+
+TODAY = date(2025, 9, 1)
+
+def _radiologist(rad_id, name, cert_expiry, cme_credits=50, cme_required=50):
+    return Radiologist(rad_id, name, "Body", ["Main Hospital"],
+                       {"board_certified": True, "cert_expiry": cert_expiry,
+                        "cme_credits": cme_credits, "cme_required": cme_required}, {}, {}, {})
+
+def _app_data():
+    app_data = AppData.empty()
+    app_data.upsert_radiologists([
+        _radiologist(1, "Dr. A", "2025-09-20"),
+        _radiologist(2, "Dr. B", "2025-11-15"),
+        _radiologist(3, "Dr. C", "2027-01-01", cme_credits=40)
+    ])
+    return app_data
+
+def test_due_within_is_ordered_by_due_date():
+    index = CredentialIndex(_app_data(), today=TODAY)
+    assert [(d.radiologist, d.kind) for d in index.due_within(90)] == [("Dr. A", "board_cert"), ("Dr. B", "board_cert")]
+    assert [d.kind for d in index.due_within(200)][-1] == "cme"  # default CME deadline is Dec 31
+    assert index.count_due(30) == 1
+    assert [d.kind for d in index.due_for("Dr. C", days=365)] == ["cme"]
+
+def test_each_threshold_alerts_once_per_user():
+    index = CredentialIndex(_app_data(), today=TODAY)
+    alerts = index.poll()
+    assert [(a.deadline.radiologist, a.threshold, a.severity) for a in alerts] == \
+        [("Dr. A", 30, "critical"), ("Dr. B", 90, "warning")]
+    assert index.poll() == []
+    assert len(index.poll(user="Dr. A")) == 2  # another consumer gets its own copy
+    assert [(a.threshold, a.days_left) for a in index.poll(today=date(2025, 9, 14))] == [(7, 6)]
+
+def test_renewal_cancels_pending_alerts():
+    app_data = _app_data()
+    index = CredentialIndex(app_data, today=TODAY)
+    index.poll()
+    rad = app_data.get_radiologist_by_name("Dr. A")
+    app_data.upsert_radiologists([replace(rad, credentials={**rad.credentials, "cert_expiry": "2028-09-20"})])
+    assert index.refresh() == 1  # only the edited record is re-indexed
+    assert index.poll(today=date(2025, 9, 19)) == []
+    assert "Dr. A" not in {d.radiologist for d in index.due_within(90)}
+
+def test_new_year_moves_the_default_cme_deadline():
+    index = CredentialIndex(_app_data(), today=TODAY)
+    assert index.due_for("Dr. C", days=365)[0].due == date(2025, 12, 31)
+    assert index.due_for("Dr. C", days=365, today=date(2026, 1, 2))[0].due == date(2026, 12, 31)
+
+def test_renewal_reminders_group_deadlines_per_radiologist():
+    app_data = _app_data()
+    messages = CredentialIndex(app_data, today=TODAY).renewal_reminders(90, today=TODAY)
+    assert [(m.recipient, m.priority) for m in messages] == [("Dr. A", "High"), ("Dr. B", "Normal")]
+    assert messages[0].body.startswith("Renewal reminder: Board certification expires in 19 days")
@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+from dataclasses import replace
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dashboard_counters import is_bidding, is_open
+from synthetic_data import SCALES, generate_app_data
+
+def _recount(app_data, user, today):
+    upcoming = [shift for shift in app_data.open_shifts if shift.date >= today.isoformat()]
+    return (sum(1 for shift in upcoming if user and shift.assigned_to == user),
+            sum(1 for shift in upcoming if is_open(shift)),
+            sum(1 for shift in upcoming if is_bidding(shift)))
+
+def _tiles(counts):
+    return counts.upcoming_calls, counts.open_shifts, counts.active_bidding
+
+def _today(app_data):
+    days = sorted(shift.date for shift in app_data.open_shifts)
+    return date.fromisoformat(days[len(days) // 2])
+
+def test_counters_match_a_recount_after_upserts():
+    app_data = generate_app_data(**SCALES["small"], seed=3)
+    counters = app_data.dashboard_counters()
+    today = _today(app_data)
+    user = app_data.radiologists[0].name
+    names = [rad.name for rad in app_data.radiologists]
+    rng = random.Random(3)
+    for _ in range(200):
+        shift = rng.choice(app_data.open_shifts)
+        assignee = rng.choice(names + [None, None])
+        status = "Filled" if assignee else rng.choice(["Open", "Active Bidding", "Smart Failed → Bidding"])
+        app_data.upsert_open_shifts([replace(shift, assigned_to=assignee, status=status)])
+    for name in (user, names[-1], None):
+        assert _tiles(counters.counts(name, today)) == _recount(app_data, name, today)
+
+def test_new_shifts_are_counted_and_bulk_loads_rebuild():
+    app_data = generate_app_data(**SCALES["small"], seed=4)
+    counters = app_data.dashboard_counters()
+    today = _today(app_data)
+    before = counters.counts(None, today).open_shifts
+    template = app_data.open_shifts[-1]
+    new_id = max(shift.id for shift in app_data.open_shifts) + 1
+    app_data.upsert_open_shifts([replace(template, id=new_id, date="2099-01-01", assigned_to=None, status="Open")])
+    assert counters.counts(None, today).open_shifts == before + 1
+
+    app_data.open_shifts = app_data.open_shifts[:10]  # replaced wholesale, no change events
+    assert _tiles(counters.counts(None, today)) == _recount(app_data, None, today)
+
+def test_missed_removal_forces_a_recount():
+    app_data = generate_app_data(**SCALES["small"], seed=5)
+    counters = app_data.dashboard_counters()
+    today = _today(app_data)
+    shift = app_data.open_shifts[0]
+    counters._on_change("open_shifts", [replace(shift, date="1999-01-01", assigned_to="Nobody")], [shift])
+    assert counters._stale
+    assert _tiles(counters.counts(None, today)) == _recount(app_data, None, today)
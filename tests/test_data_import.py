@@ -0,0 +1,69 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_import import detect_format, import_file
+from data_models import AppData
+
+SHIFTS_CSV = """id,date,shift,location,base_compensation,assignment_mode
+101,2025-10-04,Weekend Day,Main Hospital,2200,Bidding Mode
+102,2025-10-05,Weekend Night,Main Hospital,2400,Smart Distribution
+103,not-a-date,Weekend Day,Main Hospital,2200,Bidding Mode
+104,2025-10-06,Weekday Day,Main Hospital,-5,Bidding Mode
+"""
+
+def _upload(text, name):
+    handle = io.BytesIO(text.encode("utf-8"))
+    handle.name = name
+    return handle
+
+def test_csv_rows_are_validated_and_bad_rows_reported_by_line():
+    app_data = AppData.empty()
+    report = import_file(app_data, _upload(SHIFTS_CSV, "shifts.csv"), "shifts", batch_size=2)
+    assert (report.rows_read, report.rows_imported, report.error_count) == (4, 2, 2)
+    assert [error.row for error in report.errors] == [4, 5]  # CSV line numbers, header is line 1
+    assert "invalid date" in report.errors[0].message
+    assert [s.id for s in app_data.open_shifts] == [101, 102]
+    assert app_data.get_shift_by_id(101).subspecialty_required == "Any"
+
+def test_jsonl_bids_need_a_loaded_shift_and_merge_into_history():
+    app_data = AppData.empty()
+    import_file(app_data, _upload(SHIFTS_CSV, "shifts.csv"), "shifts")
+    bids = [{"shift_id": 101, "radiologist": "Dr. A", "amount": 2300, "timestamp": "2025-10-01T10:00:00Z"},
+            {"shift_id": 999, "radiologist": "Dr. B", "amount": 2300, "timestamp": "2025-10-01T10:00:00Z"},
+            {"shift_id": 101, "radiologist": "Dr. C", "amount": 2500, "timestamp": "2025-10-01T11:00:00Z"}]
+    text = "\n".join(json.dumps(bid) for bid in bids) + "\n{broken\n"
+    report = import_file(app_data, _upload(text, "bids.jsonl"), "bids")
+    assert (report.rows_imported, report.error_count) == (2, 2)
+    errors = {error.row: error.message for error in report.errors}
+    assert "unknown shift_id 999" in errors[2] and "invalid JSON" in errors[4]
+    shift = app_data.get_shift_by_id(101)
+    assert (shift.current_high_bid, shift.current_high_bidder, len(shift.bid_history)) == (2500, "Dr. C", 2)
+    import_file(app_data, _upload(text, "bids.jsonl"), "bids")  # re-importing adds nothing
+    assert len(app_data.get_shift_by_id(101).bid_history) == 2
+
+def test_nested_and_dotted_radiologist_fields():
+    record = {"id": 7, "name": "Dr. Nested", "subspecialty": "Body", "locations": ["Main Hospital"],
+              "credentials": {"board_certified": True, "cert_expiry": "2027-01-01"},
+              "preferences.max_weekend_calls": "3", "preferences.blackout_dates": "2025-12-24; 2025-12-25"}
+    app_data = AppData.empty()
+    report = import_file(app_data, _upload(json.dumps(record) + "\n", "roster.jsonl"), "radiologists")
+    assert report.error_count == 0
+    rad = app_data.radiologists[0]
+    assert rad.credentials["board_certified"] and rad.preferences["max_weekend_calls"] == 3
+    assert rad.preferences["blackout_dates"] == ["2025-12-24", "2025-12-25"]
+
+def test_errors_are_capped_but_counted():
+    rows = "".join(f"{i},bad,Day,Main Hospital,1,Hybrid\n" for i in range(10))
+    report = import_file(AppData.empty(), _upload("id,date,shift,location,base_compensation,assignment_mode\n"
+                                                  + rows, "s.csv"), "shifts", max_errors=3)
+    assert report.error_count == 10 and len(report.errors) == 3
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        detect_format("roster.xlsx")
@@ -0,0 +1,51 @@
+import os
+import sys
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData
+from synthetic_data import generate_open_shifts
+
+def _app_data(count=400):
+    app_data = AppData.empty()
+    app_data.upsert_open_shifts(generate_open_shifts(count, seed=7))
+    return app_data
+
+def _reference(app_data, sort_by, descending, **filters):
+    matches = [s for s in app_data.open_shifts
+               if (filters.get("date_from") is None or s.date >= filters["date_from"])
+               and (not filters.get("locations") or s.location in filters["locations"])
+               and (not filters.get("statuses") or any(f.lower() in s.status.lower() for f in filters["statuses"]))]
+    return sorted(matches, key=lambda s: (getattr(s, sort_by), s.id), reverse=descending)
+
+@pytest.mark.parametrize("sort_by", ["date", "base_compensation", "location", "id"])
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("offset, limit", [(0, 25), (50, 25), (390, 25)])  # heap window and full sort
+def test_query_pages_match_a_full_sort(sort_by, descending, offset, limit):
+    app_data = _app_data()
+    expected = _reference(app_data, sort_by, descending)
+    page, total = app_data.query_open_shifts(sort_by=sort_by, descending=descending, offset=offset, limit=limit)
+    assert total == len(expected)
+    assert page == expected[offset:offset + limit]
+
+def test_query_filters_before_paging():
+    app_data = _app_data()
+    location = app_data.open_shifts[0].location
+    date_from = sorted(s.date for s in app_data.open_shifts)[100]
+    filters = dict(date_from=date_from, locations=[location], statuses=["open"])
+    expected = _reference(app_data, "date", False, **filters)
+    page, total = app_data.query_open_shifts(offset=0, limit=10, **filters)
+    assert total == len(expected) and page == expected[:10]
+    assert all(s.location == location and s.date >= date_from for s in page)
+
+def test_query_sees_upserted_shifts():
+    app_data = _app_data(50)
+    newest = max(s.id for s in app_data.open_shifts)
+    added = replace(generate_open_shifts(1, seed=8)[0], id=newest + 1, location=app_data.open_shifts[0].location)
+    _, total = app_data.query_open_shifts(locations=[added.location])
+    app_data.upsert_open_shifts([added])
+    page, new_total = app_data.query_open_shifts(locations=[added.location], sort_by="id", descending=True, limit=1)
+    assert new_total == total + 1 and page == [added]
@@ -0,0 +1,59 @@
+import os
+import sys
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData
+from departments import DepartmentStore
+from synthetic_data import generate_app_data
+
+def _store():
+    store = DepartmentStore()
+    for seed, name in enumerate(("Radiology", "Neuro", "Peds")):
+        store.add_department(name, generate_app_data(radiologists=6, sites=2, months=1, consultations=0,
+                                                     messages=0, seed=seed))
+    return store
+
+def test_merged_page_matches_a_sort_over_every_shard():
+    store = _store()
+    everything = sorted(((name, shift) for name in store.departments for shift in store.shard(name).open_shifts),
+                        key=lambda row: (row[1].base_compensation, row[1].id), reverse=True)
+    page, total = store.query_open_shifts(sort_by="base_compensation", descending=True, offset=30, limit=20)
+    assert total == len(everything)
+    assert [(n, s.id, s.base_compensation) for n, s in page] == \
+        [(n, s.id, s.base_compensation) for n, s in everything[30:50]]
+
+def test_directory_follows_roster_changes():
+    store = _store()
+    rad = store.shard("Neuro").radiologists[0]
+    assert "Neuro" in store.departments_for_radiologist(rad.name)
+    assert "Peds" not in store.departments_for_radiologist(rad.name)
+    store.shard("Peds").upsert_radiologists([replace(rad, id=999)])
+    assert {"Neuro", "Peds"} <= set(store.departments_for_radiologist(rad.name))
+    assert [name for name, _ in store.find_radiologist(rad.name)] == store.departments_for_radiologist(rad.name)
+    store.remove_department("Peds")
+    assert "Peds" not in store.departments_for_radiologist(rad.name)
+
+def test_location_queries_touch_only_staffing_shards():
+    store = _store()
+    site = store.shard("Radiology").locations[0].name
+    departments = store.departments_for_location(site)
+    rows = store.shifts_at_location(site)
+    assert {name for name, _ in rows} <= set(departments)
+    assert len(rows) == sum(1 for name in store.departments for s in store.shard(name).open_shifts
+                            if s.location == site)
+
+def test_added_department_copies_settings_but_not_the_published_rotation():
+    store = DepartmentStore.with_sample_data()
+    source = store.shard(store.departments[0]).department_settings
+    source["rotation"] = {"weeks": ["2025-09-01"]}
+    shard = store.add_department("Cardiac", settings=source)
+    assert shard.department == "Cardiac" and shard.radiologists == []
+    assert "rotation" not in shard.department_settings
+    assert shard.department_settings["bidding_rules"] == source["bidding_rules"]
+    assert shard.department_settings["bidding_rules"] is not source["bidding_rules"]
+    with pytest.raises(ValueError):
+        store.add_department("Cardiac", AppData.empty())
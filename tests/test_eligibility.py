@@ -0,0 +1,61 @@
+import os
+import sys
+from dataclasses import replace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData, ineligibility_reasons
+from eligibility import EligibilityIndex
+from synthetic_data import generate_app_data
+
+def _data():
+    return generate_app_data(radiologists=12, sites=3, months=1, consultations=0, messages=0, seed=3)
+
+def _assert_matches_rebuild(index):
+    fresh = EligibilityIndex(index.app_data)
+    assert np.array_equal(index.matrix, fresh.matrix)
+    assert np.array_equal(index.shift_assignee, fresh.shift_assignee)
+    assert np.array_equal(index.weekend_cap, fresh.weekend_cap)
+
+def test_matrix_matches_ineligibility_reasons():
+    app_data = _data()
+    index = EligibilityIndex(app_data)
+    for r, rad in enumerate(app_data.radiologists):
+        for s, shift in enumerate(app_data.open_shifts):
+            static = [reason for reason in ineligibility_reasons(rad, shift, -1) if reason != "weekend call cap reached"]
+            assert index.matrix[r, s] == (not static)
+
+def test_growth_fills_capacity_instead_of_rebuilding():
+    full = _data()
+    app_data = AppData.empty(full.department)
+    app_data.locations = full.locations
+    app_data.upsert_radiologists(full.radiologists[:4])
+    app_data.upsert_open_shifts(full.open_shifts[:10])
+    index = EligibilityIndex(app_data)
+    buffer = index._matrix_buffer
+    rads, shifts = full.radiologists[4:], full.open_shifts[10:]
+    while rads or shifts:
+        app_data.upsert_open_shifts(shifts[:3])
+        app_data.upsert_radiologists(rads[:1])
+        assert index.refresh() == len(shifts[:3]) + len(rads[:1])  # appended rows and columns only
+        rads, shifts = rads[1:], shifts[3:]
+        _assert_matches_rebuild(index)
+    assert index.matrix.shape == (len(full.radiologists), len(full.open_shifts))
+    assert index._matrix_buffer is not buffer  # grew, by doubling
+    assert index._matrix_buffer.shape[1] < 2 * len(full.open_shifts)
+
+def test_shift_assigned_before_its_radiologist_joins():
+    full = _data()
+    newcomer = full.radiologists[-1]
+    app_data = AppData.empty(full.department)
+    app_data.locations = full.locations
+    app_data.upsert_radiologists(full.radiologists[:-1])
+    app_data.upsert_open_shifts([replace(full.open_shifts[0], assigned_to=newcomer.name, status="Filled")])
+    index = EligibilityIndex(app_data)
+    assert index.shift_assignee[0] == -1
+    app_data.upsert_radiologists([newcomer])
+    index.refresh()
+    assert index.shift_assignee[0] == index.position(newcomer.name)
+    _assert_matches_rebuild(index)
@@ -0,0 +1,48 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData, Location, OpenShift
+from forecasting import (SHIFT_KEYS, DemandHistory, detect_coverage_gaps, fit_demand, history_from_shifts,
+                         shift_type_key)
+
+TUESDAY, SATURDAY = date(2025, 9, 2), date(2025, 9, 6)
+
+def _shift(shift_id, day, label, assigned_to=None):
+    return OpenShift(shift_id, day.isoformat(), label, "Main Hospital", "Any", "12 hours", 2000, "Auto",
+                     "Filled" if assigned_to else "Open", assigned_to=assigned_to)
+
+def test_shift_type_key_matches_staffing_requirement_keys():
+    assert shift_type_key("Weekend Night") == "weekend_night"
+    assert shift_type_key("Weekday Day") == "weekday_day"
+    assert shift_type_key("Night", TUESDAY) == "weekday_night"
+    assert shift_type_key("Night", SATURDAY) == "weekend_night"
+    assert shift_type_key("Day", SATURDAY) == "weekend_day"
+    assert shift_type_key("weekday_night") == "weekday_night"  # study-volume records
+
+def test_history_buckets_plain_night_shifts():
+    history = history_from_shifts([_shift(1, TUESDAY, "Night"), _shift(2, SATURDAY, "Night")])
+    assert {shift_type for _, shift_type, _ in history.keys} == {"weekday_night", "weekend_night"}
+    assert all(shift_type in SHIFT_KEYS for _, shift_type, _ in history.keys)
+
+def test_assigned_night_shift_counts_toward_coverage():
+    app_data = AppData.empty()
+    app_data.locations = [Location("Main Hospital", "", ["CT"], {"weekday_day": 0, "weekday_night": 1,
+                                                                  "weekend_day": 0, "weekend_night": 0})]
+    app_data.upsert_open_shifts([_shift(1, TUESDAY, "Night", assigned_to="Dr. Sarah Chen")])
+    assert detect_coverage_gaps(app_data, TUESDAY, days=1) == []
+    gaps = detect_coverage_gaps(app_data, TUESDAY + timedelta(days=1), days=1)
+    assert [(gap.shift_type, gap.required, gap.scheduled) for gap in gaps] == [("weekday_night", 1, 0)]
+
+def test_fit_recovers_weekday_pattern():
+    start, days = date(2025, 1, 6), 140  # a Monday
+    weekday = (np.arange(days) + start.weekday()) % 7
+    values = np.where(weekday >= 5, 1.0, 3.0)[None, :]
+    history = DemandHistory(start, [("Main Hospital", "weekday_day", "All")], values)
+    forecast = fit_demand(history).predict(start + timedelta(days=days), 14)
+    expected = np.where((np.arange(14) + (start.weekday() + days) % 7) % 7 >= 5, 1.0, 3.0)
+    assert np.allclose(forecast.values[0], expected, atol=0.05)
@@ -0,0 +1,40 @@
+import os
+import sys
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_fragments
+from data_models import AppData
+
+ROW = {"Date": "Sat, Sep 13", "Shift": "Weekend Night", "Location": "Main <Hospital>", "Duration": "12 hours",
+       "Mode": "Bidding Mode", "Base Pay": "$2,400", "Status": "Active Bidding - $2,850"}
+
+def test_values_are_escaped_and_dollars_are_not_latex():
+    message = replace(AppData().messages[0], sender="<b>Dr. X</b>", body="Pay $2,500 & <script>\nthanks")
+    bubble = html_fragments.message_bubble(message)
+    assert "<script>" not in bubble and "&lt;script&gt;" in bubble
+    assert "<b>Dr. X</b>" not in bubble
+    assert "$" not in bubble and "&#36;2,500" in bubble
+    assert "&amp;" in bubble and "<br>" in bubble
+
+def test_shift_row_renders_badge_and_mode_card():
+    row = html_fragments.shift_row(ROW)
+    assert row.startswith('<div class="shift-row">')
+    assert html_fragments.status_badge(ROW["Status"]) in row and "status-active" in row
+    assert html_fragments.mode_card(ROW["Mode"], ROW["Base Pay"]) in row and "bidding-card" in row
+    assert "Main &lt;Hospital&gt;" in row and "$" not in row
+
+def test_fragments_are_memoized_until_cleared():
+    html_fragments.clear_caches()
+    first = html_fragments.shift_row(ROW)
+    assert html_fragments.shift_row(dict(ROW)) is first
+    assert html_fragments._shift_row.cache_info().hits == 1
+    html_fragments.clear_caches()
+    assert html_fragments._shift_row.cache_info().currsize == 0
+
+def test_edited_message_renders_fresh():
+    message = AppData().messages[0]
+    before = html_fragments.message_bubble(message)
+    after = html_fragments.message_bubble(replace(message, body="edited"))
+    assert before != after and "edited" in after
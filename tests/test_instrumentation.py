@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import urllib.request
+from functools import lru_cache
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+
+@pytest.fixture
+def metrics():
+    was_enabled = instrumentation.is_enabled()
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.reset()
+    if not was_enabled:
+        instrumentation.disable()
+
+def test_timed_records_only_while_enabled(metrics):
+    @instrumentation.timed("test.op")
+    def op():
+        return 42
+
+    assert op() == 42
+    instrumentation.disable()
+    op()
+    instrumentation.enable()
+    rows = {row["operation"]: row for row in instrumentation.snapshot()}
+    assert rows["test.op"]["calls"] == 1
+
+def test_timed_keeps_lru_cache_controls(metrics):
+    @instrumentation.timed()
+    @lru_cache(maxsize=4)
+    def square(n):
+        return n * n
+
+    square(3), square(3)
+    assert square.cache_info().hits == 1
+    square.cache_clear()
+    assert square.cache_info().currsize == 0
+
+def test_quantiles_and_prometheus_export(metrics):
+    for ms in range(1, 101):
+        instrumentation.record('page."quoted"', ms / 1000)
+    row = instrumentation.snapshot()[0]
+    assert row["calls"] == 100 and row["p50_ms"] == pytest.approx(51) and row["max_ms"] == pytest.approx(100)
+    text = instrumentation.prometheus_text()
+    assert 'operation="page.\\"quoted\\"",quantile="0.99"} 0.100000000' in text
+    assert 'radflow_operation_duration_seconds_count{operation="page.\\"quoted\\""} 100' in text
+
+def test_start_stop_token_is_none_when_disabled(metrics):
+    instrumentation.disable()
+    token = instrumentation.start("page.x")
+    instrumentation.stop(token)
+    assert token is None and instrumentation.snapshot() == []
+
+def test_serve_metrics_binds_once_across_threads(metrics):
+    servers = []
+    threads = [threading.Thread(target=lambda: servers.append(instrumentation.serve_metrics(0))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(server) for server in servers}) == 1
+    instrumentation.record("scraped", 0.001)
+    port = servers[0].server_address[1]
+    body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    assert 'operation="scraped"' in body
@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import Radiologist
+from rotation import RotationQueue, fairness_report, simulate_year, slot_weight
+
+MONDAY = date(2025, 9, 1)
+
+def _radiologist(rad_id, name, year_total=0, locations=("Main Hospital",), max_weekend_calls=4):
+    return Radiologist(rad_id, name, "Body", list(locations),
+                       {"board_certified": True, "cert_expiry": "2030-01-01"},
+                       {"max_weekend_calls": max_weekend_calls}, {"year_total": year_total}, {})
+
+def _roster(count=4):
+    return [_radiologist(i, f"Dr. {chr(64 + i)}") for i in range(1, count + 1)]
+
+def _one(location, day, shift_type):
+    return 1
+
+def test_least_loaded_member_is_picked_first():
+    queue = RotationQueue([_radiologist(1, "Dr. A", 30), _radiologist(2, "Dr. B", 10)])
+    assert queue.assign(MONDAY, "Day", "Main Hospital") == ("Dr. B",)
+    assert queue.loads["Dr. B"] == 10 + slot_weight(MONDAY, "Day")
+
+def test_published_slots_repeat_and_drafts_charge_nobody():
+    queue = RotationQueue(_roster())
+    before = queue.loads
+    draft = queue.schedule_week(["Main Hospital"], MONDAY, _one)
+    assert queue.loads == before and not queue.published(["Main Hospital"], MONDAY)
+    published = queue.schedule_week(["Main Hospital"], MONDAY, _one, publish=True)
+    assert published == draft
+    assert queue.published(["Main Hospital"], MONDAY)
+    assert queue.schedule_week(["Main Hospital"], MONDAY, _one) == published
+    assert queue.validate() == []  # nobody works a day call straight after a night
+
+def test_nobody_takes_two_calls_on_one_day_or_skips_rest():
+    queue = RotationQueue(_roster(2))
+    week = queue.schedule_week(["Main Hospital"], MONDAY, _one, publish=True)
+    for day in ("Monday", "Tuesday", "Wednesday"):
+        assert len(set(week[f"{day} Day"]["Main Hospital"] + week[f"{day} Night"]["Main Hospital"])) == 2
+    assert week["Monday Night"]["Main Hospital"] != week["Tuesday Day"]["Main Hospital"]
+
+def test_ineligible_and_conflicting_members_are_skipped():
+    roster = _roster(3) + [_radiologist(9, "Dr. Elsewhere", locations=("Outpatient Center",))]
+    busy = {"Dr. A"}
+    queue = RotationQueue(roster, conflicts=lambda name, shift: ["clash"] if name in busy else [])
+    names = {name for row in queue.schedule_week(["Main Hospital"], MONDAY, _one, publish=True).values()
+             for name in row["Main Hospital"]}
+    assert names == {"Dr. B", "Dr. C"}
+
+def test_weekend_cap_leaves_slots_short():
+    queue = RotationQueue([_radiologist(1, "Dr. A", max_weekend_calls=1)])
+    saturday, sunday = date(2025, 9, 6), date(2025, 9, 7)
+    assert queue.assign(saturday, "Day", "Main Hospital") == ("Dr. A",)
+    assert queue.assign(sunday, "Day", "Main Hospital") == ()
+
+def test_newcomers_join_at_the_current_minimum_load():
+    roster = _roster(2)
+    queue = RotationQueue(roster)
+    queue.schedule_week(["Main Hospital"], MONDAY, _one, publish=True)
+    floor = min(queue.loads.values())
+    queue.sync(roster[1:] + [_radiologist(5, "Dr. New")])
+    assert queue.loads["Dr. New"] == floor and "Dr. A" not in queue.loads
+
+def test_saved_rotation_resumes_the_same_schedule():
+    roster = _roster()
+    queue = RotationQueue(roster)
+    week = queue.schedule_week(["Main Hospital"], MONDAY, _one, publish=True)
+    resumed = RotationQueue.from_dict(queue.to_dict(), roster)
+    assert resumed.schedule_week(["Main Hospital"], MONDAY, _one) == week
+    assert resumed.loads == queue.loads
+
+def test_rotation_is_fairer_than_round_robin():
+    roster = [_radiologist(i, f"Dr. {i}", year_total=i * 3, max_weekend_calls=8) for i in range(1, 9)]
+    reports = simulate_year(roster, ["Main Hospital"], MONDAY, _one, weeks=12)
+    assert reports["rotation"].fill_rate == 1.0
+    assert reports["rotation"].spread < reports["round_robin"].spread
+    assert fairness_report([5, 5, 5]).gini == 0.0
@@ -0,0 +1,65 @@
+import os
+import sys
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData, OpenShift
+from schedule_export import _fold, export_schedule, iter_csv, iter_ics, unique_slugs
+
+NEW_YORK = "America/New_York"
+
+def _shift(shift_id=1, date="2025-11-01", shift="Weekend Night", location="Main Hospital", assigned_to="Dr. A"):
+    return OpenShift(shift_id, date, shift, location, "Any", "12 hours", 2400, "Bidding Mode", "Filled",
+                     assigned_to=assigned_to)
+
+def _unfold(document):
+    return document.replace("\r\n ", "")
+
+def test_lines_fold_at_75_octets_without_splitting_characters():
+    line = "DESCRIPTION:" + "é" * 100
+    folded = _fold(line)
+    physical = folded[:-2].split("\r\n")
+    assert all(len(part.encode("utf-8")) <= 75 for part in physical)
+    assert all(part.startswith(" ") for part in physical[1:])
+    assert _unfold(folded) == line + "\r\n"
+    assert _fold("SHORT:x") == "SHORT:x\r\n"
+
+def test_events_carry_tzid_with_a_matching_vtimezone():
+    document = "".join(iter_ics([_shift(date="2025-11-01", shift="Night")], "feed", tz_name=NEW_YORK))
+    lines = _unfold(document).split("\r\n")
+    assert f"DTSTART;TZID={NEW_YORK}:20251101T190000" in lines
+    assert f"DTEND;TZID={NEW_YORK}:20251102T070000" in lines  # across the DST change
+    assert f"TZID:{NEW_YORK}" in lines
+    start = lines.index("BEGIN:VTIMEZONE")
+    vtimezone = lines[start:lines.index("END:VTIMEZONE")]
+    assert "TZOFFSETFROM:-0400" in vtimezone and "TZOFFSETTO:-0500" in vtimezone
+    assert "DTSTART:20251102T020000" in vtimezone  # fall back at 2 AM local
+    assert all(len(line.encode("utf-8")) <= 75 for line in document.split("\r\n"))
+
+def test_text_values_are_escaped():
+    document = _unfold("".join(iter_ics([_shift(location="St. Mary's, East; Wing")], "feed")))
+    assert "LOCATION:St. Mary's\\, East\\; Wing" in document.split("\r\n")
+
+def test_csv_times_carry_the_utc_offset():
+    rows = list(iter_csv([_shift(date="2025-07-04", shift="Weekday Day")], NEW_YORK))
+    assert "2025-07-04T07:00:00-04:00" in rows[1] and "2025-07-04T19:00:00-04:00" in rows[1]
+
+def test_colliding_slugs_get_distinct_suffixes():
+    slugs = unique_slugs(["St. Mary's", "St Marys", "Main Hospital"])
+    assert slugs["Main Hospital"] == "main-hospital"
+    assert slugs["St. Mary's"] != slugs["St Marys"]
+
+def test_incremental_export_rewrites_only_changed_feeds(tmp_path):
+    app_data = AppData.empty()
+    app_data.upsert_open_shifts([_shift(1, assigned_to="Dr. A"), _shift(2, location="North Clinic", assigned_to="Dr. B")])
+    first = export_schedule(app_data, str(tmp_path))
+    assert first.unchanged == [] and "schedule.csv" in first.written
+    assert export_schedule(app_data, str(tmp_path)).written == []
+
+    app_data.upsert_open_shifts([replace(app_data.get_shift_by_id(2), base_compensation=2600)])
+    second = export_schedule(app_data, str(tmp_path))
+    assert sorted(second.written) == ["location-north-clinic.ics", "radiologist-dr-b.ics", "schedule.csv"]
+    ics = (tmp_path / "radiologist-dr-b.ics").read_text()
+    assert "SEQUENCE:1" in ics  # changed event bumps its sequence
+    assert "SEQUENCE:0" in (tmp_path / "radiologist-dr-a.ics").read_text()
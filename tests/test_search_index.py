@@ -0,0 +1,58 @@
+import os
+import sys
+from dataclasses import replace
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import AppData, Consultation, Message
+
+def _app_data():
+    app_data = AppData.empty()
+    app_data.consultations = [
+        Consultation(1, "RAD-2025-001", "Dr. Lee", "Neuroradiology", "STAT", "CT head bleed follow up", "Open",
+                     "2025-09-01T08:00:00"),
+        Consultation(2, "RAD-2025-002", "Dr. Kim", "Body", "Routine", "bleed on abdominal CT", "Open",
+                     "2025-09-10T08:00:00"),
+        Consultation(3, "RAD-2025-003", "Dr. Kim", "Neuroradiology", "Routine", "MRI spine head to toe", "Closed",
+                     "2025-09-20T08:00:00")
+    ]
+    app_data.upsert_messages([Message(1, "Dr. Lee", "Dr. Kim", "9:00 AM", "Please review the head CT", "sent")])
+    return app_data
+
+def _keys(hits):
+    return [(hit.kind, hit.key) for hit in hits]
+
+def test_terms_phrases_and_prefixes_must_all_match():
+    index = _app_data().search_index()
+    assert sorted(_keys(index.search("bleed"))) == [("consultations", 1), ("consultations", 2)]
+    assert _keys(index.search('"head bleed"')) == [("consultations", 1)]
+    assert _keys(index.search("RAD-2025-003")) == [("consultations", 3)]
+    assert sorted(_keys(index.search("neuro*"))) == [("consultations", 1), ("consultations", 3)]
+    assert _keys(index.search("bleed kim")) == [("consultations", 2)]
+    assert index.search("nothing-matches-this") == []
+
+def test_filters_narrow_by_kind_attribute_and_date():
+    index = _app_data().search_index()
+    assert _keys(index.search("head", kinds=["messages"])) == [("messages", 1)]
+    assert _keys(index.search("head", specialty="neuroradiology", urgency="stat")) == [("consultations", 1)]
+    assert _keys(index.search(specialty="Body")) == [("consultations", 2)]
+    assert _keys(index.search("head", date_from=date(2025, 9, 15))) == [("consultations", 3)]
+    assert index.search() == []
+
+def test_new_and_edited_records_are_searchable_immediately():
+    app_data = _app_data()
+    index = app_data.search_index()
+    assert index.search("angiogram") == []  # cached result must not survive the write
+    app_data.upsert_messages([Message(2, "Dr. Kim", "Dr. Lee", "9:05 AM", "Angiogram booked", "sent")])
+    assert _keys(index.search("angiogram")) == [("messages", 2)]
+    app_data.upsert_messages([replace(app_data.messages[1], body="Rescheduled")])
+    assert index.search("angiogram") == []
+    assert index.search("resched*")[0].record.body == "Rescheduled"
+
+def test_replaced_lists_are_reindexed():
+    app_data = _app_data()
+    index = app_data.search_index()
+    app_data.consultations = app_data.consultations[:1]
+    assert _keys(index.search("bleed")) == [("consultations", 1)]
+    assert "spine" not in index._vocabulary
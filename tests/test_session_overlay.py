@@ -0,0 +1,61 @@
+import os
+import sys
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+from session_overlay import CommitConflict, SessionOverlay
+
+BIDDING_SHIFT = 2
+BIDDER = "Dr. James Park"
+MAX_BID = ("bidding_rules", "max_bid_limit")
+
+def _overlay():
+    store = DepartmentStore.with_sample_data()
+    return store, SessionOverlay(store, DEFAULT_DEPARTMENT)
+
+def test_edits_stay_private_until_commit():
+    store, overlay = _overlay()
+    rad = store.shard(DEFAULT_DEPARTMENT).radiologists[0]
+    overlay.update("radiologists", rad.id, preferences={"max_weekend_calls": 9})
+    overlay.set_setting(MAX_BID, 9999)
+    assert overlay.get("radiologists", rad.id).preferences["max_weekend_calls"] == 9
+    assert store.shard(DEFAULT_DEPARTMENT).radiologists[0] is rad
+    assert overlay.commit() == 2
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    assert shard.radiologists[0].preferences["max_weekend_calls"] == 9
+    assert shard.department_settings["bidding_rules"]["max_bid_limit"] == 9999
+    assert overlay.pending_count == 0
+
+def test_commit_raises_conflict_when_record_changed_underneath():
+    store, overlay = _overlay()
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    rad = shard.radiologists[0]
+    overlay.update("radiologists", rad.id, preferences={"max_weekend_calls": 9})
+    overlay.set_setting(MAX_BID, 9999)
+    with store.transaction():
+        shard.upsert_radiologists([replace(rad, subspecialty="Neuroradiology")])
+    with pytest.raises(CommitConflict):
+        overlay.commit()
+    assert shard.department_settings["bidding_rules"].get("max_bid_limit") != 9999  # nothing applied
+    assert overlay.pending_count == 2
+
+def test_settings_only_commit_leaves_draft_bids_pending():
+    store, overlay = _overlay()
+    overlay.set_setting(MAX_BID, 9999)
+    overlay.draft_bid(BIDDING_SHIFT, 5000)
+    assert overlay.commit(bids=False) == 1
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    assert shard.get_shift_by_id(BIDDING_SHIFT).current_high_bid != 5000
+    assert overlay.draft_bids() == {BIDDING_SHIFT: 5000}
+
+def test_rejected_draft_bid_is_a_conflict():
+    store, overlay = _overlay()
+    overlay.draft_bid(BIDDING_SHIFT, 1)
+    with pytest.raises(CommitConflict):
+        overlay.commit(bidder=BIDDER, edits=False)
+    assert overlay.draft_bids() == {BIDDING_SHIFT: 1}
@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import settings_store
+from departments import DepartmentStore
+from session_overlay import SessionOverlay
+from settings_store import SettingsStore, SettingsValidationError, commit_and_persist
+
+DEPARTMENT = "Radiology"
+MAX_BID = ("bidding_rules", "max_bid_limit")
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "settings.json")
+
+def _store(path):
+    return SettingsStore(path, flush_interval=0.01)
+
+def test_puts_are_validated_coalesced_and_flushed(path):
+    store = _store(path)
+    with pytest.raises(SettingsValidationError) as rejected:
+        store.put_settings(DEPARTMENT, {MAX_BID: -1, ("bidding_rules", "bid_increment"): "50"})
+    assert len(rejected.value.errors) == 2
+    for limit in (3000, 3500, 4000):
+        store.put_settings(DEPARTMENT, {MAX_BID: limit})
+    store.put_preferences(DEPARTMENT, 1, {"max_weekend_calls": 3})
+    assert store.department_settings(DEPARTMENT)["bidding_rules"]["max_bid_limit"] == 4000  # before any write
+    store.close()
+    assert store.stats["coalesced"] == 2 and store.pending_count == 0
+    with open(path, encoding="utf-8") as handle:
+        saved = json.load(handle)
+    assert saved["departments"][DEPARTMENT]["bidding_rules"]["max_bid_limit"] == 4000
+    assert saved["preferences"][DEPARTMENT]["1"]["max_weekend_calls"] == 3
+
+def test_flushed_edits_survive_a_crash(path):
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {ROOT!r})
+        from settings_store import SettingsStore
+        store = SettingsStore({path!r}, flush_interval=60)
+        store.put_settings("{DEPARTMENT}", {{("bidding_rules", "max_bid_limit"): 3100}})
+        store.flush()
+        store.put_settings("{DEPARTMENT}", {{("bidding_rules", "max_bid_limit"): 3200}})
+        os._exit(1)  # killed before the writer thread or close() runs
+    """)
+    assert subprocess.run([sys.executable, "-c", script]).returncode == 1
+    reopened = _store(path)
+    assert reopened.department_settings(DEPARTMENT)["bidding_rules"]["max_bid_limit"] == 3100
+    assert reopened.last_error is None
+    reopened.close()
+
+def test_failed_write_keeps_the_old_file_and_the_pending_edits(path, monkeypatch):
+    store = _store(path)
+    store.put_settings(DEPARTMENT, {MAX_BID: 3000})
+    store.flush()
+    real_replace = os.replace
+    def crash(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(settings_store.os, "replace", crash)
+    store.put_settings(DEPARTMENT, {MAX_BID: 3300})
+    with pytest.raises(OSError):
+        store.flush()
+    assert store.pending_count == 1 and store.stats["write_errors"] == 1
+    with open(path, encoding="utf-8") as handle:
+        assert json.load(handle)["departments"][DEPARTMENT]["bidding_rules"]["max_bid_limit"] == 3000
+    monkeypatch.setattr(settings_store.os, "replace", real_replace)
+    assert store.flush() == 1
+    store.close()
+
+def test_malformed_file_is_set_aside(path):
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write('{"departments": {')  # truncated
+    store = _store(path)
+    assert isinstance(store.last_error, ValueError)
+    assert any(name.startswith("settings.json.corrupt-") for name in os.listdir(os.path.dirname(path)))
+    store.put_settings(DEPARTMENT, {MAX_BID: 3000})
+    store.close()
+    with open(path, encoding="utf-8") as handle:
+        assert json.load(handle)["departments"][DEPARTMENT]["bidding_rules"]["max_bid_limit"] == 3000
+
+def test_workers_sharing_the_file_merge_their_edits(path):
+    first, second = _store(path), _store(path)
+    first.put_settings(DEPARTMENT, {MAX_BID: 3000})
+    second.put_settings(DEPARTMENT, {("bidding_rules", "bid_increment"): 25})
+    first.close()
+    second.close()
+    reopened = _store(path)
+    rules = reopened.department_settings(DEPARTMENT)["bidding_rules"]
+    assert (rules["max_bid_limit"], rules["bid_increment"]) == (3000, 25)
+    reopened.close()
+
+def test_commit_and_persist_validates_before_committing(path):
+    departments = DepartmentStore.with_sample_data()
+    overlay = SessionOverlay(departments, departments.departments[0])
+    store = _store(path)
+    overlay.set_setting(("bidding_rules", "min_bid_weekend_day"), 5000)
+    overlay.set_setting(MAX_BID, 3900)
+    with pytest.raises(SettingsValidationError, match="cannot exceed"):
+        commit_and_persist(overlay, store)
+    assert overlay.pending_count == 2 and store.pending_count == 0
+    overlay.set_setting(("bidding_rules", "min_bid_weekend_day"), 2000)
+    assert commit_and_persist(overlay, store) == 2
+    assert departments.settings(overlay.department)["bidding_rules"]["min_bid_weekend_day"] == 2000
+    assert store.pending_count == 2
+    store.close()
@@ -0,0 +1,76 @@
+import os
+import sys
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shared_state
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+from shared_state import SharedState
+
+AUCTION = 2
+
+@pytest.fixture
+def workers(tmp_path):
+    path = str(tmp_path / "shared.db")
+    states = [SharedState(path), SharedState(path)]
+    stores = [state.attach(DepartmentStore.with_sample_data()) for state in states]
+    yield stores
+    for state in states:
+        state.close()
+
+def _raise_pay(store, shift_id, amount):
+    with store.transaction():
+        shard = store.shard(DEFAULT_DEPARTMENT)
+        shard.upsert_open_shifts([replace(shard.get_shift_by_id(shift_id), base_compensation=amount)])
+
+def test_first_worker_seeds_and_the_second_loads(workers):
+    first, second = workers
+    assert first.shared.seeded and not second.shared.seeded
+    assert [s.to_dict() for s in second.shard(DEFAULT_DEPARTMENT).open_shifts] == \
+        [s.to_dict() for s in first.shard(DEFAULT_DEPARTMENT).open_shifts]
+
+def test_sync_reloads_only_what_changed(workers):
+    first, second = workers
+    _raise_pay(first, 1, 9999)
+    assert second.shared.sync() == 1
+    assert second.shard(DEFAULT_DEPARTMENT).get_shift_by_id(1).base_compensation == 9999
+    assert second.shared.sync() == 0  # data_version unchanged
+
+def test_auction_log_is_shared_between_workers(workers):
+    first, second = workers
+    event = first.shared.append_event("bid", DEFAULT_DEPARTMENT, AUCTION, "Dr. James Park", 4500)
+    seen = second.shared.events_since(event.seq - 1, DEFAULT_DEPARTMENT)
+    assert [(e.seq, e.shift_id, e.amount) for e in seen] == [(event.seq, AUCTION, 4500)]
+    assert second.shared.events_since(event.seq) == []
+
+def test_failed_transaction_restores_memory_from_the_database(workers):
+    first, _ = workers
+    before = first.shard(DEFAULT_DEPARTMENT).get_shift_by_id(1)
+    with pytest.raises(RuntimeError):
+        with first.transaction():
+            _raise_pay(first, 1, 1)
+            raise RuntimeError("rolled back")
+    assert first.shard(DEFAULT_DEPARTMENT).get_shift_by_id(1).to_dict() == before.to_dict()
+
+def test_pruned_change_log_forces_a_full_reload(workers, monkeypatch):
+    monkeypatch.setattr(shared_state, "CHANGE_LOG_SIZE", 5)
+    monkeypatch.setattr(shared_state, "PRUNE_EVERY", 2)
+    first, second = workers
+    for amount in range(1000, 1030):
+        _raise_pay(first, 1, amount)
+    rows, = first.shared._conn.execute("SELECT COUNT(*) FROM changes").fetchone()
+    assert rows <= 5 + 2
+    assert second.shared.sync() > 1  # behind the pruned range: every record is reloaded
+    assert second.shard(DEFAULT_DEPARTMENT).get_shift_by_id(1).base_compensation == 1029
+
+def test_upsert_reorders_records_on_other_workers(workers):
+    first, second = workers
+    shard = first.shard(DEFAULT_DEPARTMENT)
+    last = shard.open_shifts[-1]
+    first.shared._write_record(DEFAULT_DEPARTMENT, "open_shifts", last.id, -1, last.to_dict())
+    second.shared._reload_department(DEFAULT_DEPARTMENT)
+    assert second.shard(DEFAULT_DEPARTMENT).open_shifts[0].id == last.id
@@ -0,0 +1,78 @@
+import json
+import os
+import pickle
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import SCHEMA_VERSION
+from snapshot import (COLLECTIONS, FORMAT_VERSION, HEADER, MAGIC, SECTION, Snapshot, SnapshotError, load_snapshot,
+                      save_snapshot)
+from synthetic_data import SCALES, generate_app_data
+
+def _dump(app_data):
+    return {collection: [record.to_dict() for record in getattr(app_data, collection)] for collection in COLLECTIONS}
+
+def _write(path, sections):
+    """A snapshot file laid out by hand from (name, payload) pairs"""
+    offset = HEADER.size + SECTION.size * len(sections)
+    with open(path, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, SCHEMA_VERSION, len(sections)))
+        for name, payload in sections:
+            handle.write(SECTION.pack(name.encode(), offset, len(payload), 1, zlib.crc32(payload)))
+            offset += len(payload)
+        for _, payload in sections:
+            handle.write(payload)
+
+def test_round_trip_preserves_every_collection_and_settings(tmp_path):
+    app_data = generate_app_data(**SCALES["small"], seed=7)
+    path = str(tmp_path / "radflow.snap")
+    counts = save_snapshot(app_data, path)
+    assert counts["open_shifts"] == len(app_data.open_shifts)
+    loaded = load_snapshot(path)
+    assert _dump(loaded) == _dump(app_data)
+    assert loaded.department_settings == app_data.department_settings
+    assert loaded.department == app_data.department
+    assert not os.path.exists(path + ".tmp")
+
+def test_partial_load_decodes_only_requested_collections(tmp_path):
+    app_data = generate_app_data(**SCALES["small"], seed=7)
+    path = str(tmp_path / "radflow.snap")
+    save_snapshot(app_data, path)
+    with Snapshot(path) as snapshot:
+        assert snapshot.count("messages") == len(app_data.messages)
+        loaded = snapshot.load("Cardiology", collections=["radiologists"])
+    assert loaded.department == "Cardiology"
+    assert len(loaded.radiologists) == len(app_data.radiologists) and loaded.open_shifts == []
+
+def test_corrupt_section_is_reported_when_read(tmp_path):
+    path = str(tmp_path / "radflow.snap")
+    save_snapshot(generate_app_data(**SCALES["small"], seed=7), path)
+    with Snapshot(path) as snapshot:
+        offset, length, _, _ = snapshot.sections["messages"]
+    with open(path, "r+b") as handle:
+        handle.seek(offset + length // 2)
+        byte = handle.read(1)
+        handle.seek(offset + length // 2)
+        handle.write(bytes([byte[0] ^ 0xFF]))
+    with Snapshot(path) as snapshot:
+        assert snapshot.records("radiologists")  # other sections still load
+        with pytest.raises(SnapshotError, match="corrupt"):
+            snapshot.records("messages")
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    for name, data in (("empty", b""), ("text", b"definitely not a snapshot file")):
+        path = tmp_path / name
+        path.write_bytes(data)
+        with pytest.raises(SnapshotError, match="not a RadFlow snapshot"):
+            Snapshot(str(path))
+
+def test_sections_may_not_reference_code(tmp_path):
+    path = str(tmp_path / "evil.snap")
+    meta = json.dumps({"department": "Radiology"}).encode()
+    _write(path, [("meta", meta), ("settings", pickle.dumps({"hook": os.system}))])
+    with Snapshot(path) as snapshot, pytest.raises(SnapshotError, match="references"):
+        snapshot.settings()
@@ -0,0 +1,85 @@
+import os
+import sys
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import DEFAULT_DEPARTMENT
+from departments import DepartmentStore
+from swaps import SwapRejected
+
+FILLED = 4  # Weekend Day at Main Hospital held by Dr. Emily Johnson
+
+def _store():
+    return DepartmentStore.with_sample_data()
+
+def test_candidates_rank_fairest_first_and_skip_the_assignee():
+    store = _store()
+    names = [c.name for c in store.swaps.candidates(DEFAULT_DEPARTMENT, FILLED)]
+    assert "Dr. Emily Johnson" not in names
+    assert names[0] in ("Dr. Sarah Chen", "Dr. James Park")  # fewer recent calls, prefer Main Hospital
+    assert names[-1] == "Dr. Michael Rodriguez"
+    assert [c.name for c in store.swaps.candidates(DEFAULT_DEPARTMENT, FILLED, query="park")] == ["Dr. James Park"]
+    assert len(store.swaps.candidates(DEFAULT_DEPARTMENT, FILLED, limit=1)) == 1
+
+def test_candidates_drop_colleagues_with_conflicts():
+    store = _store()
+    store.conflict_checker = lambda department, shift: lambda name: name == "Dr. Sarah Chen"
+    names = [c.name for c in store.swaps.candidates(DEFAULT_DEPARTMENT, FILLED)]
+    assert "Dr. Sarah Chen" not in names and "Dr. James Park" in names
+
+def test_post_offer_approve_reassigns_and_moves_call_counts():
+    store = _store()
+    market = store.swaps
+    request = market.post(DEFAULT_DEPARTMENT, FILLED, "Dr. Emily Johnson", note="family event")
+    assert market.open_requests(DEFAULT_DEPARTMENT) == [request]
+    with pytest.raises(SwapRejected):
+        market.post(DEFAULT_DEPARTMENT, FILLED, "Dr. Emily Johnson")
+    assert market.offer(DEFAULT_DEPARTMENT, request.id, "Dr. James Park").status == "Pending Approval"
+
+    shift = market.approve(DEFAULT_DEPARTMENT, request.id)
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    assert shift.assigned_to == shard.get_shift_by_id(FILLED).assigned_to == "Dr. James Park"
+    assert shard.get_radiologist_by_name("Dr. James Park").call_history["last_30_days"] == 6
+    assert shard.get_radiologist_by_name("Dr. Emily Johnson").call_history["last_30_days"] == 2
+    assert market.open_requests(DEFAULT_DEPARTMENT) == []
+    with pytest.raises(SwapRejected):
+        market.approve(DEFAULT_DEPARTMENT, request.id)
+
+def test_only_the_assignee_can_post():
+    with pytest.raises(SwapRejected):
+        _store().swaps.post(DEFAULT_DEPARTMENT, FILLED, "Dr. Sarah Chen")
+
+def test_offer_rejects_colleagues_who_cannot_cover():
+    store = _store()
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    shard.upsert_open_shifts([replace(shard.get_shift_by_id(2), assigned_to="Dr. Sarah Chen", status="Filled")])
+    request = store.swaps.post(DEFAULT_DEPARTMENT, 2, "Dr. Sarah Chen")
+    with pytest.raises(SwapRejected, match="cannot cover"):
+        store.swaps.offer(DEFAULT_DEPARTMENT, request.id, "Dr. Michael Rodriguez")
+    with pytest.raises(SwapRejected, match="not on the"):
+        store.swaps.offer(DEFAULT_DEPARTMENT, request.id, "Dr. Nobody")
+    assert store.swaps.open_requests(DEFAULT_DEPARTMENT)[0].status == "Open"
+
+def test_approval_rechecks_the_current_schedule():
+    store = _store()
+    market = store.swaps
+    request = market.post(DEFAULT_DEPARTMENT, FILLED, "Dr. Emily Johnson")
+    market.offer(DEFAULT_DEPARTMENT, request.id, "Dr. James Park")
+    shard = store.shard(DEFAULT_DEPARTMENT)
+    shard.upsert_open_shifts([replace(shard.get_shift_by_id(FILLED), assigned_to="Dr. Sarah Chen")])
+    with pytest.raises(SwapRejected, match="no longer assigned"):
+        market.approve(DEFAULT_DEPARTMENT, request.id)
+
+def test_decline_reopens_and_cancel_closes():
+    store = _store()
+    market = store.swaps
+    request = market.post(DEFAULT_DEPARTMENT, FILLED, "Dr. Emily Johnson")
+    market.offer(DEFAULT_DEPARTMENT, request.id, "Dr. James Park")
+    reopened = market.decline(DEFAULT_DEPARTMENT, request.id)
+    assert (reopened.status, reopened.candidate) == ("Open", None)
+    assert market.cancel(DEFAULT_DEPARTMENT, request.id).status == "Cancelled"
+    with pytest.raises(SwapRejected):
+        market.offer(DEFAULT_DEPARTMENT, request.id, "Dr. James Park")
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import SCALES, generate_app_data, generate_open_shifts
+
+def _dump(app_data):
+    return [[record.to_dict() for record in getattr(app_data, collection)]
+            for collection in ("radiologists", "locations", "open_shifts", "consultations", "messages")]
+
+def test_same_seed_same_data():
+    assert _dump(generate_app_data(**SCALES["small"], seed=5)) == _dump(generate_app_data(**SCALES["small"], seed=5))
+    assert _dump(generate_app_data(**SCALES["small"], seed=5)) != _dump(generate_app_data(**SCALES["small"], seed=6))
+
+def test_scale_and_referential_integrity():
+    app_data = generate_app_data(**SCALES["small"])
+    assert len(app_data.radiologists) == SCALES["small"]["radiologists"]
+    assert len(app_data.locations) == SCALES["small"]["sites"]
+    assert len(app_data.consultations) == SCALES["small"]["consultations"]
+    names = {rad.name for rad in app_data.radiologists}
+    sites = {loc.name for loc in app_data.locations}
+    assert len(names) == len(app_data.radiologists)
+    assert len({shift.id for shift in app_data.open_shifts}) == len(app_data.open_shifts)
+    for shift in app_data.open_shifts:
+        assert shift.location in sites
+        if shift.assigned_to:
+            assert shift.assigned_to in names
+            assert shift.location in app_data.get_radiologist_by_name(shift.assigned_to).locations
+        for bid in shift.bid_history or ():
+            assert bid["radiologist"] in names
+        if shift.bid_history:
+            assert shift.current_high_bid == max(bid["amount"] for bid in shift.bid_history)
+
+def test_open_shift_count_is_exact():
+    assert len(generate_open_shifts(1234)) == 1234
@@ -3,13 +3,19 @@
 Utility functions for RadFlow Pro Streamlit application
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
+from html import escape
 import streamlit as st
 
+from instrumentation import timed
+
+@timed()
 def format_currency(amount):
     """Format currency values"""
     return f"${amount:,.0f}"
 
+@timed()
 def calculate_time_remaining(end_time_str):
     """Calculate time remaining for bidding"""
     try:
@@ -26,6 +32,7 @@ def calculate_time_remaining(end_time_str):
     except:
         return "Unknown"
 
+@timed()
 def get_status_color(status):
     """Get color for status badges"""
     status_colors = {
@@ -36,6 +43,7 @@ def get_status_color(status):
     }
     return status_colors.get(status.lower(), "#6b7280")
 
+@timed()
 def format_date(date_str):
     """Format date strings for display"""
     try:
@@ -44,10 +52,12 @@ def format_date(date_str):
     except:
         return date_str
 
+@timed()
 def calculate_bid_increment(current_bid, increment=50):
     """Calculate next bid increment"""
     return current_bid + increment
 
+@timed()
 def get_urgency_emoji(urgency):
     """Get emoji for urgency levels"""
     urgency_emojis = {
@@ -57,6 +67,7 @@ def get_urgency_emoji(urgency):
     }
     return urgency_emojis.get(urgency.lower(), "⚪")
 
+@timed()
 def format_time_ago(timestamp_str):
     """Format timestamp as time ago"""
     try:
@@ -75,6 +86,8 @@ def format_time_ago(timestamp_str):
     except:
         return "Unknown"
 
+@timed()
+@lru_cache(maxsize=256)
 def create_status_badge(status, extra_class=""):
     """Create HTML status badge"""
     color_map = {
@@ -95,12 +108,13 @@ def create_status_badge(status, extra_class=""):
         font-size: 0.75rem; 
         font-weight: 600; 
         text-transform: uppercase;
-        {extra_class}
+        {escape(extra_class)}
     ">
-        {emoji} {status}
+        {emoji} {escape(status)}
     </span>
     """
 
+@timed()
 def calculate_workload_balance(radiologists_data):
     """Calculate workload balance metrics"""
     total_calls = sum(rad['call_history']['last_30_days'] for rad in radiologists_data)
@@ -114,6 +128,7 @@ def calculate_workload_balance(radiologists_data):
 
     return sum(balance_scores) / len(balance_scores)
 
+@timed()
 def get_credential_status(expiry_date, cme_current, cme_required):
     """Determine credential status"""
     try:
@@ -130,32 +145,60 @@ def get_credential_status(expiry_date, cme_current, cme_required):
     except:
         return "⚠️ Unknown"
 
-def generate_schedule_grid(radiologists, locations, start_date=None):
-    """Generate a sample schedule grid"""
+def _rotation_member(index, rad, location_names):
+    """A Radiologist from a (possibly partial) dict; missing fields impose no constraint"""
+    from data_models import Radiologist
+    return Radiologist(
+        id=rad.get('id', index), name=rad['name'], subspecialty=rad.get('subspecialty', "General"),
+        locations=rad.get('locations', location_names),
+        credentials=rad.get('credentials', {"board_certified": True, "cert_expiry": "9999-12-31"}),
+        preferences=rad.get('preferences', {"max_weekend_calls": 31}),
+        call_history=rad.get('call_history', {}), bidding_stats=rad.get('bidding_stats', {}))
+
+def _grid_cell(names, headcount):
+    """Names on call, with any calls nobody eligible was left to take"""
+    short = headcount - len(names)
+    if short <= 0:
+        return ", ".join(names) if names else "—"
+    gap = f"⚠️ {short} of {headcount} unfilled"
+    return f"{', '.join(names)} ({gap})" if names else gap
+
+@timed()
+def generate_schedule_grid(radiologists, locations, start_date=None, requirements=None, rotation=None,
+                           publish=False):
+    """Generate a week's schedule grid; requirements(location_name, date, shift_key) -> headcount
+    (e.g. a demand forecast) decides which slots are staffed, else staffing_requirements.
+    Names come from a fairness RotationQueue: pass the shard's (AppData.rotation()) so the
+    rotation carries over from week to week, otherwise a fresh one is built from `radiologists`.
+    The week is a draft that charges no call load until it is generated with `publish`.
+    Returns the grid, with shortfalls marked in their cells, and the share of required calls filled."""
+    from rotation import RotationQueue
     if start_date is None:
         start_date = datetime.now()
-
-    schedule = {}
-    shifts = ["Day", "Night"]
-
-    for i in range(7):  # Week view
-        date = start_date + timedelta(days=i)
-        day_name = date.strftime("%A")
-
-        for shift in shifts:
-            shift_key = f"{day_name} {shift}"
-            schedule[shift_key] = {}
-
-            for location in locations:
-                # Simple round-robin assignment for demo
-                rad_index = (i + (1 if shift == "Night" else 0)) % len(radiologists)
-                if location['staffing_requirements'].get(f'weekday_{shift.lower()}', 0) > 0:
-                    schedule[shift_key][location['name']] = radiologists[rad_index]['name']
-                else:
-                    schedule[shift_key][location['name']] = "—"
-
-    return schedule
-
+    if rotation is None:
+        names = [location['name'] for location in locations]
+        rotation = RotationQueue([_rotation_member(i, rad, names) for i, rad in enumerate(radiologists)])
+    if requirements is None:
+        staffing = {location['name']: location['staffing_requirements'] for location in locations}
+        requirements = lambda name, day, shift_type: staffing[name].get(shift_type, 0)
+
+    headcounts = {}  # (shift key, location) -> calls required, as the rotation asks for them
+    def required(name, day, shift_type):
+        headcount = requirements(name, datetime.combine(day, start_date.time()), shift_type)
+        headcounts[(f"{day:%A} {shift_type.split('_')[1].title()}", name)] = max(0, headcount)
+        return headcount
+
+    week = rotation.schedule_week([location['name'] for location in locations], start_date.date(), required,
+                                  publish=publish)
+    grid = {shift_key: {location: _grid_cell(names, headcounts[(shift_key, location)])
+                        for location, names in slots.items()}
+            for shift_key, slots in week.items()}
+    needed = sum(headcounts.values())
+    filled = sum(min(len(names), headcounts[(shift_key, location)])
+                 for shift_key, slots in week.items() for location, names in slots.items())
+    return grid, filled / needed if needed else 1.0
+
+@timed()
 def validate_bid_amount(amount, min_bid, max_bid):
     """Validate bid amount"""
     if amount < min_bid:
@@ -165,6 +208,7 @@ def validate_bid_amount(amount, min_bid, max_bid):
     else:
         return True, "Valid bid amount"
 
+@timed()
 def calculate_cost_savings(smart_avg, bidding_avg, smart_shifts, bidding_shifts):
     """Calculate cost savings between methods"""
     smart_total = smart_avg * smart_shifts
@@ -181,6 +225,7 @@ def calculate_cost_savings(smart_avg, bidding_avg, smart_shifts, bidding_shifts)
         "savings_percentage": (actual_savings / bidding_total * 100) if bidding_total > 0 else 0
     }
 
+@timed()
 def get_notification_settings():
     """Get default notification settings"""
     return {
@@ -193,6 +238,7 @@ def get_notification_settings():
         "consultation_requests": True
     }
 
+@timed()
 def format_subspecialty_coverage(radiologists):
     """Format subspecialty coverage matrix"""
     coverage = {}
@@ -203,3 +249,28 @@ def format_subspecialty_coverage(radiologists):
         coverage[subspecialty].append(rad['name'])
 
     return coverage
+
+@timed()
+def shift_display_row(shift):
+    """Build the display row for an open shift"""
+    status = shift.status
+    if shift.current_high_bid:
+        status = f"{status} - {format_currency(shift.current_high_bid)}"
+
+    if "Bidding" in shift.status and shift.assignment_mode == "Bidding Mode":
+        action = "View Bids"
+    elif shift.status == "Open":
+        action = "Auto-Assign"
+    else:
+        action = "Monitor"
+
+    return {
+        "Date": format_date(shift.date),
+        "Shift": shift.shift,
+        "Location": shift.location,
+        "Duration": shift.duration,
+        "Base Pay": format_currency(shift.base_compensation),
+        "Mode": shift.assignment_mode,
+        "Status": status,
+        "Action": action
+    }